@@ -10,6 +10,8 @@ from datetime import datetime, timezone
 from typing import Dict, List, Any, Optional
 from collections import defaultdict
 
+from .canister_client import call_canister
+
 # Get the directory of this script
 SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
 FUNNAI_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "../"))
@@ -33,20 +35,9 @@ def get_canister_id_from_env(env_key: str, network: str) -> str:
 
 
 def run_dfx_call(canister_id: str, method: str, args: str, network: str) -> Any:
-    """Run a dfx canister call and return the parsed JSON response."""
-    cmd = [
-        "dfx", "canister", "call",
-        "--network", network,
-        "--output", "json",
-        canister_id,
-        method,
-        args
-    ]
-
+    """Call a canister method through the shared canister client and return the parsed JSON response."""
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        response_json = json.loads(result.stdout)
-        return response_json
+        return call_canister(network, canister_id, method, args=args)
     except subprocess.CalledProcessError as e:
         print(f"Error running dfx command: {e}")
         print(f"Stdout: {e.stdout}")
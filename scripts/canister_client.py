@@ -0,0 +1,665 @@
+#!/usr/bin/env python3
+"""
+Shared in-process canister client for the ops scripts.
+
+Every `dfx canister call` subprocess pays for dfx start-up and identity loading.
+For fleet scans over thousands of mAIners that overhead dominates the run time.
+This module keeps, per network:
+  - one ic-py Agent with the dfx identity loaded once
+  - one pooled keep-alive HTTP connection to the IC boundary nodes
+  - the parsed Candid interfaces from src/declarations
+
+Results are returned in the same shape as `dfx canister call --output json`, so
+call sites can switch from `json.loads(dfx_output)` without changing how they
+read the data (e.g. `data.get('Ok', {}).get('cyclesBurnRate', {}).get('cycles')`).
+
+When ic-py is not installed, or the method/arguments cannot be handled in-process
+(no Candid interface found, Candid text arguments), the call falls back to the
+`dfx canister call` subprocess with the exact same return value.
+
+Usage:
+    from .canister_client import call_canister
+    data = call_canister(network, address, "getIssueFlagsAdmin")
+"""
+
+import asyncio
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+try:
+    from . import singleflight
+except ImportError:  # imported from a script run directly (e.g. upgrade_mainers.py)
+    import singleflight
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+ROOT_DIR = SCRIPT_DIR.parent
+DECLARATIONS_DIR = ROOT_DIR / "src" / "declarations"
+CANISTER_IDS_PATH = ROOT_DIR / "canister_ids.json"
+
+# Mainnet boundary nodes (same provider as the persistent networks in dfx.json)
+IC_URL = "https://icp0.io"
+
+# Default timeout in seconds for a single canister call
+DEFAULT_TIMEOUT = 30.0
+
+# Size of the keep-alive connection pool per network
+MAX_CONNECTIONS = 50
+
+# Set FUNNAI_USE_DFX=1 to force every call through the dfx subprocess
+FORCE_DFX = os.environ.get("FUNNAI_USE_DFX", "") not in ("", "0", "false", "False")
+
+# Which Candid interface to use for a canister name as it appears in canister_ids.json
+CANISTER_NAME_INTERFACES = {
+    "game_state_canister": "game_state_canister",
+    "mainer_ctrlb_canister": "mainer_ctrlb_canister",
+    "api_canister": "api_canister",
+    "funnai_backend": "funnai_backend",
+}
+
+
+class CanisterCallError(subprocess.CalledProcessError):
+    """A canister call failed (rejected, trapped or could not be sent).
+
+    Subclasses CalledProcessError so existing `except subprocess.CalledProcessError`
+    handlers keep working after switching from the dfx subprocess to this client.
+    """
+
+    def __init__(self, cmd: List[str], stderr: str, returncode: int = 1, output: str = ""):
+        super().__init__(returncode, cmd, output=output, stderr=stderr)
+
+    def __str__(self):
+        return f"Canister call '{' '.join(self.cmd)}' failed: {self.stderr}"
+
+
+def _ic_py_available() -> bool:
+    try:
+        import ic.agent  # noqa: F401  # type: ignore
+        import httpx  # noqa: F401  # type: ignore
+        return True
+    except ImportError:
+        return False
+
+
+class _PooledHttpClient:
+    """Drop-in replacement for ic.client.Client that reuses one connection pool.
+
+    ic-py's Client issues a module-level `httpx.post` per request, which opens a new
+    TLS connection for every call.
+    """
+
+    def __init__(self, url: str, timeout: float = DEFAULT_TIMEOUT):
+        import httpx  # type: ignore
+
+        self.url = url
+        self.timeout = timeout
+        self._http = httpx.Client(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS),
+        )
+        # An httpx.AsyncClient is bound to the event loop it was first used in
+        self._async_http: Dict[int, Any] = {}
+
+    def _post(self, canister_id, endpoint, data):
+        url = f"{self.url}/api/v2/canister/{canister_id}/{endpoint}"
+        ret = self._http.post(url, content=data, headers={'Content-Type': 'application/cbor'})
+        return ret.content
+
+    def query(self, canister_id, data):
+        return self._post(canister_id, "query", data)
+
+    def call(self, canister_id, req_id, data):
+        self._post(canister_id, "call", data)
+        return req_id
+
+    def read_state(self, canister_id, data):
+        return self._post(canister_id, "read_state", data)
+
+    def status(self):
+        return self._http.get(f"{self.url}/api/v2/status").content
+
+    def close(self):
+        self._http.close()
+
+    def _async_client(self):
+        import httpx  # type: ignore
+
+        loop_id = id(asyncio.get_running_loop())
+        if loop_id not in self._async_http:
+            self._async_http[loop_id] = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS),
+            )
+        return self._async_http[loop_id]
+
+    async def _post_async(self, canister_id, endpoint, data):
+        url = f"{self.url}/api/v2/canister/{canister_id}/{endpoint}"
+        ret = await self._async_client().post(url, content=data, headers={'Content-Type': 'application/cbor'})
+        return ret.content
+
+    async def query_async(self, canister_id, data):
+        return await self._post_async(canister_id, "query", data)
+
+    async def call_async(self, canister_id, req_id, data):
+        await self._post_async(canister_id, "call", data)
+        return req_id
+
+    async def read_state_async(self, canister_id, data):
+        return await self._post_async(canister_id, "read_state", data)
+
+    async def status_async(self):
+        return (await self._async_client().get(f"{self.url}/api/v2/status")).content
+
+    async def aclose(self):
+        """Close the async connection pool of the running event loop."""
+        client = self._async_http.pop(id(asyncio.get_running_loop()), None)
+        if client is not None:
+            await client.aclose()
+
+
+def _format_nat(value: int) -> str:
+    """Format an unbounded nat/int like dfx does: 1_000_000_000_000"""
+    sign = "-" if value < 0 else ""
+    digits = str(abs(value))
+    groups = []
+    while len(digits) > 3:
+        groups.insert(0, digits[-3:])
+        digits = digits[:-3]
+    groups.insert(0, digits)
+    return sign + "_".join(groups)
+
+
+def to_dfx_json(value: Any, idl_type: Any) -> Any:
+    """Convert a value decoded by ic-py into the shape of `dfx --output json`."""
+    from ic import candid  # type: ignore
+
+    while isinstance(idl_type, candid.RecClass):
+        idl_type = idl_type.getType()
+
+    if value is None:
+        return None
+    if isinstance(idl_type, (candid.NatClass, candid.IntClass)):
+        return _format_nat(value)
+    if isinstance(idl_type, (candid.FixedNatClass, candid.FixedIntClass)):
+        return str(value) if idl_type._bits == 64 else value
+    if isinstance(idl_type, candid.PrincipalClass):
+        return value.to_str() if hasattr(value, "to_str") else str(value)
+    if isinstance(idl_type, candid.OptClass):
+        return [to_dfx_json(value[0], idl_type._type)] if value else []
+    if isinstance(idl_type, candid.VecClass):
+        return [to_dfx_json(item, idl_type._type) for item in value]
+    if isinstance(idl_type, candid.TupleClass):
+        return {key.lstrip('_'): to_dfx_json(value.get(key), field_type) for key, field_type in idl_type._fields.items()}
+    if isinstance(idl_type, candid.RecordClass):
+        return {key: to_dfx_json(value.get(key), field_type) for key, field_type in idl_type._fields.items() if key in value}
+    if isinstance(idl_type, candid.VariantClass):
+        tag, inner = next(iter(value.items()))
+        return {tag: to_dfx_json(inner, idl_type._fields.get(tag))}
+    return value
+
+
+# The management canister and the part of its interface used by these scripts.
+# Calls to it are routed to the subnet of the target canister (effective canister id).
+MANAGEMENT_CANISTER_ID = "aaaaa-aa"
+MANAGEMENT_DID = """
+type definite_canister_settings = record {
+  controllers : vec principal;
+  compute_allocation : nat;
+  memory_allocation : nat;
+  freezing_threshold : nat;
+};
+service ic : {
+  canister_status : (record { canister_id : principal }) -> (record {
+    status : variant { running; stopping; stopped };
+    settings : definite_canister_settings;
+    module_hash : opt blob;
+    memory_size : nat;
+    cycles : nat;
+    idle_cycles_burned_per_day : nat;
+  });
+}
+"""
+
+
+# A method signature in a .did service: `name: (args) -> (results) query;`
+# (`field: func (...) -> (...)` function-typed fields are not matched)
+_DID_METHOD_RE = re.compile(
+    r'^\s*"?([A-Za-z_][A-Za-z0-9_]*)"?\s*:\s*\([\s\S]*?\)\s*->\s*\([\s\S]*?\)\s*((?:composite_)?query)?\s*;',
+    re.MULTILINE,
+)
+
+_did_methods_cache: Dict[str, Dict[str, bool]] = {}
+
+
+def did_methods(did_path: Path) -> Dict[str, bool]:
+    """Return {method: is_query} for the service methods declared in a .did file.
+
+    A cheap text scan, so the call mode can be decided without the ic-py Candid parser.
+    """
+    key = str(did_path)
+    if key not in _did_methods_cache:
+        with open(did_path, "r", encoding="utf-8") as f:
+            did = f.read()
+        _did_methods_cache[key] = {name: bool(mode) for name, mode in _DID_METHOD_RE.findall(did)}
+    return _did_methods_cache[key]
+
+
+def interface_methods(name: str) -> Dict[str, bool]:
+    """{method: is_query} of src/declarations/<name>/<name>.did, empty if there is no such file."""
+    did_path = DECLARATIONS_DIR / name / f"{name}.did"
+    return did_methods(did_path) if did_path.exists() else {}
+
+
+def is_query_method(method: str, interface: str) -> bool:
+    """True if the method is declared `query` (or `composite_query`) in the interface."""
+    return interface_methods(interface).get(method, False)
+
+
+# Per-method call statistics: (method, mode, transport) -> {"calls", "errors", "total_seconds", "max_seconds"}
+# mode is "query" or "update"; transport is "agent" (in-process) or "dfx" (subprocess)
+CALL_STATS: Dict[tuple, Dict[str, float]] = {}
+_stats_lock = threading.Lock()
+
+
+def record_call(method: str, mode: str, transport: str, seconds: float, ok: bool = True):
+    """Record the mode and latency of one canister call."""
+    with _stats_lock:
+        stats = CALL_STATS.setdefault(
+            (method, mode, transport), {"calls": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+        )
+        stats["calls"] += 1
+        if not ok:
+            stats["errors"] += 1
+        stats["total_seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+
+def call_stats_lines() -> List[str]:
+    """One line per (method, mode, transport) with call count and average/max latency."""
+    with _stats_lock:
+        items = sorted(CALL_STATS.items())
+    lines = []
+    for (method, mode, transport), stats in items:
+        average_ms = 1000 * stats["total_seconds"] / stats["calls"] if stats["calls"] else 0.0
+        lines.append(
+            f"{method:<45} {mode:<6} via {transport:<5} calls={int(stats['calls'])} errors={int(stats['errors'])} "
+            f"avg={average_ms:.0f}ms max={1000 * stats['max_seconds']:.0f}ms"
+        )
+    return lines
+
+
+class CandidInterface:
+    """The methods of one .did file: name -> (argTypes, retTypes, is_query)."""
+
+    def __init__(self, name: str, did_path: Optional[Path] = None, did: Optional[str] = None):
+        from ic.parser.DIDEmitter import DIDEmitter, DIDLexer, DIDParser  # type: ignore
+        from antlr4 import CommonTokenStream, InputStream, ParseTreeWalker  # type: ignore
+
+        self.name = name
+        self.did_path = did_path
+        if did is None:
+            with open(did_path, "r", encoding="utf-8") as f:
+                did = f.read()
+
+        parser = DIDParser(CommonTokenStream(DIDLexer(InputStream(did))))
+        emitter = DIDEmitter()
+        ParseTreeWalker().walk(emitter, parser.program())
+
+        self.methods: Dict[str, Any] = emitter.getActor()["methods"]
+
+    def has_method(self, method: str) -> bool:
+        return method in self.methods
+
+    def is_query(self, method: str) -> bool:
+        return "query" in self.methods[method].annotations
+
+
+class CanisterClient:
+    """Long-lived client for one network. Use get_client(network) to share it."""
+
+    def __init__(self, network: str, timeout: float = DEFAULT_TIMEOUT):
+        self.network = network
+        self.timeout = timeout
+        self.use_agent = not FORCE_DFX and _ic_py_available()
+        self._agent = None
+        self._interfaces: Dict[str, Optional[CandidInterface]] = {}
+        self._canister_ids: Optional[Dict[str, Dict[str, str]]] = None
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Setup (done once per network, on first use)
+    # ------------------------------------------------------------------
+    def _network_url(self) -> str:
+        if self.network != "local":
+            return IC_URL
+        port = subprocess.run(
+            ["dfx", "info", "webserver-port"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        return f"http://localhost:{port}"
+
+    @property
+    def agent(self):
+        """The ic-py Agent, created on first use with the current dfx identity."""
+        with self._lock:
+            if self._agent is None:
+                from ic.agent import Agent  # type: ignore
+                from ic.identity import Identity  # type: ignore
+
+                whoami = subprocess.run(
+                    ["dfx", "identity", "whoami"], capture_output=True, text=True, check=True
+                ).stdout.strip()
+                pem = subprocess.run(
+                    ["dfx", "identity", "export", whoami], capture_output=True, text=True, check=True
+                ).stdout
+                self._agent = Agent(Identity.from_pem(pem), _PooledHttpClient(self._network_url(), self.timeout))
+            return self._agent
+
+    def interface(self, name: str) -> Optional[CandidInterface]:
+        """The parsed Candid interface from src/declarations/<name>/<name>.did, or None."""
+        with self._lock:
+            if name not in self._interfaces:
+                did_path = DECLARATIONS_DIR / name / f"{name}.did"
+                try:
+                    if name == MANAGEMENT_CANISTER_ID:
+                        self._interfaces[name] = CandidInterface(name, did=MANAGEMENT_DID)
+                    else:
+                        self._interfaces[name] = CandidInterface(name, did_path) if did_path.exists() else None
+                except Exception as e:  # a .did the ic-py parser cannot handle -> use dfx for it
+                    print(f"WARNING: Unable to parse {did_path}, calls will use dfx: {e}")
+                    self._interfaces[name] = None
+            return self._interfaces[name]
+
+    def resolve_canister_id(self, canister: str) -> Optional[str]:
+        """Return the canister id for a name in canister_ids.json, or the input if it is already an id."""
+        if "-" in canister and canister.endswith("-cai"):
+            return canister
+        if self._canister_ids is None:
+            try:
+                with open(CANISTER_IDS_PATH, "r") as f:
+                    self._canister_ids = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                self._canister_ids = {}
+        canister_id = self._canister_ids.get(canister, {}).get(self.network, "")
+        return canister_id or None
+
+    def find_interface(self, canister: str, method: str, interface: Optional[str] = None) -> Optional[str]:
+        """Pick the name of the Candid interface (in src/declarations) for a call.
+
+        Uses, in order: the explicit interface, the canister name, or the only
+        declaration that defines the method. Returns None when unknown or ambiguous.
+        """
+        if interface:
+            return interface
+        if canister in CANISTER_NAME_INTERFACES:
+            return CANISTER_NAME_INTERFACES[canister]
+
+        names = sorted(os.listdir(DECLARATIONS_DIR)) if DECLARATIONS_DIR.exists() else []
+        matches = [name for name in names if method in interface_methods(name)]
+        return matches[0] if len(matches) == 1 else None
+
+    # ------------------------------------------------------------------
+    # Calls
+    # ------------------------------------------------------------------
+    def call(
+        self,
+        canister: str,
+        method: str,
+        args: Union[None, str, List[Any]] = None,
+        interface: Optional[str] = None,
+        timeout: Optional[float] = None,
+        coalesce: Optional[bool] = None,
+    ) -> Any:
+        """Call a canister method and return the result shaped like `dfx --output json`.
+
+        Args:
+            canister: canister id, or a name from canister_ids.json
+            method: the method name
+            args: None for no arguments, a list of Python values (encoded with the
+                  Candid interface), or a Candid text string (always uses dfx)
+            interface: name of the declaration in src/declarations to use
+            timeout: seconds to wait for the reply, of the dfx subprocess or of an update call via the agent
+            coalesce: share the result of an identical call that is already in flight
+                      (see singleflight.py). Default: only for query methods.
+        """
+        interface_name = self.find_interface(canister, method, interface)
+        if self._coalesce(method, interface_name, coalesce):
+            key = (self.network, canister, method, repr(args))
+            return singleflight.coalesce(key, lambda: self._call(canister, method, args, interface_name, timeout))
+        return self._call(canister, method, args, interface_name, timeout)
+
+    def _call(self, canister: str, method: str, args, interface_name: Optional[str], timeout: Optional[float]) -> Any:
+        candid_interface = self._agent_interface(canister, method, args, interface_name)
+        if candid_interface is not None:
+            return self._call_agent(self.resolve_canister_id(canister), method, args or [], candid_interface,
+                                    timeout=timeout)
+
+        if isinstance(args, list) and args:
+            raise ValueError(f"Cannot call {method} with Python arguments without a Candid interface; pass Candid text")
+        query = bool(interface_name) and is_query_method(method, interface_name)
+        return self._call_dfx(canister, method, args, timeout, query)
+
+    async def call_async(
+        self,
+        canister: str,
+        method: str,
+        args: Union[None, str, List[Any]] = None,
+        interface: Optional[str] = None,
+        timeout: Optional[float] = None,
+        coalesce: Optional[bool] = None,
+    ) -> Any:
+        """Async version of call(), for use with asyncio (see fleet_executor.py).
+
+        Query calls go over the shared async connection pool. Update calls, which
+        ic-py polls with blocking sleeps, run in a worker thread. The dfx fallback
+        uses an asyncio subprocess.
+        """
+        interface_name = self.find_interface(canister, method, interface)
+        if self._coalesce(method, interface_name, coalesce):
+            key = (self.network, canister, method, repr(args))
+            return await singleflight.coalesce_async(
+                key, lambda: self._call_async(canister, method, args, interface_name, timeout)
+            )
+        return await self._call_async(canister, method, args, interface_name, timeout)
+
+    async def _call_async(self, canister: str, method: str, args, interface_name: Optional[str],
+                          timeout: Optional[float]) -> Any:
+        candid_interface = self._agent_interface(canister, method, args, interface_name)
+        if candid_interface is not None:
+            canister_id = self.resolve_canister_id(canister)
+            if candid_interface.is_query(method):
+                return await self._query_agent_async(canister_id, method, args or [], candid_interface)
+            return await asyncio.to_thread(self._call_agent, canister_id, method, args or [], candid_interface,
+                                           timeout=timeout)
+
+        if isinstance(args, list) and args:
+            raise ValueError(f"Cannot call {method} with Python arguments without a Candid interface; pass Candid text")
+        query = bool(interface_name) and is_query_method(method, interface_name)
+        return await self._call_dfx_async(canister, method, args, timeout, query)
+
+    @staticmethod
+    def _coalesce(method: str, interface_name: Optional[str], coalesce: Optional[bool]) -> bool:
+        # Updates change state: two identical updates must both run, unless the caller says otherwise
+        if coalesce is not None:
+            return coalesce
+        return bool(interface_name) and is_query_method(method, interface_name)
+
+    def _agent_interface(self, canister: str, method: str, args, interface_name: Optional[str]) -> Optional[CandidInterface]:
+        """The parsed interface to use for an in-process call, or None to use dfx."""
+        if not self.use_agent or isinstance(args, str) or not interface_name:
+            return None
+        if method not in interface_methods(interface_name) or not self.resolve_canister_id(canister):
+            return None
+        candid_interface = self.interface(interface_name)
+        if candid_interface is None or not candid_interface.has_method(method):
+            return None
+        return candid_interface
+
+    async def aclose(self):
+        """Release the async connections of the running event loop."""
+        if self._agent is not None and hasattr(self._agent.client, "aclose"):
+            await self._agent.client.aclose()
+
+    def _encode_args(self, method: str, args: List[Any], func: Any) -> bytes:
+        from ic.candid import encode  # type: ignore
+
+        if len(args) != len(func.argTypes):
+            raise ValueError(f"{method} expects {len(func.argTypes)} arguments, got {len(args)}")
+        return encode([{'type': t, 'value': v} for t, v in zip(func.argTypes, args)])
+
+    @staticmethod
+    def _decode_result(result: List[Dict[str, Any]], func: Any) -> Any:
+        values = [to_dfx_json(item['value'], t) for item, t in zip(result, func.retTypes)]
+        if not values:
+            return None
+        return values[0] if len(values) == 1 else values
+
+    async def _query_agent_async(self, canister_id: str, method: str, args: List[Any], candid_interface: CandidInterface) -> Any:
+        func = candid_interface.methods[method]
+        cmd = ["canister", "call", "--network", self.network, canister_id, method]
+        arg = self._encode_args(method, args, func)
+        start = time.monotonic()
+        try:
+            result = await self.agent.query_raw_async(canister_id, method, arg, func.retTypes)
+        except Exception as e:
+            record_call(method, "query", "agent", time.monotonic() - start, ok=False)
+            raise CanisterCallError(cmd, f"error sending request: {e}") from e
+        record_call(method, "query", "agent", time.monotonic() - start, ok=not isinstance(result, str))
+        if isinstance(result, str):
+            raise CanisterCallError(cmd, f"Failed query call. {result}")
+        return self._decode_result(result, func)
+
+    def management_call(self, method: str, canister_id: str, timeout: Optional[float] = None) -> Any:
+        """Call a management canister method (e.g. canister_status) for one canister via the agent.
+
+        Only available when ic-py is installed (see use_agent); dfx has its own subcommands for these.
+        """
+        candid_interface = self.interface(MANAGEMENT_CANISTER_ID) if self.use_agent else None
+        if candid_interface is None:
+            raise RuntimeError(f"Management canister calls need ic-py; use `dfx canister {method.split('_')[-1]}`")
+        return self._call_agent(MANAGEMENT_CANISTER_ID, method, [{"canister_id": canister_id}], candid_interface,
+                                effective_canister_id=canister_id, timeout=timeout)
+
+    async def management_call_async(self, method: str, canister_id: str, timeout: Optional[float] = None) -> Any:
+        """Async version of management_call (runs in a worker thread, like other update calls)."""
+        return await asyncio.to_thread(self.management_call, method, canister_id, timeout)
+
+    def _call_agent(self, canister_id: str, method: str, args: List[Any], candid_interface: CandidInterface,
+                    effective_canister_id: Optional[str] = None, timeout: Optional[float] = None) -> Any:
+        func = candid_interface.methods[method]
+        cmd = ["canister", "call", "--network", self.network, canister_id, method]
+        arg = self._encode_args(method, args, func)
+        mode = "query" if candid_interface.is_query(method) else "update"
+
+        start = time.monotonic()
+        try:
+            if mode == "query":
+                result = self.agent.query_raw(canister_id, method, arg, func.retTypes, effective_canister_id)
+                if isinstance(result, str):
+                    # ic-py returns the reject message instead of raising for queries
+                    raise CanisterCallError(cmd, f"Failed query call. {result}")
+            else:
+                # ic-py polls for the reply of an update without a deadline unless it is given one
+                result = self.agent.update_raw(canister_id, method, arg, func.retTypes, effective_canister_id,
+                                               timeout=timeout or self.timeout)
+        except CanisterCallError:
+            record_call(method, mode, "agent", time.monotonic() - start, ok=False)
+            raise
+        except Exception as e:  # ic-py raises bare Exceptions; httpx raises its own
+            record_call(method, mode, "agent", time.monotonic() - start, ok=False)
+            raise CanisterCallError(cmd, f"error sending request: {e}") from e
+        record_call(method, mode, "agent", time.monotonic() - start)
+
+        return self._decode_result(result, func)
+
+    def _dfx_command(self, canister: str, method: str, args: Optional[str], query: bool) -> List[str]:
+        cmd = ["dfx", "canister", "call", "--network", self.network, "--output", "json"]
+        if query:
+            cmd.append("--query")
+        cmd += [canister, method]
+        if args:
+            cmd.append(args)
+        return cmd
+
+    def _call_dfx(self, canister: str, method: str, args: Optional[str], timeout: Optional[float], query: bool = False) -> Any:
+        cmd = self._dfx_command(canister, method, args, query)
+        start = time.monotonic()
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout or self.timeout)
+        except subprocess.TimeoutExpired:
+            record_call(method, "query" if query else "update", "dfx", time.monotonic() - start, ok=False)
+            raise
+        record_call(method, "query" if query else "update", "dfx", time.monotonic() - start, ok=result.returncode == 0)
+        if result.returncode != 0:
+            raise CanisterCallError(cmd, result.stderr, returncode=result.returncode, output=result.stdout)
+        output = result.stdout.strip()
+        return json.loads(output) if output else None
+
+    async def _call_dfx_async(self, canister: str, method: str, args: Optional[str], timeout: Optional[float], query: bool = False) -> Any:
+        cmd = self._dfx_command(canister, method, args, query)
+        start = time.monotonic()
+        try:
+            returncode, stdout, stderr = await run_subprocess_async(cmd, timeout or self.timeout)
+        except subprocess.TimeoutExpired:
+            record_call(method, "query" if query else "update", "dfx", time.monotonic() - start, ok=False)
+            raise
+        record_call(method, "query" if query else "update", "dfx", time.monotonic() - start, ok=returncode == 0)
+        if returncode != 0:
+            raise CanisterCallError(cmd, stderr, returncode=returncode, output=stdout)
+        output = stdout.strip()
+        return json.loads(output) if output else None
+
+
+async def run_subprocess_async(cmd: List[str], timeout: float = DEFAULT_TIMEOUT):
+    """Run a command without blocking the event loop. Returns (returncode, stdout, stderr).
+
+    Raises subprocess.TimeoutExpired when the command does not finish in time.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    except asyncio.CancelledError:
+        # Do not leave an orphaned dfx process behind when the caller gives up
+        if process.returncode is None:
+            process.kill()
+        raise
+    return process.returncode, stdout.decode(), stderr.decode()
+
+
+_clients: Dict[str, CanisterClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(network: str) -> CanisterClient:
+    """Return the shared CanisterClient for a network."""
+    with _clients_lock:
+        if network not in _clients:
+            _clients[network] = CanisterClient(network)
+        return _clients[network]
+
+
+def call_canister(
+    network: str,
+    canister: str,
+    method: str,
+    args: Union[None, str, List[Any]] = None,
+    interface: Optional[str] = None,
+    timeout: Optional[float] = None,
+    coalesce: Optional[bool] = None,
+) -> Any:
+    """Call a canister method through the shared client for the network.
+
+    Same result as `json.loads(dfx canister call --output json ...)`.
+    Raises CanisterCallError (a subprocess.CalledProcessError) on failure.
+    """
+    return get_client(network).call(canister, method, args=args, interface=interface, timeout=timeout, coalesce=coalesce)
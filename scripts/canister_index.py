@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Index of a canister_ids.json, loaded once and shared by the scripts that look up dfx names.
+
+Looking up the dfx name of a canister used to open, parse and scan the whole canister_ids.json
+for every canister. The index parses the file once into both directions:
+
+  - (network, address) -> dfx name   (the name to pass to dfx deploy)
+  - dfx name -> {network: address}
+
+It is re-read when the modification time or size of the file changes, so edits by other
+processes (get_mainers.sh) are picked up. Owner and canister type of mAIners, which are
+not in canister_ids.json, are added from the mAIner records of the GameState with
+register_mainers().
+
+Usage:
+    from .canister_index import canister_index
+
+    index = canister_index(POAIW_CANISTER_IDS_PATH)
+    index.register_mainers(get_mainers(network))
+    name = index.name(network, address)
+    owner, canister_type = index.owner(address), index.canister_type(address)
+"""
+
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def mainer_canister_type(mainer: Dict) -> str:
+    """The MainerAgent type of a mAIner record of the GameState (e.g. ShareAgent), '' if none."""
+    canister_type_dict = mainer.get('canisterType', {}).get("MainerAgent", {})
+    return list(canister_type_dict.keys())[0] if canister_type_dict else ''
+
+
+class CanisterIndex:
+    """Bidirectional index of one canister_ids.json, plus owner and type of the mAIners in it."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._version: Optional[Tuple[int, int]] = None
+        self._addresses: Dict[str, Dict[str, str]] = {}
+        self._names: Dict[Tuple[str, str], str] = {}
+        self._mainers: Dict[str, Tuple[str, str]] = {}
+
+    def _file_version(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _build(self, canister_ids: Dict):
+        self._addresses = {name: dict(networks) for name, networks in canister_ids.items() if isinstance(networks, dict)}
+        self._names = {}
+        for name, networks in self._addresses.items():
+            for network, address in networks.items():
+                # The first name wins, like the linear scan it replaces
+                self._names.setdefault((network, address), name)
+
+    def _load(self):
+        """Parse the file if it changed since it was parsed (a file without a readable mtime is parsed every time)."""
+        version = self._file_version()
+        if version is not None and version == self._version:
+            return
+        with open(self.path, 'r') as f:
+            canister_ids = json.load(f)
+        self._build(canister_ids)
+        self._version = version
+
+    def name(self, network: str, address: str) -> Optional[str]:
+        """The dfx name of the canister with this address on the network, None if not in the file."""
+        with self._lock:
+            self._load()
+            return self._names.get((network, address))
+
+    def address(self, name: str, network: str) -> Optional[str]:
+        """The address of a dfx name on the network, None if not in the file."""
+        with self._lock:
+            self._load()
+            return self._addresses.get(name, {}).get(network)
+
+    def names(self, network: str) -> Dict[str, str]:
+        """{dfx name: address} of all canisters with an address on the network."""
+        with self._lock:
+            self._load()
+            return {name: networks[network] for name, networks in self._addresses.items() if network in networks}
+
+    def update(self, network: str, addresses: Dict[str, str]):
+        """Set the address on the network of some dfx names (others are kept) and write the file."""
+        with self._lock:
+            try:
+                self._load()
+            except FileNotFoundError:
+                self._build({})
+            canister_ids = {name: dict(networks) for name, networks in self._addresses.items()}
+            for name, address in addresses.items():
+                canister_ids.setdefault(name, {})[network] = address
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, prefix=".tmp-", suffix=".json")
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(canister_ids, f, indent=2)
+                os.replace(tmp_path, self.path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            self._build(canister_ids)
+            self._version = self._file_version()
+
+    def register_mainers(self, mainers: Iterable[Dict]):
+        """Add owner and canister type of the mAIners in GameState records (getMainerAgentCanistersAdmin)."""
+        with self._lock:
+            for mainer in mainers:
+                address = mainer.get('address', '')
+                if address:
+                    self._mainers[address] = (mainer.get('ownedBy', ''), mainer_canister_type(mainer))
+
+    def owner(self, address: str) -> Optional[str]:
+        with self._lock:
+            return self._mainers.get(address, (None, None))[0]
+
+    def canister_type(self, address: str) -> Optional[str]:
+        with self._lock:
+            return self._mainers.get(address, (None, None))[1]
+
+    def owned_by(self, owner: str) -> List[str]:
+        """Addresses of the registered mAIners of an owner."""
+        with self._lock:
+            return [address for address, (owned_by, _) in self._mainers.items() if owned_by == owner]
+
+
+_indexes: Dict[Path, CanisterIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def canister_index(path) -> CanisterIndex:
+    """The shared index of a canister_ids.json."""
+    path = Path(path).resolve()
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = CanisterIndex(path)
+        return _indexes[path]
+
+
+def forget_indexes():
+    """Drop all indexes (for tests)."""
+    with _indexes_lock:
+        _indexes.clear()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+One typed status record per canister, shared by the balance, memory, hash and controller checks.
+
+`dfx canister status` already returns the status, cycle balance, memory size, module hash,
+controllers and idle burn of a canister, but scripts used to run it (or `dfx canister info`)
+separately for each of those values. get_status_record() fetches everything in one round trip
+and remembers the record for a short time, so that analysis passes hit each canister once.
+
+The record comes from the management canister's canister_status, through the in-process agent
+when ic-py is installed, else from the `dfx canister status` output. Only controllers may call
+canister_status: for other callers the record falls back to `dfx canister info`, which has the
+module hash and controllers only (source="info").
+
+Usage:
+    from .canister_status import get_status_record
+
+    record = get_status_record(network, canister_id)
+    print(record.status, record.balance, record.module_hash)
+"""
+
+import re
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from .canister_client import CanisterCallError, get_client, run_subprocess_async, DEFAULT_TIMEOUT
+    from .singleflight import coalesce, coalesce_async
+except ImportError:  # imported from a script run directly (e.g. upgrade_mainers.py)
+    from canister_client import CanisterCallError, get_client, run_subprocess_async, DEFAULT_TIMEOUT
+    from singleflight import coalesce, coalesce_async
+
+# How long a fetched record is reused, in seconds
+STATUS_MAX_AGE = 30.0
+
+
+@dataclass
+class CanisterStatus:
+    """The state of one canister, as reported by the management canister."""
+    canister_id: str
+    status: Optional[str] = None  # "Running", "Stopping" or "Stopped"
+    balance: Optional[int] = None  # cycles
+    memory_size: Optional[int] = None  # bytes
+    module_hash: Optional[str] = None  # "0x..." like dfx prints it, None if no wasm is installed
+    controllers: List[str] = field(default_factory=list)
+    idle_cycles_burned_per_day: Optional[int] = None
+    source: str = "status"  # "status", or "info" when the caller is not a controller
+    fetched_at: float = field(default_factory=time.time)
+
+
+_records: Dict[Tuple[str, str], CanisterStatus] = {}
+_records_lock = threading.Lock()
+
+
+def _parse_number(text: str) -> Optional[int]:
+    # "3_141_592_653_589 Cycles", "12_345 Bytes" or, for older dfx, "Nat(12345)"
+    match = re.search(r"\d[\d_,]*", text)
+    return int(match.group(0).replace("_", "").replace(",", "")) if match else None
+
+
+def _parse_hash(text: str) -> Optional[str]:
+    text = text.strip()
+    return text if text.startswith("0x") else None
+
+
+def parse_status_output(canister_id: str, output: str) -> CanisterStatus:
+    """Parse the output of `dfx canister status` into a CanisterStatus."""
+    record = CanisterStatus(canister_id=canister_id)
+    for line in output.split('\n'):
+        key, sep, value = line.partition(':')
+        if not sep:
+            continue
+        key = key.strip()
+        if key == 'Status':
+            record.status = value.strip()
+        elif key == 'Balance':
+            record.balance = _parse_number(value)
+        elif key == 'Memory Size':
+            record.memory_size = _parse_number(value)
+        elif key == 'Module hash':
+            record.module_hash = _parse_hash(value)
+        elif key == 'Controllers':
+            record.controllers = value.split()
+        elif key == 'Idle cycles burned per day':
+            record.idle_cycles_burned_per_day = _parse_number(value)
+    return record
+
+
+def parse_info_output(canister_id: str, output: str) -> CanisterStatus:
+    """Parse the output of `dfx canister info` (module hash and controllers only)."""
+    record = CanisterStatus(canister_id=canister_id, source="info")
+    for line in output.split('\n'):
+        key, sep, value = line.partition(':')
+        if key.strip() == 'Module hash':
+            record.module_hash = _parse_hash(value)
+        elif key.strip() == 'Controllers':
+            record.controllers = value.split()
+    return record
+
+
+def from_management_record(canister_id: str, value: Dict[str, Any]) -> CanisterStatus:
+    """Build a CanisterStatus from a decoded canister_status reply (dfx JSON shape)."""
+    module_hash = value.get("module_hash") or []
+    return CanisterStatus(
+        canister_id=canister_id,
+        status=next(iter(value["status"])).capitalize(),
+        balance=_parse_number(value["cycles"]),
+        memory_size=_parse_number(value["memory_size"]),
+        module_hash="0x" + bytes(module_hash[0]).hex() if module_hash else None,
+        controllers=list(value["settings"]["controllers"]),
+        idle_cycles_burned_per_day=_parse_number(value["idle_cycles_burned_per_day"]),
+    )
+
+
+def _is_not_controller_error(error_text: str) -> bool:
+    # e.g. "Only controllers of canister ... can call ic00 method canister_status"
+    return "controller" in error_text.lower()
+
+
+def _dfx_command(network: str, command: str, canister_id: str) -> List[str]:
+    return ["dfx", "canister", "--network", network, command, canister_id]
+
+
+def _run_dfx(network: str, command: str, canister_id: str, timeout: float) -> str:
+    cmd = _dfx_command(network, command, canister_id)
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    if result.returncode != 0:
+        raise CanisterCallError(cmd, result.stderr, returncode=result.returncode, output=result.stdout)
+    return result.stdout
+
+
+async def _run_dfx_async(network: str, command: str, canister_id: str, timeout: float) -> str:
+    cmd = _dfx_command(network, command, canister_id)
+    returncode, stdout, stderr = await run_subprocess_async(cmd, timeout)
+    if returncode != 0:
+        raise CanisterCallError(cmd, stderr, returncode=returncode, output=stdout)
+    return stdout
+
+
+def fetch_status_record(network: str, canister_id: str, timeout: float = DEFAULT_TIMEOUT) -> CanisterStatus:
+    """Fetch a fresh CanisterStatus. Raises CanisterCallError (a CalledProcessError) on failure.
+
+    Concurrent fetches of the same canister share one request.
+    """
+    return coalesce(("canister_status", network, canister_id), lambda: _fetch_status_record(network, canister_id, timeout))
+
+
+def _fetch_status_record(network: str, canister_id: str, timeout: float) -> CanisterStatus:
+    client = get_client(network)
+    try:
+        if client.use_agent:
+            record = from_management_record(canister_id, client.management_call("canister_status", canister_id))
+        else:
+            record = parse_status_output(canister_id, _run_dfx(network, "status", canister_id, timeout))
+    except CanisterCallError as e:
+        if not _is_not_controller_error(str(e.stderr)):
+            raise
+        record = parse_info_output(canister_id, _run_dfx(network, "info", canister_id, timeout))
+    remember_status_record(network, record)
+    return record
+
+
+async def fetch_status_record_async(network: str, canister_id: str, timeout: float = DEFAULT_TIMEOUT) -> CanisterStatus:
+    """Async version of fetch_status_record."""
+    return await coalesce_async(("canister_status", network, canister_id),
+                                lambda: _fetch_status_record_async(network, canister_id, timeout))
+
+
+async def _fetch_status_record_async(network: str, canister_id: str, timeout: float) -> CanisterStatus:
+    client = get_client(network)
+    try:
+        if client.use_agent:
+            value = await client.management_call_async("canister_status", canister_id)
+            record = from_management_record(canister_id, value)
+        else:
+            record = parse_status_output(canister_id, await _run_dfx_async(network, "status", canister_id, timeout))
+    except CanisterCallError as e:
+        if not _is_not_controller_error(str(e.stderr)):
+            raise
+        record = parse_info_output(canister_id, await _run_dfx_async(network, "info", canister_id, timeout))
+    remember_status_record(network, record)
+    return record
+
+
+def remember_status_record(network: str, record: CanisterStatus):
+    """Store a record so that get_status_record() can reuse it."""
+    with _records_lock:
+        _records[(network, record.canister_id)] = record
+
+
+def cached_status_record(network: str, canister_id: str, max_age: float = STATUS_MAX_AGE) -> Optional[CanisterStatus]:
+    """The remembered record of a canister if it is not older than max_age seconds, else None."""
+    with _records_lock:
+        record = _records.get((network, canister_id))
+    if record is None or time.time() - record.fetched_at > max_age:
+        return None
+    return record
+
+
+def forget_status_records(network: Optional[str] = None, canister_id: Optional[str] = None):
+    """Drop remembered records (all, or those of one network and/or canister), e.g. after an upgrade."""
+    with _records_lock:
+        for key in list(_records):
+            if (network is None or key[0] == network) and (canister_id is None or key[1] == canister_id):
+                del _records[key]
+
+
+def get_status_record(network: str, canister_id: str, max_age: float = STATUS_MAX_AGE,
+                      timeout: float = DEFAULT_TIMEOUT) -> CanisterStatus:
+    """The CanisterStatus of a canister, reusing a record fetched in the last max_age seconds."""
+    return cached_status_record(network, canister_id, max_age) or fetch_status_record(network, canister_id, timeout)
+
+
+async def get_status_record_async(network: str, canister_id: str, max_age: float = STATUS_MAX_AGE,
+                                  timeout: float = DEFAULT_TIMEOUT) -> CanisterStatus:
+    """Async version of get_status_record."""
+    record = cached_status_record(network, canister_id, max_age)
+    return record or await fetch_status_record_async(network, canister_id, timeout)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Subnet of a canister, looked up once per run, for the per-subnet circuit breaker (see retry_policy.py).
+
+A subnet that is down or overloaded fails the calls to all of its canisters. The subnet
+breaker counts those failures per subnet, so the other mAIners of the subnet fail fast
+instead of each spending its own retries on it.
+
+The subnet of a canister is looked up with the IC API (ic-api.internetcomputer.org) the
+first time one of its calls fails with a network error, and kept for the rest of the run.
+A canister whose subnet is unknown (lookup failed, local replica, fake IC) only has its
+own circuit breaker.
+
+Usage:
+    from .canister_subnets import subnet_of, known_subnet
+
+    subnet = subnet_of(canister_id)       # looks it up once, None if unknown
+    subnet = known_subnet(canister_id)    # never looks it up
+"""
+
+import threading
+from typing import Dict, Optional
+
+IC_API_CANISTER_URL = "https://ic-api.internetcomputer.org/api/v3/canisters/{canister_id}"
+
+# Seconds to wait for the IC API
+LOOKUP_TIMEOUT = 5.0
+
+_subnets: Dict[str, Optional[str]] = {}
+_subnets_lock = threading.Lock()
+
+
+def fetch_subnet(canister_id: str) -> Optional[str]:
+    """Ask the IC API for the subnet of a canister. None if it cannot tell."""
+    try:
+        import requests
+
+        response = requests.get(IC_API_CANISTER_URL.format(canister_id=canister_id), timeout=LOOKUP_TIMEOUT)
+        response.raise_for_status()
+        return response.json().get("subnet_id") or None
+    except Exception:
+        return None
+
+
+def known_subnet(canister_id: str) -> Optional[str]:
+    """The subnet of a canister if it was already looked up, else None."""
+    with _subnets_lock:
+        return _subnets.get(canister_id)
+
+
+def subnet_of(canister_id: str) -> Optional[str]:
+    """The subnet of a canister, looked up on the first call only (also when the lookup fails)."""
+    with _subnets_lock:
+        if canister_id in _subnets:
+            return _subnets[canister_id]
+    subnet = fetch_subnet(canister_id)
+    with _subnets_lock:
+        return _subnets.setdefault(canister_id, subnet)
+
+
+def remember_subnets(subnets: Dict[str, Optional[str]]):
+    """Set the subnet of canisters whose subnet is known without a lookup (e.g. the fake IC)."""
+    with _subnets_lock:
+        _subnets.update(subnets)
+
+
+def forget_subnets():
+    """Drop all looked up subnets (for tests)."""
+    with _subnets_lock:
+        _subnets.clear()
@@ -9,6 +9,8 @@ from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Any
 
+from .canister_client import call_canister
+
 # Get the directory of this script
 SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
 FUNNAI_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "../"))
@@ -33,20 +35,11 @@ def get_canister_id_from_env(env_key: str, network: str) -> str:
 
 
 def run_dfx_call(canister_id: str, method: str, network: str) -> Any:
-    """Run a dfx canister call and return the parsed JSON response."""
-    cmd = [
-        "dfx", "canister", "call",
-        "--network", network,
-        "--output", "json",
-        canister_id,
-        method
-    ]
-
-    print(f"Running: {' '.join(cmd)}")
+    """Call a canister method through the shared canister client and return the parsed JSON response."""
+    print(f"Calling: {canister_id} {method} --network {network}")
 
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        response_json = json.loads(result.stdout)
+        response_json = call_canister(network, canister_id, method)
         return response_json.get('Ok', [])
     except subprocess.CalledProcessError as e:
         print(f"Error running dfx command: {e}")
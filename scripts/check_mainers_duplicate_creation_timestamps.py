@@ -6,6 +6,7 @@ from collections import defaultdict
 from datetime import datetime
 
 from .get_mainers import get_mainers
+from .response_cache import add_cache_arguments, configure_cache_from_args
 
 # Get the directory of this script
 SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
@@ -110,5 +111,7 @@ if __name__ == "__main__":
         default="local",
         help="Specify the network to use (default: local)",
     )
+    add_cache_arguments(parser)
     args = parser.parse_args()
+    configure_cache_from_args(args)
     check_duplicate_timestamps(args.network)
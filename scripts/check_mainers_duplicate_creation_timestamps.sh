@@ -2,6 +2,7 @@
 
 # Default network type is local
 NETWORK_TYPE="local"
+CACHE_FLAGS=""
 
 # Parse command line arguments for network type
 while [ $# -gt 0 ]; do
@@ -16,9 +17,17 @@ while [ $# -gt 0 ]; do
             fi
             shift
             ;;
+        --no-cache)
+            CACHE_FLAGS="$CACHE_FLAGS --no-cache"
+            shift
+            ;;
+        --refresh)
+            CACHE_FLAGS="$CACHE_FLAGS --refresh"
+            shift
+            ;;
         *)
             echo "Unknown argument: $1"
-            echo "Usage: $0 --network [local|ic|testing|development|demo|prd]"
+            echo "Usage: $0 --network [local|ic|testing|development|demo|prd] [--no-cache] [--refresh]"
             exit 1
             ;;
     esac
@@ -26,4 +35,4 @@ done
 
 echo "Using network type: $NETWORK_TYPE"
 
-python -m scripts.check_mainers_duplicate_creation_timestamps --network $NETWORK_TYPE
+python -m scripts.check_mainers_duplicate_creation_timestamps --network $NETWORK_TYPE $CACHE_FLAGS
@@ -10,6 +10,7 @@ from dotenv import dotenv_values
 import json
 
 from .monitor_common import get_canisters, get_prompt_cache_entries
+from .rate_limiter import LIMITER
 from datetime import datetime, timezone
 
 # Get the directory of this script
@@ -63,6 +64,8 @@ def cleanup_llm_promptcache(gamestate_canister_id, challenger_canister_id, judge
         print(f"No entries found in .canister_cache for LLM canister {canister_name} ({canister_id}) on network {network}. Nothing to clean up.")
         return
     
+    # delay to avoid rate limiting: start at 10 deletes/s and adapt
+    LIMITER.configure(canister_id, initial_rate=10.0, max_rate=50.0)
     for i, ftype in enumerate(["file", "directory"]):
         print(f"Loop {i}: deleting .canister_cache '{ftype}' paths in the LLM canister.")
         try:
@@ -73,15 +76,14 @@ def cleanup_llm_promptcache(gamestate_canister_id, challenger_canister_id, judge
                 if filetype == ftype:
                     count += 1
                     print(f"({count}/{len(entries)}) Deleting {filename} ")
-                    subprocess.run(
-                        ["dfx", "canister", "call", canister_id, "filesystem_remove", 
-                        f"(record {{filename = \"{filename}\"; }})", 
-                        "--network", network],
-                        check=True,
-                        text=True
-                    )
-                    # delay to avoid rate limiting
-                    time.sleep(0.1)
+                    with LIMITER.limit(canister_id):
+                        subprocess.run(
+                            ["dfx", "canister", "call", canister_id, "filesystem_remove", 
+                            f"(record {{filename = \"{filename}\"; }})", 
+                            "--network", network],
+                            check=True,
+                            text=True
+                        )
             print(f"Deleted {count} .canister_cache '{ftype}' paths in LLM canister {canister_name} ({canister_id}) on network {network}.")
         except subprocess.CalledProcessError as e:
             print(f"Error deleting .canister_cache '{ftype}' paths in LLM canister {canister_name} ({canister_id}) on network {network}: {e}")
@@ -10,6 +10,7 @@ from dotenv import dotenv_values
 import json
 
 from .monitor_common import get_canisters, get_prompt_cache_entries
+from .rate_limiter import LIMITER
 from datetime import datetime, timezone
 
 # Get the directory of this script
@@ -38,6 +39,8 @@ def cleanup_llm_promptcache(challenger_canister_id, judge_canister_id, share_ser
     ftype = "file"
     age_minutes_threshold = 24 * 60  # Only delete files older than this threshold
     print(f"Deleting .canister_cache '{ftype}' paths older than {age_minutes_threshold} minutes, while LLM is still online.")
+    # The LLM is online: keep the calls slow (1/s to start) to avoid protocol interference
+    LIMITER.configure(canister_id, initial_rate=1.0, max_rate=5.0)
     try:
         count = 0
         count_deleted = 0
@@ -54,7 +57,8 @@ def cleanup_llm_promptcache(challenger_canister_id, judge_canister_id, share_ser
             cmd = ["dfx", "canister", "--network", network, "call", canister_id, "get_creation_timestamp_ns", 
                 f"(record {{filename = \"{filename}\"; }})", "--output", "json"]
             # print(f"  {' '.join(cmd)}")
-            result = subprocess.check_output(cmd, stderr=subprocess.STDOUT, text=True)
+            with LIMITER.limit(canister_id):
+                result = subprocess.check_output(cmd, stderr=subprocess.STDOUT, text=True)
             # print(result)
             data = json.loads(result)
             if 'Err' in data:
@@ -65,7 +69,6 @@ def cleanup_llm_promptcache(challenger_canister_id, judge_canister_id, share_ser
 
             if age_minutes < age_minutes_threshold:
                 print(f"({count}/{len(entries)}) Skipping {filename} of age {age_minutes} minutes, as it is too recent.")
-                time.sleep(1.0)
                 continue
 
             age_days = age_minutes // (60 * 24)
@@ -75,15 +78,14 @@ def cleanup_llm_promptcache(challenger_canister_id, judge_canister_id, share_ser
             # print("====PATCH-PATCH-PATCH=====SKIPPING ACTUAL DELETE===DRY-RUN=====")
             # time.sleep(3)
             # continue            
-            subprocess.run(
-                ["dfx", "canister", "call", canister_id, "filesystem_remove", 
-                f"(record {{filename = \"{filename}\"; }})", 
-                "--network", network],
-                check=True,
-                text=True
-            )
-            # delay to avoid protocol interference
-            time.sleep(1.0)
+            with LIMITER.limit(canister_id):
+                subprocess.run(
+                    ["dfx", "canister", "call", canister_id, "filesystem_remove", 
+                    f"(record {{filename = \"{filename}\"; }})", 
+                    "--network", network],
+                    check=True,
+                    text=True
+                )
         print(f"Deleted {count_deleted} .canister_cache '{ftype}' paths in LLM canister {canister_name} ({canister_id}) on network {network}.")
     except subprocess.CalledProcessError as e:
         print(f"ERROR occured when calling the subprocess command.")
@@ -0,0 +1,715 @@
+#!/usr/bin/env python3
+"""
+A fake Internet Computer for load tests and benchmarks of the ops scripts, fully offline.
+
+Serves a synthetic fleet of mAIners (10k and more) plus the GameState, ledger index and
+management canister calls the scripts use. Latency, error rate and rate limit are configurable.
+Outcomes are deterministic: the latency and error of the n-th call of a method on a canister
+only depend on the seed, so two runs with the same config see the same failures.
+
+Two ways to plug it in:
+
+  - In process: FakeIC.install(network) replaces the shared CanisterClient of the network
+    (see canister_client.get_client), so call_canister / fleet_executor calls are served
+    by the fake, with asyncio.sleep for the latency.
+  - As a fake `dfx` executable: write_fake_dfx(state_dir, config) writes a `dfx` shim to
+    put first on PATH. Each invocation runs `python fake_ic.py dfx --state <state_dir> ...`
+    and keeps the canister state (status, module hash, flags) in state_dir, so scripts
+    that run dfx themselves (upgrade_mainers.py, ...) work against it too.
+
+Usage:
+    fake = FakeIC(FakeConfig(mainers=10_000, query_latency_ms=50, error_rate=0.01))
+    fake.install("testing")
+    call_canister("testing", fake.mainer_ids[0], "health")
+
+    bin_dir = write_fake_dfx("/tmp/fake-ic", FakeConfig(mainers=100))
+    PATH=/tmp/fake-ic/bin:$PATH python -m scripts.upgrade_mainers --network testing ...
+
+    # Benchmark a health scan (health + canister status of every mAIner):
+    python -m scripts.fake_ic benchmark --mainers 10000 --query-latency-ms 50 --error-rate 0.01
+    python -m scripts.fake_ic benchmark --mainers 200 --dfx
+"""
+
+import argparse
+import asyncio
+import base64
+import contextlib
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import shlex
+import stat
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: the fake dfx is not safe for concurrent calls there
+    fcntl = None
+
+# Error kinds for failure injection and the stderr dfx shows for them
+ERROR_MESSAGES = {
+    "timeout": "Error: Failed to call canister {canister}: Operation timed out",
+    "connect": ("Error: error sending request for url (https://icp-api.io/api/v2/canister/{canister}/call): "
+                "client error (Connect): tcp connect error: Connection refused (os error 111)"),
+    "stopped": "Error: Failed query call. Error code: IC0508, Canister {canister} is stopped",
+    "trapped": "Error: Failed update call. Error code: IC0503, Canister {canister} trapped explicitly",
+}
+RATE_LIMITED_MESSAGE = "Error: 429 Too Many Requests: rate limit exceeded for {canister}"
+
+GAME_STATE_METHODS = {"getMainerAgentCanistersAdmin"}
+INDEX_METHODS = {"status", "get_blocks"}
+QUERY_METHODS = {"health", "getIssueFlagsAdmin", "getMainerStatisticsAdmin", "getMaintenanceFlag",
+                 "getChallengeQueueAdmin", "getAdminRoles", "status", "get_blocks", "getMainerAgentCanistersAdmin"}
+
+# Candid types of fields shown in dfx text output, other numbers are shown as nat
+CANDID_NUMBER_TYPES = {"status_code": "nat16"}
+
+BURN_RATES = ["1_000_000_000_000", "2_000_000_000_000", "4_000_000_000_000", "6_000_000_000_000"]
+
+
+@dataclass
+class FakeConfig:
+    """The synthetic fleet and how the fake IC behaves. Latencies are medians of a log-normal distribution."""
+    mainers: int = 1000
+    seed: int = 0
+    query_latency_ms: float = 100.0
+    update_latency_ms: float = 2000.0
+    latency_sigma: float = 0.3  # spread of the log-normal latency, 0 for a fixed latency
+    error_rate: float = 0.0  # fraction of calls that fail with one of error_kinds
+    error_kinds: List[str] = field(default_factory=lambda: ["timeout", "connect"])
+    unhealthy_rate: float = 0.0  # fraction of mAIners whose health check fails
+    rate_limit: float = 0.0  # calls per second over all canisters, 0 for no limit
+    module_hash: str = "0x" + "ab" * 32
+    upgraded_module_hash: str = "0x" + "cd" * 32
+    blocks: int = 100_000  # blocks in the token index
+    cycles: int = 3_000_000_000_000
+    controllers: List[str] = field(default_factory=lambda: ["2vxsx-fae"])
+
+
+class FakeReject(Exception):
+    """A call the fake IC answers with an error (stderr of dfx)."""
+
+    def __init__(self, stderr: str):
+        super().__init__(stderr)
+        self.stderr = stderr
+
+
+def fake_canister_id(seed: int, index: int) -> str:
+    """A deterministic, well-formed looking canister id."""
+    digest = hashlib.sha256(f"fake-ic:{seed}:{index}".encode()).digest()
+    text = base64.b32encode(digest).decode().lower()[:20]
+    return "-".join(text[i:i + 5] for i in range(0, 20, 5)) + "-cai"
+
+
+def _rng(*parts) -> random.Random:
+    return random.Random(hashlib.sha256(":".join(str(p) for p in parts).encode()).digest())
+
+
+class _MemoryStore:
+    """Canister state in memory, for the in-process fake."""
+
+    def __init__(self):
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def update(self, key: str, default: Callable[[], Dict[str, Any]], fn: Callable[[Dict[str, Any]], Any]) -> Any:
+        with self._lock:
+            state = self._state.setdefault(key, default())
+            return fn(state)
+
+
+class _DirStore:
+    """Canister state in one JSON file per canister, locked, for the fake dfx processes."""
+
+    def __init__(self, state_dir: Path):
+        self.dir = Path(state_dir) / "canisters"
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+    def update(self, key: str, default: Callable[[], Dict[str, Any]], fn: Callable[[Dict[str, Any]], Any]) -> Any:
+        path = self.dir / f"{key}.json"
+        with open(path, "a+", encoding="utf-8") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            text = f.read()
+            state = json.loads(text) if text else default()
+            value = fn(state)
+            f.seek(0)
+            f.truncate()
+            json.dump(state, f)
+            return value
+
+
+class FakeIC:
+    """The fake canisters. call() returns (latency in seconds, result shaped like `dfx --output json`)."""
+
+    def __init__(self, config: Optional[FakeConfig] = None, state_dir: Optional[Path] = None):
+        self.config = config or FakeConfig()
+        self.store = _DirStore(state_dir) if state_dir else _MemoryStore()
+        self.mainer_ids = [fake_canister_id(self.config.seed, i) for i in range(self.config.mainers)]
+        self._mainers = set(self.mainer_ids)
+        self.game_state_id = fake_canister_id(self.config.seed, -1)
+        self.calls = 0
+        self.errors = 0
+        self._stats_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # State
+    # ------------------------------------------------------------------
+    def _default_state(self) -> Dict[str, Any]:
+        return {"status": "Running", "module_hash": self.config.module_hash, "maintenance": False,
+                "timers": True, "snapshots": 0, "calls": {}}
+
+    def _state(self, canister_id: str, fn: Callable[[Dict[str, Any]], Any]) -> Any:
+        return self.store.update(canister_id, self._default_state, fn)
+
+    def is_mainer(self, canister_id: str) -> bool:
+        return canister_id in self._mainers
+
+    def is_unhealthy(self, canister_id: str) -> bool:
+        return _rng(self.config.seed, canister_id, "unhealthy").random() < self.config.unhealthy_rate
+
+    def _check_rate_limit(self, canister_id: str):
+        if not self.config.rate_limit:
+            return
+        window = int(time.time())
+
+        def count(state):
+            if state.get("window") != window:
+                state["window"], state["count"] = window, 0
+            state["count"] += 1
+            return state["count"]
+
+        if self.store.update("_rate", dict, count) > self.config.rate_limit:
+            raise FakeReject(RATE_LIMITED_MESSAGE.format(canister=canister_id))
+
+    def _next_call(self, canister_id: str, method: str) -> Tuple[float, Optional[str]]:
+        """Draw the latency and the injected error (or None) of the next call of method on canister_id."""
+        def count(state):
+            calls = state.setdefault("calls", {})
+            calls[method] = calls.get(method, 0) + 1
+            return calls[method]
+
+        n = self._state(canister_id, count)
+        rng = _rng(self.config.seed, canister_id, method, n)
+        median = self.config.query_latency_ms if method in QUERY_METHODS else self.config.update_latency_ms
+        latency = 0.0
+        if median > 0:
+            latency = rng.lognormvariate(math.log(median), self.config.latency_sigma) / 1000
+        error = None
+        if rng.random() < self.config.error_rate and self.config.error_kinds:
+            error = ERROR_MESSAGES[rng.choice(self.config.error_kinds)].format(canister=canister_id)
+        return latency, error
+
+    def _serve(self, canister_id: str, method: str, handler: Callable[[], Any]) -> Tuple[float, Any]:
+        """Common path of all calls: rate limit, latency and failure injection, then the handler."""
+        with self._stats_lock:
+            self.calls += 1
+        try:
+            self._check_rate_limit(canister_id)
+            latency, error = self._next_call(canister_id, method)
+            if error:
+                raise FakeReject(error)
+            return latency, handler()
+        except FakeReject:
+            with self._stats_lock:
+                self.errors += 1
+            raise
+
+    # ------------------------------------------------------------------
+    # Canister methods
+    # ------------------------------------------------------------------
+    def call(self, canister_id: str, method: str, args: Any = None) -> Tuple[float, Any]:
+        """Call a canister method. Raises FakeReject for errors."""
+        if canister_id in ("game_state_canister", self.game_state_id) or method in GAME_STATE_METHODS:
+            return self._serve(canister_id, method, lambda: self._game_state(method))
+        if not self.is_mainer(canister_id):
+            if method in INDEX_METHODS:
+                return self._serve(canister_id, method, lambda: self._index(method, args))
+            raise FakeReject(f"Error: Canister {canister_id} does not exist")
+        return self._serve(canister_id, method, lambda: self._mainer(canister_id, method))
+
+    def _game_state(self, method: str) -> Any:
+        if method != "getMainerAgentCanistersAdmin":
+            raise FakeReject(f"Error: IC0536: Canister has no query method '{method}'")
+        return {"Ok": [
+            {
+                "address": canister_id,
+                "canisterType": {"MainerAgent": {"ShareAgent": None}},
+                "ownedBy": fake_canister_id(self.config.seed, -1000 - i % 100),
+                "creationTimestamp": str(1_700_000_000_000_000_000 + i),
+            }
+            for i, canister_id in enumerate(self.mainer_ids)
+        ]}
+
+    def _index(self, method: str, args: Any) -> Any:
+        if method == "status":
+            return {"num_blocks_synced": str(self.config.blocks)}
+        start, length = _block_range(args)
+        end = min(self.config.blocks, start + length)
+        return {"blocks": [self._block(i) for i in range(start, end)]}
+
+    def _block(self, index: int) -> Dict[str, Any]:
+        rng = _rng(self.config.seed, "block", index)
+        op = rng.choice(["burn", "mint", "xfer", "xfer"])
+        timestamp = 1_700_000_000_000_000_000 + index * 60_000_000_000
+        return {"Map": [
+            {"0": "ts", "1": {"Nat64": str(timestamp)}},
+            {"0": "tx", "1": {"Map": [
+                {"0": "op", "1": {"Text": op}},
+                {"0": "amt", "1": {"Nat": str(rng.randint(1, 10_000) * 1_000_000)}},
+            ]}},
+        ]}
+
+    def _mainer(self, canister_id: str, method: str) -> Any:
+        def running(state):
+            if state["status"] != "Running":
+                raise FakeReject(ERROR_MESSAGES["stopped"].format(canister=canister_id))
+            return state
+
+        state = self._state(canister_id, running)
+        rng = _rng(self.config.seed, canister_id, "settings")
+        if method == "health":
+            return {"Ok": {"status_code": 503 if self.is_unhealthy(canister_id) else 200}}
+        if method == "getIssueFlagsAdmin":
+            return {"Ok": {"lowCycleBalance": rng.random() < 0.1}}
+        if method == "getMainerStatisticsAdmin":
+            return {"Ok": {"cyclesBurnRate": {"cycles": rng.choice(BURN_RATES)}}}
+        if method == "getMaintenanceFlag":
+            return {"Ok": {"flag": state["maintenance"]}}
+        if method == "toggleMaintenanceFlagAdmin":
+            flag = self._state(canister_id, lambda s: s.update(maintenance=not s["maintenance"]) or s["maintenance"])
+            return {"Ok": {"flag": flag}}
+        if method == "stopTimerExecutionAdmin":
+            self._state(canister_id, lambda s: s.update(timers=False))
+            return {"Ok": {"auth": "You stopped the timers: 1, "}}
+        if method == "startTimerExecutionAdmin":
+            self._state(canister_id, lambda s: s.update(timers=True))
+            return {"Ok": {"auth": "You started the timers:  1, "}}
+        if method == "getChallengeQueueAdmin":
+            return {"Ok": list(state.get("queue", []))}
+        if method == "resetChallengeQueueAdmin":
+            self._state(canister_id, lambda s: s.update(queue=[]))
+            return {"Ok": {"status_code": 200}}
+        if method == "getAdminRoles":
+            return {"Ok": []}
+        raise FakeReject(f"Error: IC0536: Canister {canister_id} has no update method '{method}'")
+
+    # ------------------------------------------------------------------
+    # Management canister (dfx canister status/info/stop/start/...)
+    # ------------------------------------------------------------------
+    def _require_canister(self, canister_id: str):
+        if not self.is_mainer(canister_id) and canister_id != self.game_state_id:
+            raise FakeReject(f"Error: Canister {canister_id} does not exist")
+
+    def canister_status(self, canister_id: str) -> Tuple[float, Dict[str, Any]]:
+        """The management canister_status record (as from_management_record reads it)."""
+        self._require_canister(canister_id)
+
+        def record():
+            state = self._state(canister_id, dict)
+            return {
+                "status": {state["status"].lower(): None},
+                "settings": {"controllers": list(self.config.controllers)},
+                "module_hash": [list(bytes.fromhex(state["module_hash"][2:]))],
+                "memory_size": str(_rng(self.config.seed, canister_id, "memory").randint(2_000_000, 900_000_000)),
+                "cycles": str(self.config.cycles),
+                "idle_cycles_burned_per_day": "37_418_301",
+            }
+
+        return self._serve(canister_id, "canister_status", record)
+
+    def set_status(self, canister_id: str, status: str) -> Tuple[float, None]:
+        self._require_canister(canister_id)
+        return self._serve(canister_id, f"canister_{status.lower()}",
+                           lambda: self._state(canister_id, lambda s: s.update(status=status)))
+
+    def create_snapshot(self, canister_id: str) -> Tuple[float, str]:
+        self._require_canister(canister_id)
+
+        def snapshot(s):
+            s["snapshots"] += 1
+            snapshot_id = f"{s['snapshots']:016x}{hashlib.sha256(canister_id.encode()).hexdigest()[:16]}"
+            s.setdefault("snapshot_hashes", {})[snapshot_id] = s["module_hash"]
+            return snapshot_id
+
+        return self._serve(canister_id, "take_canister_snapshot", lambda: self._state(canister_id, snapshot))
+
+    def load_snapshot(self, canister_id: str, snapshot_id: str) -> Tuple[float, None]:
+        """Restore the module hash a canister had when the snapshot was taken."""
+        self._require_canister(canister_id)
+
+        def load(s):
+            hashes = s.get("snapshot_hashes", {})
+            if snapshot_id not in hashes:
+                raise FakeReject(f"Error: Could not find the snapshot ID {snapshot_id} for canister {canister_id}.")
+            s["module_hash"] = hashes[snapshot_id]
+
+        return self._serve(canister_id, "load_canister_snapshot", lambda: self._state(canister_id, load))
+
+    def queue_challenge(self, canister_id: str, queued_at: Optional[float] = None):
+        """Add an entry to the challenge queue of a mAIner, queued at a Unix time (default: now)."""
+        timestamp_ns = int((time.time() if queued_at is None else queued_at) * 1_000_000_000)
+        self._state(canister_id, lambda s: s.setdefault("queue", []).append(
+            {"challengeQueuedTimestamp": str(timestamp_ns)}))
+
+    def install_code(self, canister_id: str) -> Tuple[float, None]:
+        """Upgrade a canister to config.upgraded_module_hash."""
+        self._require_canister(canister_id)
+        return self._serve(canister_id, "install_code",
+                           lambda: self._state(canister_id, lambda s: s.update(module_hash=self.config.upgraded_module_hash)))
+
+    # ------------------------------------------------------------------
+    # In-process client
+    # ------------------------------------------------------------------
+    def install(self, network: str):
+        """Serve all CanisterClient calls for network from this fake (see canister_client.get_client)."""
+        try:
+            from . import canister_client
+        except ImportError:
+            import canister_client
+
+        client = _fake_client_class(canister_client)(network, self)
+        with canister_client._clients_lock:
+            canister_client._clients[network] = client
+        return client
+
+    def uninstall(self, network: str):
+        try:
+            from . import canister_client
+        except ImportError:
+            import canister_client
+
+        with canister_client._clients_lock:
+            canister_client._clients.pop(network, None)
+
+
+def _block_range(args: Any) -> Tuple[int, int]:
+    """start and length of a get_blocks call, from Candid text or Python arguments."""
+    if isinstance(args, list) and args and isinstance(args[0], dict):
+        return int(args[0].get("start", 0)), int(args[0].get("length", 0))
+    text = args or ""
+    start = re.search(r"start\s*=\s*([\d_]+)", text)
+    length = re.search(r"length\s*=\s*([\d_]+)", text)
+    return (int(start.group(1).replace("_", "")) if start else 0,
+            int(length.group(1).replace("_", "")) if length else 0)
+
+
+def _fake_client_class(canister_client):
+    """A CanisterClient whose calls are served by a FakeIC, with the latency slept (or awaited)."""
+
+    class FakeCanisterClient(canister_client.CanisterClient):
+        def __init__(self, network: str, fake: FakeIC):
+            super().__init__(network)
+            self.fake = fake
+            self.use_agent = True
+
+        def _fake_call(self, canister: str, method: str, serve: Callable[[], Tuple[float, Any]]):
+            cmd = ["canister", "call", "--network", self.network, canister, method]
+            try:
+                return serve()
+            except FakeReject as e:
+                raise canister_client.CanisterCallError(cmd, e.stderr) from None
+
+        def _call(self, canister, method, args, interface_name, timeout):
+            canister_id = self.resolve_canister_id(canister) or canister
+            start = time.monotonic()
+            try:
+                latency, value = self._fake_call(canister, method, lambda: self.fake.call(canister_id, method, args))
+            except canister_client.CanisterCallError:
+                canister_client.record_call(method, "fake", "agent", time.monotonic() - start, ok=False)
+                raise
+            time.sleep(latency)
+            canister_client.record_call(method, "fake", "agent", time.monotonic() - start)
+            return value
+
+        async def _call_async(self, canister, method, args, interface_name, timeout):
+            canister_id = self.resolve_canister_id(canister) or canister
+            start = time.monotonic()
+            try:
+                latency, value = self._fake_call(canister, method, lambda: self.fake.call(canister_id, method, args))
+            except canister_client.CanisterCallError:
+                canister_client.record_call(method, "fake", "agent", time.monotonic() - start, ok=False)
+                raise
+            await asyncio.sleep(latency)
+            canister_client.record_call(method, "fake", "agent", time.monotonic() - start)
+            return value
+
+        def management_call(self, method, canister_id, timeout=None):
+            if method != "canister_status":
+                raise RuntimeError(f"The fake IC does not serve management method {method}")
+            latency, value = self._fake_call(canister_id, method, lambda: self.fake.canister_status(canister_id))
+            time.sleep(latency)
+            return value
+
+        async def management_call_async(self, method, canister_id, timeout=None):
+            if method != "canister_status":
+                raise RuntimeError(f"The fake IC does not serve management method {method}")
+            latency, value = self._fake_call(canister_id, method, lambda: self.fake.canister_status(canister_id))
+            await asyncio.sleep(latency)
+            return value
+
+        async def aclose(self):
+            pass
+
+    return FakeCanisterClient
+
+
+# ----------------------------------------------------------------------
+# Fake dfx
+# ----------------------------------------------------------------------
+def to_candid_text(value: Any, name: Optional[str] = None) -> str:
+    """Render a `dfx --output json` shaped value the way dfx prints Candid by default."""
+    if isinstance(value, dict):
+        if len(value) == 1 and next(iter(value)) in ("Ok", "Err"):
+            key, inner = next(iter(value.items()))
+            return f"variant {{ {key} = {to_candid_text(inner)} }}"
+        fields = "; ".join(f"{key} = {to_candid_text(inner, key)}" for key, inner in value.items())
+        return f"record {{ {fields} }}"
+    if isinstance(value, list):
+        return f"vec {{ {'; '.join(to_candid_text(item) for item in value)} }}" if value else "vec {}"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if value is None:
+        return "null"
+    if isinstance(value, int) or (isinstance(value, str) and re.fullmatch(r"\d[\d_]*", value)):
+        return f"{value} : {CANDID_NUMBER_TYPES.get(name, 'nat')}"
+    return json.dumps(value)
+
+
+def _status_text(canister_id: str, record: Dict[str, Any]) -> str:
+    """`dfx canister status` output for a management canister_status record."""
+    status = next(iter(record["status"])).capitalize()
+    module_hash = "0x" + bytes(record["module_hash"][0]).hex() if record["module_hash"] else "None"
+    return (f"Canister status call result for {canister_id}.\n"
+            f"Status: {status}\n"
+            f"Controllers: {' '.join(record['settings']['controllers'])}\n"
+            f"Memory allocation: 0 Bytes\n"
+            f"Compute allocation: 0 %\n"
+            f"Freezing threshold: 2_592_000 Seconds\n"
+            f"Idle cycles burned per day: {record['idle_cycles_burned_per_day']} Cycles\n"
+            f"Memory Size: {int(record['memory_size']):_} Bytes\n"
+            f"Balance: {int(record['cycles']):_} Cycles\n"
+            f"Reserved: 0 Cycles\n"
+            f"Module hash: {module_hash}\n")
+
+
+# dfx options that take a value, and flags, which the fake accepts and ignores
+_DFX_OPTIONS = {"--network", "--output", "--identity", "--mode", "--wasm-memory-persistence", "--wasm", "--argument"}
+_DFX_FLAGS = {"--query", "--update", "--yes", "-y", "-q", "-v", "--ic"}
+
+
+def _resolve_name(name: str, network: str) -> str:
+    """Canister id of a name in ./canister_ids.json (as dfx deploy does), or the name itself."""
+    try:
+        with open("canister_ids.json", "r", encoding="utf-8") as f:
+            return json.load(f).get(name, {}).get(network, name)
+    except (OSError, json.JSONDecodeError):
+        return name
+
+
+def run_fake_dfx(fake: FakeIC, argv: List[str]) -> Tuple[int, str, str]:
+    """Run one dfx command line against the fake. Returns (exit code, stdout, stderr); sleeps the latency."""
+    options: Dict[str, str] = {}
+    words: List[str] = []
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg in _DFX_OPTIONS and i + 1 < len(argv):
+            options[arg] = argv[i + 1]
+            i += 2
+            continue
+        if arg not in _DFX_FLAGS:
+            words.append(arg)
+        i += 1
+    network = options.get("--network", "local")
+    as_json = options.get("--output") == "json"
+
+    latency, stdout, stderr = 0.0, "", ""
+    try:
+        if words[:2] == ["canister", "call"] and len(words) >= 4:
+            latency, value = fake.call(_resolve_name(words[2], network), words[3], words[4] if len(words) > 4 else None)
+            stdout = json.dumps(value) if as_json else f"({to_candid_text(value)})"
+        elif words[:2] == ["canister", "status"] and len(words) == 3:
+            canister_id = _resolve_name(words[2], network)
+            latency, record = fake.canister_status(canister_id)
+            stdout = _status_text(canister_id, record)
+        elif words[:2] == ["canister", "info"] and len(words) == 3:
+            canister_id = _resolve_name(words[2], network)
+            latency, record = fake.canister_status(canister_id)
+            stdout = (f"Controllers: {' '.join(record['settings']['controllers'])}\n"
+                      f"Module hash: 0x{bytes(record['module_hash'][0]).hex()}\n")
+        elif words[:2] == ["canister", "stop"] and len(words) == 3:
+            latency, _ = fake.set_status(_resolve_name(words[2], network), "Stopped")
+        elif words[:2] == ["canister", "start"] and len(words) == 3:
+            latency, _ = fake.set_status(_resolve_name(words[2], network), "Running")
+        elif words[:3] == ["canister", "snapshot", "create"] and len(words) == 4:
+            canister_id = _resolve_name(words[3], network)
+            latency, snapshot_id = fake.create_snapshot(canister_id)
+            stderr = f"Created a new snapshot of canister {canister_id}. Snapshot ID: {snapshot_id}\n"
+        elif words[:3] == ["canister", "snapshot", "load"] and len(words) == 5:
+            latency, _ = fake.load_snapshot(_resolve_name(words[3], network), words[4])
+        elif words[:2] == ["canister", "install"] and len(words) == 3:
+            latency, _ = fake.install_code(_resolve_name(words[2], network))
+        elif words[:1] == ["deploy"] and len(words) == 2:
+            canister_id = _resolve_name(words[1], network)
+            latency, _ = fake.install_code(canister_id)
+            stdout = f"Upgraded code for canister {words[1]}, with canister ID {canister_id}\n"
+        elif words[:2] == ["wallet", "send"] and len(words) == 4:
+            latency = fake.config.update_latency_ms / 1000
+        elif words[:2] == ["identity", "whoami"]:
+            stdout = "default\n"
+        elif words[:2] == ["identity", "get-principal"]:
+            stdout = "2vxsx-fae\n"
+        elif words[:1] == ["ping"]:
+            stdout = '{"replica_health_status": "healthy"}\n'
+        else:
+            return 2, "", f"fake dfx: unsupported command: {shlex.join(argv)}\n"
+    except FakeReject as e:
+        time.sleep(latency)
+        return 255, "", e.stderr + "\n"
+    time.sleep(latency)
+    if stdout and not stdout.endswith("\n"):
+        stdout += "\n"
+    return 0, stdout, stderr
+
+
+def write_fake_dfx(state_dir, config: Optional[FakeConfig] = None) -> Path:
+    """Write the config and a `dfx` shim into state_dir. Returns the bin directory to put first on PATH."""
+    state_dir = Path(state_dir).resolve()
+    bin_dir = state_dir / "bin"
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    with open(state_dir / "config.json", "w", encoding="utf-8") as f:
+        json.dump(asdict(config or FakeConfig()), f, indent=2)
+
+    shim = bin_dir / "dfx"
+    shim.write_text(
+        "#!/bin/sh\n"
+        f"exec {shlex.quote(sys.executable)} {shlex.quote(str(Path(__file__).resolve()))} "
+        f"dfx --state {shlex.quote(str(state_dir))} \"$@\"\n"
+    )
+    shim.chmod(shim.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return bin_dir
+
+
+def load_fake(state_dir) -> FakeIC:
+    """The FakeIC of a state directory written by write_fake_dfx."""
+    with open(Path(state_dir) / "config.json", "r", encoding="utf-8") as f:
+        return FakeIC(FakeConfig(**json.load(f)), state_dir=Path(state_dir))
+
+
+# ----------------------------------------------------------------------
+# Benchmark
+# ----------------------------------------------------------------------
+def benchmark(config: FakeConfig, network: str = "fake", concurrency: int = 50, use_dfx: bool = False,
+              timeout: float = 30.0, max_retries: int = 5, retry_delay: float = 1.0) -> Dict[str, Any]:
+    """Scan the fake fleet like get_mainers_health does (health + canister status per mAIner) and time it."""
+    try:
+        from . import canister_client
+        from .fleet_executor import run_fleet, canister_method, canister_status_record, BOUNDARY_NODES
+        from .retry_policy import RetryPolicy, NETWORK_ERRORS
+        from .canister_subnets import remember_subnets
+    except ImportError:
+        import canister_client
+        from fleet_executor import run_fleet, canister_method, canister_status_record, BOUNDARY_NODES
+        from retry_policy import RetryPolicy, NETWORK_ERRORS
+        from canister_subnets import remember_subnets
+
+    with contextlib.ExitStack() as stack:
+        if use_dfx:
+            state_dir = stack.enter_context(tempfile.TemporaryDirectory(prefix="fake-ic-"))
+            bin_dir = write_fake_dfx(state_dir, config)
+            old_path = os.environ.get("PATH", "")
+            os.environ["PATH"] = f"{bin_dir}{os.pathsep}{old_path}"
+            stack.callback(os.environ.__setitem__, "PATH", old_path)
+            fake = load_fake(state_dir)
+            canister_client.get_client(network).use_agent = False
+        else:
+            fake = FakeIC(config)
+            fake.install(network)
+            stack.callback(fake.uninstall, network)
+        # The fake mAIners are on no subnet: do not look them up in the IC API when their calls fail
+        remember_subnets(dict.fromkeys(fake.mainer_ids))
+
+        tasks = {
+            "health": canister_method(network, "health", interface="mainer_ctrlb_canister"),
+            "status": canister_status_record(network),
+        }
+        start = time.monotonic()
+        results = run_fleet(
+            fake.mainer_ids, tasks, concurrency=concurrency, network=network, timeout=timeout,
+            retry_policy=RetryPolicy(retry_classes=NETWORK_ERRORS, max_retries=max_retries,
+                                     base_delay=retry_delay),
+            rate_limit_target=BOUNDARY_NODES,
+        )
+        elapsed = time.monotonic() - start
+
+    failed = sum(1 for address_results in results.values() for result in address_results.values() if not result.ok)
+    return {
+        "mainers": len(results),
+        "tasks": len(results) * len(tasks),
+        "failed_tasks": failed,
+        "seconds": round(elapsed, 3),
+        "mainers_per_second": round(len(results) / elapsed, 1) if elapsed else None,
+        "calls": fake.calls if not use_dfx else None,
+        "injected_errors": fake.errors if not use_dfx else None,
+    }
+
+
+def _config_from_args(args) -> FakeConfig:
+    return FakeConfig(
+        mainers=args.mainers, seed=args.seed, query_latency_ms=args.query_latency_ms,
+        update_latency_ms=args.update_latency_ms, latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate, unhealthy_rate=args.unhealthy_rate, rate_limit=args.rate_limit,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:2] == ["dfx", "--state"] and len(argv) >= 3:
+        returncode, stdout, stderr = run_fake_dfx(load_fake(argv[2]), argv[3:])
+        sys.stdout.write(stdout)
+        sys.stderr.write(stderr)
+        return returncode
+
+    parser = argparse.ArgumentParser(description="Fake IC for offline benchmarks of the ops scripts.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("benchmark", "Time a health scan of the fake fleet"),
+                            ("write-dfx", "Write a fake dfx into a state directory")):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("--mainers", type=int, default=1000, help="Number of mAIners in the fleet (default: 1000)")
+        sub.add_argument("--seed", type=int, default=0, help="Seed of the fleet, latencies and errors (default: 0)")
+        sub.add_argument("--query-latency-ms", type=float, default=100.0, help="Median query latency (default: 100)")
+        sub.add_argument("--update-latency-ms", type=float, default=2000.0, help="Median update latency (default: 2000)")
+        sub.add_argument("--latency-sigma", type=float, default=0.3, help="Spread of the log-normal latency (default: 0.3)")
+        sub.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls that fail transiently (default: 0)")
+        sub.add_argument("--unhealthy-rate", type=float, default=0.0, help="Fraction of unhealthy mAIners (default: 0)")
+        sub.add_argument("--rate-limit", type=float, default=0.0, help="Calls/s before 429 errors, 0 for none (default: 0)")
+    subparsers.choices["benchmark"].add_argument("--concurrency", type=int, default=50,
+                                                 help="Maximum concurrent calls (default: 50)")
+    subparsers.choices["benchmark"].add_argument("--dfx", action="store_true",
+                                                 help="Go through the fake dfx executable instead of in process")
+    subparsers.choices["write-dfx"].add_argument("state_dir", help="Directory for the fake canister state and bin/dfx")
+    args = parser.parse_args(argv)
+
+    config = _config_from_args(args)
+    if args.command == "write-dfx":
+        bin_dir = write_fake_dfx(args.state_dir, config)
+        print(f"export PATH={bin_dir}:$PATH")
+        return 0
+
+    print(json.dumps(benchmark(config, concurrency=args.concurrency, use_dfx=args.dfx), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
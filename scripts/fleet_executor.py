@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Asyncio fan-out of per-canister calls across the mAIner fleet.
+
+Instead of a ThreadPoolExecutor where every thread blocks on a dfx subprocess,
+all calls for all mAIners are scheduled on one event loop. A single semaphore
+caps the number of calls in flight, no matter how many tasks run per mAIner.
+Results are streamed per mAIner as soon as all of its tasks are done.
+
+A task is any `async def task(address) -> value`. Factories for the common ones:
+  - canister_method(network, method)   -> decoded result of a canister call
+  - canister_status(network)           -> stdout of `dfx canister status`
+  - canister_info(network)             -> stdout of `dfx canister info`
+  - canister_status_record(network)    -> CanisterStatus (status, balance, memory, hash, controllers)
+  - canister_health(network)           -> True if the mAIner `health` endpoint returns status_code 200
+
+A fleet scan can be split over several processes or machines: shard_addresses() keeps the
+mAIners of one shard, chosen by a hash of the canister ID, so every process that is given
+the same shard count agrees on the split (see get_mainers_health.py --shard).
+
+Usage:
+    from .fleet_executor import run_fleet, canister_method
+
+    tasks = {
+        "flags": canister_method(network, "getIssueFlagsAdmin"),
+        "stats": canister_method(network, "getMainerStatisticsAdmin"),
+    }
+    def on_result(address, results):
+        if results["flags"].ok:
+            print(address, results["flags"].value)
+
+    results = run_fleet(addresses, tasks, concurrency=50, on_result=on_result)
+"""
+
+import asyncio
+import hashlib
+import subprocess
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .canister_client import CanisterCallError, get_client, run_subprocess_async
+    from .canister_status import get_status_record_async
+    from .rate_limiter import LIMITER
+    from .retry_policy import CircuitOpenError, RetryPolicy
+except ImportError:  # imported from a script run directly (e.g. upgrade_mainers.py)
+    from canister_client import CanisterCallError, get_client, run_subprocess_async
+    from canister_status import get_status_record_async
+    from rate_limiter import LIMITER
+    from retry_policy import CircuitOpenError, RetryPolicy
+
+# Maximum number of canister calls in flight across the whole fleet
+DEFAULT_CONCURRENCY = 50
+
+# Default timeout in seconds for a single task
+DEFAULT_TASK_TIMEOUT = 30.0
+
+# Rate limiter target for calls to the IC boundary nodes (see rate_limiter.py)
+BOUNDARY_NODES = "boundary-nodes"
+LIMITER.configure(BOUNDARY_NODES, initial_rate=500.0, min_rate=5.0, max_rate=1000.0, increase=50.0)
+
+Task = Callable[[str], Awaitable[Any]]
+
+
+@dataclass
+class TaskResult:
+    """The outcome of one task for one mAIner."""
+    value: Any = None
+    error: Optional[str] = None
+    duration: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def canister_method(network: str, method: str, args=None, interface: Optional[str] = None) -> Task:
+    """Task that calls a canister method and returns the `dfx --output json` shaped result."""
+    async def task(address: str) -> Any:
+        return await get_client(network).call_async(address, method, args=args, interface=interface)
+    return task
+
+
+def dfx_canister_command(network: str, command: str) -> Task:
+    """Task that runs `dfx canister --network <network> <command> <address>` and returns stdout."""
+    async def task(address: str) -> str:
+        cmd = ["dfx", "canister", "--network", network, command, address]
+        returncode, stdout, stderr = await run_subprocess_async(cmd, DEFAULT_TASK_TIMEOUT)
+        if returncode != 0:
+            raise CanisterCallError(cmd, stderr, returncode=returncode, output=stdout)
+        return stdout
+    return task
+
+
+def canister_status(network: str) -> Task:
+    """Task that returns the output of `dfx canister status` (needs controller rights)."""
+    return dfx_canister_command(network, "status")
+
+
+def canister_info(network: str) -> Task:
+    """Task that returns the output of `dfx canister info` (module hash, controllers)."""
+    return dfx_canister_command(network, "info")
+
+
+def canister_status_record(network: str) -> Task:
+    """Task that returns the parsed CanisterStatus of a mAIner, in one round trip."""
+    async def task(address: str):
+        return await get_status_record_async(network, address, timeout=DEFAULT_TASK_TIMEOUT)
+    return task
+
+
+def is_health_ok(data) -> bool:
+    """Check a `health` response (dfx JSON shape) for status_code 200.
+
+    (Sometimes dfx fails to parse the candid and shows the numeric field hashes)
+    """
+    if not isinstance(data, dict):
+        return False
+    record = data.get('Ok', data.get('17_724'))
+    if not isinstance(record, dict):
+        return False
+    status_code = record.get('status_code', record.get('3_475_804_314'))
+    return str(status_code) == "200"
+
+
+def canister_health(network: str) -> Task:
+    """Task that calls the `health` endpoint of a mAIner and returns whether it is healthy."""
+    health = canister_method(network, "health", interface="mainer_ctrlb_canister")
+
+    async def task(address: str) -> bool:
+        return is_health_ok(await health(address))
+    return task
+
+
+def _error_text(e: BaseException) -> str:
+    if isinstance(e, subprocess.CalledProcessError) and e.stderr:
+        return str(e.stderr).strip()
+    if isinstance(e, (subprocess.TimeoutExpired, asyncio.TimeoutError)):
+        return "Operation timed out"
+    return str(e) or type(e).__name__
+
+
+async def stream_fleet(
+    addresses: Iterable[str],
+    tasks: Dict[str, Task],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    timeout: float = DEFAULT_TASK_TIMEOUT,
+    is_transient: Optional[Callable[[str], bool]] = None,
+    max_retries: int = 1,
+    retry_delay: float = 10.0,
+    rate_limit_target: Optional[str] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+) -> AsyncIterator[Tuple[str, Dict[str, TaskResult]]]:
+    """Run every task for every address, yielding (address, {task_name: TaskResult}) as each address completes.
+
+    Exceptions raised by a task are captured in TaskResult.error, they never abort the scan.
+    Each attempt is limited by `timeout`. Errors for which is_transient(error_text) is True are
+    retried up to max_retries attempts with jittered exponential backoff; the in-flight slot is
+    released while waiting to retry. A retry_policy (see retry_policy.py) replaces is_transient,
+    max_retries and retry_delay, and adds circuit breakers per mAIner and per subnet and a retry
+    budget: calls to a mAIner whose circuit (or that of its subnet) is open fail fast. With rate_limit_target, attempts also go through
+    the shared AIMD rate limiter (e.g. BOUNDARY_NODES), which slows down on rate-limit and
+    transient errors.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    if retry_policy is None:
+        retry_policy = RetryPolicy(max_retries=max_retries, base_delay=retry_delay,
+                                   is_retryable=is_transient or (lambda _: False), breakers=False, budget=None)
+
+    async def run_task(address: str, task: Task) -> TaskResult:
+        start = time.monotonic()
+        keys = (address,)
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                retry_policy.check(keys)
+            except CircuitOpenError as e:
+                return TaskResult(error=_error_text(e), duration=time.monotonic() - start)
+            if rate_limit_target:
+                await LIMITER.acquire_async(rate_limit_target)
+            async with semaphore:
+                started = time.monotonic()
+                try:
+                    value = await asyncio.wait_for(task(address), timeout)
+                    if rate_limit_target:
+                        LIMITER.success(rate_limit_target)
+                    retry_policy.record_success(keys)
+                    return TaskResult(value=value, duration=time.monotonic() - start)
+                except Exception as e:
+                    error_text = _error_text(e)
+            if rate_limit_target:
+                LIMITER.failure(rate_limit_target, error_text, started)
+            await asyncio.to_thread(retry_policy.resolve_subnets, error_text, keys)
+            delay = retry_policy.retry_delay(attempt, error_text, keys)
+            if delay is None:
+                return TaskResult(error=error_text, duration=time.monotonic() - start)
+            await asyncio.sleep(delay)
+
+    async def run_address(address: str) -> Tuple[str, Dict[str, TaskResult]]:
+        names = list(tasks.keys())
+        outcomes = await asyncio.gather(*(run_task(address, tasks[name]) for name in names))
+        return address, dict(zip(names, outcomes))
+
+    pending = [asyncio.ensure_future(run_address(address)) for address in addresses]
+    try:
+        for next_done in asyncio.as_completed(pending):
+            yield await next_done
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+async def run_fleet_async(
+    addresses: Iterable[str],
+    tasks: Dict[str, Task],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    on_result: Optional[Callable[[str, Dict[str, TaskResult]], None]] = None,
+    networks: Iterable[str] = (),
+    **stream_options,
+) -> Dict[str, Dict[str, TaskResult]]:
+    """Collect stream_fleet() into {address: {task_name: TaskResult}}, calling on_result for each address."""
+    results = {}
+    try:
+        async for address, address_results in stream_fleet(addresses, tasks, concurrency, **stream_options):
+            results[address] = address_results
+            if on_result is not None:
+                on_result(address, address_results)
+    finally:
+        for network in networks:
+            await get_client(network).aclose()
+    return results
+
+
+def run_fleet(
+    addresses: Iterable[str],
+    tasks: Dict[str, Task],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    on_result: Optional[Callable[[str, Dict[str, TaskResult]], None]] = None,
+    network: Optional[str] = None,
+    **stream_options,
+) -> Dict[str, Dict[str, TaskResult]]:
+    """Synchronous entry point: run the fleet scan on a fresh event loop.
+
+    on_result(address, results) is called from the event loop as each mAIner completes,
+    so it should be quick (printing, counting). Pass `network` so its connection pool
+    is closed when the scan is done. Other keyword arguments (timeout, is_transient,
+    max_retries, retry_delay, rate_limit_target, retry_policy) are passed on to stream_fleet().
+    """
+    networks = (network,) if network else ()
+    return asyncio.run(run_fleet_async(addresses, tasks, concurrency, on_result, networks, **stream_options))
+
+
+def parse_shard(text: str) -> Tuple[int, int]:
+    """Parse a shard given as "i/N" (1 <= i <= N). Raises ValueError."""
+    index, _, count = text.partition("/")
+    index, count = int(index), int(count)
+    if not 1 <= index <= count:
+        raise ValueError(f"shard {text}: expected i/N with 1 <= i <= N")
+    return index, count
+
+
+def shard_of(address: str, count: int) -> int:
+    """The shard (1..count) of a canister, the same in every process (unlike hash())."""
+    return int.from_bytes(hashlib.sha256(address.encode()).digest()[:8], "big") % count + 1
+
+
+def shard_addresses(addresses: Iterable[str], shard: Tuple[int, int]) -> List[str]:
+    """The addresses that belong to shard (i, N)."""
+    index, count = shard
+    return [address for address in addresses if shard_of(address, count) == index]
@@ -12,6 +12,7 @@ import pandas as pd
 
 from .monitor_common import get_canisters, ensure_log_dir, get_balance
 from .get_mainers import get_mainers_for_user
+from .response_cache import add_cache_arguments, configure_cache_from_args
 from .ledgers.icp import get_usd_per_computed_xdr_from_cmc, icp_xdr_summary, get_cycle_burn_rate_from_ic_api
 
 # Get the directory of this script
@@ -131,5 +132,7 @@ if __name__ == "__main__":
         default="all",
         help="Specify the user for which to get mainers (default: 'all')",
     )
+    add_cache_arguments(parser)
     args = parser.parse_args()
+    configure_cache_from_args(args)
     main(args.network, args.user)
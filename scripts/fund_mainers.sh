@@ -2,6 +2,7 @@
 
 # Default network type is local
 NETWORK_TYPE="prd"
+CACHE_FLAGS=""
 
 # Default is the principal of the IConfucius funnai account
 USER="xijdk-rtoet-smgxl-a4apd-ahchq-bslha-ope4a-zlpaw-ldxat-prh6f-jqe"
@@ -24,9 +25,17 @@ while [ $# -gt 0 ]; do
             USER=$1  
             shift
             ;;
+        --no-cache)
+            CACHE_FLAGS="$CACHE_FLAGS --no-cache"
+            shift
+            ;;
+        --refresh)
+            CACHE_FLAGS="$CACHE_FLAGS --refresh"
+            shift
+            ;;
         *)
             echo "Unknown argument: $1"
-            echo "Usage: $0 --network [local|ic|testing|development|demo|prd] [--user principal]"
+            echo "Usage: $0 --network [local|ic|testing|development|demo|prd] [--user principal] [--no-cache] [--refresh]"
             exit 1
             ;;
     esac
@@ -35,5 +44,5 @@ done
 echo "Using network type: $NETWORK_TYPE"
 
 echo "Funding all mainers on network: $NETWORK_TYPE for user: $USER"
-python -m scripts.fund_mainers --network $NETWORK_TYPE --user $USER
+python -m scripts.fund_mainers --network $NETWORK_TYPE --user $USER $CACHE_FLAGS
 
@@ -11,6 +11,10 @@ import json
 import pandas as pd
 
 from .monitor_common import get_canisters, ensure_log_dir, get_balance
+from .canister_client import call_canister, call_stats_lines
+from .canister_index import canister_index
+from .fleet_executor import run_fleet, canister_method, DEFAULT_CONCURRENCY, BOUNDARY_NODES
+from .response_cache import cached_call, add_cache_arguments, configure_cache_from_args, cache_stats_summary
 from .ledgers.icp import get_usd_per_computed_xdr_from_cmc, icp_xdr_summary, get_cycle_burn_rate_from_ic_api
 
 # Get the directory of this script
@@ -35,13 +39,12 @@ def get_mainers(network):
     """Get mainers from gamestate using dfx."""
     try:    
         print(f"Getting all mAIners from the game_state_canister on network {network}...")
-        result = subprocess.check_output(
-            ["dfx", "canister", "--network", network, "call", "game_state_canister", "getMainerAgentCanistersAdmin", "--output", "json"],
-            stderr=subprocess.DEVNULL,
-            text=True
+        data = cached_call(
+            network, "game_state_canister", "getMainerAgentCanistersAdmin",
+            lambda: call_canister(network, "game_state_canister", "getMainerAgentCanistersAdmin"),
         )
-        data = json.loads(result)
         mainers = data.get('Ok', [])
+        print(cache_stats_summary())
         return mainers
     except subprocess.CalledProcessError:
         print(f"ERROR: Unable to get mAiners from game_state_canister on network {network}")
@@ -57,41 +60,44 @@ def get_mainers_for_user(network, user):
 def get_mainer_setting(network, address):
     """Get the mainer setting (Low, Medium, High, VeryHigh, Custom) for a given mainer."""
     try:
-        cmd = ["dfx", "canister", "call", address, "getMainerStatisticsAdmin", "--network", network, "--output", "json"]
-        output = subprocess.check_output(cmd, stderr=subprocess.STDOUT, text=True, timeout=10)
-        data = json.loads(output)
-        cycles_burn_rate = data.get('Ok', {}).get('cyclesBurnRate', {}).get('cycles', None)
-
-        # Map cycles burn rate to human-readable setting
-        if cycles_burn_rate == "1_000_000_000_000":
-            return "Low"
-        elif cycles_burn_rate == "2_000_000_000_000":
-            return "Medium"
-        elif cycles_burn_rate == "4_000_000_000_000":
-            return "High"
-        elif cycles_burn_rate == "6_000_000_000_000":
-            return "VeryHigh"
-        elif cycles_burn_rate is not None:
-            return "Custom"
-        else:
-            return "Unknown"
+        data = call_canister(network, address, "getMainerStatisticsAdmin", timeout=10)
+        return setting_from_statistics(data)
     except (subprocess.CalledProcessError, subprocess.TimeoutExpired, json.JSONDecodeError, KeyError):
         return "Unable to query"
 
+def setting_from_statistics(data):
+    """Map the cyclesBurnRate of a getMainerStatisticsAdmin response to a human-readable setting."""
+    cycles_burn_rate = data.get('Ok', {}).get('cyclesBurnRate', {}).get('cycles', None)
+
+    if cycles_burn_rate == "1_000_000_000_000":
+        return "Low"
+    elif cycles_burn_rate == "2_000_000_000_000":
+        return "Medium"
+    elif cycles_burn_rate == "4_000_000_000_000":
+        return "High"
+    elif cycles_burn_rate == "6_000_000_000_000":
+        return "VeryHigh"
+    elif cycles_burn_rate is not None:
+        return "Custom"
+    else:
+        return "Unknown"
+
 def get_mainer_is_active(network, address):
     """Check if a mainer is active (not paused due to low cycle balance)."""
     try:
-        cmd = ["dfx", "canister", "call", address, "getIssueFlagsAdmin", "--network", network, "--output", "json"]
-        output = subprocess.check_output(cmd, stderr=subprocess.STDOUT, text=True, timeout=10)
-        data = json.loads(output)
-        low_cycle_balance = data.get('Ok', {}).get('lowCycleBalance', None)
-
-        if low_cycle_balance is None:
-            return None
-        return not low_cycle_balance  # Active if lowCycleBalance is False
+        data = call_canister(network, address, "getIssueFlagsAdmin", timeout=10)
+        return is_active_from_issue_flags(data)
     except (subprocess.CalledProcessError, subprocess.TimeoutExpired, json.JSONDecodeError, KeyError):
         return None
 
+def is_active_from_issue_flags(data):
+    """Active if lowCycleBalance is False in a getIssueFlagsAdmin response, None if unknown."""
+    low_cycle_balance = data.get('Ok', {}).get('lowCycleBalance', None)
+
+    if low_cycle_balance is None:
+        return None
+    return not low_cycle_balance
+
 def get_daily_burn_rate_for_setting(setting, is_active):
     """Get the daily burn rate in trillion cycles for a given setting."""
     if not is_active:
@@ -151,16 +157,12 @@ def write_mainers_env_file(mainers, env_file_path, network):
 
 def update_poaiw_files(mainers, network):
     """Update dfx.json and canister_ids.json with ShareAgent mainers."""
-    share_agent_mainers = []
+    index = canister_index(POAIW_CANISTER_IDS_PATH)
+    index.register_mainers(mainers)
 
     # Filter for ShareAgent type mainers only
-    for mainer in mainers:
-        address = mainer.get('address', '')
-        canister_type_dict = mainer.get('canisterType', {}).get("MainerAgent", {})
-        canister_type = list(canister_type_dict.keys())[0] if canister_type_dict else ''
-
-        if canister_type == "ShareAgent" and address != "":
-            share_agent_mainers.append(address)
+    share_agent_mainers = [mainer['address'] for mainer in mainers
+                           if mainer.get('address') and index.canister_type(mainer['address']) == "ShareAgent"]
 
     # Update dfx.json
     with open(POAIW_DFX_JSON_PATH, 'r') as f:
@@ -179,32 +181,39 @@ def update_poaiw_files(mainers, network):
     with open(POAIW_DFX_JSON_PATH, 'w') as f:
         json.dump(dfx_config, f, indent=2)
 
-    # Update canister_ids.json
-    with open(POAIW_CANISTER_IDS_PATH, 'r') as f:
-        canister_ids = json.load(f)
-
-    # Add or update ShareAgent mainers with their addresses for the specified network (preserve all existing entries)
-    for i, address in enumerate(share_agent_mainers):
-        canister_name = f"mainer_ctrlb_canister_{i}"
-        if canister_name not in canister_ids:
-            canister_ids[canister_name] = {}
-        canister_ids[canister_name][network] = address
-
-    with open(POAIW_CANISTER_IDS_PATH, 'w') as f:
-        json.dump(canister_ids, f, indent=2)
+    # Add or update ShareAgent mainers with their addresses for the specified network in canister_ids.json
+    # (preserve all existing entries); the index is kept up to date, for lookups in the same process
+    index.update(network, {f"mainer_ctrlb_canister_{i}": address for i, address in enumerate(share_agent_mainers)})
 
     print(f"Updated {len(share_agent_mainers)} ShareAgent mainers in {os.path.abspath(POAIW_DFX_JSON_PATH)}")
     print(f"Updated {len(share_agent_mainers)} ShareAgent mainers in {os.path.abspath(POAIW_CANISTER_IDS_PATH)}")
 
-def get_mainer_info_parallel(network, address):
-    """Get both setting and active status for a mainer in a single call (for parallel processing)."""
-    setting = get_mainer_setting(network, address)
-    is_active = get_mainer_is_active(network, address)
-    return {
-        "address": address,
-        "setting": setting,
-        "is_active": is_active
+def get_mainer_info_parallel(network, addresses, concurrency=DEFAULT_CONCURRENCY):
+    """Get setting and active status for many mainers concurrently.
+
+    Returns a dict of address -> {"address", "setting", "is_active"}.
+    """
+    tasks = {
+        "statistics": canister_method(network, "getMainerStatisticsAdmin"),
+        "issue_flags": canister_method(network, "getIssueFlagsAdmin"),
     }
+    mainer_info = {}
+    total = len(addresses)
+
+    def on_result(address, results):
+        statistics = results["statistics"]
+        issue_flags = results["issue_flags"]
+        mainer_info[address] = {
+            "address": address,
+            "setting": setting_from_statistics(statistics.value or {}) if statistics.ok else "Unable to query",
+            "is_active": is_active_from_issue_flags(issue_flags.value or {}) if issue_flags.ok else None,
+        }
+        if len(mainer_info) % 100 == 0:
+            print(f"  Fetched statistics for {len(mainer_info)}/{total} mainers")
+
+    run_fleet(addresses, tasks, concurrency=concurrency, on_result=on_result, network=network, timeout=10,
+              rate_limit_target=BOUNDARY_NODES)
+    return mainer_info
 
 def main(network, user, skip_poaiw_update=False, daily_metrics=False, limit=None, statistics=False):
     print("----------------------------------------------")
@@ -258,57 +267,41 @@ def main(network, user, skip_poaiw_update=False, daily_metrics=False, limit=None
         principals_data = {}
         total_network_daily_burn = 0
 
-        # Use ThreadPoolExecutor for parallel processing
-        from concurrent.futures import ThreadPoolExecutor, as_completed
+        # Fetch the statistics of all mainers of all principals in one concurrent fleet scan
+        all_addresses = [address for _, addresses in sorted_owners for address in addresses]
+        print(f"Fetching statistics for {len(all_addresses)} mainers concurrently...")
+        mainer_info = get_mainer_info_parallel(network, all_addresses)
 
         for owner, addresses in sorted_owners:
             print(f"\nPrincipal: {owner}")
             print(f"  Total mainers: {len(addresses)}")
-            print(f"  Fetching statistics for {len(addresses)} mainers in parallel...")
 
-            # Get settings and calculate daily burn rate for each mainer in parallel
+            # Get settings and calculate daily burn rate for each mainer
             settings_count = defaultdict(int)
             total_daily_burn_rate = 0
             active_count = 0
             paused_count = 0
             mainer_details = []
 
-            # Fetch all mainer info in parallel
-            with ThreadPoolExecutor(max_workers=10) as executor:
-                future_to_address = {
-                    executor.submit(get_mainer_info_parallel, network, address): address
-                    for address in addresses
-                }
-
-                for future in as_completed(future_to_address):
-                    try:
-                        info = future.result()
-                        address = info["address"]
-                        setting = info["setting"]
-                        is_active = info["is_active"]
-
-                        settings_count[setting] += 1
-
-                        if is_active is True:
-                            active_count += 1
-                            daily_burn = get_daily_burn_rate_for_setting(setting, is_active)
-                            total_daily_burn_rate += daily_burn
-                        elif is_active is False:
-                            paused_count += 1
-
-                        mainer_details.append({
-                            "address": address,
-                            "setting": setting,
-                            "is_active": is_active
-                        })
-                    except Exception as e:
-                        address = future_to_address[future]
-                        print(f"  Error fetching info for {address}: {e}")
-                        mainer_details.append({
-                            "address": address,
-                            "setting": "Unable to query",
-                            "is_active": None
-                        })
+            for address in addresses:
+                info = mainer_info.get(address, {"address": address, "setting": "Unable to query", "is_active": None})
+                setting = info["setting"]
+                is_active = info["is_active"]
+
+                settings_count[setting] += 1
+
+                if is_active is True:
+                    active_count += 1
+                    daily_burn = get_daily_burn_rate_for_setting(setting, is_active)
+                    total_daily_burn_rate += daily_burn
+                elif is_active is False:
+                    paused_count += 1
+
+                mainer_details.append({
+                    "address": address,
+                    "setting": setting,
+                    "is_active": is_active
+                })
 
             total_network_daily_burn += total_daily_burn_rate
 
@@ -334,6 +327,9 @@ def main(network, user, skip_poaiw_update=False, daily_metrics=False, limit=None
             }
 
         print(f"\nTotal network daily burn rate (active): {total_network_daily_burn} trillion cycles/day")
+        print("\nCall latency per method:")
+        for line in call_stats_lines():
+            print(f"  {line}")
         print("\n----------------------------------------------")
 
         # Write JSON summary file
@@ -395,14 +391,11 @@ def main(network, user, skip_poaiw_update=False, daily_metrics=False, limit=None
 
                 # check if the canister is paused or active
                 active = False
-                cmd = ["dfx", "canister", "call", address, "getIssueFlagsAdmin", "--network", network, "--output", "json"]
-                output = subprocess.check_output(cmd, stderr=subprocess.STDOUT, text=True)
-                data = json.loads(output)
+                data = call_canister(network, address, "getIssueFlagsAdmin")
                 low_cycle_balance = data.get('Ok', {}).get('lowCycleBalance', None)
                 if low_cycle_balance is None:
                     print(f"ERROR 1: Unable to get issue flags for canister {address} on network {network}")
-                    print(f"  {' '.join(cmd)}")
-                    print(output)
+                    print(data)
                     continue
                 elif low_cycle_balance == False:
                     active = True
@@ -411,17 +404,14 @@ def main(network, user, skip_poaiw_update=False, daily_metrics=False, limit=None
                     total_paused += 1
 
                 # get cycleBalance & cyclesBurnRate from getMainerStatisticsAdmin endpoint
-                cmd = ["dfx", "canister", "call", address, "getMainerStatisticsAdmin", "--network", network, "--output", "json"]
-                output = subprocess.check_output(cmd, stderr=subprocess.STDOUT, text=True)
-                data = json.loads(output)
+                data = call_canister(network, address, "getMainerStatisticsAdmin")
 
                 cycle_balance = int(data.get('Ok', {}).get('cycleBalance', 0))
                 if cycle_balance > 0:
                     total_cycles += cycle_balance
                 else:
                     print(f"ERROR: Unable to get cycleBalance for canister {address} on network {network}")
-                    print(f"  {' '.join(cmd)}")
-                    print(output)
+                    print(data)
                     continue
 
                 cycles_burn_rate = data.get('Ok', {}).get('cyclesBurnRate', {}).get('cycles', None)
@@ -449,13 +439,11 @@ def main(network, user, skip_poaiw_update=False, daily_metrics=False, limit=None
                             total_paused_very_high += 1
                     else:
                         print(f"ERROR: Unknown cyclesBurnRate {cycles_burn_rate} for canister {address} on network {network}")
-                        print(f"  {' '.join(cmd)}")
-                        print(output)
+                        print(data)
                         continue
                 else:
                     print(f"ERROR: Unable to get cyclesBurnRate for canister {address} on network {network}")
-                    print(f"  {' '.join(cmd)}")
-                    print(output)
+                    print(data)
                     continue
 
                 # print progress every 25 mainers
@@ -566,5 +554,7 @@ if __name__ == "__main__":
         action="store_true",
         help="Calculate per-principal statistics including settings and daily burn rates",
     )
+    add_cache_arguments(parser)
     args = parser.parse_args()
+    configure_cache_from_args(args)
     main(args.network, args.user, args.skip_poaiw_update, args.daily_metrics, args.limit, args.statistics)
@@ -9,6 +9,7 @@ SKIP_POAIW_UPDATE=""
 DAILY_METRICS=""
 LIMIT=""
 STATISTICS=""
+CACHE_FLAGS=""
 
 # Parse command line arguments for network type
 while [ $# -gt 0 ]; do
@@ -51,9 +52,17 @@ while [ $# -gt 0 ]; do
             STATISTICS="--statistics"
             shift
             ;;
+        --no-cache)
+            CACHE_FLAGS="$CACHE_FLAGS --no-cache"
+            shift
+            ;;
+        --refresh)
+            CACHE_FLAGS="$CACHE_FLAGS --refresh"
+            shift
+            ;;
         *)
             echo "Unknown argument: $1"
-            echo "Usage: $0 --network [local|ic|testing|development|demo|prd] [--loop [delay]] [--user principal] [--skip-poaiw-update] [--daily-metrics] [--limit N] [--statistics]"
+            echo "Usage: $0 --network [local|ic|testing|development|demo|prd] [--loop [delay]] [--user principal] [--skip-poaiw-update] [--daily-metrics] [--limit N] [--statistics] [--no-cache] [--refresh]"
             exit 1
             ;;
     esac
@@ -64,12 +73,12 @@ echo "Using network type: $NETWORK_TYPE"
 if [ "$LOOP" = "true" ]; then
     echo "Running in loop mode with a delay of $LOOP_DELAY seconds."
     while true; do
-        python -m scripts.get_mainers --network $NETWORK_TYPE --user $USER $SKIP_POAIW_UPDATE $DAILY_METRICS $LIMIT $STATISTICS
+        python -m scripts.get_mainers --network $NETWORK_TYPE --user $USER $SKIP_POAIW_UPDATE $DAILY_METRICS $LIMIT $STATISTICS $CACHE_FLAGS
         sleep $LOOP_DELAY
     done
 fi
 
-python -m scripts.get_mainers --network $NETWORK_TYPE --user $USER $SKIP_POAIW_UPDATE $DAILY_METRICS $LIMIT $STATISTICS
+python -m scripts.get_mainers --network $NETWORK_TYPE --user $USER $SKIP_POAIW_UPDATE $DAILY_METRICS $LIMIT $STATISTICS $CACHE_FLAGS
 
 # If statistics flag is set, automatically run the analysis script
 if [ -n "$STATISTICS" ]; then
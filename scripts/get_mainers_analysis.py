@@ -4,8 +4,6 @@ import argparse
 import os
 import json
 import sys
-import subprocess
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 
 # Get the directory of this script
@@ -13,6 +11,9 @@ SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
 
 # Import ICP ledger functions
 from .ledgers.icp import get_cycles_per_icp_from_cmc, get_icp_to_usd_rate_from_coinbase, get_icp_transactions, principal_to_account_id
+from .fleet_executor import run_fleet, canister_status_record, DEFAULT_CONCURRENCY, BOUNDARY_NODES
+from .canister_status import get_status_record
+from .singleflight import coalesce_stats_summary
 
 # GameState canister treasury account ID
 GAMESTATE_TREASURY_ACCOUNT_ID = "300d6f0058417bb5131c7313a3fe7f7b90510ca2f413ab863d39b1e35eceebad"
@@ -63,6 +64,11 @@ def calculate_icp_and_usd_for_burn_rate(burn_rate_tcycles, cycles_per_icp, usd_p
     return icp_per_day, usd_per_day
 
 
+def find_cycleops_controllers(controllers):
+    """Return the CycleOps canister IDs among a canister's controllers."""
+    return [cycleops_id for cycleops_id in CYCLEOPS_CANISTER_IDS if cycleops_id in controllers]
+
+
 def check_mainer_controllers(network, canister_id, debug=False):
     """
     Check if a mainer has CycleOps canisters as controllers.
@@ -76,37 +82,13 @@ def check_mainer_controllers(network, canister_id, debug=False):
         List of CycleOps canister IDs that are controllers, or empty list
     """
     try:
-        cmd = ["dfx", "canister", "--network", network, "info", canister_id]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
+        record = get_status_record(network, canister_id, timeout=10)
 
         if debug:
             print(f"    DEBUG: Checking {canister_id}")
-            print(f"    Return code: {result.returncode}")
-
-        if result.returncode != 0:
-            if debug:
-                print(f"    Error: {result.stderr[:200]}")
-            return []
-
-        output = result.stdout
-
-        if debug:
-            print(f"    Output sample: {output[:300]}")
-
-        # Parse the controllers from the output
-        # Looking for lines like "Controllers: canister1 canister2 ..."
-        cycleops_controllers = []
-
-        for line in output.split('\n'):
-            if 'Controllers:' in line or 'Controller' in line:
-                if debug:
-                    print(f"    Found controller line: {line}")
-                # Check if any of the CycleOps canister IDs are in this line
-                for cycleops_id in CYCLEOPS_CANISTER_IDS:
-                    if cycleops_id in line:
-                        cycleops_controllers.append(cycleops_id)
+            print(f"    Controllers: {' '.join(record.controllers)}")
 
-        return cycleops_controllers
+        return find_cycleops_controllers(record.controllers)
 
     except Exception as e:
         if debug:
@@ -127,44 +109,13 @@ def get_canister_cycle_balance(network, canister_id, debug=False):
         Cycle balance as an integer, or None if error
     """
     try:
-        cmd = ["dfx", "canister", "--network", network, "status", canister_id]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
+        record = get_status_record(network, canister_id, timeout=10)
 
         if debug:
             print(f"    DEBUG: Checking cycle balance for {canister_id}")
-            print(f"    Return code: {result.returncode}")
+            print(f"    Balance: {record.balance}")
 
-        if result.returncode != 0:
-            if debug:
-                print(f"    Error: {result.stderr[:200]}")
-            return None
-
-        output = result.stdout
-
-        if debug:
-            print(f"    Output sample: {output[:300]}")
-
-        # Parse the balance from the output
-        # Looking for a line like "Balance: 3_141_592_653_589 Cycles"
-        for line in output.split('\n'):
-            if 'Balance:' in line:
-                if debug:
-                    print(f"    Found balance line: {line}")
-                # Extract the numeric value
-                parts = line.split()
-                for i, part in enumerate(parts):
-                    if part == 'Balance:' and i + 1 < len(parts):
-                        # Remove underscores and convert to int
-                        balance_str = parts[i + 1].replace('_', '').replace(',', '')
-                        try:
-                            balance = int(balance_str)
-                            return balance
-                        except ValueError:
-                            if debug:
-                                print(f"    Failed to parse balance: {balance_str}")
-                            return None
-
-        return None
+        return record.balance
 
     except Exception as e:
         if debug:
@@ -471,7 +422,7 @@ def generate_markdown_summary(data, network, cycles_per_icp, usd_per_icp):
     return "\n".join(md_lines)
 
 
-def main(network, analyze_topups=True, limit=None):
+def main(network, analyze_topups=True, limit=None, concurrency=DEFAULT_CONCURRENCY):
     print("----------------------------------------------")
     print(f"Loading mAIners data for network: {network}")
     if analyze_topups:
@@ -529,9 +480,9 @@ def main(network, analyze_topups=True, limit=None):
     data['total_network_icp_per_day'] = round(total_icp, 8)
     data['total_network_usd_per_day'] = round(total_usd, 2)
 
-    # Check CycleOps controllers for all mainers (in parallel)
+    # Check CycleOps controllers and cycle balances for all mainers (one concurrent fleet scan)
     print("----------------------------------------------")
-    print("Checking for CycleOps controllers on mainers (parallel)...")
+    print("Checking CycleOps controllers and cycle balances on mainers (concurrent)...")
     print("----------------------------------------------")
 
     # Build a list of all (principal_id, address) pairs to check
@@ -540,6 +491,7 @@ def main(network, analyze_topups=True, limit=None):
         addresses = principal_data.get('addresses', [])
         for address in addresses:
             mainers_to_check.append((principal_id, address))
+    principal_by_address = {address: principal_id for principal_id, address in mainers_to_check}
 
     print(f"Total mainers to check: {len(mainers_to_check)}")
 
@@ -547,87 +499,62 @@ def main(network, analyze_topups=True, limit=None):
     for principal_id in principals.keys():
         principals[principal_id]['mainers_with_cycleops'] = 0
 
-    # Check controllers in parallel
     first_cycleops_found = False
     total_checked = 0
     total_with_cycleops = 0
 
-    def check_controller_wrapper(principal_id, address, is_first):
-        """Wrapper function for parallel execution."""
-        controllers = check_mainer_controllers(network, address, debug=is_first)
-        return (principal_id, address, controllers)
-
-    with ThreadPoolExecutor(max_workers=20) as executor:
-        # Submit all tasks
-        futures = []
-        for idx, (principal_id, address) in enumerate(mainers_to_check):
-            is_first = (idx == 0)
-            future = executor.submit(check_controller_wrapper, principal_id, address, is_first)
-            futures.append(future)
-
-        # Process results as they complete
-        for future in as_completed(futures):
-            principal_id, address, cycleops_controllers = future.result()
-            total_checked += 1
-
-            if cycleops_controllers:
-                principals[principal_id]['mainers_with_cycleops'] += 1
-                total_with_cycleops += 1
-
-                # Debug: Print the first time we find a CycleOps controller
-                if not first_cycleops_found:
-                    print(f"DEBUG: Found CycleOps controller(s) on mainer {address}")
-                    print(f"       Controllers found: {', '.join(cycleops_controllers)}")
-                    print(f"       Principal: {principal_id[:20]}...")
-                    first_cycleops_found = True
-
-            # Progress update every 50 mainers
-            if total_checked % 50 == 0:
-                percent = (total_checked / len(mainers_to_check)) * 100
-                print(f"Progress: {total_checked}/{len(mainers_to_check)} ({percent:.1f}%) - {total_with_cycleops} with CycleOps")
-
-    print(f"CycleOps controller check complete! Found {total_with_cycleops} mainers with CycleOps controllers.")
-    print("----------------------------------------------")
-
-    # Get cycle balances for all mainers (in parallel)
-    print("----------------------------------------------")
-    print("Fetching cycle balances for all mainers (parallel)...")
-    print("----------------------------------------------")
-
     # Build a dictionary to store cycle balances by canister_id
     cycle_balances = {}
-
-    def get_balance_wrapper(address, is_first):
-        """Wrapper function for parallel execution."""
-        balance = get_canister_cycle_balance(network, address, debug=is_first)
-        return (address, balance)
-
-    total_balance_checked = 0
     total_balance_success = 0
 
-    with ThreadPoolExecutor(max_workers=20) as executor:
-        # Submit all tasks
-        futures = []
-        for idx, (principal_id, address) in enumerate(mainers_to_check):
-            is_first = (idx == 0)
-            future = executor.submit(get_balance_wrapper, address, is_first)
-            futures.append(future)
-
-        # Process results as they complete
-        for future in as_completed(futures):
-            address, balance = future.result()
-            total_balance_checked += 1
-
-            if balance is not None:
-                cycle_balances[address] = balance
-                total_balance_success += 1
-
-            # Progress update every 50 mainers
-            if total_balance_checked % 50 == 0:
-                percent = (total_balance_checked / len(mainers_to_check)) * 100
-                print(f"Progress: {total_balance_checked}/{len(mainers_to_check)} ({percent:.1f}%) - {total_balance_success} successful")
+    def on_result(address, results):
+        nonlocal first_cycleops_found, total_checked, total_with_cycleops, total_balance_success
+        principal_id = principal_by_address[address]
+        is_first = (total_checked == 0)
+        total_checked += 1
+
+        status = results["status"]
+        if is_first:
+            print(f"    DEBUG: Checking {address}")
+            if status.ok:
+                print(f"    Controllers: {' '.join(status.value.controllers)}")
+                print(f"    Balance: {status.value.balance}")
+            else:
+                print(f"    Error: {status.error[:200]}")
+        record = status.value if status.ok else None
+        cycleops_controllers = find_cycleops_controllers(record.controllers) if record else []
+
+        if cycleops_controllers:
+            principals[principal_id]['mainers_with_cycleops'] += 1
+            total_with_cycleops += 1
+
+            # Debug: Print the first time we find a CycleOps controller
+            if not first_cycleops_found:
+                print(f"DEBUG: Found CycleOps controller(s) on mainer {address}")
+                print(f"       Controllers found: {', '.join(cycleops_controllers)}")
+                print(f"       Principal: {principal_id[:20]}...")
+                first_cycleops_found = True
+
+        balance = record.balance if record else None
+        if balance is not None:
+            cycle_balances[address] = balance
+            total_balance_success += 1
+
+        # Progress update every 50 mainers
+        if total_checked % 50 == 0:
+            percent = (total_checked / len(mainers_to_check)) * 100
+            print(f"Progress: {total_checked}/{len(mainers_to_check)} ({percent:.1f}%) - {total_with_cycleops} with CycleOps, {total_balance_success} balances")
+
+    # One canister_status per mainer gives both the controllers and the cycle balance
+    tasks = {
+        "status": canister_status_record(network),
+    }
+    run_fleet(list(principal_by_address.keys()), tasks, concurrency=concurrency, on_result=on_result, network=network, timeout=10,
+              rate_limit_target=BOUNDARY_NODES)
 
+    print(f"CycleOps controller check complete! Found {total_with_cycleops} mainers with CycleOps controllers.")
     print(f"Cycle balance check complete! Successfully fetched {total_balance_success}/{len(mainers_to_check)} balances.")
+    print(coalesce_stats_summary())
     print("----------------------------------------------")
 
     # Update mainer_details with cycle balances and calculate totals per principal
@@ -743,5 +670,11 @@ if __name__ == "__main__":
         default=None,
         help="Limit the number of principals to analyze (for testing purposes)",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"Maximum number of concurrent canister calls (default: {DEFAULT_CONCURRENCY})",
+    )
     args = parser.parse_args()
-    main(args.network, args.topups, args.limit)
+    main(args.network, args.topups, args.limit, args.concurrency)
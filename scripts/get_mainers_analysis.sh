@@ -4,6 +4,7 @@
 NETWORK_TYPE="local"
 NO_TOPUPS=""
 LIMIT=""
+CONCURRENCY=""
 
 # Parse command line arguments for network type
 while [ $# -gt 0 ]; do
@@ -27,9 +28,14 @@ while [ $# -gt 0 ]; do
             LIMIT="--limit $1"
             shift
             ;;
+        --concurrency)
+            shift
+            CONCURRENCY="--concurrency $1"
+            shift
+            ;;
         *)
             echo "Unknown argument: $1"
-            echo "Usage: $0 --network [local|ic|testing|development|demo|prd] [--no-topups] [--limit N]"
+            echo "Usage: $0 --network [local|ic|testing|development|demo|prd] [--no-topups] [--limit N] [--concurrency N]"
             exit 1
             ;;
     esac
@@ -41,4 +47,4 @@ echo "NOTE: Make sure you have first run: scripts/get_mainers.sh --network $NETW
 echo "      to generate the base JSON with statistics"
 echo ""
 
-python -m scripts.get_mainers_analysis --network $NETWORK_TYPE $NO_TOPUPS $LIMIT
+python -m scripts.get_mainers_analysis --network $NETWORK_TYPE $NO_TOPUPS $LIMIT $CONCURRENCY
@@ -1,19 +1,28 @@
 #!/usr/bin/env python3
 
 import argparse
+import glob
 import os
+import re
 import subprocess
 import json
-import time
+import sys
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Optional
 import threading
 
 from .monitor_common import get_canisters
+from .fleet_executor import (run_fleet, canister_method, canister_info, is_health_ok, BOUNDARY_NODES,
+                             parse_shard, shard_addresses)
+from .canister_status import parse_info_output
+from .canister_client import call_stats_lines
+from .singleflight import coalesce_stats_summary
+from .rate_limiter import LIMITER
+from .retry_policy import RetryPolicy, NETWORK_ERRORS, canister_keys, retry_stats_summary
 
 # Get the directory of this script
 SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+LOGS_DIR = os.path.join(SCRIPT_DIR, "logs-mainer-analysis")
 
 # Color codes for output
 GREEN = '\033[0;32m'
@@ -25,67 +34,27 @@ NC = '\033[0m'  # No Color
 print_lock = threading.Lock()
 
 
-def is_transient_error(error_text: str) -> bool:
-    """Check if error message indicates a transient error worth retrying."""
-    if not error_text:
-        return False
-
-    # Transient errors that should be retried
-    transient_indicators = [
-        "timeout",
-        "Timeout",
-        "timed out",
-        "Operation timed out",
-        "tcp connect error",
-        "connection refused",
-        "Connection refused",
-        "temporarily unavailable",
-        "error sending request",
-        "client error (Connect)"
-    ]
-    return any(indicator in error_text for indicator in transient_indicators)
-
-
 def run_command_with_retry(cmd: list, timeout: int = 10, max_retries: int = 5, retry_delay: float = 10.0):
     """
-    Run a command with retry on transient errors.
+    Run a command with retry on transient network errors (timeouts, connection errors).
 
     Args:
         cmd: Command to run as list of strings
         timeout: Timeout for command in seconds
         max_retries: Maximum number of retry attempts
-        retry_delay: Base delay between retries in seconds (exponential backoff)
+        retry_delay: Base delay between retries in seconds (jittered exponential backoff)
 
     Returns:
         subprocess.CompletedProcess if successful, None otherwise
     """
-    attempt = 0
-    while attempt < max_retries:
-        try:
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout, check=True)
-            return result
-        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
-            attempt += 1
-
-            # Collect error messages
-            error_text = str(e)
-            if hasattr(e, 'stderr') and e.stderr:
-                error_text += " " + e.stderr
-            if hasattr(e, 'stdout') and e.stdout:
-                error_text += " " + e.stdout
-
-            # Check if we should retry
-            if attempt < max_retries and is_transient_error(error_text):
-                delay = retry_delay * (2 ** (attempt - 1))  # Exponential backoff
-                time.sleep(delay)
-                continue
-
-            # Not retrying - return None
-            return None
-        except Exception:
-            return None
-
-    return None
+    policy = RetryPolicy(retry_classes=NETWORK_ERRORS, max_retries=max_retries, base_delay=retry_delay)
+    try:
+        return policy.call(
+            lambda: subprocess.run(cmd, capture_output=True, text=True, timeout=timeout, check=True),
+            keys=canister_keys(cmd),
+        )
+    except Exception:
+        return None
 
 
 def log_message(message: str, level: str = "INFO", current: int = None, total: int = None):
@@ -118,10 +87,7 @@ def get_canister_wasm_hash(network: str, canister_id: str) -> Optional[str]:
     if not result:
         return None
 
-    for line in result.stdout.split('\n'):
-        if 'Module hash:' in line:
-            return line.split(':')[1].strip()
-    return None
+    return parse_info_output(canister_id, result.stdout).module_hash
 
 
 def check_health_quiet(network: str, canister_id: str) -> bool:
@@ -156,9 +122,17 @@ def check_health_worker(network: str, name: str, canister_id: str, index: int, t
 
     # Get hash if target hash is provided
     current_hash = None
-    hash_matches = None
     if target_hash:
         current_hash = get_canister_wasm_hash(network, canister_id)
+
+    return classify_health(name, canister_id, index, total, is_healthy, current_hash, target_hash)
+
+
+def classify_health(name: str, canister_id: str, index: int, total: int, is_healthy: bool,
+                    current_hash: Optional[str] = None, target_hash: Optional[str] = None):
+    """Log and return the health check result of a single canister."""
+    hash_matches = None
+    if target_hash:
         if current_hash:
             hash_matches = (current_hash == target_hash)
         else:
@@ -191,10 +165,17 @@ def check_health_worker(network: str, name: str, canister_id: str, index: int, t
     return result
 
 
-def main(network, workers=10, target_hash=None):
+def results_file_path(network, date_prefix, shard=None):
+    """The JSON file with the results of a scan (of one shard)."""
+    suffix = f"-shard-{shard[0]}of{shard[1]}" if shard else ""
+    return os.path.join(LOGS_DIR, f"{date_prefix}-get_mainers_health-{network}{suffix}.json")
+
+
+def main(network, workers=50, target_hash=None, shard=None):
     log_message("=" * 100)
-    log_message(f"Checking health of all mAIners on network '{network}'")
-    log_message(f"Using {workers} parallel workers")
+    log_message(f"Checking health of all mAIners on network '{network}'"
+                + (f", shard {shard[0]}/{shard[1]}" if shard else ""))
+    log_message(f"Using at most {workers} concurrent calls")
     if target_hash:
         log_message(f"Target hash: {target_hash}")
     log_message("=" * 100)
@@ -207,49 +188,96 @@ def main(network, workers=10, target_hash=None):
         log_message(f"Make sure to run: scripts/get_mainers.sh --network {network}", "INFO")
         return
 
-    total_mainers = len(CANISTERS)
+    names_by_id = {canister_id: name for name, canister_id in CANISTERS.items()}
+    if shard:
+        shard_ids = shard_addresses(names_by_id, shard)
+        log_message(f"Shard {shard[0]}/{shard[1]}: {len(shard_ids)} of {len(names_by_id)} mAIners")
+        names_by_id = {canister_id: names_by_id[canister_id] for canister_id in shard_ids}
+
+    total_mainers = len(names_by_id)
     healthy_mainers = []
     unhealthy_mainers = []
     hash_mismatch_mainers = []
 
     log_message(f"Starting health check for {total_mainers} mAIners...")
 
-    # Process health checks in parallel
+    # Process health checks concurrently, streaming results as each mAIner completes
+    tasks = {"health": canister_method(network, "health", interface="mainer_ctrlb_canister")}
+    if target_hash:
+        # `dfx canister info` reads the module hash from the certified state tree (a read_state
+        # request), where canister_status is an update call that goes through consensus
+        tasks["info"] = canister_info(network)
+
     processed = 0
-    with ThreadPoolExecutor(max_workers=workers) as executor:
-        # Submit all health check tasks
-        future_to_canister = {
-            executor.submit(check_health_worker, network, name, canister_id, idx + 1, total_mainers, target_hash): (name, canister_id)
-            for idx, (name, canister_id) in enumerate(CANISTERS.items())
-        }
-
-        # Process results as they complete
-        for future in as_completed(future_to_canister):
-            processed += 1
-            try:
-                result = future.result()
-                if result["status"] == "hash_mismatch":
-                    hash_mismatch_mainers.append(result)
-                elif result["is_healthy"]:
-                    healthy_mainers.append(result)
-                else:
-                    unhealthy_mainers.append(result)
-            except Exception as e:
-                name, canister_id = future_to_canister[future]
-                log_message(f"Exception checking {canister_id}: {e}", "ERROR", processed, total_mainers)
-                unhealthy_mainers.append({
-                    "name": name,
-                    "id": canister_id,
-                    "status": "error",
-                    "is_healthy": False
-                })
+
+    def on_result(canister_id, results):
+        nonlocal processed
+        processed += 1
+        name = names_by_id[canister_id]
+        health = results["health"]
+        is_healthy = health.ok and is_health_ok(health.value)
+
+        current_hash = None
+        if target_hash and results["info"].ok:
+            current_hash = parse_info_output(canister_id, results["info"].value).module_hash
+
+        result = classify_health(name, canister_id, processed, total_mainers, is_healthy, current_hash, target_hash)
+        if result["status"] == "hash_mismatch":
+            hash_mismatch_mainers.append(result)
+        elif result["is_healthy"]:
+            healthy_mainers.append(result)
+        else:
+            unhealthy_mainers.append(result)
+
+    run_fleet(
+        list(names_by_id.keys()),
+        tasks,
+        concurrency=workers,
+        on_result=on_result,
+        network=network,
+        timeout=10,
+        retry_policy=RetryPolicy(retry_classes=NETWORK_ERRORS, max_retries=5, base_delay=10.0),
+        rate_limit_target=BOUNDARY_NODES,
+    )
+
+    log_message("")
+    for line in call_stats_lines():
+        log_message(f"Call latency: {line}")
+    log_message(coalesce_stats_summary())
+    log_message(f"Rate limit {LIMITER.summary()}")
+    log_message(retry_stats_summary())
+
+    results = {
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "network": network,
+        "target_hash": target_hash,
+        "total_mainers": total_mainers,
+        "healthy_count": len(healthy_mainers),
+        "unhealthy_count": len(unhealthy_mainers),
+        "hash_mismatch_count": len(hash_mismatch_mainers),
+        "healthy_mainers": healthy_mainers,
+        "unhealthy_mainers": unhealthy_mainers,
+        "hash_mismatch_mainers": hash_mismatch_mainers
+    }
+    if shard:
+        results["shard"] = f"{shard[0]}/{shard[1]}"
+    print_summary(results)
+    save_results(results, results_file_path(network, datetime.now().strftime("%Y-%m-%d"), shard))
+
+
+def print_summary(results):
+    """Print the summary and the unhealthy and hash mismatch mAIners of a scan."""
+    target_hash = results["target_hash"]
+    healthy_mainers = results["healthy_mainers"]
+    unhealthy_mainers = results["unhealthy_mainers"]
+    hash_mismatch_mainers = results["hash_mismatch_mainers"]
 
     # Print summary
     log_message("")
     log_message("=" * 100)
-    log_message("HEALTH CHECK SUMMARY")
+    log_message("HEALTH CHECK SUMMARY" + (f" (shard {results['shard']})" if results.get("shard") else ""))
     log_message("=" * 100)
-    log_message(f"Total mAIners checked : {total_mainers}")
+    log_message(f"Total mAIners checked : {results['total_mainers']}")
     log_message(f"Healthy mAIners       : {len(healthy_mainers)}", "SUCCESS" if len(unhealthy_mainers) == 0 and len(hash_mismatch_mainers) == 0 else "INFO")
     log_message(f"Unhealthy mAIners     : {len(unhealthy_mainers)}", "ERROR" if len(unhealthy_mainers) > 0 else "INFO")
     if target_hash:
@@ -280,25 +308,11 @@ def main(network, workers=10, target_hash=None):
         log_message("All mAIners are healthy" + (" and have the correct hash!" if target_hash else "!"), "SUCCESS")
         log_message("")
 
-    # Save results to JSON file with date prefix
-    date_prefix = datetime.now().strftime("%Y-%m-%d")
-    logs_dir = os.path.join(SCRIPT_DIR, "logs-mainer-analysis")
-    os.makedirs(logs_dir, exist_ok=True)
 
-    results = {
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "network": network,
-        "target_hash": target_hash,
-        "total_mainers": total_mainers,
-        "healthy_count": len(healthy_mainers),
-        "unhealthy_count": len(unhealthy_mainers),
-        "hash_mismatch_count": len(hash_mismatch_mainers),
-        "healthy_mainers": healthy_mainers,
-        "unhealthy_mainers": unhealthy_mainers,
-        "hash_mismatch_mainers": hash_mismatch_mainers
-    }
 
-    json_file_path = os.path.join(logs_dir, f"{date_prefix}-get_mainers_health-{network}.json")
+def save_results(results, json_file_path):
+    """Save the results of a scan to a JSON file."""
+    os.makedirs(os.path.dirname(json_file_path), exist_ok=True)
     with open(json_file_path, 'w') as f:
         json.dump(results, f, indent=2)
 
@@ -306,6 +320,63 @@ def main(network, workers=10, target_hash=None):
     log_message("")
 
 
+def merge_shards(network, date_prefix=None):
+    """Combine the shard files of a scan into the results file of a scan of the whole fleet.
+
+    Returns:
+        The merged results, or None if the shard files are missing or do not belong together
+    """
+    date_prefix = date_prefix or datetime.now().strftime("%Y-%m-%d")
+    pattern = re.compile(re.escape(f"{date_prefix}-get_mainers_health-{network}-shard-") + r"(\d+)of(\d+)\.json$")
+    shards = {}
+    for path in glob.glob(os.path.join(LOGS_DIR, f"{date_prefix}-get_mainers_health-{network}-shard-*.json")):
+        match = pattern.search(os.path.basename(path))
+        if match:
+            shards[(int(match.group(1)), int(match.group(2)))] = path
+
+    counts = {count for _, count in shards}
+    if not shards:
+        log_message(f"No shard files of {date_prefix} for network '{network}' in {LOGS_DIR}", "ERROR")
+        return None
+    if len(counts) > 1:
+        log_message(f"Shard files of different shard counts ({sorted(counts)}): remove the stale ones first", "ERROR")
+        return None
+    count = counts.pop()
+    missing = [index for index in range(1, count + 1) if (index, count) not in shards]
+    if missing:
+        log_message(f"Missing shard(s) {', '.join(f'{index}/{count}' for index in missing)}", "ERROR")
+        return None
+
+    parts = []
+    for index in range(1, count + 1):
+        with open(shards[(index, count)], 'r') as f:
+            parts.append(json.load(f))
+    target_hashes = {part.get("target_hash") for part in parts}
+    if len(target_hashes) > 1:
+        log_message(f"The shards were checked against different target hashes: {sorted(map(str, target_hashes))}", "ERROR")
+        return None
+
+    results = {
+        "timestamp": max(part["timestamp"] for part in parts),
+        "network": network,
+        "target_hash": target_hashes.pop(),
+        "total_mainers": sum(part["total_mainers"] for part in parts),
+    }
+    for key in ("healthy", "unhealthy", "hash_mismatch"):
+        results[f"{key}_mainers"] = [mainer for part in parts for mainer in part[f"{key}_mainers"]]
+    for key in ("healthy", "unhealthy", "hash_mismatch"):
+        results[f"{key}_count"] = len(results[f"{key}_mainers"])
+    # Same key order as the file of a scan that was not sharded
+    results = {key: results[key] for key in ("timestamp", "network", "target_hash", "total_mainers", "healthy_count",
+                                             "unhealthy_count", "hash_mismatch_count", "healthy_mainers",
+                                             "unhealthy_mainers", "hash_mismatch_mainers")}
+
+    log_message(f"Merged {count} shard(s) of {date_prefix} for network '{network}'")
+    print_summary(results)
+    save_results(results, results_file_path(network, date_prefix))
+    return results
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Check health status of all mAIners.")
     parser.add_argument(
@@ -317,8 +388,8 @@ if __name__ == "__main__":
     parser.add_argument(
         "--workers",
         type=int,
-        default=10,
-        help="Number of parallel workers for health checks (default: 10)",
+        default=50,
+        help="Maximum number of concurrent canister calls for health checks (default: 50)",
     )
     parser.add_argument(
         "--target-hash",
@@ -326,5 +397,30 @@ if __name__ == "__main__":
         default=None,
         help="Target wasm hash to verify all mAIners against",
     )
+    parser.add_argument(
+        "--shard",
+        type=str,
+        default=None,
+        help="Only check shard i of N (i/N, 1 <= i <= N), split by canister ID; run one process per shard",
+    )
+    parser.add_argument(
+        "--merge",
+        action="store_true",
+        help="Combine today's shard files in logs-mainer-analysis/ into one results file, without checking",
+    )
+    parser.add_argument(
+        "--date",
+        type=str,
+        default=None,
+        help="With --merge: date (YYYY-MM-DD) of the shard files to combine (default: today)",
+    )
     args = parser.parse_args()
-    main(args.network, args.workers, args.target_hash)
+    if args.merge:
+        if merge_shards(args.network, args.date) is None:
+            sys.exit(1)
+    else:
+        try:
+            shard = parse_shard(args.shard) if args.shard else None
+        except ValueError as e:
+            parser.error(str(e))
+        main(args.network, args.workers, args.target_hash, shard)
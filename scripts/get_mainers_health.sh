@@ -4,6 +4,8 @@
 NETWORK_TYPE="local"
 WORKERS=""
 TARGET_HASH=""
+SHARD=""
+MERGE=""
 
 # Parse command line arguments for network type
 while [ $# -gt 0 ]; do
@@ -28,9 +30,18 @@ while [ $# -gt 0 ]; do
             TARGET_HASH="--target-hash $1"
             shift
             ;;
+        --shard)
+            shift
+            SHARD="--shard $1"
+            shift
+            ;;
+        --merge)
+            MERGE="--merge"
+            shift
+            ;;
         *)
             echo "Unknown argument: $1"
-            echo "Usage: $0 --network [local|ic|testing|development|demo|prd] [--workers N] [--target-hash HASH]"
+            echo "Usage: $0 --network [local|ic|testing|development|demo|prd] [--workers N] [--target-hash HASH] [--shard i/N | --merge]"
             exit 1
             ;;
     esac
@@ -38,4 +49,4 @@ done
 
 echo "Using network type: $NETWORK_TYPE"
 
-python -m scripts.get_mainers_health --network $NETWORK_TYPE $WORKERS $TARGET_HASH
+python -m scripts.get_mainers_health --network $NETWORK_TYPE $WORKERS $TARGET_HASH $SHARD $MERGE
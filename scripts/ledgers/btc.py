@@ -5,9 +5,16 @@ using the mempool.space API.
 """
 
 import requests
-import time
+import sys
+from pathlib import Path
 from typing import List, Dict
 
+try:
+    from ..rate_limiter import LIMITER
+except ImportError:  # run directly as a script
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from rate_limiter import LIMITER
+
 BASE_URL = "https://mempool.space/api"          # mainnet
 # For testnet/signet, change to e.g.  "https://mempool.space/testnet/api"
 
@@ -15,6 +22,11 @@ DEST_ADDR   = "bc1q2qwyms5ptyjq7mn09ap79u96fhmkpdjt0c8wve"      # the funnai_btc
 SOURCE_ADDR = "bc1qmzhm50tgwl7k30xlnrtyffvph283y4zvx0q472"      # the bioniq_btc_address we expect in *inputs*
 
 PAGE_SIZE = 25      # mempool.space returns 25 txs per page
+MAX_RATE_LIMITED_RETRIES = 10   # 429s in a row for one page before giving up
+
+# be polite – start at 1 request / sec, speed up while mempool.space keeps answering
+RATE_LIMIT_TARGET = "mempool.space"
+LIMITER.configure(RATE_LIMIT_TARGET, initial_rate=1.0, max_rate=5.0)
 
 
 def fetch_address_txs(address: str) -> List[Dict]:
@@ -26,6 +38,7 @@ def fetch_address_txs(address: str) -> List[Dict]:
     """
     txs: List[Dict] = []
     last_seen = None
+    rate_limited = 0
 
     while True:
         # The first call has no paging param; subsequent calls append `last_seen_txid`
@@ -33,8 +46,17 @@ def fetch_address_txs(address: str) -> List[Dict]:
         if last_seen:
             endpoint = f"{endpoint}/{last_seen}"
 
+        LIMITER.acquire(RATE_LIMIT_TARGET)
         resp = requests.get(endpoint, timeout=15)
+        if resp.status_code == 429:        # rate limited: back off and retry the same page
+            LIMITER.failure(RATE_LIMIT_TARGET, "429 Too Many Requests")
+            rate_limited += 1
+            if rate_limited > MAX_RATE_LIMITED_RETRIES:
+                resp.raise_for_status()    # raises HTTPError: 429 Too Many Requests
+            continue
+        rate_limited = 0
         resp.raise_for_status()
+        LIMITER.success(RATE_LIMIT_TARGET)
 
         page = resp.json()
         if not page:                       # no more pages
@@ -45,8 +67,6 @@ def fetch_address_txs(address: str) -> List[Dict]:
 
         if len(page) < PAGE_SIZE:
             break                          # final partial page reached
-
-        time.sleep(1)                      # be polite – 1 request / sec
     # mempool.space gives newest→oldest; we want oldest→newest for later logic
     return list(reversed(txs))
 
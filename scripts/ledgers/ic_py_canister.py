@@ -1,10 +1,20 @@
-"""Returns the ic-py Canister instance, for calling the endpoints."""
+"""Returns the ic-py Canister instance, for calling the endpoints.
+
+The agent (one per network), the identity and the parsed Candid (keyed by the
+hash of the .did file) are created once per process, so only the first
+get_canister() call pays for the dfx subprocesses and the Candid parsing.
+"""
 
 import sys
+import hashlib
 import subprocess
+import threading
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
-from ic.canister import Canister  # type: ignore
+from typing import Any, Dict, Optional
+from antlr4 import CommonTokenStream, InputStream, ParseTreeWalker  # type: ignore
+from ic.canister import Canister, CaniterMethod, CaniterMethodAsync  # type: ignore
+from ic.parser.DIDEmitter import DIDEmitter, DIDLexer, DIDParser  # type: ignore
 from ic.client import Client  # type: ignore
 from ic.identity import Identity  # type: ignore
 from ic.agent import Agent  # type: ignore
@@ -26,8 +36,24 @@ def run_dfx_command(cmd: str, quiet: bool = False) -> Optional[str]:
     return None
 
 
+@lru_cache(maxsize=None)
+def get_identity() -> Identity:
+    """Returns the ic_py Identity of the current dfx identity (looked up once per process)"""
+
+    # Get the name of the current identity
+    identity_whoami = run_dfx_command(f"{DFX} identity whoami ")
+    print(f"Using identity = {identity_whoami}")
+
+    # Get the private key of the current identity
+    private_key = run_dfx_command(f"{DFX} identity export {identity_whoami} ")
+
+    # Create an Identity instance using the private key
+    return Identity.from_pem(private_key)
+
+
+@lru_cache(maxsize=None)
 def get_agent(network: str = "local") -> Agent:
-    """Returns an ic_py Agent instance"""
+    """Returns an ic_py Agent instance (one per network, created on first use)"""
 
     # Check if the network is up
     print(f"--\nChecking if the {network} network is up...")
@@ -57,15 +83,7 @@ def get_agent(network: str = "local") -> Agent:
 
     print(f"Network URL        = {network_url}")
 
-    # Get the name of the current identity
-    identity_whoami = run_dfx_command(f"{DFX} identity whoami ")
-    print(f"Using identity = {identity_whoami}")
-
-    # Get the private key of the current identity
-    private_key = run_dfx_command(f"{DFX} identity export {identity_whoami} ")
-
-    # Create an Identity instance using the private key
-    identity = Identity.from_pem(private_key)
+    identity = get_identity()
 
     # Create an HTTP client instance for making HTTPS calls to the IC
     # https://smartcontracts.org/docs/interface-spec/index.html#http-interface
@@ -76,6 +94,37 @@ def get_agent(network: str = "local") -> Agent:
     return agent
 
 
+# Parsed Candid actors, keyed by the sha256 of the .did text
+_candid_actors: Dict[str, Dict[str, Any]] = {}
+_candid_lock = threading.Lock()
+
+
+def parse_candid(canister_did: str) -> Dict[str, Any]:
+    """Returns the parsed Candid actor of a .did text (parsed once per distinct text)"""
+    key = hashlib.sha256(canister_did.encode("utf-8")).hexdigest()
+    with _candid_lock:
+        if key not in _candid_actors:
+            parser = DIDParser(CommonTokenStream(DIDLexer(InputStream(canister_did))))
+            emitter = DIDEmitter()
+            ParseTreeWalker().walk(emitter, parser.program())
+            _candid_actors[key] = emitter.getActor()
+        return _candid_actors[key]
+
+
+def make_canister(agent: Agent, canister_id: str, canister_did: str) -> Canister:
+    """Returns an ic_py Canister like Canister(agent, canister_id, candid), using the parsed Candid cache"""
+    canister = Canister.__new__(Canister)
+    canister.agent = agent
+    canister.canister_id = canister_id
+    canister.candid = canister_did
+    canister.actor = parse_candid(canister_did)
+    for name, method in canister.actor["methods"].items():
+        anno = None if len(method.annotations) == 0 else method.annotations[0]
+        setattr(canister, name, CaniterMethod(agent, canister_id, name, method.argTypes, method.retTypes, anno))
+        setattr(canister, name + "_async", CaniterMethodAsync(agent, canister_id, name, method.argTypes, method.retTypes, anno))
+    return canister
+
+
 def get_canister(
     canister_name: str,
     candid_path: Path,
@@ -104,4 +153,4 @@ def get_canister(
         canister_did = f.read()
 
     # Create a Canister instance
-    return Canister(agent=agent, canister_id=canister_id, candid=canister_did)
+    return make_canister(agent, canister_id, canister_did)
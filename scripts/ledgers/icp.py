@@ -10,6 +10,8 @@ from ic.common.ledger import Ledger
 from ic.principal import Principal
 
 from .ic_py_canister import get_canister, run_dfx_command
+from ..singleflight import coalesce
+from ..response_cache import cached_call
 
 import hashlib
 import binascii
@@ -304,11 +306,16 @@ def get_cycles_per_icp_from_cmc() -> int:
         "get_icp_xdr_conversion_rate"
     ]
     
-    # print(f"Running command: {' '.join(cmd)}")
-    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-    
-    # Parse the JSON response
-    response_json = json.loads(result.stdout)
+    def fetch():
+        # print(f"Running command: {' '.join(cmd)}")
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        return json.loads(result.stdout)
+
+    # Parse the JSON response (one call for concurrent callers, reused for a minute)
+    response_json = cached_call(
+        "ic", CMC_CANISTER_ID, "get_icp_xdr_conversion_rate",
+        lambda: coalesce(("ic", CMC_CANISTER_ID, "get_icp_xdr_conversion_rate"), fetch),
+    )
 
     xdr_permyriad_per_icp = response_json.get('data', {}).get('xdr_permyriad_per_icp', None)
     if xdr_permyriad_per_icp is None:
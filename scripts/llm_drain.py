@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Wait until an LLM canister that was removed from its controller has no more work in flight.
+
+upgrade_llms used to sleep 180s after remove_llm_canister, in case the protocol was still using
+the LLM. Instead, wait_for_drain() watches the LLM and returns as soon as it is idle, with the
+180s as the upper bound (the deadline of the "llm_drain" stage in readiness.py).
+
+Two signals are compared between samples taken about 10s apart:
+
+  - the cycle balance (`dfx canister status`): an inference burns far more cycles than the
+    idle burn of the canister, so a balance that drops faster than that means work in flight
+  - the last line of `dfx canister logs`: a new line means activity (when logging is on)
+
+The LLM is drained after QUIET_SAMPLES intervals in a row without either signal. When neither
+signal can be read, it is never taken as drained, and the wait lasts the full 180s.
+
+Usage:
+    from .llm_drain import wait_for_drain
+
+    drain = wait_for_drain(network, canister_id)
+    if drain.ready:
+        print(f"Idle after {drain.elapsed:.0f}s")
+"""
+
+import subprocess
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+try:
+    from .canister_status import fetch_status_record
+    from .readiness import poll_until, PollResult
+except ImportError:  # run directly or imported by the tests
+    from canister_status import fetch_status_record
+    from readiness import poll_until, PollResult
+
+# Intervals in a row without activity before the LLM counts as drained
+QUIET_SAMPLES = 2
+
+# Drop of the cycle balance beyond the idle burn that still counts as idle (a few cheap calls)
+BURN_TOLERANCE = 1_000_000_000
+
+LOGS_TIMEOUT = 30
+
+
+@dataclass
+class DrainSample:
+    """What an LLM looked like at one moment. None: could not be read."""
+    balance: Optional[int]
+    idle_cycles_burned_per_day: Optional[int]
+    last_log_line: Optional[str]
+
+
+def last_log_line(network: str, canister_id: str) -> Optional[str]:
+    """The last line of the canister's log ('' if empty), None if the log cannot be read."""
+    try:
+        output = subprocess.check_output(
+            ["dfx", "canister", "logs", canister_id, "--network", network],
+            stderr=subprocess.DEVNULL,
+            text=True,
+            timeout=LOGS_TIMEOUT
+        )
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError):
+        return None
+    lines = output.strip().splitlines()
+    return lines[-1] if lines else ""
+
+
+def drain_sample(network: str, canister_id: str) -> DrainSample:
+    try:
+        record = fetch_status_record(network, canister_id)
+        balance, idle_burn = record.balance, record.idle_cycles_burned_per_day
+    except subprocess.CalledProcessError:
+        balance = idle_burn = None
+    return DrainSample(balance, idle_burn, last_log_line(network, canister_id))
+
+
+def is_busy(before: DrainSample, after: DrainSample, seconds: float) -> Optional[bool]:
+    """Whether the LLM did work between two samples, None if no signal could be compared."""
+    signals = []
+    if before.balance is not None and after.balance is not None:
+        allowed = (after.idle_cycles_burned_per_day or 0) * seconds / 86400 + BURN_TOLERANCE
+        signals.append(before.balance - after.balance > allowed)
+    if before.last_log_line is not None and after.last_log_line is not None:
+        signals.append(after.last_log_line != before.last_log_line)
+    return any(signals) if signals else None
+
+
+def wait_for_drain(network: str, canister_id: str,
+                   on_wait: Optional[Callable[[int, float, int], None]] = None) -> PollResult[int]:
+    """Sample the LLM until it was idle for QUIET_SAMPLES intervals in a row, or the deadline.
+
+    The value of the result is the number of quiet intervals in a row at the end.
+    """
+    state = {"sample": drain_sample(network, canister_id), "at": time.monotonic(), "quiet": 0}
+
+    def probe() -> int:
+        now = time.monotonic()
+        sample = drain_sample(network, canister_id)
+        busy = is_busy(state["sample"], sample, now - state["at"])
+        state["quiet"] = state["quiet"] + 1 if busy is False else 0
+        state["sample"], state["at"] = sample, now
+        return state["quiet"]
+
+    return poll_until("llm_drain", probe, is_ready=lambda quiet: quiet >= QUIET_SAMPLES, on_wait=on_wait)
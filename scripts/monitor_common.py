@@ -8,35 +8,30 @@ import json
 from collections import defaultdict
 from dotenv import dotenv_values
 
+from .canister_status import get_status_record
+
 # Get the directory of this script
 SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
 
 def get_balance(canister_id, network):
-    """Fetch cycles balance using dfx for a given canister."""
+    """Fetch cycles balance for a given canister (from its shared status record)."""
     try:
-        cmd = ["dfx", "canister", "status", canister_id, "--network", network]
-        output = subprocess.check_output(cmd, stderr=subprocess.STDOUT, text=True)
-        
-        # Extract balance from the output
-        balance = None
-        for line in output.split('\n'):
-            if line.startswith('Balance:'):
-                balance_string = line.split(':')[1].strip().split()[0]  
-                balance = int(balance_string)
-                break
-        
-        if balance is None:
+        record = get_status_record(network, canister_id)
+        if record.balance is None:
             print(f"ERROR: Unable to find balance for canister {canister_id} on network {network}")
-            print(f"  {' '.join(cmd)}")
-            print(output)
+            print(f"  dfx canister status {canister_id} --network {network}")
+            print(record)
 
-        return balance
+        return record.balance
     except subprocess.CalledProcessError as e:
         print(f"ERROR occured when calling the subprocess command.")
         print("Command:", e.cmd)
         print("Return code:", e.returncode)
         print("Output:\n", e.output)
         return None
+    except subprocess.TimeoutExpired:
+        print(f"ERROR: Timed out fetching the status of canister {canister_id} on network {network}")
+        return None
 
 def run_this_cmd(cmd, cwd, confirm=False):
     print(f"  {' '.join(cmd)} \n  -> from directory: {cwd}")
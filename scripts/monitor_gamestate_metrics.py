@@ -9,6 +9,7 @@ from dotenv import dotenv_values
 import json
 
 from .monitor_common import get_canisters, ensure_log_dir
+from .canister_client import call_canister, call_stats_lines
 from datetime import datetime, timezone
 
 # Get the directory of this script
@@ -75,20 +76,16 @@ def get_data(canister_id, network):
             ("getNumOpenSubmissionsForOpenChallengesAdmin", "OpenSubsForOpenChallenges"),
         ]
 
+        # Read-only getters: query calls, answered by a single replica without consensus
         for method, label in methods:
-            result = subprocess.check_output(
-                ["dfx", "canister", "call", canister_id, method, "--output", "json", "--network", network],
-                stderr=subprocess.DEVNULL,
-                text=True
-            )
-            data = json.loads(result)
-            val = data.get('Ok')
+            data = call_canister(network, canister_id, method, interface="game_state_canister", timeout=10)
+            val = (data or {}).get('Ok')
             if should_include(label, val):
                 output += f"- {method:<45} = {val} \n"
 
         get_data.previous_values = current_values
         return output.strip().splitlines()
-    except subprocess.CalledProcessError:
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
         return []
 
 def main(network):
@@ -121,7 +118,6 @@ def main(network):
     # Log directory (also relative to script location)
     LOG_DIR = os.path.join(SCRIPT_DIR, f"logs-{network}")
     MONITOR_GAMESTATE_FILE = os.path.join(LOG_DIR, "monitor_gamestate.log")
-    PREVIOUS_LOGS = defaultdict(set)
 
     ensure_log_dir(LOG_DIR)
 
@@ -132,6 +128,18 @@ def main(network):
     delay = 2  # seconds
 
     print(f"\nEvery {delay} seconds, monitoring changes to stats for {gamestate_name} ({gamestate_canister_id}) on '{network}' network...\n")
+    try:
+        monitor_loop(network, gamestate_name, gamestate_canister_id, challenger_name, judge_name, share_service_name,
+                     CANISTER_COLORS, MONITOR_GAMESTATE_FILE, delay)
+    except KeyboardInterrupt:
+        print("\nCall latency per method:")
+        for line in call_stats_lines():
+            print(f"  {line}")
+
+
+def monitor_loop(network, gamestate_name, gamestate_canister_id, challenger_name, judge_name, share_service_name,
+                 CANISTER_COLORS, MONITOR_GAMESTATE_FILE, delay):
+    PREVIOUS_LOGS = defaultdict(set)
     while True:
         new_lines = []
         log_lines = get_data(gamestate_canister_id, network)
@@ -8,29 +8,17 @@ from collections import defaultdict
 from dotenv import dotenv_values
 
 from .monitor_common import get_canisters, ensure_log_dir
+from .canister_status import get_status_record
 from datetime import datetime, timezone
 
 # Get the directory of this script
 SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
 
 def get_memory(canister_id, network):
-    """Fetch memory using dfx for a given canister."""
+    """Fetch memory for a given canister (from its shared status record)."""
     try:
-        output = subprocess.check_output(
-            ["dfx", "canister", "status", canister_id, "--network", network],
-            stderr=subprocess.DEVNULL,
-            text=True
-        )
-        
-        # Extract memory from the output
-        memory = None
-        for line in output.split('\n'):
-            if line.startswith('Memory Size:'):
-                balance_string = line.split(':')[1].strip().split()[0]  
-                memory = int(balance_string)
-                break
-        return memory
-    except subprocess.CalledProcessError:
+        return get_status_record(network, canister_id).memory_size
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
         print(f"ERROR: Unable to fetch memory for canister {canister_id} on network {network}")
         return []
 
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Adaptive (AIMD) token-bucket rate limiter, shared by the fleet and cleanup scripts.
+
+Instead of a fixed `time.sleep` between calls, each target (a canister, a subnet,
+an HTTP host) gets a token bucket. While calls succeed its rate grows additively
+(by about `increase` calls/s per second of traffic). On a rate-limit or transient
+error it is cut multiplicatively (times `decrease`) and the bucket is emptied, so
+the scripts run at the highest rate the target tolerates.
+
+Usage:
+    from .rate_limiter import LIMITER
+
+    LIMITER.configure("mempool.space", initial_rate=1.0, max_rate=5.0)
+    with LIMITER.limit("mempool.space"):
+        resp = requests.get(url)          # an exception reports a failure
+
+    # or explicitly
+    LIMITER.acquire(canister_id)
+    ...
+    LIMITER.success(canister_id)  /  LIMITER.failure(canister_id, error_text)
+"""
+
+import asyncio
+import subprocess
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+# Errors that mean "slow down": rate limits, overload and transient network failures
+BACKOFF_INDICATORS = [
+    "429",
+    "too many requests",
+    "rate limit",
+    "overloaded",
+    "queue is full",
+    "timed out",
+    "timeout",
+    "connection reset",
+    "connection refused",
+    "503",
+    "service unavailable",
+]
+
+
+def is_backoff_error(error_text: str) -> bool:
+    """True if an error indicates the target is rate limiting or overloaded."""
+    text = (error_text or "").lower()
+    return any(indicator in text for indicator in BACKOFF_INDICATORS)
+
+
+def _error_text(e: BaseException) -> str:
+    text = str(e)
+    if isinstance(e, subprocess.CalledProcessError):
+        text += f" {e.stderr or ''} {e.output or ''}"
+    return text
+
+
+@dataclass
+class _Bucket:
+    rate: float  # tokens per second
+    min_rate: float
+    max_rate: float
+    tokens: float = 1.0
+    updated: float = field(default_factory=time.monotonic)
+    successes: int = 0
+    backoffs: int = 0
+    last_decrease: float = 0.0
+
+    def refill(self, now: float):
+        # At most one second of burst, so a bucket that was idle does not flood the target
+        self.tokens = min(max(1.0, self.rate), self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class AimdRateLimiter:
+    """Token buckets per target with additive increase / multiplicative decrease of the rate."""
+
+    def __init__(self, initial_rate: float = 5.0, min_rate: float = 0.2, max_rate: float = 50.0,
+                 increase: float = 1.0, decrease: float = 0.5):
+        self.defaults = {"initial_rate": initial_rate, "min_rate": min_rate, "max_rate": max_rate}
+        self.increase = increase
+        self.decrease = decrease
+        self._settings: Dict[str, Dict[str, float]] = {}
+        self._buckets: Dict[str, _Bucket] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, target: str, initial_rate: Optional[float] = None, min_rate: Optional[float] = None,
+                  max_rate: Optional[float] = None, increase: Optional[float] = None):
+        """Set the rates (calls/s) and additive increase of one target. Applies to its bucket from the next call on."""
+        settings = dict(self.defaults, increase=self.increase)
+        for key, value in (("initial_rate", initial_rate), ("min_rate", min_rate), ("max_rate", max_rate),
+                           ("increase", increase)):
+            if value is not None:
+                settings[key] = value
+        with self._lock:
+            self._settings[target] = settings
+            self._buckets.pop(target, None)
+
+    def _bucket(self, target: str) -> _Bucket:
+        bucket = self._buckets.get(target)
+        if bucket is None:
+            settings = self._settings.get(target, self.defaults)
+            bucket = self._buckets[target] = _Bucket(
+                rate=settings["initial_rate"], min_rate=settings["min_rate"], max_rate=settings["max_rate"]
+            )
+        return bucket
+
+    def _take(self, target: str) -> float:
+        """Reserve the next token and return the seconds to wait until it is there (0 if it is).
+
+        Reserving (the bucket goes negative) lets each waiter sleep once, instead of all
+        waiters waking up together and polling for the same token.
+        """
+        with self._lock:
+            bucket = self._bucket(target)
+            bucket.refill(time.monotonic())
+            bucket.tokens -= 1.0
+            return max(0.0, -bucket.tokens / bucket.rate)
+
+    def acquire(self, target: str):
+        """Block until a call to target is allowed."""
+        wait = self._take(target)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, target: str):
+        """Wait (without blocking the event loop) until a call to target is allowed."""
+        wait = self._take(target)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def success(self, target: str):
+        """Report a successful call: increase the rate additively."""
+        with self._lock:
+            bucket = self._bucket(target)
+            bucket.successes += 1
+            increase = self._settings.get(target, {}).get("increase", self.increase)
+            bucket.rate = min(bucket.max_rate, bucket.rate + increase / bucket.rate)
+
+    def failure(self, target: str, error_text: str = "", started: Optional[float] = None):
+        """Report a failed call: back off multiplicatively if it was a rate-limit or transient error.
+
+        Pass `started` (time.monotonic() when the call was made) so that calls which were already
+        in flight when the rate was last cut do not cut it again: one decrease per burst of errors.
+        """
+        if not is_backoff_error(error_text):
+            return
+        with self._lock:
+            bucket = self._bucket(target)
+            if started is not None and started < bucket.last_decrease:
+                return
+            bucket.backoffs += 1
+            bucket.rate = max(bucket.min_rate, bucket.rate * self.decrease)
+            bucket.tokens = 0.0  # empty, and forget the debt of reservations made at the old rate
+            bucket.last_decrease = time.monotonic()
+
+    def rate(self, target: str) -> float:
+        """The current rate of a target in calls/s."""
+        with self._lock:
+            return self._bucket(target).rate
+
+    @contextmanager
+    def limit(self, target: str):
+        """Acquire before the block; report success, or failure if the block raises."""
+        self.acquire(target)
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self.failure(target, _error_text(e), started)
+            raise
+        self.success(target)
+
+    @asynccontextmanager
+    async def limit_async(self, target: str):
+        """Async version of limit()."""
+        await self.acquire_async(target)
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self.failure(target, _error_text(e), started)
+            raise
+        self.success(target)
+
+    def summary(self) -> str:
+        """One line per target: current rate, successes and backoffs."""
+        with self._lock:
+            return "\n".join(
+                f"{target}: {bucket.rate:.1f} calls/s ({bucket.successes} ok, {bucket.backoffs} backoffs)"
+                for target, bucket in sorted(self._buckets.items())
+            )
+
+
+# The limiter shared by all scripts in a process
+LIMITER = AimdRateLimiter()
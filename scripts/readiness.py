@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Adaptive readiness polling for the upgrade state machine.
+
+Replaces the fixed sleeps of upgrade_mainers (15s before each maintenance flag poll after
+an upgrade, 10s before the health check, 30s between health retries, 3s before each flag
+check after a toggle). poll_until() probes a condition after a short first wait, then at
+intervals that grow exponentially with jitter, until it is ready or the deadline of the
+stage has passed.
+
+The time each stage took to become ready is recorded. The first wait of a stage is 3/4 of
+the median of its recent times-to-ready, so it settles just below the typical time-to-ready
+instead of a hard-coded guess. Times-to-ready are kept in scripts/.cache/readiness.json
+between runs (FUNNAI_READINESS_FILE overrides).
+
+Usage:
+    from .readiness import poll_until
+
+    poll = poll_until("health", lambda: check_health(network, address), is_ready=lambda result: result[0])
+    if poll.ready:
+        print(f"Healthy after {poll.elapsed:.1f}s")
+"""
+
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Generic, List, Optional, TypeVar
+
+try:
+    from .retry_policy import backoff_delay
+except ImportError:  # imported from a script run directly, or from the tests
+    from retry_policy import backoff_delay
+
+T = TypeVar("T")
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+READINESS_FILE = Path(os.environ.get("FUNNAI_READINESS_FILE", SCRIPT_DIR / ".cache" / "readiness.json"))
+
+# Times-to-ready kept per stage
+MAX_OBSERVATIONS = 50
+
+
+@dataclass
+class Stage:
+    """How to poll one stage.
+
+    first_wait: wait before the first probe while nothing was observed yet
+    interval: wait after the first probe that was not ready; doubles per probe, with jitter
+    max_interval: cap of the wait between two probes
+    deadline: give up after this many seconds
+    max_polls: give up after this many probes
+    """
+    first_wait: float
+    interval: float
+    max_interval: float
+    deadline: float
+    max_polls: int = 30
+
+
+STAGES: Dict[str, Stage] = {
+    # getMaintenanceFlag answers at all (it may not, while a canister initializes)
+    "flag_endpoint": Stage(first_wait=0.0, interval=1.0, max_interval=4.0, deadline=15.0),
+    # the flag reads back as on / off after toggleMaintenanceFlagAdmin
+    "maintenance_flag_on": Stage(first_wait=1.0, interval=1.0, max_interval=5.0, deadline=15.0),
+    "maintenance_flag_off": Stage(first_wait=1.0, interval=1.0, max_interval=5.0, deadline=15.0),
+    # the upgraded and restarted canister reports its maintenance flag as on
+    "post_upgrade_flag": Stage(first_wait=2.0, interval=1.0, max_interval=15.0, deadline=150.0),
+    # health returns 200 once the maintenance flag is off
+    "health": Stage(first_wait=2.0, interval=2.0, max_interval=30.0, deadline=70.0),
+    # an LLM removed from its controller has no more work in flight (see llm_drain.py); the
+    # deadline is the fixed delay upgrade_llms used to wait
+    "llm_drain": Stage(first_wait=10.0, interval=10.0, max_interval=15.0, deadline=180.0),
+}
+
+
+@dataclass
+class PollResult(Generic[T]):
+    """The outcome of poll_until: whether the stage became ready, the last probe result and the time it took."""
+    ready: bool
+    value: T
+    elapsed: float
+    polls: int
+
+
+class ReadinessStats:
+    """Recent times-to-ready per stage, loaded from and saved to a JSON file."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self._observations: Optional[Dict[str, List[float]]] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, List[float]]:
+        if self._observations is None:
+            self._observations = {}
+            if self.path is not None and self.path.exists():
+                try:
+                    with open(self.path, "r") as f:
+                        self._observations = {stage: [float(t) for t in times] for stage, times in json.load(f).items()}
+                except (OSError, ValueError, AttributeError, TypeError):
+                    self._observations = {}
+        return self._observations
+
+    def _save(self):
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, prefix=".tmp-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self._observations, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def record(self, stage: str, time_to_ready: float):
+        with self._lock:
+            times = self._load().setdefault(stage, [])
+            times.append(round(time_to_ready, 3))
+            del times[:-MAX_OBSERVATIONS]
+            self._save()
+
+    def first_wait(self, stage: str) -> float:
+        """3/4 of the median time-to-ready of the stage, or its default first wait."""
+        with self._lock:
+            times = self._load().get(stage)
+        if not times:
+            return STAGES[stage].first_wait
+        return min(0.75 * statistics.median(times), STAGES[stage].max_interval)
+
+    def summary(self) -> str:
+        with self._lock:
+            observations = dict(self._load())
+        if not observations:
+            return "Time to ready: nothing observed yet"
+        parts = [f"{stage} {statistics.median(times):.1f}s" for stage, times in sorted(observations.items()) if times]
+        return "Time to ready (median): " + ", ".join(parts)
+
+
+STATS = ReadinessStats(READINESS_FILE)
+
+
+def poll_until(stage: str, probe: Callable[[], T], is_ready: Callable[[T], bool] = bool,
+               give_up: Optional[Callable[[T], bool]] = None,
+               on_wait: Optional[Callable[[int, float, T], None]] = None) -> PollResult[T]:
+    """Call probe() until is_ready(result), give_up(result), or the deadline of the stage.
+
+    on_wait(poll, delay, result) is called before each wait after a probe that was not ready.
+    Exceptions raised by probe() are not caught.
+    """
+    config = STAGES[stage]
+    start = time.monotonic()
+    polls = 0
+    delay = STATS.first_wait(stage)
+    while True:
+        remaining = config.deadline - (time.monotonic() - start)
+        if delay > 0:
+            time.sleep(max(0.0, min(delay, remaining)))
+        value = probe()
+        polls += 1
+        elapsed = time.monotonic() - start
+        if is_ready(value):
+            STATS.record(stage, elapsed)
+            return PollResult(True, value, elapsed, polls)
+        if (give_up is not None and give_up(value)) or polls >= config.max_polls or elapsed >= config.deadline:
+            return PollResult(False, value, elapsed, polls)
+        delay = backoff_delay(polls, config.interval, config.max_interval)
+        if on_wait is not None:
+            on_wait(polls, delay, value)
+
+
+def readiness_summary() -> str:
+    return STATS.summary()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+On-disk TTL cache for heavy read-only canister queries, shared by all scripts.
+
+The full mAIner inventory (game_state_canister.getMainerAgentCanistersAdmin) is
+fetched by get_mainers, upgrade_mainers, update_admin_rbac_mainers, fund_mainers,
+check_mainers_duplicate_creation_timestamps and scripts_whitelist/funnai. With this
+cache a runbook of those scripts fetches it once instead of once per script.
+
+Entries are keyed by (network, canister, method, args) and stored as JSON files in
+scripts/.cache/responses. Canister names are resolved to their ID with canister_ids.json,
+and a canister ID on the IC is the same canister whatever dfx network name it is called
+with, so `cached_call("prd", "game_state_canister", ...)` and
+`cached_call("ic", "r5m5y-diaaa-aaaaa-qanaa-cai", ...)` share an entry. Only methods listed in METHOD_TTLS are cached, and only
+responses that are not an Err variant. Writes are
+atomic (temp file + os.replace), so concurrent scripts never read a partial entry.
+
+Overrides:
+  --no-cache        do not read or write the cache  (or FUNNAI_NO_CACHE=1)
+  --refresh         ignore cached entries, fetch and store fresh ones  (or FUNNAI_REFRESH_CACHE=1)
+
+Usage:
+    from .response_cache import cached_call, add_cache_arguments, configure_cache
+
+    data = cached_call(network, "game_state_canister", "getMainerAgentCanistersAdmin",
+                       lambda: call_canister(network, "game_state_canister", "getMainerAgentCanistersAdmin"))
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+try:
+    from .canister_index import canister_index
+except ImportError:
+    from canister_index import canister_index
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+CANISTER_IDS_PATH = SCRIPT_DIR.parent / "canister_ids.json"
+CACHE_DIR = Path(os.environ.get("FUNNAI_CACHE_DIR", SCRIPT_DIR / ".cache" / "responses"))
+
+# Time-to-live in seconds per cached method. Methods not listed here are never cached.
+METHOD_TTLS = {
+    "getMainerAgentCanistersAdmin": 10 * 60,
+    "getRecentProtocolActivity": 60,
+    "getWinnerDeclarationsAdmin": 10 * 60,
+    "get_icp_xdr_conversion_rate": 60,
+}
+
+
+def _env_flag(name: str) -> bool:
+    return os.environ.get(name, "") not in ("", "0", "false", "False")
+
+
+_enabled = not _env_flag("FUNNAI_NO_CACHE")
+_refresh = _env_flag("FUNNAI_REFRESH_CACHE")
+
+CACHE_STATS = {
+    "hits": 0,
+    "misses": 0,
+    "expired": 0,
+    "writes": 0,
+    "bypassed": 0,
+}
+
+
+def configure_cache(no_cache: bool = False, refresh: bool = False):
+    """Set the cache mode for this process (see add_cache_arguments)."""
+    global _enabled, _refresh
+    _enabled = not no_cache and not _env_flag("FUNNAI_NO_CACHE")
+    _refresh = refresh or _env_flag("FUNNAI_REFRESH_CACHE")
+
+
+def add_cache_arguments(parser):
+    """Add the --no-cache and --refresh options to an argparse parser."""
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not use the on-disk response cache for read-only queries",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Ignore cached responses, fetch fresh data and update the cache",
+    )
+
+
+def configure_cache_from_args(args):
+    """Apply the --no-cache/--refresh options parsed by add_cache_arguments."""
+    configure_cache(no_cache=getattr(args, "no_cache", False), refresh=getattr(args, "refresh", False))
+
+
+def _canister_key(network: str, canister: str):
+    """(network, canister) part of a cache key: the canister ID on the IC, whatever the dfx network name."""
+    canister_id = canister if canister.endswith("-cai") else None
+    if canister_id is None:
+        try:
+            canister_id = canister_index(CANISTER_IDS_PATH).address(canister, network)
+        except (OSError, json.JSONDecodeError):
+            pass
+    if not canister_id or network == "local":
+        # The local replica hands out IDs of its own, which can also exist on the IC
+        return [network, canister_id or canister]
+    return ["ic", canister_id]
+
+
+def cache_key(network: str, canister: str, method: str, args: Optional[str] = None) -> str:
+    """Stable key for a call: sha256 of network and canister (see _canister_key), method and args."""
+    raw = json.dumps([*_canister_key(network, canister), method, args or ""], separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _cache_path(key: str) -> Path:
+    return CACHE_DIR / f"{key}.json"
+
+
+def get_cached(network: str, canister: str, method: str, args: Optional[str] = None,
+               ttl: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """Return the cache entry if present and not older than ttl, else None."""
+    ttl = METHOD_TTLS.get(method, 0) if ttl is None else ttl
+    if not _enabled or _refresh or ttl <= 0:
+        return None
+
+    path = _cache_path(cache_key(network, canister, method, args))
+    try:
+        with open(path, "r") as f:
+            entry = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        CACHE_STATS["misses"] += 1
+        return None
+
+    if time.time() - entry.get("fetched_at", 0) > ttl:
+        CACHE_STATS["expired"] += 1
+        CACHE_STATS["misses"] += 1
+        return None
+
+    CACHE_STATS["hits"] += 1
+    return entry
+
+
+def put_cached(network: str, canister: str, method: str, value: Any, args: Optional[str] = None):
+    """Store a response atomically, so readers never see a partially written file."""
+    if not _enabled:
+        return
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    entry = {
+        "network": network,
+        "canister": canister,
+        "method": method,
+        "args": args,
+        "fetched_at": time.time(),
+        "value": value,
+    }
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, _cache_path(cache_key(network, canister, method, args)))
+        CACHE_STATS["writes"] += 1
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def cached_call(network: str, canister: str, method: str, fetch: Callable[[], Any],
+                args: Optional[str] = None, ttl: Optional[float] = None) -> Any:
+    """Return the cached response of a read-only call, or fetch() and cache it.
+
+    Only successful responses are stored: if fetch() raises or returns an Err variant
+    (e.g. Unauthorized), nothing is cached.
+    """
+    ttl = METHOD_TTLS.get(method, 0) if ttl is None else ttl
+    if not _enabled or ttl <= 0:
+        CACHE_STATS["bypassed"] += 1
+        return fetch()
+
+    entry = get_cached(network, canister, method, args, ttl)
+    if entry is not None:
+        return entry["value"]
+
+    if _refresh:
+        CACHE_STATS["misses"] += 1
+    value = fetch()
+    if not (isinstance(value, dict) and "Err" in value):
+        put_cached(network, canister, method, value, args)
+    return value
+
+
+def cache_age(network: str, canister: str, method: str, args: Optional[str] = None) -> Optional[float]:
+    """Age in seconds of the cached entry, or None if there is none."""
+    try:
+        with open(_cache_path(cache_key(network, canister, method, args)), "r") as f:
+            return time.time() - json.load(f).get("fetched_at", 0)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def clear_cache():
+    """Remove all cached responses."""
+    if CACHE_DIR.exists():
+        for path in CACHE_DIR.glob("*.json"):
+            path.unlink()
+
+
+def cache_stats_summary() -> str:
+    return (f"Response cache: {CACHE_STATS['hits']} hits, {CACHE_STATS['misses']} misses "
+            f"({CACHE_STATS['expired']} expired), {CACHE_STATS['writes']} writes, "
+            f"{CACHE_STATS['bypassed']} bypassed")
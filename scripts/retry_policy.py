@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+One retry policy for all scripts: error classes, jittered backoff, circuit breakers and a retry budget.
+
+Replaces the copies of the transient-error indicator lists and exponential backoff loops
+in upgrade_mainers, update_admin_rbac_mainers, get_mainers_health and fleet_executor.
+
+- classify_error(text) sorts an error into PERMANENT, CANISTER_STOPPED (IC0508),
+  CANISTER_TRAPPED (IC0503), CONNECT, TIMEOUT, TRANSIENT or UNKNOWN.
+- backoff_delay() is exponential, capped at 60s, with jitter so retries do not synchronize.
+- Circuit breakers fail fast: after a run of connect/timeout failures for a canister, or
+  for the canisters of one subnet (see canister_subnets.py), calls for it fail immediately
+  until a cooldown has passed. Then a single call probes it.
+- A retry budget caps the number of retries in one run, so a bad subnet cannot stall a
+  fleet scan for minutes.
+
+Usage:
+    from .retry_policy import RetryPolicy, NETWORK_ERRORS
+
+    policy = RetryPolicy(retry_classes=NETWORK_ERRORS, max_retries=5, base_delay=10.0)
+    result = policy.call(lambda: subprocess.run(cmd, check=True, ...), keys=(canister_id,))
+"""
+
+import asyncio
+import os
+import random
+import subprocess
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set, TypeVar
+
+try:
+    from .canister_subnets import known_subnet, subnet_of
+except ImportError:
+    from canister_subnets import known_subnet, subnet_of
+
+T = TypeVar("T")
+
+PERMANENT = "permanent"
+CANISTER_STOPPED = "canister_stopped"
+CANISTER_TRAPPED = "canister_trapped"
+CONNECT = "connect"
+TIMEOUT = "timeout"
+TRANSIENT = "transient"
+UNKNOWN = "unknown"
+
+# (error class, indicators), checked in order, case-insensitive: the first match wins
+ERROR_INDICATORS = [
+    (PERMANENT, ["IC0536", "has no update method", "has no query method", "does not exist"]),
+    (CANISTER_STOPPED, ["IC0508"]),
+    (CANISTER_TRAPPED, ["IC0503"]),
+    (CONNECT, ["tcp connect error", "connection refused", "connection reset", "client error (Connect)",
+               "error sending request", "temporarily unavailable"]),
+    (TIMEOUT, ["timed out", "timeout"]),
+    (TRANSIENT, ["Failed query call", "CanisterError", "429", "too many requests", "503"]),
+]
+
+# Network trouble: worth retrying everywhere, and what the circuit breakers count
+NETWORK_ERRORS = frozenset({CONNECT, TIMEOUT})
+
+# Also retried by the upgrade scripts, where a canister may be stopped or busy for a while
+TRANSIENT_ERRORS = frozenset({CONNECT, TIMEOUT, TRANSIENT, CANISTER_STOPPED, CANISTER_TRAPPED})
+
+# Backoff cap in seconds
+MAX_DELAY = 60.0
+
+# Retries allowed per run, across all calls (FUNNAI_RETRY_BUDGET overrides)
+DEFAULT_RETRY_BUDGET = int(os.environ.get("FUNNAI_RETRY_BUDGET", "1000"))
+
+
+def classify_error(error_text: str) -> str:
+    """Return the error class of an error message."""
+    text = (error_text or "").lower()
+    for error_class, indicators in ERROR_INDICATORS:
+        if any(indicator.lower() in text for indicator in indicators):
+            return error_class
+    return UNKNOWN
+
+
+def is_transient_error(error_text: str, retry_classes: Iterable[str] = TRANSIENT_ERRORS) -> bool:
+    """True if the error is of one of the retry classes."""
+    return classify_error(error_text) in retry_classes
+
+
+def error_text_of(e: BaseException) -> str:
+    """All the text of an exception: message, stderr and stdout of a failed subprocess."""
+    text = str(e)
+    if isinstance(e, subprocess.CalledProcessError):
+        text = f"{e.stderr or ''} {e.stdout or ''} {text}"
+    elif isinstance(e, (subprocess.TimeoutExpired, asyncio.TimeoutError)):
+        text = f"Operation timed out {text}"
+    return text
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float = MAX_DELAY) -> float:
+    """Exponential backoff with jitter: between half and all of min(max_delay, base_delay * 2^(attempt-1))."""
+    delay = min(max_delay, base_delay * (2 ** (attempt - 1)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class CircuitOpenError(subprocess.CalledProcessError):
+    """Raised instead of making a call while the circuit of its canister or subnet is open."""
+
+    def __init__(self, key: str, retry_in: float):
+        message = f"Circuit open for {key}: too many network failures, retry in {retry_in:.0f}s"
+        super().__init__(1, ["circuit-breaker", key], output="", stderr=message)
+
+
+class CircuitBreaker:
+    """Counts consecutive network failures per key; opens after `threshold` of them for `cooldown` seconds."""
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures: Dict[str, int] = {}
+        self._open_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.trips = 0
+
+    def check(self, key: str):
+        """Raise CircuitOpenError if the circuit of key is open. After the cooldown one probe call is let through."""
+        with self._lock:
+            open_until = self._open_until.get(key)
+            if open_until is None:
+                return
+            now = time.monotonic()
+            if now < open_until:
+                raise CircuitOpenError(key, open_until - now)
+            # half-open: let this call probe, the others wait for another cooldown
+            self._open_until[key] = now + self.cooldown
+
+    def record_success(self, key: str):
+        with self._lock:
+            self._failures.pop(key, None)
+            self._open_until.pop(key, None)
+
+    def record_failure(self, key: str, error_class: str):
+        if error_class not in NETWORK_ERRORS:
+            return
+        with self._lock:
+            self._failures[key] = self._failures.get(key, 0) + 1
+            if self._failures[key] >= self.threshold and key not in self._open_until:
+                self._open_until[key] = time.monotonic() + self.cooldown
+                self.trips += 1
+
+    def is_open(self, key: str) -> bool:
+        with self._lock:
+            return time.monotonic() < self._open_until.get(key, 0)
+
+    def reset(self):
+        with self._lock:
+            self._failures.clear()
+            self._open_until.clear()
+            self.trips = 0
+
+
+class RetryBudget:
+    """A number of retries shared by all calls of one run."""
+
+    def __init__(self, retries: int = DEFAULT_RETRY_BUDGET):
+        self.retries = retries
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def take(self) -> bool:
+        """Use one retry; False once the budget is spent."""
+        with self._lock:
+            if self.used >= self.retries:
+                return False
+            self.used += 1
+            return True
+
+
+# Shared by all policies of a process
+CANISTER_BREAKER = CircuitBreaker(threshold=3, cooldown=60.0)
+SUBNET_BREAKER = CircuitBreaker(threshold=20, cooldown=30.0)
+RETRY_BUDGET = RetryBudget()
+
+
+class RetryPolicy:
+    """When to retry a failed call, how long to wait, and when to fail fast.
+
+    Args:
+        retry_classes: error classes that are retried (see classify_error)
+        max_retries: maximum number of attempts per call
+        base_delay: backoff before the 2nd attempt; doubles per attempt, with jitter, up to max_delay
+        is_retryable: optional predicate on the error text, replacing retry_classes
+        breakers: False to disable the circuit breakers
+        budget: the retry budget, None for no budget
+    """
+
+    def __init__(self, retry_classes: Iterable[str] = TRANSIENT_ERRORS, max_retries: int = 3,
+                 base_delay: float = 2.0, max_delay: float = MAX_DELAY,
+                 is_retryable: Optional[Callable[[str], bool]] = None, breakers: bool = True,
+                 budget: Optional[RetryBudget] = RETRY_BUDGET):
+        self.retry_classes: Set[str] = set(retry_classes)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.is_retryable = is_retryable
+        self.breakers = breakers
+        self.budget = budget
+
+    def _breaker_keys(self, keys: Iterable[str]):
+        if not self.breakers:
+            return []
+        keys = [key for key in keys if key]
+        subnets = sorted({subnet for subnet in map(known_subnet, keys) if subnet})
+        return [(CANISTER_BREAKER, key) for key in keys] + [(SUBNET_BREAKER, subnet) for subnet in subnets]
+
+    def resolve_subnets(self, error_text: str, keys: Iterable[str] = ()):
+        """Look up the subnets of the keys after a network failure, so the subnet breaker counts it.
+
+        Blocks for the lookups of canisters seen for the first time; call it in a worker thread from async code.
+        """
+        if self.breakers and classify_error(error_text) in NETWORK_ERRORS:
+            for key in keys:
+                if key:
+                    subnet_of(key)
+
+    def check(self, keys: Iterable[str] = ()):
+        """Raise CircuitOpenError if the circuit of a key or of its subnet is open."""
+        for breaker, key in self._breaker_keys(keys):
+            breaker.check(key)
+
+    def record_success(self, keys: Iterable[str] = ()):
+        for breaker, key in self._breaker_keys(keys):
+            breaker.record_success(key)
+
+    def retry_delay(self, attempt: int, error_text: str, keys: Iterable[str] = ()) -> Optional[float]:
+        """Record failed attempt number `attempt`; return the seconds to wait before retrying, or None to give up."""
+        self.resolve_subnets(error_text, keys)
+        error_class = classify_error(error_text)
+        breaker_keys = self._breaker_keys(keys)
+        for breaker, key in breaker_keys:
+            breaker.record_failure(key, error_class)
+
+        if attempt >= self.max_retries:
+            return None
+        if self.is_retryable is not None:
+            retryable = self.is_retryable(error_text)
+        else:
+            retryable = error_class in self.retry_classes
+        if not retryable or any(breaker.is_open(key) for breaker, key in breaker_keys):
+            return None
+        if self.budget is not None and not self.budget.take():
+            return None
+        return backoff_delay(attempt, self.base_delay, self.max_delay)
+
+    def call(self, fn: Callable[[], T], keys: Iterable[str] = (),
+             on_retry: Optional[Callable[[int, float, str], None]] = None) -> T:
+        """Run fn() with retries. on_retry(attempt, delay, error_text) is called before each wait."""
+        keys = tuple(keys)
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                self.check(keys)
+                result = fn()
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                error_text = error_text_of(e)
+                delay = self.retry_delay(attempt, error_text, keys)
+                if delay is None:
+                    raise
+                if on_retry is not None:
+                    on_retry(attempt, delay, error_text)
+                time.sleep(delay)
+                continue
+            self.record_success(keys)
+            return result
+
+    async def call_async(self, fn: Callable[[], Awaitable[T]], keys: Iterable[str] = (),
+                         on_retry: Optional[Callable[[int, float, str], None]] = None) -> T:
+        """Async version of call()."""
+        keys = tuple(keys)
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                self.check(keys)
+                result = await fn()
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                error_text = error_text_of(e)
+                await asyncio.to_thread(self.resolve_subnets, error_text, keys)
+                delay = self.retry_delay(attempt, error_text, keys)
+                if delay is None:
+                    raise
+                if on_retry is not None:
+                    on_retry(attempt, delay, error_text)
+                await asyncio.sleep(delay)
+                continue
+            self.record_success(keys)
+            return result
+
+
+def canister_keys(command: Iterable[str]) -> tuple:
+    """The canister ids in a dfx command line, used as circuit breaker keys."""
+    return tuple(arg for arg in command if isinstance(arg, str) and arg.endswith("-cai"))
+
+
+def retry_stats_summary() -> str:
+    return (f"Retries: {RETRY_BUDGET.used}/{RETRY_BUDGET.retries} of the budget used, "
+            f"circuit breakers tripped {CANISTER_BREAKER.trips} (canisters) / {SUBNET_BREAKER.trips} (subnets)")
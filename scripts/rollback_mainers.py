@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Roll back mAIners to the snapshots recorded by upgrade_mainers.py, many at a time.
+
+The snapshot taken before the deploy of each mAIner is read from the upgrade journal
+(scripts/upgrade_mainers_journal-<network>.jsonl, the last run and the runs it resumed) or
+from the status file (the `Snapshot: <id>` in the errors of scripts/upgrade_mainers_status.json).
+
+  --select failed    mAIners whose upgrade failed (default)
+  --select upgraded  all mAIners whose code was replaced, failed or not (journal only: the
+                     status file has no snapshot ID for successful upgrades)
+
+Each selected mAIner is stopped, gets its snapshot loaded, is started (timer on, maintenance
+flag off, as before the upgrade) and health checked, --concurrency mAIners at a time.
+Rolled back mAIners are recorded as released in the journal, so a later --resume upgrades
+them again. The outcome per mAIner is written to scripts/rollback_mainers_status.json.
+
+Usage:
+    # from the folder: funnAI
+    scripts/rollback_mainers.sh --network prd [--select failed|upgraded] [--source journal|status] [--dry-run]
+
+    # Roll back every mAIner of the last upgrade run, 50 at a time:
+    python -m scripts.rollback_mainers --network prd --select upgraded --concurrency 50
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from .readiness import poll_until
+    from .upgrade_journal import UpgradeJournal, STEPS, DEPLOYED, RELEASED, journal_path, read_records, replay
+    from .upgrade_mainers import restore_snapshot, check_health, log_message, RED, GREEN, NC
+except ImportError:  # run directly or imported by the tests
+    from readiness import poll_until
+    from upgrade_journal import UpgradeJournal, STEPS, DEPLOYED, RELEASED, journal_path, read_records, replay
+    from upgrade_mainers import restore_snapshot, check_health, log_message, RED, GREEN, NC
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+STATUS_FILE_PATH = SCRIPT_DIR / "upgrade_mainers_status.json"
+ROLLBACK_STATUS_PATH = SCRIPT_DIR / "rollback_mainers_status.json"
+
+# Snapshot IDs are hex; this leaves out the markers of dry runs and of IDs that could not be parsed
+SNAPSHOT_ID = re.compile(r"[0-9a-fA-F]+")
+SNAPSHOT_IN_ERROR = re.compile(r"Snapshot: ([0-9a-fA-F]+)\b")
+
+DEFAULT_CONCURRENCY = 20
+
+# Outcomes of a rollback
+ROLLED_BACK = "rolled_back"
+UNHEALTHY = "rolled_back_unhealthy"
+FAILED = "failed"
+NO_SNAPSHOT = "no_snapshot"
+
+
+def targets_from_status(path: Path, select: str) -> Tuple[Dict[str, str], List[str]]:
+    """Selected mAIners of a status file of upgrade_mainers.py.
+
+    Returns:
+        ({address: snapshot_id}, [selected addresses without a snapshot ID])
+    """
+    with open(path, "r") as f:
+        statuses = json.load(f)
+
+    targets, missing = {}, []
+    for address, entry in statuses.items():
+        status = entry.get("status", "")
+        if not (status.startswith("failed_") or (select == "upgraded" and status == "success")):
+            continue
+        match = SNAPSHOT_IN_ERROR.search(entry.get("error") or "")
+        if match:
+            targets[address] = match.group(1)
+        else:
+            missing.append(address)
+    return targets, missing
+
+
+def targets_from_journal(path: Path, network: str, select: str) -> Tuple[Dict[str, str], List[str]]:
+    """Selected mAIners of the last run in an upgrade journal (and the runs it resumed).
+
+    Only mAIners that were deployed are selected: before the deploy their code was not replaced.
+
+    Returns:
+        ({address: snapshot_id}, [selected addresses without a snapshot ID])
+    """
+    records = read_records(path)
+    headers = [record for record in records if record.get("step") == "run" and record.get("network") == network]
+    if not headers:
+        return {}, []
+
+    targets, missing = {}, []
+    for address, entry in replay(records, network, headers[-1].get("target_hash")).items():
+        step = entry.get("step")
+        deployed = step in STEPS and STEPS.index(step) >= STEPS.index(DEPLOYED)
+        if not deployed or (select == "failed" and "failed" not in entry):
+            continue
+        if SNAPSHOT_ID.fullmatch(entry.get("snapshot_id") or ""):
+            targets[address] = entry["snapshot_id"]
+        else:
+            missing.append(address)
+    return targets, missing
+
+
+def rollback_mainer(network: str, address: str, snapshot_id: str, dry_run: bool = False) -> Dict:
+    """Stop, load the snapshot, start and health check one mAIner."""
+    start = time.monotonic()
+    result = {"snapshot_id": snapshot_id, "status": FAILED, "error": None}
+    try:
+        if not restore_snapshot(network, address, snapshot_id, dry_run):
+            result["error"] = "Could not restore the snapshot (see the log)"
+        elif dry_run:
+            result["status"] = ROLLED_BACK
+        else:
+            poll = poll_until(
+                "health", lambda: check_health(network, address, dry_run),
+                is_ready=lambda health: health[0],
+                give_up=lambda health: 'mAIner is under maintenance' not in health[1]
+            )
+            if poll.ready:
+                result["status"] = ROLLED_BACK
+            else:
+                result["status"] = UNHEALTHY
+                result["error"] = f"Health check failed after the rollback: {poll.value[1]}"
+    except Exception as e:
+        result["error"] = f"Unexpected error: {e}"
+    result["duration"] = round(time.monotonic() - start, 1)
+    return result
+
+
+def rollback_fleet(network: str, targets: Dict[str, str], concurrency: int = DEFAULT_CONCURRENCY,
+                   dry_run: bool = False, journal: Optional[UpgradeJournal] = None) -> Dict[str, Dict]:
+    """Roll back every target, `concurrency` mAIners at a time.
+
+    Returns:
+        {address: {"snapshot_id", "status", "error", "duration"}}
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="rollback") as pool:
+        futures = {pool.submit(rollback_mainer, network, address, snapshot_id, dry_run): address
+                   for address, snapshot_id in targets.items()}
+        for future in as_completed(futures):
+            address = futures[future]
+            result = future.result()
+            results[address] = result
+            if journal is not None and result["status"] != FAILED:
+                journal.record(address, RELEASED, rolled_back_to=result["snapshot_id"])
+            level = "SUCCESS" if result["status"] == ROLLED_BACK else "ERROR"
+            log_message(f"[{len(results)}/{len(targets)}] {address}: {result['status']}"
+                        f"{' - ' + result['error'] if result['error'] else ''}", level)
+    return results
+
+
+def write_rollback_status(results: Dict[str, Dict], missing: List[str], path: Path = ROLLBACK_STATUS_PATH):
+    """Write the outcome per mAIner to a JSON file."""
+    report = dict(results)
+    for address in missing:
+        report[address] = {"snapshot_id": None, "status": NO_SNAPSHOT, "error": "No snapshot ID recorded"}
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    log_message(f"Status written to {path}", "SUCCESS")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Roll back mAIners to the snapshots recorded by upgrade_mainers.py")
+    parser.add_argument(
+        "--network",
+        choices=["local", "ic", "testing", "development", "demo", "prd"],
+        required=True,
+        help="Network of the upgrade run to roll back"
+    )
+    parser.add_argument(
+        "--select",
+        choices=["failed", "upgraded"],
+        default="failed",
+        help="Roll back the mAIners whose upgrade failed, or all mAIners whose code was replaced (default: failed)"
+    )
+    parser.add_argument(
+        "--source",
+        choices=["journal", "status"],
+        default="journal",
+        help="Read the snapshot IDs from the upgrade journal or from the status file (default: journal)"
+    )
+    parser.add_argument(
+        "--file",
+        type=Path,
+        help="Journal or status file to read (default: the one upgrade_mainers.py writes)"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"Number of mAIners rolled back at the same time (default: {DEFAULT_CONCURRENCY})"
+    )
+    parser.add_argument(
+        "--mainer",
+        help="Only roll back this mAIner (canister address)"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Show what would be rolled back without making changes"
+    )
+    args = parser.parse_args()
+    if args.select == "upgraded" and args.source == "status":
+        parser.error("--select upgraded needs --source journal: the status file has no snapshot IDs of successful upgrades")
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+
+    path = args.file or (journal_path(args.network) if args.source == "journal" else STATUS_FILE_PATH)
+    if not path.exists():
+        print(f"{RED}File not found: {path}{NC}")
+        sys.exit(1)
+    if args.source == "journal":
+        targets, missing = targets_from_journal(path, args.network, args.select)
+    else:
+        targets, missing = targets_from_status(path, args.select)
+    if args.mainer:
+        targets = {address: snapshot_id for address, snapshot_id in targets.items() if address == args.mainer}
+        missing = [address for address in missing if address == args.mainer]
+
+    log_message(f"{'='*60}", "INFO")
+    log_message(f"Rolling back the {args.select} mAIners of {path} on {args.network}", "INFO")
+    log_message(f"{len(targets)} mAIner(s) with a snapshot, {args.concurrency} at a time", "INFO")
+    if missing:
+        log_message(f"{len(missing)} selected mAIner(s) have no snapshot ID and are left as they are: "
+                    f"{', '.join(missing)}", "WARNING")
+    if args.dry_run:
+        log_message("RUNNING IN DRY-RUN MODE - NO ACTUAL CHANGES WILL BE MADE", "WARNING")
+    log_message(f"{'='*60}", "INFO")
+    if not targets:
+        log_message("Nothing to roll back", "INFO")
+        return
+
+    journal = None
+    if args.source == "journal" and not args.dry_run:
+        journal = UpgradeJournal.reopen(args.network, path)
+    start = time.monotonic()
+    try:
+        results = rollback_fleet(args.network, targets, args.concurrency, args.dry_run, journal)
+    finally:
+        if journal is not None:
+            journal.close()
+    write_rollback_status(results, missing)
+
+    counts = {}
+    for result in results.values():
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    log_message(f"{'='*60}", "INFO")
+    log_message(f"ROLLBACK SUMMARY ({time.monotonic() - start:.0f}s)", "INFO")
+    log_message(f"  ✓ Rolled back and healthy: {counts.get(ROLLED_BACK, 0)}", "SUCCESS")
+    log_message(f"  ! Rolled back, not healthy: {counts.get(UNHEALTHY, 0)}",
+                "ERROR" if counts.get(UNHEALTHY) else "INFO")
+    log_message(f"  ✗ Failed: {counts.get(FAILED, 0)}", "ERROR" if counts.get(FAILED) else "INFO")
+    log_message(f"  ⊘ No snapshot ID: {len(missing)}", "WARNING" if missing else "INFO")
+    log_message(f"{'='*60}", "INFO")
+    if counts.get(FAILED) or counts.get(UNHEALTHY):
+        sys.exit(1)
+    print(f"{GREEN}Rollback complete{NC}")
+
+
+if __name__ == "__main__":
+    main()
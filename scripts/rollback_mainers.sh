@@ -0,0 +1,69 @@
+#!/bin/bash
+
+# Default values
+NETWORK_TYPE=""
+SELECT=""
+SOURCE=""
+FILE=""
+CONCURRENCY=""
+SPECIFIC_MAINER=""
+DRY_RUN=""
+
+# Parse command line arguments
+while [ $# -gt 0 ]; do
+    case "$1" in
+        --network)
+            shift
+            if [ "$1" = "local" ] || [ "$1" = "ic" ] || [ "$1" = "testing" ] || [ "$1" = "development" ] || [ "$1" = "demo" ] || [ "$1" = "prd" ]; then
+                NETWORK_TYPE=$1
+            else
+                echo "Invalid network type: $1. Use 'local', 'ic', 'testing', 'development', 'demo', or 'prd'."
+                exit 1
+            fi
+            shift
+            ;;
+        --select)
+            shift
+            SELECT="--select $1"
+            shift
+            ;;
+        --source)
+            shift
+            SOURCE="--source $1"
+            shift
+            ;;
+        --file)
+            shift
+            FILE="--file $1"
+            shift
+            ;;
+        --concurrency)
+            shift
+            CONCURRENCY="--concurrency $1"
+            shift
+            ;;
+        --mainer)
+            shift
+            SPECIFIC_MAINER="--mainer $1"
+            shift
+            ;;
+        --dry-run)
+            DRY_RUN="--dry-run"
+            shift
+            ;;
+        *)
+            echo "Unknown argument: $1"
+            echo "Usage: $0 --network [local|ic|testing|development|demo|prd] [--select failed|upgraded] [--source journal|status] [--file PATH] [--concurrency N] [--mainer ADDRESS] [--dry-run]"
+            exit 1
+            ;;
+    esac
+done
+
+if [ -z "$NETWORK_TYPE" ]; then
+    echo "Error: --network is required"
+    exit 1
+fi
+
+echo "Using network type: $NETWORK_TYPE"
+
+python -m scripts.rollback_mainers --network $NETWORK_TYPE $SELECT $SOURCE $FILE $CONCURRENCY $SPECIFIC_MAINER $DRY_RUN
@@ -5,6 +5,8 @@ import pprint
 from pathlib import Path
 from typing import Dict, Any, List
 
+from ..response_cache import cached_call, cache_stats_summary
+
 def get_funnai_principals() -> list:
     """
     Query the getUsersAdmin endpoint of the funnai_backend canister on the prd network.
@@ -91,11 +93,14 @@ def get_mainer_ownership_data() -> Dict[str, List[str]]:
             "getMainerAgentCanistersAdmin"
         ]
 
-        print(f"Running command: {' '.join(cmd)}")
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        def fetch():
+            print(f"Running command: {' '.join(cmd)}")
+            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            # Parse the JSON response
+            return json.loads(result.stdout)
 
-        # Parse the JSON response
-        response_json = json.loads(result.stdout)
+        response_json = cached_call("ic", gamestate_canister_id, "getMainerAgentCanistersAdmin", fetch)
+        print(cache_stats_summary())
 
         # Extract the mAIner data
         mainers_data = response_json.get('Ok', [])
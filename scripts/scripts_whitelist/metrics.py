@@ -4,7 +4,7 @@ import argparse
 
 from pathlib import Path
 from .icp import get_icp_balance
-from time import sleep
+from ..rate_limiter import LIMITER
 from datetime import datetime
 
 def main (token: str):
@@ -21,15 +21,16 @@ def main (token: str):
     total_icp_in_wallets = 0
     count = 0
     total = len(wl_allocs_json)
+    # throttle the requests to avoid rate limiting (adapts to what the ledger tolerates)
+    LIMITER.configure("icp_ledger", initial_rate=2.0, max_rate=20.0)
     for funnai_principal, alloc in wl_allocs_json.items():
        total_icp_wl_needed += alloc.get('total', 0) * 5
-       balance = get_icp_balance(funnai_principal)
+       with LIMITER.limit("icp_ledger"):
+           balance = get_icp_balance(funnai_principal)
        total_icp_in_wallets += balance
        alloc['icp_balance'] = balance
        count += 1
     #    print(f"{count:.2f}/{total:.2f} total_icp_wl_needed = {total_icp_wl_needed:.2f}, total_icp_in_wallets = {total_icp_in_wallets:.2f} ({(total_icp_in_wallets/total_icp_wl_needed*100 if total_icp_wl_needed > 0 else 0):.2f}%)")
-       # throttle the requests to avoid rate limiting
-       sleep(0.5)
         
     print(f"Total ICP needed for WL claims: {total_icp_wl_needed}")
     print(f"Total ICP in funnAI wallets   : {total_icp_in_wallets:.2f} ({(total_icp_in_wallets/total_icp_wl_needed*100 if total_icp_wl_needed > 0 else 0):.2f}%)")
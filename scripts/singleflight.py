@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Request coalescing ("singleflight") for concurrent identical read-only calls.
+
+When several threads or tasks ask for the same thing at the same moment, e.g. the
+same `canister_status` of a mAIner or the same CMC conversion rate, only the first
+caller runs the request; the others wait for it and share its result (or its
+exception). Nothing is kept once the request is done: this is not a cache.
+
+Only use it for calls without side effects (queries, status reads).
+
+Usage:
+    from .singleflight import coalesce, coalesce_async
+
+    value = coalesce(("status", network, canister_id), lambda: fetch(network, canister_id))
+    value = await coalesce_async(("status", network, canister_id), lambda: fetch_async(network, canister_id))
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+COALESCE_STATS = {
+    "calls": 0,  # requests actually sent
+    "coalesced": 0,  # requests saved by sharing an in-flight one
+}
+
+_stats_lock = threading.Lock()
+
+
+class _Flight:
+    """One in-flight call shared by threads."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: BaseException = None
+
+
+_flights: Dict[Hashable, _Flight] = {}
+_flights_lock = threading.Lock()
+
+# In-flight async calls: {id(event loop): {key: future}}, futures belong to one loop
+_async_flights: Dict[int, Dict[Hashable, asyncio.Future]] = {}
+
+
+def _count(name: str):
+    with _stats_lock:
+        COALESCE_STATS[name] += 1
+
+
+def coalesce(key: Hashable, fetch: Callable[[], Any]) -> Any:
+    """Return fetch(), sharing the result with concurrent callers that use the same key."""
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        _count("coalesced")
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    _count("calls")
+    try:
+        flight.value = fetch()
+        return flight.value
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+
+
+async def coalesce_async(key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+    """Async version of coalesce() for tasks on one event loop."""
+    loop = asyncio.get_running_loop()
+    flights = _async_flights.setdefault(id(loop), {})
+    future = flights.get(key)
+    if future is not None:
+        _count("coalesced")
+        # shield: a cancelled waiter must not cancel the shared call
+        return await asyncio.shield(future)
+
+    _count("calls")
+    future = flights[key] = asyncio.ensure_future(fetch())
+
+    def landed(_):
+        if not future.cancelled():
+            future.exception()  # retrieved here, so an error nobody awaits any more is not logged
+        if flights.get(key) is future:
+            del flights[key]
+        if not flights:
+            _async_flights.pop(id(loop), None)
+
+    future.add_done_callback(landed)
+    return await asyncio.shield(future)
+
+
+def coalesce_stats_summary() -> str:
+    return f"Request coalescing: {COALESCE_STATS['calls']} calls sent, {COALESCE_STATS['coalesced']} saved"
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Time spent per stage of the mAIner upgrades of a fleet run, and the ETA of the run.
+
+upgrade_mainers.py times each stage of an upgrade (maintenance flag on, stop timer, queue
+drain, stop, snapshot, deploy, start, ...) in a span. Each span is appended to the status
+stream as a structured record:
+
+    {"event": "span", "ts": ..., "address": "...", "stage": "deploy", "seconds": 41.7}
+
+During the run, a progress line with the p50/p95 of each stage and the ETA of the run (from the
+mAIners finished per second so far) is logged after each upgrade. At the end, a histogram of
+the time per stage is logged and written to scripts/upgrade_mainers_timings.json, to tune the
+fixed waits, the wave sizes and --parallel from real data.
+
+The report of an earlier run is rebuilt from its status stream:
+
+    python -m scripts.stage_timings scripts/upgrade_mainers_status.jsonl [--output timings.json]
+
+Usage:
+    from .stage_timings import StageTimings
+
+    timings = StageTimings(sink=stream.span)
+    timings.start_run(total=len(mainers))
+    with timings.span(address, "deploy"):
+        deploy(...)
+    timings.finished(address)
+    log(timings.progress())
+"""
+
+import argparse
+import json
+import math
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .status_stream import read_events
+except ImportError:  # run directly or imported by the tests
+    from status_stream import read_events
+
+# Upper bounds (seconds) of the histogram buckets; the last bucket has no upper bound
+BUCKETS = [1, 2, 5, 10, 20, 30, 60, 120, 300, 600]
+
+# Width of the longest bar in the histogram report
+BAR_WIDTH = 40
+
+
+def percentile(values: List[float], p: float) -> float:
+    """The p-th percentile (nearest rank) of values, which must not be empty."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def format_duration(seconds: float) -> str:
+    """A duration for humans: 42.1s, 12m 5s, 38h 40m."""
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    if seconds < 3600:
+        return f"{int(seconds // 60)}m {int(seconds % 60)}s"
+    return f"{int(seconds // 3600)}h {int(seconds % 3600 // 60)}m"
+
+
+class StageTimings:
+    """Durations per stage of the upgrades of one run, and the mAIners finished so far."""
+
+    def __init__(self, sink: Optional[Callable[[str, str, float], None]] = None):
+        self.sink = sink
+        self.durations: Dict[str, List[float]] = {}
+        self.total = 0
+        self._finished: set = set()
+        self._started_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def start_run(self, total: int):
+        """Start counting the throughput of the run, for `total` mAIners."""
+        with self._lock:
+            self.total = total
+            self._finished = set()
+            self._started_at = time.monotonic()
+
+    def record(self, address: str, stage: str, seconds: float):
+        with self._lock:
+            self.durations.setdefault(stage, []).append(seconds)
+        if self.sink is not None:
+            self.sink(address, stage, round(seconds, 3))
+
+    @contextmanager
+    def span(self, address: str, stage: str):
+        """Time the stage of a mAIner's upgrade (also when it raises)."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(address, stage, time.monotonic() - start)
+
+    def finished(self, address: str):
+        """A mAIner of the run is done (upgraded, skipped or failed)."""
+        with self._lock:
+            self._finished.add(address)
+
+    def stage_percentiles(self) -> Dict[str, Tuple[float, float]]:
+        """{stage: (p50, p95)} of the stages timed so far."""
+        with self._lock:
+            durations = {stage: list(values) for stage, values in self.durations.items() if values}
+        return {stage: (percentile(values, 50), percentile(values, 95)) for stage, values in durations.items()}
+
+    def eta(self) -> Optional[float]:
+        """Seconds until all mAIners of the run are done at the throughput so far, None before the first is."""
+        with self._lock:
+            done = len(self._finished)
+            if self._started_at is None or not done:
+                return None
+            elapsed = time.monotonic() - self._started_at
+        return max(0, self.total - done) * elapsed / done
+
+    def progress(self) -> str:
+        """One line with the p50/p95 per stage and the ETA of the run."""
+        with self._lock:
+            done = len(self._finished)
+            elapsed = time.monotonic() - self._started_at if self._started_at is not None else 0.0
+        stages = ", ".join(f"{stage} {p50:.1f}/{p95:.1f}s" for stage, (p50, p95) in self.stage_percentiles().items())
+        eta = self.eta()
+        rate = f"{done / elapsed * 60:.1f}/min" if elapsed > 0 and done else "-"
+        return (f"{done}/{self.total} mAIner(s) done, {rate}, "
+                f"ETA {format_duration(eta) if eta is not None else 'unknown'}"
+                f"{' | p50/p95: ' + stages if stages else ''}")
+
+    def report(self) -> Dict[str, Dict]:
+        """Count, total, p50, p95, max and histogram (count per bucket of BUCKETS) per stage."""
+        with self._lock:
+            durations = {stage: list(values) for stage, values in self.durations.items() if values}
+        report = {}
+        for stage, values in durations.items():
+            histogram = [0] * (len(BUCKETS) + 1)
+            for seconds in values:
+                histogram[next((i for i, bound in enumerate(BUCKETS) if seconds <= bound), len(BUCKETS))] += 1
+            report[stage] = {
+                "count": len(values),
+                "total": round(sum(values), 1),
+                "p50": round(percentile(values, 50), 2),
+                "p95": round(percentile(values, 95), 2),
+                "max": round(max(values), 2),
+                "histogram": histogram,
+            }
+        return report
+
+
+def bucket_labels() -> List[str]:
+    labels, lower = [], 0
+    for bound in BUCKETS:
+        labels.append(f"{lower}-{bound}s")
+        lower = bound
+    labels.append(f">{BUCKETS[-1]}s")
+    return labels
+
+
+def histogram_lines(report: Dict[str, Dict]) -> List[str]:
+    """The report as text: totals per stage (most time first), then a histogram per stage."""
+    if not report:
+        return ["No stage timings recorded"]
+    run_total = sum(entry["total"] for entry in report.values()) or 1
+    lines = ["Time per stage (share of all stage time, p50 / p95 / max):"]
+    ordered = sorted(report.items(), key=lambda item: item[1]["total"], reverse=True)
+    for stage, entry in ordered:
+        lines.append(f"  {stage:<20} {format_duration(entry['total']):>9} ({entry['total'] / run_total:4.0%})  "
+                     f"{entry['p50']:.1f}s / {entry['p95']:.1f}s / {entry['max']:.1f}s  ({entry['count']}x)")
+    labels = bucket_labels()
+    for stage, entry in ordered:
+        lines.append(f"  {stage}:")
+        peak = max(entry["histogram"])
+        for label, count in zip(labels, entry["histogram"]):
+            if count:
+                lines.append(f"    {label:>10} {'#' * max(1, round(count / peak * BAR_WIDTH))} {count}")
+    return lines
+
+
+def timings_from_events(events: Iterable[Dict]) -> StageTimings:
+    """The stage timings of the last run in a status stream."""
+    timings = StageTimings()
+    for event in events:
+        if event.get("event") == "run":
+            timings = StageTimings()
+        elif event.get("event") == "span":
+            timings.record(event["address"], event["stage"], float(event["seconds"]))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the time per upgrade stage of the last run in a status stream")
+    parser.add_argument("path", type=Path, help="Status stream, e.g. scripts/upgrade_mainers_status.jsonl")
+    parser.add_argument("--output", type=Path, help="Also write the report as JSON to this file")
+    args = parser.parse_args()
+
+    if not args.path.exists():
+        print(f"Stream not found: {args.path}")
+        sys.exit(1)
+    report = timings_from_events(read_events(args.path)).report()
+    print("\n".join(histogram_lines(report)))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Append-only stream of the status changes of the mAIners in a fleet run, and its rollup.
+
+upgrade_mainers.py and update_admin_rbac_mainers.py append one JSON line per status change
+as it happens, so a run can be followed live without waiting for the report at the end:
+
+    {"event": "run", "ts": ..., "script": "upgrade_mainers", "network": "prd", ...}
+    {"event": "status", "ts": ..., "address": "...", "status": "in_progress", "error": null}
+    {"event": "span", "ts": ..., "address": "...", "stage": "deploy", "seconds": 41.7}
+    ...
+    {"event": "end", "ts": ..., "counts": {"success": 98, "failed_health": 2}}
+
+Each change costs one appended line, instead of rewriting a report of the whole fleet.
+A new run is appended after the runs before it, so the stream of an interrupted run is kept.
+The rollup (the last status of each mAIner and the counts per status, for the last run) is
+rebuilt from the stream in one pass, by any other tool:
+
+    python -m scripts.status_stream rollup scripts/upgrade_mainers_status.jsonl [--output rollup.json]
+    python -m scripts.status_stream follow scripts/upgrade_mainers_status.jsonl
+    tail -f scripts/upgrade_mainers_status.jsonl
+
+Usage:
+    from .status_stream import StatusStream
+
+    stream = StatusStream.open(path, script="upgrade_mainers", network=network)
+    stream.emit(address, "success")
+    stream.close()
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional
+
+# Seconds between two reads of a followed stream that had no new line
+FOLLOW_INTERVAL = 0.5
+
+
+class StatusStream:
+    """The stream of status changes of one run, written as they happen."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.counts: Dict[str, int] = {}
+        self._statuses: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._file = None
+
+    @classmethod
+    def open(cls, path: Path, **run_info) -> "StatusStream":
+        """Start the stream of a run, appended after the runs before it."""
+        stream = cls(Path(path))
+        stream.path.parent.mkdir(parents=True, exist_ok=True)
+        stream._file = open(stream.path, "a")
+        stream._append({"event": "run", **run_info})
+        return stream
+
+    def _append(self, event: Dict):
+        self._file.write(json.dumps({**event, "ts": datetime.now().isoformat()}) + "\n")
+        self._file.flush()
+
+    def emit(self, address: str, status: str, error: Optional[str] = None):
+        """Append a status change of a mAIner, and keep the counts per status up to date."""
+        with self._lock:
+            previous = self._statuses.get(address)
+            if previous is not None:
+                self.counts[previous] -= 1
+            self._statuses[address] = status
+            self.counts[status] = self.counts.get(status, 0) + 1
+            if self._file is not None:
+                self._append({"event": "status", "address": address, "status": status, "error": error})
+
+    def span(self, address: str, stage: str, seconds: float):
+        """Append the time a stage of a mAIner took (see stage_timings.py)."""
+        with self._lock:
+            if self._file is not None:
+                self._append({"event": "span", "address": address, "stage": stage, "seconds": seconds})
+
+    def close(self):
+        """End the run: append the final counts."""
+        with self._lock:
+            if self._file is None:
+                return
+            self._append({"event": "end", "counts": {status: n for status, n in self.counts.items() if n}})
+            self._file.close()
+            self._file = None
+
+
+def last_run_offset(path: Path) -> int:
+    """Where the last run in a stream starts (0 if it has none)."""
+    offset = position = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if line.startswith(b'{"event": "run"'):
+                offset = position
+            position += len(line)
+    return offset
+
+
+def read_events(path: Path, follow: bool = False) -> Iterator[Dict]:
+    """The events of a stream. With follow, the events of the last run, waiting for new ones until it ends.
+
+    A line that is not complete yet (the writer is appending it) is only read once it is.
+    """
+    with open(path, "r") as f:
+        if follow:
+            f.seek(last_run_offset(path))
+        pending = ""
+        while True:
+            line = f.readline()
+            if not line:
+                if not follow:
+                    return
+                time.sleep(FOLLOW_INTERVAL)
+                continue
+            pending += line
+            if not pending.endswith("\n"):
+                continue
+            try:
+                event = json.loads(pending)
+            except ValueError:
+                event = None
+            pending = ""
+            if event is None:
+                continue
+            yield event
+            if follow and event.get("event") == "end":
+                return
+
+
+def rollup(events: Iterable[Dict]) -> Dict:
+    """The last status of each mAIner and the counts per status, for the last run of a stream."""
+    run: Dict = {}
+    mainers: Dict[str, Dict] = {}
+    ended = None
+    for event in events:
+        kind = event.get("event")
+        if kind == "run":
+            run, mainers, ended = event, {}, None
+        elif kind == "status":
+            mainers[event["address"]] = {"status": event["status"], "ts": event.get("ts"), "error": event.get("error")}
+        elif kind == "end":
+            ended = event.get("ts")
+
+    counts: Dict[str, int] = {}
+    for entry in mainers.values():
+        counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+    return {"run": run, "ended": ended, "counts": counts, "mainers": mainers}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Roll up or follow the status stream of a fleet run")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rollup_parser = subparsers.add_parser("rollup", help="Print the last status of each mAIner and the counts")
+    rollup_parser.add_argument("path", type=Path)
+    rollup_parser.add_argument("--output", type=Path, help="Write the rollup to this file instead")
+    follow_parser = subparsers.add_parser("follow", help="Print the status changes of the last run as they happen, until it ends")
+    follow_parser.add_argument("path", type=Path)
+    args = parser.parse_args()
+
+    if not args.path.exists():
+        print(f"Stream not found: {args.path}")
+        sys.exit(1)
+
+    if args.command == "rollup":
+        result = rollup(read_events(args.path))
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(result, f, indent=2)
+        else:
+            print(json.dumps(result, indent=2))
+        return
+
+    counts: Dict[str, int] = {}
+    statuses: Dict[str, str] = {}
+    try:
+        for event in read_events(args.path, follow=True):
+            if event.get("event") == "run":
+                counts, statuses = {}, {}
+                print(f"[{event['ts']}] run: {json.dumps({k: v for k, v in event.items() if k not in ('event', 'ts')})}")
+            elif event.get("event") == "status":
+                previous = statuses.get(event["address"])
+                if previous is not None:
+                    counts[previous] -= 1
+                statuses[event["address"]] = event["status"]
+                counts[event["status"]] = counts.get(event["status"], 0) + 1
+                error = f" - {event['error']}" if event.get("error") else ""
+                totals = ", ".join(f"{status} {n}" for status, n in sorted(counts.items()) if n)
+                print(f"[{event['ts']}] {event['address']}: {event['status']}{error}  ({totals})")
+            elif event.get("event") == "end":
+                print(f"[{event['ts']}] end: {json.dumps(event.get('counts', {}))}")
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
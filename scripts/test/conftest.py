@@ -0,0 +1,80 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path to import the modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import canister_index
+import canister_status
+import canister_subnets
+import readiness
+import response_cache
+import retry_policy
+import update_admin_rbac_mainers
+import upgrade_journal
+import upgrade_mainers
+
+
+@pytest.fixture(autouse=True)
+def isolated_response_cache(tmp_path, monkeypatch):
+    """Keep the on-disk response cache of each test in its own temporary directory."""
+    monkeypatch.setattr(response_cache, "CACHE_DIR", tmp_path / "responses")
+    response_cache.configure_cache()
+    for key in response_cache.CACHE_STATS:
+        monkeypatch.setitem(response_cache.CACHE_STATS, key, 0)
+    yield
+    response_cache.configure_cache()
+
+
+@pytest.fixture(autouse=True)
+def fresh_canister_indexes():
+    """Parse canister_ids.json again in each test, even if the file did not change."""
+    canister_index.forget_indexes()
+    yield
+    canister_index.forget_indexes()
+
+
+@pytest.fixture(autouse=True)
+def fresh_status_records():
+    """Do not let canister status records fetched by one test leak into the next."""
+    canister_status.forget_status_records()
+    yield
+    canister_status.forget_status_records()
+
+
+@pytest.fixture(autouse=True)
+def fresh_retry_state(monkeypatch):
+    """Start each test with closed circuit breakers and a full retry budget, without looking up subnets online."""
+    retry_policy.CANISTER_BREAKER.reset()
+    retry_policy.SUBNET_BREAKER.reset()
+    monkeypatch.setattr(retry_policy.RETRY_BUDGET, "used", 0)
+    monkeypatch.setattr(canister_subnets, "fetch_subnet", lambda canister_id: None)
+    canister_subnets.forget_subnets()
+    yield
+    canister_subnets.forget_subnets()
+
+
+@pytest.fixture(autouse=True)
+def isolated_readiness_stats(tmp_path, monkeypatch):
+    """Record the times-to-ready of each test in its own temporary file."""
+    monkeypatch.setattr(readiness, "STATS", readiness.ReadinessStats(tmp_path / "readiness.json"))
+
+
+@pytest.fixture(autouse=True)
+def isolated_upgrade_journal(tmp_path, monkeypatch):
+    """Write upgrade journals to the temporary directory of each test."""
+    monkeypatch.setattr(upgrade_journal, "SCRIPT_DIR", tmp_path)
+
+
+@pytest.fixture(autouse=True)
+def isolated_status_streams(tmp_path, monkeypatch):
+    """Write the logs, status reports and stage timings of the scripts to the temporary directory of each test."""
+    monkeypatch.setattr(upgrade_mainers, "LOG_FILE_PATH", tmp_path / "upgrade_mainers.logs")
+    monkeypatch.setattr(upgrade_mainers, "STATUS_JSON_PATH", tmp_path / "upgrade_mainers_status.json")
+    monkeypatch.setattr(upgrade_mainers, "STATUS_MD_PATH", tmp_path / "upgrade_mainers_status.md")
+    monkeypatch.setattr(upgrade_mainers, "STATUS_STREAM_PATH", tmp_path / "upgrade_mainers_status.jsonl")
+    monkeypatch.setattr(upgrade_mainers, "TIMINGS_REPORT_PATH", tmp_path / "upgrade_mainers_timings.json")
+    monkeypatch.setattr(update_admin_rbac_mainers, "LOG_FILE_PATH", tmp_path / "update_admin_rbac_mainers.logs")
+    monkeypatch.setattr(update_admin_rbac_mainers, "STATUS_STREAM_PATH", tmp_path / "update_admin_rbac_mainers_status.jsonl")
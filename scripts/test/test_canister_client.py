@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+import asyncio
+import json
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+# Add parent directory to path to import the module
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import canister_client
+
+
+@pytest.fixture
+def dfx_client():
+    """A CanisterClient that always uses the dfx subprocess."""
+    client = canister_client.CanisterClient("testing")
+    client.use_agent = False
+    return client
+
+
+class TestFormatNat:
+    """Test the dfx-style formatting of unbounded nat/int values."""
+
+    def test_format_nat_small(self):
+        assert canister_client._format_nat(0) == "0"
+        assert canister_client._format_nat(999) == "999"
+
+    def test_format_nat_grouped(self):
+        assert canister_client._format_nat(1_000_000_000_000) == "1_000_000_000_000"
+        assert canister_client._format_nat(12_345) == "12_345"
+
+    def test_format_int_negative(self):
+        assert canister_client._format_nat(-1_500) == "-1_500"
+
+    def test_format_nat_parses_back(self):
+        assert int(canister_client._format_nat(4_000_000_000_000)) == 4_000_000_000_000
+
+
+class TestResolveCanisterId:
+    """Test canister name resolution."""
+
+    def test_canister_id_is_returned_as_is(self, dfx_client):
+        assert dfx_client.resolve_canister_id("r5m5y-diaaa-aaaaa-qanaa-cai") == "r5m5y-diaaa-aaaaa-qanaa-cai"
+
+    def test_canister_name_from_canister_ids_json(self, dfx_client):
+        dfx_client._canister_ids = {"game_state_canister": {"testing": "vpa37-giaaa-aaaam-qdxeq-cai"}}
+        assert dfx_client.resolve_canister_id("game_state_canister") == "vpa37-giaaa-aaaam-qdxeq-cai"
+
+    def test_unknown_canister_name(self, dfx_client):
+        dfx_client._canister_ids = {}
+        assert dfx_client.resolve_canister_id("unknown_canister") is None
+
+
+class TestDfxFallback:
+    """Test the dfx subprocess path of CanisterClient.call."""
+
+    @patch('canister_client.subprocess.run')
+    def test_call_returns_parsed_json(self, mock_run, dfx_client):
+        mock_run.return_value = MagicMock(returncode=0, stdout=json.dumps({"Ok": {"lowCycleBalance": False}}), stderr="")
+
+        result = dfx_client.call("aaaaa-aaaaa-aaaaa-aaaaa-cai", "getIssueFlagsAdmin")
+
+        assert result == {"Ok": {"lowCycleBalance": False}}
+        cmd = mock_run.call_args[0][0]
+        assert cmd == ["dfx", "canister", "call", "--network", "testing", "--output", "json", "--query",
+                       "aaaaa-aaaaa-aaaaa-aaaaa-cai", "getIssueFlagsAdmin"]
+
+    @patch('canister_client.subprocess.run')
+    def test_update_method_is_not_called_as_query(self, mock_run, dfx_client):
+        mock_run.return_value = MagicMock(returncode=0, stdout="", stderr="")
+
+        dfx_client.call("aaaaa-aaaaa-aaaaa-aaaaa-cai", "resetChallengeQueueAdmin")
+
+        assert "--query" not in mock_run.call_args[0][0]
+
+    @patch('canister_client.subprocess.run')
+    def test_call_stats_record_mode_and_transport(self, mock_run, dfx_client):
+        mock_run.return_value = MagicMock(returncode=0, stdout="{}", stderr="")
+        canister_client.CALL_STATS.clear()
+
+        dfx_client.call("game_state_canister", "getNumOpenSubmissionsAdmin")
+
+        assert canister_client.CALL_STATS[("getNumOpenSubmissionsAdmin", "query", "dfx")]["calls"] == 1
+
+    @patch('canister_client.subprocess.run')
+    def test_call_passes_candid_text_args(self, mock_run, dfx_client):
+        mock_run.return_value = MagicMock(returncode=0, stdout='{"blocks": []}', stderr="")
+
+        dfx_client.call("aaaaa-aaaaa-aaaaa-aaaaa-cai", "get_blocks", args="(record { start = 0; length = 10 })")
+
+        assert mock_run.call_args[0][0][-1] == "(record { start = 0; length = 10 })"
+
+    @patch('canister_client.subprocess.run')
+    def test_call_empty_output(self, mock_run, dfx_client):
+        mock_run.return_value = MagicMock(returncode=0, stdout="\n", stderr="")
+
+        assert dfx_client.call("aaaaa-aaaaa-aaaaa-aaaaa-cai", "startTimerExecutionAdmin") is None
+
+    @patch('canister_client.subprocess.run')
+    def test_call_failure_raises_called_process_error(self, mock_run, dfx_client):
+        mock_run.return_value = MagicMock(returncode=255, stdout="", stderr="Error: IC0508: Canister is stopped")
+
+        with pytest.raises(subprocess.CalledProcessError) as exc_info:
+            dfx_client.call("aaaaa-aaaaa-aaaaa-aaaaa-cai", "health")
+
+        assert isinstance(exc_info.value, canister_client.CanisterCallError)
+        assert "IC0508" in exc_info.value.stderr
+        assert exc_info.value.returncode == 255
+
+    def test_python_args_without_interface_raise(self, dfx_client):
+        with pytest.raises(ValueError):
+            dfx_client.call("aaaaa-aaaaa-aaaaa-aaaaa-cai", "someMethod", args=[1])
+
+
+class TestAgentPath:
+    """Test the in-process ic-py path of CanisterClient.call, with the Agent mocked."""
+
+    ADDRESS = "aaaaa-aaaaa-aaaaa-aaaaa-cai"
+
+    @pytest.fixture
+    def agent_client(self):
+        pytest.importorskip("ic.agent")
+        client = canister_client.CanisterClient("testing")
+        client.use_agent = True
+        client._agent = MagicMock()
+        return client
+
+    @patch('canister_client.subprocess.run')
+    def test_query_is_encoded_and_decoded_by_the_agent(self, mock_run, agent_client):
+        agent_client.agent.query_raw.return_value = [{"type": "variant", "value": {"Ok": {"status_code": 200}}}]
+        canister_client.CALL_STATS.clear()
+
+        result = agent_client.call(self.ADDRESS, "health", interface="mainer_ctrlb_canister", coalesce=False)
+
+        assert result == {"Ok": {"status_code": 200}}
+        canister_id, method, arg, ret_types, effective_canister_id = agent_client.agent.query_raw.call_args.args
+        assert (canister_id, method, arg, effective_canister_id) == (self.ADDRESS, "health", b"DIDL\x00\x00", None)
+        assert canister_client.CALL_STATS[("health", "query", "agent")]["calls"] == 1
+        mock_run.assert_not_called()
+
+    def test_rejected_query_raises_called_process_error(self, agent_client):
+        agent_client.agent.query_raw.return_value = "IC0503: Canister trapped"
+
+        with pytest.raises(canister_client.CanisterCallError) as exc_info:
+            agent_client.call(self.ADDRESS, "health", interface="mainer_ctrlb_canister", coalesce=False)
+
+        assert "Failed query call" in exc_info.value.stderr
+        assert "IC0503" in exc_info.value.stderr
+
+    def test_update_polls_with_the_call_timeout(self, agent_client):
+        agent_client.agent.update_raw.return_value = [{"type": "variant", "value": {"Ok": {"status_code": 200}}}]
+
+        agent_client.call(self.ADDRESS, "resetChallengeQueueAdmin", interface="mainer_ctrlb_canister", timeout=5)
+        assert agent_client.agent.update_raw.call_args.kwargs == {"timeout": 5}
+
+        agent_client.call(self.ADDRESS, "resetChallengeQueueAdmin", interface="mainer_ctrlb_canister")
+        assert agent_client.agent.update_raw.call_args.kwargs == {"timeout": agent_client.timeout}
+
+    def test_async_query_uses_the_async_agent(self, agent_client):
+        agent_client.agent.query_raw_async = AsyncMock(
+            return_value=[{"type": "variant", "value": {"Ok": {"status_code": 200}}}])
+
+        result = asyncio.run(agent_client.call_async(self.ADDRESS, "health", interface="mainer_ctrlb_canister",
+                                                     coalesce=False))
+
+        assert result == {"Ok": {"status_code": 200}}
+        agent_client.agent.query_raw.assert_not_called()
+
+
+class TestDidMethods:
+    """Test the query/update index built from the .did files."""
+
+    def test_admin_getters_are_queries(self):
+        methods = canister_client.interface_methods("game_state_canister")
+        assert methods["getNumOpenSubmissionsAdmin"] is True
+        assert methods["getNumberMainerAgentsAdmin"] is True
+
+    def test_update_methods(self):
+        methods = canister_client.interface_methods("mainer_ctrlb_canister")
+        assert methods["getMainerStatisticsAdmin"] is True
+        assert methods["resetChallengeQueueAdmin"] is False
+
+    def test_function_typed_fields_are_not_methods(self, tmp_path):
+        did = tmp_path / "test.did"
+        did.write_text(
+            "type Token = record { callback : func (nat) -> (nat) query; };\n"
+            "service : {\n  get : (nat) -> (\n    Token,\n  ) query;\n  put : (nat) -> ();\n}\n"
+        )
+        assert canister_client.did_methods(did) == {"get": True, "put": False}
+
+    def test_find_interface_by_unique_method(self, dfx_client):
+        assert dfx_client.find_interface("aaaaa-aaaaa-aaaaa-aaaaa-cai", "getNumOpenSubmissionsAdmin") == "game_state_canister"
+        assert dfx_client.find_interface("aaaaa-aaaaa-aaaaa-aaaaa-cai", "health") is None
+
+
+class TestGetClient:
+    """Test the per-network client registry."""
+
+    def test_get_client_is_shared_per_network(self):
+        assert canister_client.get_client("testing") is canister_client.get_client("testing")
+        assert canister_client.get_client("testing") is not canister_client.get_client("demo")
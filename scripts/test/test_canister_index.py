@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add parent directory to path to import the module
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from canister_index import CanisterIndex, canister_index
+
+
+def write_ids(path, canister_ids, mtime_ns=None):
+    path.write_text(json.dumps(canister_ids))
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+class TestCanisterIndex:
+    """Test the index of a canister_ids.json."""
+
+    def test_lookups_in_both_directions(self, tmp_path):
+        write_ids(tmp_path / "canister_ids.json", {
+            "mainer_ctrlb_canister_0": {"prd": "a-cai", "testing": "t-cai"},
+            "mainer_ctrlb_canister_1": {"prd": "b-cai"},
+        })
+        index = CanisterIndex(tmp_path / "canister_ids.json")
+
+        assert index.name("prd", "b-cai") == "mainer_ctrlb_canister_1"
+        assert index.name("testing", "a-cai") is None
+        assert index.address("mainer_ctrlb_canister_0", "testing") == "t-cai"
+        assert index.names("prd") == {"mainer_ctrlb_canister_0": "a-cai", "mainer_ctrlb_canister_1": "b-cai"}
+
+    def test_file_is_parsed_once_until_it_changes(self, tmp_path):
+        path = tmp_path / "canister_ids.json"
+        write_ids(path, {"mainer_ctrlb_canister_0": {"prd": "a-cai"}}, mtime_ns=1_000_000_000)
+        index = CanisterIndex(path)
+
+        with patch("canister_index.json.load", wraps=json.load) as load:
+            for _ in range(3):
+                assert index.name("prd", "a-cai") == "mainer_ctrlb_canister_0"
+            assert load.call_count == 1
+
+            write_ids(path, {"mainer_ctrlb_canister_0": {"prd": "c-cai"}}, mtime_ns=2_000_000_000)
+            assert index.name("prd", "a-cai") is None
+            assert index.name("prd", "c-cai") == "mainer_ctrlb_canister_0"
+            assert load.call_count == 2
+
+    def test_update_writes_the_file_and_the_index(self, tmp_path):
+        path = tmp_path / "canister_ids.json"
+        write_ids(path, {"llm_0": {"prd": "l-cai"}})
+        index = canister_index(path)
+
+        index.update("prd", {"mainer_ctrlb_canister_0": "a-cai"})
+
+        assert json.loads(path.read_text()) == {"llm_0": {"prd": "l-cai"}, "mainer_ctrlb_canister_0": {"prd": "a-cai"}}
+        assert canister_index(path).name("prd", "a-cai") == "mainer_ctrlb_canister_0"
+
+    def test_owner_and_type_of_registered_mainers(self, tmp_path):
+        index = CanisterIndex(tmp_path / "canister_ids.json")
+        index.register_mainers([
+            {"address": "a-cai", "ownedBy": "user-1", "canisterType": {"MainerAgent": {"ShareAgent": None}}},
+            {"address": "b-cai", "ownedBy": "user-1", "canisterType": {"MainerAgent": {"Own": None}}},
+            {"address": "", "ownedBy": "user-2"},
+        ])
+
+        assert index.canister_type("a-cai") == "ShareAgent"
+        assert index.owner("b-cai") == "user-1"
+        assert index.owned_by("user-1") == ["a-cai", "b-cai"]
+        assert index.owner("unknown-cai") is None
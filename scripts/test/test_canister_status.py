@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Add parent directory to path to import the module
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import canister_client
+import canister_status
+
+STATUS_OUTPUT = """Canister status call result for aaaaa-aaaaa-aaaaa-aaaaa-cai.
+Status: Running
+Controllers: 2vxsx-fae cpbhu-5iaaa-aaaad-aalta-cai
+Memory allocation: 0 Bytes
+Compute allocation: 0 %
+Freezing threshold: 2_592_000 Seconds
+Idle cycles burned per day: 37_418_301 Cycles
+Memory Size: 3_612_475 Bytes
+Balance: 3_033_245_418_813 Cycles
+Reserved: 0 Cycles
+Module hash: 0xabcdef123456
+"""
+
+INFO_OUTPUT = """Controllers: 2vxsx-fae cpbhu-5iaaa-aaaad-aalta-cai
+Module hash: 0xabcdef123456
+"""
+
+
+@pytest.fixture
+def dfx_only(monkeypatch):
+    """Make the shared client for 'testing' use the dfx subprocess."""
+    monkeypatch.setattr(canister_client.get_client("testing"), "use_agent", False)
+
+
+class TestParseOutput:
+    """Test parsing of the dfx status/info text output."""
+
+    def test_parse_status_output(self):
+        record = canister_status.parse_status_output("aaaaa-aaaaa-aaaaa-aaaaa-cai", STATUS_OUTPUT)
+
+        assert record.status == "Running"
+        assert record.balance == 3_033_245_418_813
+        assert record.memory_size == 3_612_475
+        assert record.module_hash == "0xabcdef123456"
+        assert record.controllers == ["2vxsx-fae", "cpbhu-5iaaa-aaaad-aalta-cai"]
+        assert record.idle_cycles_burned_per_day == 37_418_301
+        assert record.source == "status"
+
+    def test_parse_old_dfx_memory_format(self):
+        record = canister_status.parse_status_output("a", "Memory Size: Nat(12345)\nModule hash: None\n")
+
+        assert record.memory_size == 12345
+        assert record.module_hash is None
+
+    def test_parse_info_output(self):
+        record = canister_status.parse_info_output("a", INFO_OUTPUT)
+
+        assert record.module_hash == "0xabcdef123456"
+        assert record.controllers == ["2vxsx-fae", "cpbhu-5iaaa-aaaad-aalta-cai"]
+        assert record.balance is None
+        assert record.source == "info"
+
+    def test_from_management_record(self):
+        value = {
+            "status": {"stopped": None},
+            "settings": {"controllers": ["2vxsx-fae"]},
+            "module_hash": [[0xab, 0xcd]],
+            "memory_size": "1_000",
+            "cycles": "2_000_000",
+            "idle_cycles_burned_per_day": "300",
+        }
+        record = canister_status.from_management_record("a", value)
+
+        assert record.status == "Stopped"
+        assert record.module_hash == "0xabcd"
+        assert record.balance == 2_000_000
+        assert record.memory_size == 1_000
+
+
+class TestGetStatusRecord:
+    """Test fetching and reusing status records."""
+
+    @patch('canister_status.subprocess.run')
+    def test_record_is_reused(self, mock_run, dfx_only):
+        mock_run.return_value = MagicMock(returncode=0, stdout=STATUS_OUTPUT, stderr="")
+
+        first = canister_status.get_status_record("testing", "aaaaa-aaaaa-aaaaa-aaaaa-cai")
+        second = canister_status.get_status_record("testing", "aaaaa-aaaaa-aaaaa-aaaaa-cai")
+
+        assert first is second
+        assert mock_run.call_count == 1
+        assert mock_run.call_args[0][0] == ["dfx", "canister", "--network", "testing", "status", "aaaaa-aaaaa-aaaaa-aaaaa-cai"]
+
+    @patch('canister_status.subprocess.run')
+    def test_max_age_zero_fetches_again(self, mock_run, dfx_only):
+        mock_run.return_value = MagicMock(returncode=0, stdout=STATUS_OUTPUT, stderr="")
+
+        canister_status.get_status_record("testing", "aaaaa-aaaaa-aaaaa-aaaaa-cai")
+        canister_status.get_status_record("testing", "aaaaa-aaaaa-aaaaa-aaaaa-cai", max_age=0)
+
+        assert mock_run.call_count == 2
+
+    @patch('canister_status.subprocess.run')
+    def test_falls_back_to_info_for_non_controllers(self, mock_run, dfx_only):
+        mock_run.side_effect = [
+            MagicMock(returncode=255, stdout="", stderr="Only controllers of canister a can call ic00 method canister_status"),
+            MagicMock(returncode=0, stdout=INFO_OUTPUT, stderr=""),
+        ]
+
+        record = canister_status.get_status_record("testing", "aaaaa-aaaaa-aaaaa-aaaaa-cai")
+
+        assert record.source == "info"
+        assert record.module_hash == "0xabcdef123456"
+        assert mock_run.call_args[0][0][-2] == "info"
+
+    @patch('canister_status.subprocess.run')
+    def test_other_errors_raise(self, mock_run, dfx_only):
+        mock_run.return_value = MagicMock(returncode=255, stdout="", stderr="Error: Canister a does not exist")
+
+        with pytest.raises(canister_client.CanisterCallError):
+            canister_status.get_status_record("testing", "aaaaa-aaaaa-aaaaa-aaaaa-cai")
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path to import the module
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import canister_client
+import canister_status
+import fake_ic
+from fake_ic import FakeConfig, FakeIC, FakeReject
+from fleet_executor import run_fleet, canister_method, canister_status_record
+
+FAST = dict(query_latency_ms=0, update_latency_ms=0)
+
+
+@pytest.fixture
+def fake():
+    fake = FakeIC(FakeConfig(mainers=20, **FAST))
+    fake.install("fake")
+    yield fake
+    fake.uninstall("fake")
+
+
+class TestFakeIC:
+    """Test the fake canisters."""
+
+    def test_fleet_is_deterministic(self):
+        assert FakeIC(FakeConfig(mainers=3)).mainer_ids == FakeIC(FakeConfig(mainers=3)).mainer_ids
+        assert FakeIC(FakeConfig(mainers=3, seed=1)).mainer_ids != FakeIC(FakeConfig(mainers=3)).mainer_ids
+        assert all(canister_id.endswith("-cai") for canister_id in FakeIC(FakeConfig(mainers=3)).mainer_ids)
+
+    def test_injected_errors_are_deterministic(self):
+        def outcomes():
+            fake = FakeIC(FakeConfig(mainers=10, error_rate=0.5, **FAST))
+            result = []
+            for canister_id in fake.mainer_ids:
+                try:
+                    fake.call(canister_id, "health")
+                    result.append("ok")
+                except FakeReject as e:
+                    result.append(e.stderr)
+            return result
+
+        first = outcomes()
+        assert first == outcomes()
+        assert "ok" in first and len(set(first)) > 1
+
+    def test_unknown_canister_does_not_exist(self):
+        with pytest.raises(FakeReject, match="does not exist"):
+            FakeIC(FakeConfig(mainers=1, **FAST)).call("aaaaa-aaaaa-aaaaa-aaaaa-cai", "health")
+
+    def test_rate_limit(self):
+        fake = FakeIC(FakeConfig(mainers=1, rate_limit=2, **FAST))
+        canister_id = fake.mainer_ids[0]
+        fake.call(canister_id, "health")
+        fake.call(canister_id, "health")
+        with pytest.raises(FakeReject, match="429"):
+            fake.call(canister_id, "health")
+
+
+class TestInProcess:
+    """Test serving the shared canister client from the fake."""
+
+    def test_call_canister(self, fake):
+        assert canister_client.call_canister("fake", fake.mainer_ids[0], "health") == {"Ok": {"status_code": 200}}
+
+    def test_fleet_scan(self, fake):
+        tasks = {
+            "health": canister_method("fake", "health"),
+            "status": canister_status_record("fake"),
+        }
+        results = run_fleet(fake.mainer_ids, tasks, network="fake")
+
+        assert len(results) == 20
+        assert all(result.ok for address_results in results.values() for result in address_results.values())
+        assert results[fake.mainer_ids[0]]["status"].value.module_hash == fake.config.module_hash
+
+
+class TestFakeDfx:
+    """Test the fake dfx command line."""
+
+    @pytest.fixture
+    def dfx_fake(self, tmp_path):
+        fake_ic.write_fake_dfx(tmp_path, FakeConfig(mainers=2, **FAST))
+        return fake_ic.load_fake(tmp_path)
+
+    def test_health_text_output(self, dfx_fake):
+        code, stdout, _ = fake_ic.run_fake_dfx(dfx_fake, ["canister", "--network", "testing", "call",
+                                                          dfx_fake.mainer_ids[0], "health"])
+        assert code == 0
+        assert "(variant { Ok = record { status_code = 200 : nat16 } })" in stdout
+
+    def test_status_output_parses(self, dfx_fake):
+        canister_id = dfx_fake.mainer_ids[0]
+        code, stdout, _ = fake_ic.run_fake_dfx(dfx_fake, ["canister", "--network", "testing", "status", canister_id])
+        record = canister_status.parse_status_output(canister_id, stdout)
+
+        assert code == 0
+        assert record.status == "Running"
+        assert record.module_hash == dfx_fake.config.module_hash
+
+    def test_state_is_kept_between_invocations(self, tmp_path, dfx_fake):
+        canister_id = dfx_fake.mainer_ids[0]
+        fake_ic.run_fake_dfx(dfx_fake, ["canister", "--network", "testing", "stop", canister_id])
+        fake_ic.run_fake_dfx(dfx_fake, ["canister", "--network", "testing", "install", canister_id])
+
+        again = fake_ic.load_fake(tmp_path)
+        code, _, stderr = fake_ic.run_fake_dfx(again, ["canister", "--network", "testing", "call", canister_id, "health"])
+        assert code == 255 and "IC0508" in stderr
+        _, stdout, _ = fake_ic.run_fake_dfx(again, ["canister", "--network", "testing", "info", canister_id])
+        assert dfx_fake.config.upgraded_module_hash in stdout
+
+    def test_snapshot_load_restores_module(self, dfx_fake):
+        canister_id = dfx_fake.mainer_ids[0]
+        _, _, stderr = fake_ic.run_fake_dfx(dfx_fake, ["canister", "--network", "testing", "snapshot", "create", canister_id])
+        snapshot_id = stderr.split("Snapshot ID:")[1].strip()
+        fake_ic.run_fake_dfx(dfx_fake, ["canister", "--network", "testing", "install", canister_id])
+
+        code, _, _ = fake_ic.run_fake_dfx(dfx_fake, ["canister", "--network", "testing", "snapshot", "load", canister_id, snapshot_id])
+        assert code == 0
+        _, stdout, _ = fake_ic.run_fake_dfx(dfx_fake, ["canister", "--network", "testing", "info", canister_id])
+        assert dfx_fake.config.module_hash in stdout
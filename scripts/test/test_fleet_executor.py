@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+import asyncio
+import subprocess
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import the module
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import fleet_executor
+
+
+class TestRunFleet:
+    """Test run_fleet with in-process tasks."""
+
+    def test_results_for_every_address_and_task(self):
+        async def double(address):
+            return address * 2
+
+        async def upper(address):
+            return address.upper()
+
+        results = fleet_executor.run_fleet(["a", "b", "c"], {"double": double, "upper": upper})
+
+        assert set(results.keys()) == {"a", "b", "c"}
+        assert results["b"]["double"].value == "bb"
+        assert results["c"]["upper"].value == "C"
+        assert all(r.ok for address_results in results.values() for r in address_results.values())
+
+    def test_concurrency_limit_is_respected(self):
+        in_flight = 0
+        max_in_flight = 0
+
+        async def task(address):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return True
+
+        fleet_executor.run_fleet([str(i) for i in range(40)], {"a": task, "b": task}, concurrency=5)
+
+        assert max_in_flight == 5
+
+    def test_results_are_streamed_as_they_complete(self):
+        async def task(address):
+            await asyncio.sleep(0.05 if address == "slow" else 0)
+            return address
+
+        order = []
+        fleet_executor.run_fleet(["slow", "fast"], {"t": task}, on_result=lambda address, _: order.append(address))
+
+        assert order == ["fast", "slow"]
+
+    def test_errors_are_captured(self):
+        async def failing(address):
+            raise subprocess.CalledProcessError(1, ["dfx"], stderr="Error: IC0536: no such method")
+
+        results = fleet_executor.run_fleet(["a"], {"t": failing})
+
+        assert not results["a"]["t"].ok
+        assert "IC0536" in results["a"]["t"].error
+
+    def test_timeout_is_an_error(self):
+        async def hanging(address):
+            await asyncio.sleep(5)
+
+        results = fleet_executor.run_fleet(["a"], {"t": hanging}, timeout=0.01)
+
+        assert results["a"]["t"].error == "Operation timed out"
+
+    def test_transient_errors_are_retried(self):
+        attempts = 0
+
+        async def flaky(address):
+            nonlocal attempts
+            attempts += 1
+            if attempts < 3:
+                raise subprocess.CalledProcessError(1, ["dfx"], stderr="connection refused")
+            return "ok"
+
+        results = fleet_executor.run_fleet(
+            ["a"], {"t": flaky},
+            is_transient=lambda text: "connection refused" in text, max_retries=5, retry_delay=0.001,
+        )
+
+        assert results["a"]["t"].value == "ok"
+        assert attempts == 3
+
+    def test_non_transient_errors_are_not_retried(self):
+        attempts = 0
+
+        async def failing(address):
+            nonlocal attempts
+            attempts += 1
+            raise subprocess.CalledProcessError(1, ["dfx"], stderr="Canister trapped")
+
+        results = fleet_executor.run_fleet(
+            ["a"], {"t": failing},
+            is_transient=lambda text: "connection refused" in text, max_retries=5, retry_delay=0.001,
+        )
+
+        assert not results["a"]["t"].ok
+        assert attempts == 1
+
+
+class TestSharding:
+    """Test splitting a fleet scan into shards."""
+
+    def test_shards_partition_the_fleet(self):
+        addresses = [f"mainer-{i}-cai" for i in range(200)]
+
+        shards = [fleet_executor.shard_addresses(addresses, (i, 4)) for i in range(1, 5)]
+
+        assert sorted(sum(shards, [])) == sorted(addresses)
+        assert all(shard for shard in shards)
+        # The same split in every process
+        assert fleet_executor.shard_of("mainer-7-cai", 4) == fleet_executor.shard_of("mainer-7-cai", 4)
+
+    def test_parse_shard(self):
+        assert fleet_executor.parse_shard("2/4") == (2, 4)
+        for text in ("0/4", "5/4", "2", "a/b"):
+            try:
+                fleet_executor.parse_shard(text)
+            except ValueError:
+                continue
+            raise AssertionError(f"{text} was accepted")
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add parent directory to path to import the module
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from llm_drain import DrainSample, is_busy, wait_for_drain
+
+
+class TestDrainDetection:
+    """Test detecting that an LLM removed from its controller is idle."""
+
+    def test_signals(self):
+        idle = DrainSample(balance=10_000_000_000_000, idle_cycles_burned_per_day=86_400_000_000, last_log_line="a")
+
+        # The idle burn and a few cheap calls are not work; an inference burning 60B is
+        assert is_busy(idle, DrainSample(9_999_500_000_000, 86_400_000_000, "a"), 10.0) is False
+        assert is_busy(idle, DrainSample(9_940_000_000_000, 86_400_000_000, "a"), 10.0) is True
+        assert is_busy(idle, DrainSample(10_000_000_000_000, 86_400_000_000, "b"), 10.0) is True
+        # Only the log can be read
+        assert is_busy(DrainSample(None, None, "a"), DrainSample(None, None, "a"), 10.0) is False
+        assert is_busy(DrainSample(None, None, None), DrainSample(None, None, None), 10.0) is None
+
+    def test_ready_after_quiet_samples(self):
+        busy = [DrainSample(100_000_000_000_000 - i * 50_000_000_000, 0, None) for i in range(3)]
+        quiet = [busy[-1]] * 3
+        with patch("llm_drain.drain_sample", side_effect=busy + quiet), patch("readiness.time.sleep"):
+            drain = wait_for_drain("prd", "llm-cai")
+
+        assert drain.ready
+        # 2 probes while busy, then 2 quiet intervals in a row
+        assert drain.polls == 4
+
+    def test_unknown_signals_wait_for_the_deadline(self):
+        with patch("llm_drain.drain_sample", return_value=DrainSample(None, None, None)), \
+                patch("readiness.time.sleep"):
+            drain = wait_for_drain("prd", "llm-cai")
+
+        assert not drain.ready
+        assert drain.value == 0
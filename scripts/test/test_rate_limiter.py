@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path to import the module
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import rate_limiter
+
+
+@pytest.fixture
+def limiter():
+    limiter = rate_limiter.AimdRateLimiter(initial_rate=10.0, min_rate=1.0, max_rate=20.0)
+    return limiter
+
+
+class TestAimd:
+    """Test the additive increase / multiplicative decrease of the rate."""
+
+    def test_success_increases_rate_additively(self, limiter):
+        limiter.success("a")
+        assert limiter.rate("a") == pytest.approx(10.1)
+
+    def test_rate_is_capped(self, limiter):
+        for _ in range(1000):
+            limiter.success("a")
+        assert limiter.rate("a") == 20.0
+
+    def test_backoff_error_halves_rate(self, limiter):
+        limiter.failure("a", "HTTP 429 Too Many Requests")
+        assert limiter.rate("a") == 5.0
+
+    def test_other_errors_do_not_back_off(self, limiter):
+        limiter.failure("a", "Canister trapped: invalid argument")
+        assert limiter.rate("a") == 10.0
+
+    def test_rate_has_a_floor(self, limiter):
+        for _ in range(10):
+            limiter.failure("a", "Operation timed out")
+        assert limiter.rate("a") == 1.0
+
+    def test_targets_are_independent(self, limiter):
+        limiter.failure("a", "rate limit exceeded")
+        assert limiter.rate("b") == 10.0
+
+    def test_configure_target(self, limiter):
+        limiter.configure("slow", initial_rate=2.0, max_rate=3.0)
+        assert limiter.rate("slow") == 2.0
+
+
+class TestTokenBucket:
+    """Test that calls are spaced by the rate."""
+
+    def test_acquire_waits_for_tokens(self, limiter):
+        start = time.monotonic()
+        for _ in range(12):  # 1 burst token, then 11 more at 10/s
+            limiter.acquire("a")
+        assert time.monotonic() - start >= 0.9
+
+    def test_limit_reports_failure(self, limiter):
+        with pytest.raises(subprocess.CalledProcessError):
+            with limiter.limit("a"):
+                raise subprocess.CalledProcessError(1, ["dfx"], stderr="connection refused")
+        assert limiter.rate("a") == 5.0
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Add parent directory to path to import the module
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import readiness
+
+
+@pytest.fixture(autouse=True)
+def no_sleep():
+    with patch('readiness.time.sleep') as mock_sleep:
+        yield mock_sleep
+
+
+class TestPollUntil:
+    """Test polling a stage until it is ready."""
+
+    def test_ready_on_first_probe(self, no_sleep):
+        poll = readiness.poll_until("health", lambda: (True, "ok"), is_ready=lambda result: result[0])
+
+        assert poll.ready is True
+        assert poll.polls == 1
+        no_sleep.assert_called_once_with(readiness.STAGES["health"].first_wait)
+
+    def test_polls_until_ready(self):
+        values = iter([None, None, True])
+
+        poll = readiness.poll_until("post_upgrade_flag", lambda: next(values), is_ready=lambda flag: flag is True)
+
+        assert (poll.ready, poll.value, poll.polls) == (True, True, 3)
+
+    def test_waits_grow(self, no_sleep):
+        readiness.poll_until("post_upgrade_flag", lambda: False)
+
+        waits = [c.args[0] for c in no_sleep.call_args_list[1:]]
+        assert max(waits) <= readiness.STAGES["post_upgrade_flag"].max_interval
+        assert waits[5] > waits[0]
+
+    def test_gives_up_after_max_polls(self):
+        poll = readiness.poll_until("maintenance_flag_on", lambda: False)
+
+        assert poll.ready is False
+        assert poll.polls == readiness.STAGES["maintenance_flag_on"].max_polls
+
+    def test_give_up_predicate(self):
+        poll = readiness.poll_until("health", lambda: (False, "Canister trapped"),
+                                    is_ready=lambda result: result[0],
+                                    give_up=lambda result: "maintenance" not in result[1])
+
+        assert (poll.ready, poll.polls) == (False, 1)
+
+
+class TestReadinessStats:
+    """Test that the first wait follows the observed times-to-ready."""
+
+    def test_default_first_wait(self):
+        assert readiness.STATS.first_wait("health") == readiness.STAGES["health"].first_wait
+
+    def test_first_wait_is_below_median(self):
+        for time_to_ready in (4.0, 4.0, 8.0):
+            readiness.STATS.record("health", time_to_ready)
+
+        assert readiness.STATS.first_wait("health") == pytest.approx(3.0)
+
+    def test_observations_persist(self, tmp_path):
+        stats = readiness.ReadinessStats(tmp_path / "readiness.json")
+        stats.record("flag_endpoint", 0.5)
+
+        assert readiness.ReadinessStats(tmp_path / "readiness.json").first_wait("flag_endpoint") == pytest.approx(0.375)
+
+    def test_poll_records_time_to_ready(self):
+        readiness.poll_until("flag_endpoint", lambda: True)
+
+        assert "flag_endpoint" in readiness.readiness_summary()
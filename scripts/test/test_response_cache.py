@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+import json
+import sys
+import time
+from pathlib import Path
+from unittest.mock import Mock
+
+# Add parent directory to path to import the module
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import response_cache
+
+
+class TestCachedCall:
+    """Test the cached_call function."""
+
+    def test_second_call_is_a_hit(self):
+        fetch = Mock(return_value={"Ok": [{"address": "abc123"}]})
+
+        first = response_cache.cached_call("testing", "game_state_canister", "getMainerAgentCanistersAdmin", fetch)
+        second = response_cache.cached_call("testing", "game_state_canister", "getMainerAgentCanistersAdmin", fetch)
+
+        assert first == second == {"Ok": [{"address": "abc123"}]}
+        fetch.assert_called_once()
+        assert response_cache.CACHE_STATS["hits"] == 1
+        assert response_cache.CACHE_STATS["misses"] == 1
+        assert response_cache.CACHE_STATS["writes"] == 1
+
+    def test_key_includes_network_and_args(self):
+        fetch = Mock(side_effect=[1, 2, 3])
+
+        assert response_cache.cached_call("testing", "gs", "getMainerAgentCanistersAdmin", fetch) == 1
+        assert response_cache.cached_call("prd", "gs", "getMainerAgentCanistersAdmin", fetch) == 2
+        assert response_cache.cached_call("prd", "gs", "getMainerAgentCanistersAdmin", fetch, args="(1)") == 3
+        assert fetch.call_count == 3
+
+    def test_expired_entry_is_refetched(self):
+        fetch = Mock(side_effect=["old", "new"])
+        response_cache.cached_call("testing", "gs", "getMainerAgentCanistersAdmin", fetch)
+
+        path = next(response_cache.CACHE_DIR.glob("*.json"))
+        entry = json.loads(path.read_text())
+        entry["fetched_at"] = time.time() - 3600
+        path.write_text(json.dumps(entry))
+
+        assert response_cache.cached_call("testing", "gs", "getMainerAgentCanistersAdmin", fetch) == "new"
+        assert response_cache.CACHE_STATS["expired"] == 1
+
+    def test_methods_without_ttl_are_not_cached(self):
+        fetch = Mock(return_value="value")
+
+        response_cache.cached_call("testing", "abc123", "getIssueFlagsAdmin", fetch)
+        response_cache.cached_call("testing", "abc123", "getIssueFlagsAdmin", fetch)
+
+        assert fetch.call_count == 2
+        assert not response_cache.CACHE_DIR.exists() or not list(response_cache.CACHE_DIR.glob("*.json"))
+
+    def test_no_cache_bypasses_reads_and_writes(self):
+        response_cache.configure_cache(no_cache=True)
+        fetch = Mock(return_value="value")
+
+        response_cache.cached_call("testing", "gs", "getMainerAgentCanistersAdmin", fetch)
+        response_cache.cached_call("testing", "gs", "getMainerAgentCanistersAdmin", fetch)
+
+        assert fetch.call_count == 2
+        assert response_cache.CACHE_STATS["bypassed"] == 2
+        assert not response_cache.CACHE_DIR.exists()
+
+    def test_refresh_fetches_and_updates_the_cache(self):
+        response_cache.cached_call("testing", "gs", "getMainerAgentCanistersAdmin", Mock(return_value="old"))
+
+        response_cache.configure_cache(refresh=True)
+        assert response_cache.cached_call("testing", "gs", "getMainerAgentCanistersAdmin", Mock(return_value="new")) == "new"
+
+        response_cache.configure_cache()
+        assert response_cache.cached_call("testing", "gs", "getMainerAgentCanistersAdmin", Mock(return_value="unused")) == "new"
+
+    def test_failed_fetch_is_not_cached(self):
+        fetch = Mock(side_effect=[RuntimeError("Connection failed"), "value"])
+
+        try:
+            response_cache.cached_call("testing", "gs", "getMainerAgentCanistersAdmin", fetch)
+        except RuntimeError:
+            pass
+
+        assert response_cache.cached_call("testing", "gs", "getMainerAgentCanistersAdmin", fetch) == "value"
+
+    def test_err_variant_is_not_cached(self):
+        fetch = Mock(side_effect=[{"Err": {"Unauthorized": None}}, {"Ok": []}])
+
+        assert response_cache.cached_call("testing", "gs", "getMainerAgentCanistersAdmin", fetch) == {"Err": {"Unauthorized": None}}
+        assert response_cache.cached_call("testing", "gs", "getMainerAgentCanistersAdmin", fetch) == {"Ok": []}
+        assert response_cache.CACHE_STATS["writes"] == 1
+
+    def test_canister_name_and_id_share_an_entry(self, tmp_path, monkeypatch):
+        canister_ids = tmp_path / "canister_ids.json"
+        canister_ids.write_text(json.dumps({"game_state_canister": {"prd": "r5m5y-diaaa-aaaaa-qanaa-cai"}}))
+        monkeypatch.setattr(response_cache, "CANISTER_IDS_PATH", canister_ids)
+        fetch = Mock(return_value={"Ok": []})
+
+        response_cache.cached_call("prd", "game_state_canister", "getMainerAgentCanistersAdmin", fetch)
+        response_cache.cached_call("ic", "r5m5y-diaaa-aaaaa-qanaa-cai", "getMainerAgentCanistersAdmin", fetch)
+
+        fetch.assert_called_once()
+
+    def test_no_temporary_files_are_left_behind(self):
+        response_cache.cached_call("testing", "gs", "getMainerAgentCanistersAdmin", Mock(return_value="value"))
+
+        assert [p.name for p in response_cache.CACHE_DIR.iterdir() if p.name.startswith(".tmp-")] == []
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+import asyncio
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Add parent directory to path to import the module
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import canister_subnets
+import retry_policy
+from retry_policy import RetryPolicy, RetryBudget, CircuitBreaker, CircuitOpenError
+
+
+def failure(stderr):
+    return subprocess.CalledProcessError(1, ["dfx"], output="", stderr=stderr)
+
+
+class TestClassifyError:
+    """Test sorting errors into classes."""
+
+    @pytest.mark.parametrize("text,expected", [
+        ("Error: IC0536: Canister has no update method 'foo'", retry_policy.PERMANENT),
+        ("Canister aaaaa-aa does not exist", retry_policy.PERMANENT),
+        ("Error code: IC0508, Canister is stopped", retry_policy.CANISTER_STOPPED),
+        ("IC0503: Canister trapped explicitly", retry_policy.CANISTER_TRAPPED),
+        ("error sending request for url: tcp connect error", retry_policy.CONNECT),
+        ("Connection refused (os error 111)", retry_policy.CONNECT),
+        ("Operation Timed Out", retry_policy.TIMEOUT),
+        ("Failed query call.", retry_policy.TRANSIENT),
+        ("Invalid argument", retry_policy.UNKNOWN),
+        ("", retry_policy.UNKNOWN),
+    ])
+    def test_classify_error(self, text, expected):
+        assert retry_policy.classify_error(text) == expected
+
+    def test_network_only_retry_classes(self):
+        assert retry_policy.is_transient_error("IC0508", retry_policy.NETWORK_ERRORS) is False
+        assert retry_policy.is_transient_error("timed out", retry_policy.NETWORK_ERRORS) is True
+
+
+class TestBackoff:
+    """Test the jittered backoff."""
+
+    def test_delay_is_jittered_within_bounds(self):
+        delays = [retry_policy.backoff_delay(3, 2.0) for _ in range(50)]
+
+        assert all(4.0 <= delay <= 8.0 for delay in delays)
+        assert len(set(delays)) > 1
+
+    def test_delay_is_capped(self):
+        assert retry_policy.backoff_delay(20, 10.0, max_delay=60.0) <= 60.0
+
+
+class TestCircuitBreaker:
+    """Test opening, failing fast and probing."""
+
+    def test_opens_after_consecutive_network_failures(self):
+        breaker = CircuitBreaker(threshold=2, cooldown=60)
+        breaker.record_failure("a", retry_policy.TIMEOUT)
+        breaker.check("a")
+        breaker.record_failure("a", retry_policy.CONNECT)
+
+        with pytest.raises(CircuitOpenError):
+            breaker.check("a")
+        breaker.check("b")
+        assert breaker.trips == 1
+
+    def test_other_errors_do_not_count(self):
+        breaker = CircuitBreaker(threshold=1, cooldown=60)
+        breaker.record_failure("a", retry_policy.CANISTER_STOPPED)
+
+        breaker.check("a")
+
+    def test_half_open_after_cooldown(self):
+        breaker = CircuitBreaker(threshold=1, cooldown=0)
+        breaker.record_failure("a", retry_policy.TIMEOUT)
+
+        breaker.check("a")  # the probe
+        breaker.record_success("a")
+        assert not breaker.is_open("a")
+
+
+class TestRetryPolicy:
+    """Test retrying calls."""
+
+    @patch('retry_policy.time.sleep')
+    def test_retries_transient_errors(self, mock_sleep):
+        fn = MagicMock(side_effect=[failure("IC0508 canister stopped"), "ok"])
+
+        assert RetryPolicy(max_retries=3, base_delay=1.0).call(fn) == "ok"
+        assert fn.call_count == 2
+        assert 0.5 <= mock_sleep.call_args[0][0] <= 1.0
+
+    @patch('retry_policy.time.sleep')
+    def test_does_not_retry_permanent_errors(self, mock_sleep):
+        fn = MagicMock(side_effect=failure("IC0536 has no query method"))
+
+        with pytest.raises(subprocess.CalledProcessError):
+            RetryPolicy(max_retries=3).call(fn)
+        assert fn.call_count == 1
+
+    @patch('retry_policy.time.sleep')
+    def test_budget_limits_retries(self, mock_sleep):
+        fn = MagicMock(side_effect=failure("timed out"))
+
+        with pytest.raises(subprocess.CalledProcessError):
+            RetryPolicy(max_retries=10, breakers=False, budget=RetryBudget(2)).call(fn)
+        assert fn.call_count == 3
+
+    @patch('retry_policy.time.sleep')
+    def test_open_circuit_fails_fast(self, mock_sleep):
+        fn = MagicMock(side_effect=failure("tcp connect error"))
+        policy = RetryPolicy(max_retries=10)
+
+        with pytest.raises(subprocess.CalledProcessError):
+            policy.call(fn, keys=("aaaaa-aaaaa-aaaaa-aaaaa-cai",))
+        assert fn.call_count == retry_policy.CANISTER_BREAKER.threshold
+
+        with pytest.raises(CircuitOpenError):
+            policy.call(fn, keys=("aaaaa-aaaaa-aaaaa-aaaaa-cai",))
+        assert fn.call_count == retry_policy.CANISTER_BREAKER.threshold
+
+    @patch('retry_policy.time.sleep')
+    def test_open_subnet_fails_fast_for_its_other_canisters(self, mock_sleep, monkeypatch):
+        subnets = {f"m{i}-cai": "subnet-1" for i in range(10)}
+        monkeypatch.setattr(canister_subnets, "fetch_subnet", subnets.get)
+        monkeypatch.setattr(retry_policy.SUBNET_BREAKER, "threshold", 4)
+        fn = MagicMock(side_effect=failure("tcp connect error"))
+        policy = RetryPolicy(max_retries=2)
+
+        for canister_id in ["m0-cai", "m1-cai"]:
+            with pytest.raises(subprocess.CalledProcessError):
+                policy.call(fn, keys=(canister_id,))
+        assert retry_policy.SUBNET_BREAKER.is_open("subnet-1")
+
+        # Its subnet is only known once it failed: the first call of m2 still goes out, then fails fast
+        with pytest.raises(subprocess.CalledProcessError):
+            policy.call(fn, keys=("m2-cai",))
+        assert fn.call_count == 5
+        canister_subnets.remember_subnets({"m3-cai": "subnet-1"})
+        with pytest.raises(CircuitOpenError):
+            policy.call(fn, keys=("m3-cai",))
+        assert fn.call_count == 5
+
+    def test_call_async(self):
+        attempts = []
+
+        async def fn():
+            attempts.append(1)
+            if len(attempts) < 2:
+                raise asyncio.TimeoutError()
+            return "ok"
+
+        policy = RetryPolicy(max_retries=3, base_delay=0.001)
+        assert asyncio.run(policy.call_async(fn)) == "ok"
+        assert len(attempts) == 2
+
+    def test_canister_keys(self):
+        command = ["dfx", "canister", "--network", "ic", "call", "aaaaa-aaaaa-aaaaa-aaaaa-cai", "health"]
+        assert retry_policy.canister_keys(command) == ("aaaaa-aaaaa-aaaaa-aaaaa-cai",)
+
+
+class TestCanisterSubnets:
+    """Test the lookup of the subnet of a canister."""
+
+    def test_subnet_is_looked_up_once(self, monkeypatch):
+        fetch = MagicMock(side_effect=["subnet-1", None])
+        monkeypatch.setattr(canister_subnets, "fetch_subnet", fetch)
+
+        assert canister_subnets.known_subnet("a-cai") is None
+        assert canister_subnets.subnet_of("a-cai") == canister_subnets.subnet_of("a-cai") == "subnet-1"
+        assert canister_subnets.subnet_of("b-cai") is canister_subnets.subnet_of("b-cai") is None
+        assert fetch.call_count == 2
+        assert canister_subnets.known_subnet("a-cai") == "subnet-1"
+
+    def test_only_network_failures_look_up_subnets(self, monkeypatch):
+        fetch = MagicMock(return_value="subnet-1")
+        monkeypatch.setattr(canister_subnets, "fetch_subnet", fetch)
+        policy = RetryPolicy()
+
+        policy.resolve_subnets("IC0503 canister trapped", keys=("a-cai",))
+        RetryPolicy(breakers=False).resolve_subnets("timed out", keys=("a-cai",))
+        fetch.assert_not_called()
+
+        policy.resolve_subnets("timed out", keys=("a-cai",))
+        fetch.assert_called_once_with("a-cai")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+import json
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Add parent directory to path to import the module
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import rollback_mainers
+import upgrade_journal
+import upgrade_mainers
+from upgrade_journal import UpgradeJournal
+
+
+@pytest.fixture(autouse=True)
+def no_log_file(monkeypatch):
+    monkeypatch.setattr(upgrade_mainers, 'log_file_handle', None)
+
+
+def write_journal(path: Path):
+    journal = UpgradeJournal.open("prd", "0xhash", path=path)
+    # verified
+    journal.record("a-cai", upgrade_journal.SNAPSHOT, snapshot_id="0000000000000001")
+    journal.record("a-cai", upgrade_journal.DEPLOYED)
+    journal.record("a-cai", upgrade_journal.VERIFIED)
+    # failed after its deploy
+    journal.record("b-cai", upgrade_journal.SNAPSHOT, snapshot_id="0000000000000002")
+    journal.record("b-cai", upgrade_journal.DEPLOYED)
+    journal.record("b-cai", upgrade_journal.FAILED, reason="Hash verification failed")
+    # failed before its deploy: code not replaced
+    journal.record("c-cai", upgrade_journal.SNAPSHOT, snapshot_id="0000000000000003")
+    journal.record("c-cai", upgrade_journal.FAILED, reason="Upgrade failed")
+    journal.close()
+
+
+class TestTargets:
+    """Test selecting the mAIners to roll back and their snapshot IDs."""
+
+    def test_journal_failed(self, tmp_path):
+        write_journal(tmp_path / "journal.jsonl")
+
+        targets, missing = rollback_mainers.targets_from_journal(tmp_path / "journal.jsonl", "prd", "failed")
+
+        assert targets == {"b-cai": "0000000000000002"}
+        assert missing == []
+
+    def test_journal_upgraded(self, tmp_path):
+        write_journal(tmp_path / "journal.jsonl")
+
+        targets, _ = rollback_mainers.targets_from_journal(tmp_path / "journal.jsonl", "prd", "upgraded")
+
+        assert targets == {"a-cai": "0000000000000001", "b-cai": "0000000000000002"}
+
+    def test_status_file(self, tmp_path):
+        statuses = {
+            "a-cai": {"status": "success", "timestamp": "", "error": None},
+            "b-cai": {"status": "failed_other", "timestamp": "", "error": "Hash unchanged after upgrade: 0x1. Snapshot: 00000000000000020123abcd"},
+            "c-cai": {"status": "failed_snapshot", "timestamp": "", "error": "Could not create snapshot"},
+            "d-cai": {"status": "failed_upgrade", "timestamp": "", "error": "Upgrade failed. Snapshot: dry-run-snapshot-id"},
+        }
+        (tmp_path / "status.json").write_text(json.dumps(statuses))
+
+        targets, missing = rollback_mainers.targets_from_status(tmp_path / "status.json", "failed")
+
+        assert targets == {"b-cai": "00000000000000020123abcd"}
+        assert sorted(missing) == ["c-cai", "d-cai"]
+
+
+class TestRollbackFleet:
+    """Test the concurrent rollback."""
+
+    @patch('rollback_mainers.check_health', return_value=(True, "(variant { Ok = record { status_code = 200 : nat16 } })"))
+    @patch('rollback_mainers.restore_snapshot')
+    def test_rollback_and_journal(self, mock_restore, mock_health, tmp_path):
+        """Test that each target is restored once and that rolled back mAIners are released in the journal."""
+        write_journal(tmp_path / "journal.jsonl")
+        mock_restore.side_effect = lambda network, address, snapshot_id, dry_run: address != "c-cai"
+        targets = {"a-cai": "0000000000000001", "b-cai": "0000000000000002", "c-cai": "0000000000000003"}
+
+        journal = UpgradeJournal.reopen("prd", tmp_path / "journal.jsonl")
+        results = rollback_mainers.rollback_fleet("prd", targets, concurrency=3, journal=journal)
+        journal.close()
+
+        assert {address: result["status"] for address, result in results.items()} == {
+            "a-cai": rollback_mainers.ROLLED_BACK, "b-cai": rollback_mainers.ROLLED_BACK, "c-cai": rollback_mainers.FAILED}
+        assert mock_restore.call_count == 3
+        resumed = UpgradeJournal.open("prd", "0xhash", resume=True, path=tmp_path / "journal.jsonl")
+        assert resumed.step("a-cai") == upgrade_journal.RELEASED
+        assert not resumed.is_done("a-cai")
+        assert resumed.reached("c-cai", upgrade_journal.SNAPSHOT)
+        resumed.close()
+
+    @patch('rollback_mainers.check_health', return_value=(False, "IC0508: canister is stopped"))
+    @patch('rollback_mainers.restore_snapshot', return_value=True)
+    def test_unhealthy_after_rollback(self, mock_restore, mock_health):
+        """Test that a mAIner that is not healthy after its rollback is reported as such."""
+        results = rollback_mainers.rollback_fleet("prd", {"a-cai": "0000000000000001"})
+
+        assert results["a-cai"]["status"] == rollback_mainers.UNHEALTHY
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path to import the module
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import singleflight
+
+
+@pytest.fixture(autouse=True)
+def zero_stats(monkeypatch):
+    for key in singleflight.COALESCE_STATS:
+        monkeypatch.setitem(singleflight.COALESCE_STATS, key, 0)
+
+
+class TestCoalesce:
+    """Test coalescing of calls from threads."""
+
+    def test_concurrent_callers_share_one_call(self):
+        calls = 0
+        release = threading.Event()
+
+        def fetch():
+            nonlocal calls
+            calls += 1
+            release.wait(1)
+            return "value"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(singleflight.coalesce("key", fetch)))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        while singleflight.COALESCE_STATS["coalesced"] < 4:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert results == ["value"] * 5
+        assert calls == 1
+        assert singleflight.COALESCE_STATS == {"calls": 1, "coalesced": 4}
+
+    def test_sequential_calls_are_not_cached(self):
+        assert singleflight.coalesce("key", lambda: 1) == 1
+        assert singleflight.coalesce("key", lambda: 2) == 2
+
+    def test_error_is_raised(self):
+        def fetch():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            singleflight.coalesce("key", fetch)
+        assert singleflight.coalesce("key", lambda: "ok") == "ok"
+
+
+class TestCoalesceAsync:
+    """Test coalescing of calls from asyncio tasks."""
+
+    def test_concurrent_tasks_share_one_call(self):
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return calls
+
+        async def main():
+            return await asyncio.gather(*(singleflight.coalesce_async("key", fetch) for _ in range(10)))
+
+        assert asyncio.run(main()) == [1] * 10
+        assert calls == 1
+        assert singleflight.COALESCE_STATS["coalesced"] == 9
+
+    def test_different_keys_are_not_shared(self):
+        async def main():
+            return await asyncio.gather(
+                singleflight.coalesce_async("a", lambda: asyncio.sleep(0, "a")),
+                singleflight.coalesce_async("b", lambda: asyncio.sleep(0, "b")),
+            )
+
+        assert asyncio.run(main()) == ["a", "b"]
+        assert singleflight.COALESCE_STATS["coalesced"] == 0
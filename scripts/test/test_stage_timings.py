@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add parent directory to path to import the module
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from stage_timings import StageTimings, percentile, histogram_lines, timings_from_events
+from status_stream import StatusStream, read_events
+
+
+class TestStageTimings:
+    """Test the timing spans, the ETA and the report of a run."""
+
+    def test_percentiles_per_stage(self):
+        timings = StageTimings()
+        for seconds in range(1, 101):
+            timings.record("a-cai", "deploy", float(seconds))
+        timings.record("a-cai", "stop", 2.0)
+
+        assert percentile([3.0, 1.0, 2.0], 50) == 2.0
+        assert timings.stage_percentiles() == {"deploy": (50.0, 95.0), "stop": (2.0, 2.0)}
+
+    def test_span_is_recorded_when_the_stage_raises(self):
+        sink = []
+        timings = StageTimings(sink=lambda address, stage, seconds: sink.append((address, stage)))
+
+        try:
+            with timings.span("a-cai", "deploy"):
+                raise RuntimeError("dfx failed")
+        except RuntimeError:
+            pass
+
+        assert sink == [("a-cai", "deploy")]
+        assert len(timings.durations["deploy"]) == 1
+
+    def test_eta_from_the_throughput_so_far(self):
+        timings = StageTimings()
+        with patch("stage_timings.time.monotonic", return_value=1000.0):
+            timings.start_run(total=10)
+        assert timings.eta() is None
+
+        timings.finished("a-cai")
+        timings.finished("b-cai")
+        timings.finished("b-cai")
+        with patch("stage_timings.time.monotonic", return_value=1060.0):
+            # 2 mAIners in 60s: 8 left take 240s
+            assert timings.eta() == 240.0
+            assert "2/10 mAIner(s) done, 2.0/min, ETA 4m 0s" in timings.progress()
+
+    def test_report_from_the_status_stream(self, tmp_path):
+        stream = StatusStream.open(tmp_path / "status.jsonl", script="test")
+        timings = StageTimings(sink=stream.span)
+        timings.record("a-cai", "deploy", 45.0)
+        timings.record("b-cai", "deploy", 700.0)
+        timings.record("a-cai", "health", 3.0)
+        stream.close()
+
+        report = timings_from_events(read_events(tmp_path / "status.jsonl")).report()
+
+        assert report == timings.report()
+        assert report["deploy"]["histogram"] == [0, 0, 0, 0, 0, 0, 1, 0, 0, 0, 1]
+        assert report["deploy"]["max"] == 700.0
+        lines = histogram_lines(report)
+        assert lines[1].split()[0] == "deploy"
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add parent directory to path to import the module
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import status_stream
+from status_stream import StatusStream, read_events, rollup
+
+
+class TestStatusStream:
+    """Test writing, rolling up and following a status stream."""
+
+    def test_rollup_keeps_last_status(self, tmp_path):
+        stream = StatusStream.open(tmp_path / "status.jsonl", script="test", network="prd")
+        stream.emit("a-cai", "in_progress")
+        stream.emit("b-cai", "in_progress")
+        stream.emit("a-cai", "success")
+        stream.emit("b-cai", "failed_health", "Health check failed")
+        assert stream.counts == {"in_progress": 0, "success": 1, "failed_health": 1}
+        stream.close()
+
+        result = rollup(read_events(tmp_path / "status.jsonl"))
+
+        assert result["run"]["network"] == "prd"
+        assert result["ended"] is not None
+        assert result["counts"] == {"success": 1, "failed_health": 1}
+        assert result["mainers"]["b-cai"]["error"] == "Health check failed"
+
+    def test_incomplete_line_is_not_read(self, tmp_path):
+        path = tmp_path / "status.jsonl"
+        path.write_text('{"event": "status", "address": "a-cai", "status": "success"}\n{"event": "sta')
+
+        events = list(read_events(path))
+
+        assert [event["address"] for event in events] == ["a-cai"]
+
+    def test_follow_until_end_of_run(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(status_stream, "FOLLOW_INTERVAL", 0.01)
+        stream = StatusStream.open(tmp_path / "status.jsonl", script="test")
+
+        def writer():
+            time.sleep(0.05)
+            stream.emit("a-cai", "success")
+            stream.close()
+        thread = threading.Thread(target=writer)
+        thread.start()
+
+        events = list(read_events(tmp_path / "status.jsonl", follow=True))
+        thread.join()
+
+        assert [event["event"] for event in events] == ["run", "status", "end"]
+
+    def test_runs_are_appended(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(status_stream, "FOLLOW_INTERVAL", 0.01)
+        path = tmp_path / "status.jsonl"
+        first = StatusStream.open(path, script="test", network="prd")
+        first.emit("a-cai", "failed_health", "Health check failed")
+        first.close()
+        second = StatusStream.open(path, script="test", network="prd", resume=True)
+        second.emit("a-cai", "success")
+        second.close()
+
+        assert [event["event"] for event in read_events(path)] == ["run", "status", "end", "run", "status", "end"]
+        assert rollup(read_events(path))["counts"] == {"success": 1}
+        followed = list(read_events(path, follow=True))
+        assert followed[0]["resume"] is True
+        assert [event["event"] for event in followed] == ["run", "status", "end"]
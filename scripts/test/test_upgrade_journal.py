@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import the module
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import upgrade_journal
+from upgrade_journal import UpgradeJournal
+
+
+class TestUpgradeJournal:
+    """Test recording and resuming upgrade steps."""
+
+    def test_resume_continues_at_last_step(self, tmp_path):
+        journal = UpgradeJournal.open("prd", "0xhash", path=tmp_path / "journal.jsonl")
+        journal.record("a-cai", upgrade_journal.STOPPED, canister_name=None, pre_upgrade_hash="0xold", was_stopped=False)
+        journal.record("a-cai", upgrade_journal.SNAPSHOT, snapshot_id="0000000000000001")
+        journal.record("a-cai", upgrade_journal.FAILED, reason="Upgrade failed")
+        journal.record("b-cai", upgrade_journal.VERIFIED)
+        journal.close()
+
+        resumed = UpgradeJournal.open("prd", "0xhash", resume=True, path=tmp_path / "journal.jsonl")
+
+        assert resumed.reached("a-cai", upgrade_journal.SNAPSHOT)
+        assert not resumed.reached("a-cai", upgrade_journal.DEPLOYED)
+        assert resumed.data("a-cai")["snapshot_id"] == "0000000000000001"
+        assert resumed.is_done("b-cai")
+        assert not resumed.is_done("c-cai")
+
+    def test_resume_of_a_resumed_run(self, tmp_path):
+        path = tmp_path / "journal.jsonl"
+        first = UpgradeJournal.open("prd", "0xhash", path=path)
+        first.record("a-cai", upgrade_journal.FLAG_ON)
+        first.close()
+        second = UpgradeJournal.open("prd", "0xhash", resume=True, path=path)
+        second.record("b-cai", upgrade_journal.SKIPPED, reason="skipped_upgraded")
+        second.close()
+
+        third = UpgradeJournal.open("prd", "0xhash", resume=True, path=path)
+
+        assert third.reached("a-cai", upgrade_journal.FLAG_ON)
+        assert third.is_done("b-cai")
+
+    def test_other_target_hash_or_fresh_run_is_not_resumed(self, tmp_path):
+        path = tmp_path / "journal.jsonl"
+        old = UpgradeJournal.open("prd", "0xold", path=path)
+        old.record("a-cai", upgrade_journal.VERIFIED)
+        old.close()
+
+        assert not UpgradeJournal.open("prd", "0xnew", resume=True, path=path).is_done("a-cai")
+        assert not UpgradeJournal.open("prd", "0xold", path=path).is_done("a-cai")
+
+    def test_released_mainer_starts_over(self, tmp_path):
+        journal = UpgradeJournal.open("prd", "0xhash", path=tmp_path / "journal.jsonl")
+        journal.record("a-cai", upgrade_journal.STOPPED)
+        journal.record("a-cai", upgrade_journal.RELEASED)
+
+        assert not journal.reached("a-cai", upgrade_journal.FLAG_ON)
+
+    def test_torn_line_is_ignored(self, tmp_path):
+        path = tmp_path / "journal.jsonl"
+        journal = UpgradeJournal.open("prd", "0xhash", path=path)
+        journal.record("a-cai", upgrade_journal.VERIFIED)
+        journal.close()
+        with open(path, "a") as f:
+            f.write('{"address": "b-cai", "st')
+
+        assert UpgradeJournal.open("prd", "0xhash", resume=True, path=path).is_done("a-cai")
+
+    def test_failed_after_verified_is_not_done(self, tmp_path):
+        path = tmp_path / "journal.jsonl"
+        journal = UpgradeJournal.open("prd", "0xhash", path=path)
+        journal.record("a-cai", upgrade_journal.VERIFIED)
+        journal.record("a-cai", upgrade_journal.FAILED, reason="Health check failed after its wave completed")
+        journal.record("b-cai", upgrade_journal.VERIFIED)
+
+        assert not journal.is_done("a-cai")
+        assert journal.is_done("b-cai")
+        journal.close()
+
+        resumed = UpgradeJournal.open("prd", "0xhash", resume=True, path=path)
+        assert not resumed.is_done("a-cai")
+        assert resumed.reached("a-cai", upgrade_journal.STARTED)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+
+import subprocess
+import sys
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# upgrade_llms reads the canister ids of a network with python-dotenv, and is imported as part of the scripts package
+pytest.importorskip("dotenv")
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from scripts import upgrade_llms
+from scripts.upgrade_llms import PoolCapacity
+
+
+class TestPoolCapacity:
+    """Test that LLMs are only taken out of a controller while min_online others stay registered."""
+
+    def test_take_keeps_min_online_registered(self):
+        capacity = PoolCapacity(["llm0-cai", "llm1-cai", "llm2-cai"], min_online=2)
+
+        assert capacity.take("llm0-cai")
+        capacity.give_back("llm0-cai", registered=False)
+
+        # Nothing in flight could give the capacity back: do not wait for it
+        assert not capacity.take("llm1-cai")
+        assert capacity.online == {"llm1-cai", "llm2-cai"}
+
+    def test_unregistered_llm_can_always_be_taken(self):
+        capacity = PoolCapacity(["llm0-cai"], min_online=1)
+
+        assert capacity.take("llm9-cai")
+        assert capacity.in_flight == 1
+
+    def test_take_waits_for_an_upgraded_llm(self):
+        capacity = PoolCapacity(["llm0-cai", "llm1-cai"], min_online=1)
+        assert capacity.take("llm0-cai")
+        taken = []
+
+        waiter = threading.Thread(target=lambda: taken.append(capacity.take("llm1-cai")))
+        waiter.start()
+        waiter.join(0.2)
+        assert waiter.is_alive()
+
+        capacity.give_back("llm0-cai", registered=True)
+        waiter.join(5)
+        assert taken == [True]
+        assert capacity.online == {"llm0-cai"}
+
+
+class TestUpgradeLlmRolling:
+    """Test the unattended upgrade of one LLM of a pool."""
+
+    @pytest.fixture(autouse=True)
+    def mocks(self):
+        with patch.object(upgrade_llms, "run_this_cmd") as run_this_cmd, \
+                patch.object(upgrade_llms, "registered_llms") as registered_llms, \
+                patch.object(upgrade_llms, "wait_until_drained"), \
+                patch.object(upgrade_llms, "upgrade_llm_canister") as upgrade_llm_canister, \
+                patch.object(upgrade_llms, "canister_index") as canister_index:
+            canister_index.return_value.name.return_value = "llm_0"
+            self.run_this_cmd = run_this_cmd
+            self.registered_llms = registered_llms
+            self.upgrade_llm_canister = upgrade_llm_canister
+            yield
+
+    def upgrade(self, capacity):
+        return upgrade_llms.upgrade_llm_rolling("testing", capacity, "ctrl-cai", "judge", "/tmp/llms/Judge",
+                                                "LLM_0", "llm0-cai")
+
+    def test_skipped_when_it_would_leave_too_few_online(self):
+        capacity = PoolCapacity(["llm0-cai"], min_online=1)
+
+        assert self.upgrade(capacity) == "skipped"
+        self.run_this_cmd.assert_not_called()
+        self.upgrade_llm_canister.assert_not_called()
+
+    def test_upgraded_llm_is_registered_again(self):
+        capacity = PoolCapacity(["llm0-cai", "llm1-cai"], min_online=1)
+        self.registered_llms.return_value = ["llm0-cai", "llm1-cai"]
+
+        assert self.upgrade(capacity) == "upgraded"
+        commands = [c.args[0][6] for c in self.run_this_cmd.call_args_list]
+        assert commands == ["remove_llm_canister", "add_llm_canister"]
+        assert capacity.online == {"llm0-cai", "llm1-cai"}
+        assert capacity.in_flight == 0
+
+    def test_failed_upgrade_does_not_give_the_llm_back(self):
+        capacity = PoolCapacity(["llm0-cai", "llm1-cai"], min_online=1)
+        self.upgrade_llm_canister.side_effect = subprocess.CalledProcessError(1, ["dfx", "deploy"])
+
+        assert self.upgrade(capacity) == "failed"
+        assert capacity.online == {"llm1-cai"}
+        assert capacity.in_flight == 0
+
+
+class TestUpgradeLlmCanister:
+    """Test that an LLM is put back into service when its upgrade fails after it was stopped."""
+
+    def upgrade(self):
+        upgrade_llms.upgrade_llm_canister("testing", "ctrl-cai", "judge", "/tmp/llms/Judge", "LLM_0", "llm0-cai",
+                                          "llm_0", interactive=False)
+
+    @patch.object(upgrade_llms.time, "sleep")
+    @patch.object(upgrade_llms.subprocess, "run")
+    @patch.object(upgrade_llms, "run_this_cmd")
+    def test_failed_health_check_restores_the_snapshot(self, run_this_cmd, run, sleep):
+        run.return_value = subprocess.CompletedProcess(
+            [], 0, stdout="", stderr="Created a new snapshot of canister llm0-cai. Snapshot ID: 0000000001")
+
+        def dfx(cmd, cwd, confirm=False):
+            if cmd[-1] == "health":
+                raise subprocess.CalledProcessError(1, cmd)
+        run_this_cmd.side_effect = dfx
+
+        with pytest.raises(subprocess.CalledProcessError):
+            self.upgrade()
+
+        commands = [c.args[0] for c in run_this_cmd.call_args_list]
+        assert commands[-3:] == [
+            ["dfx", "canister", "--network", "testing", "stop", "llm0-cai"],
+            ["dfx", "canister", "--network", "testing", "snapshot", "load", "llm0-cai", "0000000001"],
+            ["dfx", "canister", "--network", "testing", "start", "llm0-cai"],
+        ]
+
+    @patch.object(upgrade_llms.subprocess, "run")
+    @patch.object(upgrade_llms, "run_this_cmd")
+    def test_failed_deploy_starts_the_llm_again(self, run_this_cmd, run):
+        run.return_value = subprocess.CompletedProcess([], 0, stdout="", stderr="Snapshot ID: 0000000001")
+
+        def dfx(cmd, cwd, confirm=False):
+            if cmd[1] == "deploy":
+                raise subprocess.CalledProcessError(1, cmd)
+        run_this_cmd.side_effect = dfx
+
+        with pytest.raises(subprocess.CalledProcessError):
+            self.upgrade()
+
+        assert run_this_cmd.call_args_list[-1].args[0] == ["dfx", "canister", "--network", "testing", "start", "llm0-cai"]
+        assert not any("load" in c.args[0] for c in run_this_cmd.call_args_list)
+
+    def test_one_dfx_deploy_at_a_time_per_project(self):
+        assert upgrade_llms.dfx_project_lock("/tmp/llms/Judge") is upgrade_llms.dfx_project_lock("/tmp/llms/Judge/")
+        assert upgrade_llms.dfx_project_lock("/tmp/llms/Judge") is not upgrade_llms.dfx_project_lock("/tmp/llms/mAIner")
@@ -4,6 +4,8 @@ import pytest
 import sys
 import json
 import subprocess
+import threading
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
 from unittest.mock import Mock, MagicMock, patch, call, mock_open
@@ -135,6 +137,21 @@ class TestRunCommand:
         with pytest.raises(subprocess.CalledProcessError):
             upgrade_mainers.run_command(['test', 'command'])
 
+    @patch('upgrade_mainers.time.sleep')
+    @patch('upgrade_mainers.subprocess.run')
+    def test_upgrade_steps_ignore_the_circuit_breaker(self, mock_run, mock_sleep):
+        """Test that a mutating step retries up to max_retries, past the breaker threshold."""
+        timeout = subprocess.CalledProcessError(returncode=1, cmd=['dfx'], stderr="request timed out")
+        ok = subprocess.CompletedProcess(args=['dfx'], returncode=0, stdout="", stderr="")
+        command = ["dfx", "canister", "--network", "ic", "start", "a-cai"]
+
+        mock_run.side_effect = [timeout] * 4 + [ok]
+        assert upgrade_mainers.run_command(command, retry_on_transient_errors=True, max_retries=5) is ok
+
+        mock_run.side_effect = [timeout] * 4 + [ok]
+        with pytest.raises(subprocess.CalledProcessError):
+            upgrade_mainers.run_command(command, retry_on_transient_errors=True, max_retries=5, fail_fast=True)
+
 
 class TestGetMainers:
     """Test the get_mainers function."""
@@ -541,6 +558,62 @@ class TestUpgradeCanister:
 
         assert result is False
 
+    @patch('upgrade_mainers.load_canister_index')
+    def test_one_dfx_deploy_at_a_time(self, mock_index):
+        """Test that parallel upgrades do not run `dfx deploy` in the shared project folder at the same time."""
+        mock_index.return_value.address.return_value = 'aaaaa-aaaaa-aaaaa-aaaaa-cai'
+        running = []
+        overlapped = []
+
+        def deploy(*args):
+            running.append(args)
+            overlapped.append(len(running) > 1)
+            time.sleep(0.05)
+            running.pop()
+            return True
+
+        with patch.object(upgrade_mainers, 'install_with_cycles_top_up', side_effect=deploy):
+            threads = [threading.Thread(target=upgrade_mainers.upgrade_canister,
+                                        args=('testing', f'mainer_share_agent_000{i}')) for i in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert overlapped == [False, False, False]
+
+
+class TestInstallByHash:
+    """Test installing a prebuilt wasm by canister ID."""
+
+    def test_wasm_module_hash(self, tmp_path):
+        """Test that the module hash is the sha256 of the wasm file, like dfx prints it."""
+        wasm = tmp_path / "mainer.wasm"
+        wasm.write_bytes(b"\0asm")
+
+        assert upgrade_mainers.wasm_module_hash(wasm) == (
+            "0xcd5d4935a48c0672cb06407bb443bc0087aff947c6b864bac886982c73b3027f")
+
+    @patch('upgrade_mainers.run_command')
+    def test_install_mainer_wasm(self, mock_run, tmp_path):
+        """Test that the wasm is installed by canister ID in upgrade mode."""
+        wasm = tmp_path / "mainer.wasm"
+        mock_run.return_value = Mock(returncode=0)
+
+        result = upgrade_mainers.install_mainer_wasm('testing', 'abc-cai', wasm)
+
+        assert result is True
+        command = mock_run.call_args[0][0]
+        assert command[:7] == ["dfx", "canister", "install", "--network", "testing", "abc-cai", "--mode"]
+        assert command[command.index("--wasm") + 1] == str(wasm)
+
+    @patch('upgrade_mainers.run_command')
+    def test_install_mainer_wasm_failure(self, mock_run, tmp_path):
+        """Test a failed install."""
+        mock_run.side_effect = subprocess.CalledProcessError(1, ["dfx"], stderr="Canister trapped")
+
+        assert upgrade_mainers.install_mainer_wasm('testing', 'abc-cai', tmp_path / "mainer.wasm") is False
+
 
 class TestCheckHealth:
     """Test the check_health function."""
@@ -1411,3 +1484,424 @@ class TestFilterMainers:
 
         # Should exit because no valid mainers found
         assert exc_info.value.code == 0
+
+
+class TestRunUpgradeWaves:
+    """Test the parallel, wave-based upgrade mode."""
+
+    MAINERS = [{'address': f'mainer{i}-cai'} for i in range(6)]
+
+    @pytest.fixture(autouse=True)
+    def not_interrupted(self, monkeypatch):
+        monkeypatch.setattr(upgrade_mainers, 'interrupted', False)
+        monkeypatch.setattr(upgrade_mainers, 'log_file_handle', None)
+
+    @patch('upgrade_mainers.check_health', return_value=(True, None))
+    @patch('upgrade_mainers.upgrade_mainer', return_value=True)
+    @patch('upgrade_mainers.should_skip_upgrade', return_value=(False, None))
+    def test_all_waves_upgrade(self, mock_skip, mock_upgrade, mock_health):
+        """Test that every mAIner is upgraded and health-gated once."""
+        result = upgrade_mainers.run_upgrade_waves('testing', self.MAINERS, '0xhash', parallel=3, wave_size=2)
+
+        assert result == (6, 0, 0)
+        assert mock_upgrade.call_count == 6
+        assert mock_health.call_count == 6
+
+    @patch('upgrade_mainers.check_health', return_value=(True, None))
+    @patch('upgrade_mainers.upgrade_mainer')
+    @patch('upgrade_mainers.should_skip_upgrade', return_value=(False, None))
+    def test_failure_aborts_next_waves(self, mock_skip, mock_upgrade, mock_health):
+        """Test that with the default failure rate the first failure stops new upgrades."""
+        mock_upgrade.side_effect = lambda network, mainer, *args: mainer['address'] != 'mainer1-cai'
+
+        successful, failed, skipped = upgrade_mainers.run_upgrade_waves(
+            'testing', self.MAINERS, '0xhash', parallel=1, wave_size=2)
+
+        assert (successful, failed) == (1, 1)
+        assert mock_upgrade.call_count == 2
+
+    @patch('upgrade_mainers.check_health', return_value=(True, None))
+    @patch('upgrade_mainers.upgrade_mainer')
+    @patch('upgrade_mainers.should_skip_upgrade', return_value=(False, None))
+    def test_failure_rate_tolerates_some_failures(self, mock_skip, mock_upgrade, mock_health):
+        """Test that failures below the maximum failure rate do not abort the run."""
+        mock_upgrade.side_effect = lambda network, mainer, *args: mainer['address'] != 'mainer1-cai'
+
+        result = upgrade_mainers.run_upgrade_waves(
+            'testing', self.MAINERS, '0xhash', parallel=2, wave_size=2, max_failure_rate=0.5)
+
+        assert result == (5, 1, 0)
+
+    @patch('upgrade_mainers.check_health')
+    @patch('upgrade_mainers.upgrade_mainer', return_value=True)
+    @patch('upgrade_mainers.should_skip_upgrade', return_value=(False, None))
+    def test_unhealthy_wave_stops_rollout(self, mock_skip, mock_upgrade, mock_health):
+        """Test that the next wave does not start when the previous one is not healthy."""
+        mock_health.side_effect = lambda network, address, dry_run: (address != 'mainer0-cai', None)
+
+        result = upgrade_mainers.run_upgrade_waves('testing', self.MAINERS, '0xhash', parallel=2, wave_size=2)
+
+        assert result == (1, 1, 0)
+        assert mock_upgrade.call_count == 2
+
+    @patch('upgrade_mainers.upgrade_mainer')
+    @patch('upgrade_mainers.should_skip_upgrade', return_value=(True, "already_upgraded"))
+    def test_skipped_mainers_are_not_upgraded(self, mock_skip, mock_upgrade):
+        """Test that mAIners already at the target hash are skipped."""
+        result = upgrade_mainers.run_upgrade_waves('testing', self.MAINERS, '0xhash', parallel=3)
+
+        assert result == (0, 0, 6)
+        mock_upgrade.assert_not_called()
+
+    @patch('upgrade_mainers.time.sleep')
+    @patch('upgrade_mainers.queue_busy_until')
+    @patch('upgrade_mainers.check_health', return_value=(True, None))
+    @patch('upgrade_mainers.upgrade_mainer', return_value=True)
+    @patch('upgrade_mainers.should_skip_upgrade', return_value=(False, None))
+    def test_active_queue_is_deferred_to_the_next_wave(self, mock_skip, mock_upgrade, mock_health,
+                                                       mock_busy, mock_sleep):
+        """Test that a mAIner with an active challenge queue does not hold up its wave."""
+        busy = {'mainer3-cai': [datetime.now() + timedelta(minutes=5)]}
+        mock_busy.side_effect = lambda network, address: (busy.get(address) or [None]).pop(0)
+
+        result = upgrade_mainers.run_upgrade_waves('testing', self.MAINERS[:4], '0xhash', parallel=2, wave_size=2)
+
+        assert result == (4, 0, 0)
+        assert mock_upgrade.call_args_list[-1].args[1]['address'] == 'mainer3-cai'
+        mock_sleep.assert_called_once()
+        assert 240 < mock_sleep.call_args.args[0] <= 300
+
+
+class TestCanaryRollout:
+    """Test the canary waves with soak window and automatic rollback (--canary)."""
+
+    MAINERS = [{'address': f'mainer{i}-cai'} for i in range(8)]
+
+    @pytest.fixture(autouse=True)
+    def not_interrupted(self, monkeypatch):
+        monkeypatch.setattr(upgrade_mainers, 'interrupted', False)
+        monkeypatch.setattr(upgrade_mainers, 'log_file_handle', None)
+        monkeypatch.setattr(upgrade_mainers, 'upgrade_snapshots', {})
+
+    @staticmethod
+    def deploy(failing=()):
+        """upgrade_mainer stand-in: records the snapshot of the deployed mAIner, fails those in `failing`."""
+        def upgrade(network, mainer, *args):
+            address = mainer['address']
+            upgrade_mainers.upgrade_snapshots[address] = f'snap-{address}'
+            if address in failing:
+                upgrade_mainers.update_mainer_status(address, upgrade_mainers.MainerStatus.FAILED_OTHER, "Hash mismatch")
+                return False
+            return True
+        return upgrade
+
+    def test_plan_waves_ramps_up_to_wave_size(self):
+        """Test that the waves start at the canary size and grow by the ramp factor up to the wave size."""
+        waves = upgrade_mainers.plan_waves(self.MAINERS, 3, canary=1, ramp=2.0)
+
+        assert [len(wave) for wave in waves] == [1, 2, 3, 2]
+
+    @patch('upgrade_mainers.restore_snapshot', return_value=True)
+    @patch('upgrade_mainers.check_health', return_value=(True, None))
+    @patch('upgrade_mainers.upgrade_mainer')
+    @patch('upgrade_mainers.should_skip_upgrade', return_value=(False, None))
+    @patch('upgrade_mainers.time.sleep')
+    def test_healthy_canary_soaks_then_ramps(self, mock_sleep, mock_skip, mock_upgrade, mock_health, mock_restore):
+        """Test that every wave but the last is soaked and that nothing is rolled back."""
+        mock_upgrade.side_effect = self.deploy()
+
+        result = upgrade_mainers.run_upgrade_waves(
+            'testing', self.MAINERS, '0xhash', parallel=2, canary=1, soak=120, ramp=2.0)
+
+        assert result == (8, 0, 0)
+        # waves of 1, 2, 4 and 1: gate of every wave, plus 2 soak checks of the first three
+        assert mock_health.call_count == 8 + 2 * 7
+        mock_restore.assert_not_called()
+
+    @patch('upgrade_mainers.restore_snapshot', return_value=True)
+    @patch('upgrade_mainers.check_health', return_value=(True, None))
+    @patch('upgrade_mainers.upgrade_mainer')
+    @patch('upgrade_mainers.should_skip_upgrade', return_value=(False, None))
+    @patch('upgrade_mainers.time.sleep')
+    def test_failed_canary_is_rolled_back_and_halts(self, mock_sleep, mock_skip, mock_upgrade, mock_health, mock_restore):
+        """Test that a canary failing its hash verification is restored from its snapshot and halts the rollout."""
+        mock_upgrade.side_effect = self.deploy(failing={'mainer1-cai'})
+
+        result = upgrade_mainers.run_upgrade_waves(
+            'testing', self.MAINERS, '0xhash', parallel=1, canary=2, soak=0, max_failure_rate=0.5)
+
+        assert result == (1, 1, 0)
+        assert mock_upgrade.call_count == 2
+        mock_restore.assert_called_once_with('testing', 'mainer1-cai', 'snap-mainer1-cai', False)
+        assert upgrade_mainers.mainer_status_tracker['mainer1-cai']['status'] == upgrade_mainers.MainerStatus.ROLLED_BACK
+
+    @patch('upgrade_mainers.restore_snapshot', return_value=True)
+    @patch('upgrade_mainers.check_health')
+    @patch('upgrade_mainers.upgrade_mainer')
+    @patch('upgrade_mainers.should_skip_upgrade', return_value=(False, None))
+    @patch('upgrade_mainers.time.sleep')
+    def test_unhealthy_during_soak_is_rolled_back(self, mock_sleep, mock_skip, mock_upgrade, mock_health, mock_restore):
+        """Test that a canary turning unhealthy during the soak window is rolled back before the next wave."""
+        mock_upgrade.side_effect = self.deploy()
+        checks = []
+
+        def health(network, address, dry_run):
+            checks.append(address)
+            return (len(checks) < 3, None)
+        mock_health.side_effect = health
+
+        result = upgrade_mainers.run_upgrade_waves(
+            'testing', self.MAINERS, '0xhash', parallel=1, canary=1, soak=180)
+
+        assert result == (0, 1, 0)
+        assert mock_upgrade.call_count == 1
+        mock_restore.assert_called_once_with('testing', 'mainer0-cai', 'snap-mainer0-cai', False)
+
+    @patch('upgrade_mainers.restore_snapshot')
+    @patch('upgrade_mainers.upgrade_mainer', return_value=False)
+    @patch('upgrade_mainers.should_skip_upgrade', return_value=(False, None))
+    def test_failure_before_deploy_is_not_rolled_back(self, mock_skip, mock_upgrade, mock_restore):
+        """Test that a mAIner that failed before its deploy (no snapshot in this run) is not restored."""
+        result = upgrade_mainers.run_upgrade_waves('testing', self.MAINERS, '0xhash', canary=1, soak=0)
+
+        assert result == (0, 1, 0)
+        mock_restore.assert_not_called()
+
+    @patch('upgrade_mainers.turn_off_maintenance_flag', return_value=True)
+    @patch('upgrade_mainers.start_timer', return_value=True)
+    @patch('upgrade_mainers.start_canister', return_value=True)
+    @patch('upgrade_mainers.stop_canister', return_value=True)
+    @patch('upgrade_mainers.run_command')
+    def test_restore_snapshot_loads_and_restarts(self, mock_run, mock_stop, mock_start, mock_timer, mock_flag):
+        """Test that a restore stops the canister, loads the snapshot and puts it back into service."""
+        assert upgrade_mainers.restore_snapshot('testing', 'mainer0-cai', 'snap0') is True
+
+        mock_run.assert_called_once()
+        assert mock_run.call_args.args[0] == ["dfx", "canister", "--network", "testing", "snapshot", "load", "mainer0-cai", "snap0"]
+        mock_start.assert_called_once()
+        mock_timer.assert_called_once()
+        mock_flag.assert_called_once()
+
+    @patch('upgrade_mainers.start_canister')
+    @patch('upgrade_mainers.stop_canister', return_value=True)
+    @patch('upgrade_mainers.run_command', side_effect=Exception("snapshot not found"))
+    def test_restore_snapshot_load_failure_leaves_canister_stopped(self, mock_run, mock_stop, mock_start):
+        """Test that a canister whose snapshot could not be loaded is not started again."""
+        assert upgrade_mainers.restore_snapshot('testing', 'mainer0-cai', 'snap0') is False
+
+        mock_start.assert_not_called()
+
+
+class TestUpgradeQueue:
+    """Test the deferral of mAIners with an active challenge queue."""
+
+    MAINERS = [{'address': f'mainer{i}-cai'} for i in range(3)]
+
+    @pytest.fixture(autouse=True)
+    def no_log_file(self, monkeypatch):
+        monkeypatch.setattr(upgrade_mainers, 'log_file_handle', None)
+
+    @patch('upgrade_mainers.time.sleep')
+    def test_deferred_mainer_comes_after_the_others(self, mock_sleep):
+        """Test that a deferred mAIner is upgraded after the ready ones, waiting only for what is left of its queue."""
+        queue = upgrade_mainers.UpgradeQueue(self.MAINERS)
+        order = []
+        for index, mainer in queue:
+            order.append(index)
+            if index == 0 and order.count(0) == 1:
+                assert queue.defer(index, mainer, datetime.now() + timedelta(minutes=5))
+
+        assert order == [0, 1, 2, 0]
+        mock_sleep.assert_called_once()
+        assert 240 < mock_sleep.call_args.args[0] <= 300
+
+    @patch('upgrade_mainers.time.sleep')
+    def test_quiet_deferred_mainer_is_not_waited_for(self, mock_sleep):
+        """Test that a deferred mAIner whose queue is already quiet comes back without waiting."""
+        queue = upgrade_mainers.UpgradeQueue(self.MAINERS)
+        order = []
+        for index, mainer in queue:
+            order.append(index)
+            if index == 0 and order.count(0) == 1:
+                queue.defer(index, mainer, datetime.now() - timedelta(seconds=1))
+
+        assert order == [0, 0, 1, 2]
+        mock_sleep.assert_not_called()
+
+    def test_deferrals_are_limited(self):
+        """Test that a mAIner is deferred at most MAX_QUEUE_DEFERRALS times."""
+        queue = upgrade_mainers.UpgradeQueue(self.MAINERS)
+        quiet_at = datetime.now()
+
+        deferred = [queue.defer(0, self.MAINERS[0], quiet_at) for _ in range(upgrade_mainers.MAX_QUEUE_DEFERRALS + 1)]
+
+        assert deferred == [True] * upgrade_mainers.MAX_QUEUE_DEFERRALS + [False]
+
+
+class TestRunUpgradePipeline:
+    """Test the pipelined upgrade mode (--lookahead)."""
+
+    MAINERS = [{'address': f'mainer{i}-cai'} for i in range(4)]
+    PREPARED = {'canister_name': 'mainer', 'pre_upgrade_hash': '0xold', 'was_stopped': False}
+
+    @pytest.fixture(autouse=True)
+    def not_interrupted(self, monkeypatch):
+        monkeypatch.setattr(upgrade_mainers, 'interrupted', False)
+        monkeypatch.setattr(upgrade_mainers, 'log_file_handle', None)
+
+    @patch('upgrade_mainers.complete_upgrade', return_value=True)
+    @patch('upgrade_mainers.prepare_mainer')
+    @patch('upgrade_mainers.should_skip_upgrade', return_value=(False, None))
+    def test_upgrades_in_order(self, mock_skip, mock_prepare, mock_complete):
+        """Test that every mAIner is prepared once and upgraded in order."""
+        mock_prepare.return_value = self.PREPARED
+
+        result = upgrade_mainers.run_upgrade_pipeline('testing', self.MAINERS, '0xhash', lookahead=2)
+
+        assert result == (4, 0, 0)
+        assert mock_prepare.call_count == 4
+        assert [c.args[1] for c in mock_complete.call_args_list] == [m['address'] for m in self.MAINERS]
+
+    @patch('upgrade_mainers.turn_off_maintenance_flag', return_value=True)
+    @patch('upgrade_mainers.start_timer', return_value=True)
+    @patch('upgrade_mainers.start_canister', return_value=True)
+    @patch('upgrade_mainers.complete_upgrade', return_value=False)
+    @patch('upgrade_mainers.prepare_mainer')
+    @patch('upgrade_mainers.should_skip_upgrade', return_value=(False, None))
+    def test_failure_releases_prepared_mainers(self, mock_skip, mock_prepare, mock_complete,
+                                               mock_start, mock_start_timer, mock_flag_off):
+        """Test that a failure stops the run and restarts the mAIners prepared ahead of it."""
+        import threading
+        lookahead_prepared = threading.Event()
+
+        def prepare(network, mainer, dry_run, index):
+            if index == 1:
+                lookahead_prepared.set()
+            return self.PREPARED
+        mock_prepare.side_effect = prepare
+        mock_complete.side_effect = lambda *args: not lookahead_prepared.wait(5)
+
+        result = upgrade_mainers.run_upgrade_pipeline('testing', self.MAINERS, '0xhash', lookahead=1)
+
+        assert result == (0, 1, 0)
+        mock_complete.assert_called_once()
+        mock_start.assert_called_once_with('testing', 'mainer1-cai', False)
+        mock_flag_off.assert_called_once_with('testing', 'mainer1-cai', False)
+        assert upgrade_mainers.mainer_status_tracker['mainer1-cai']['status'] == upgrade_mainers.MainerStatus.PENDING
+
+
+    @patch('upgrade_mainers.time.sleep')
+    @patch('upgrade_mainers.queue_busy_until')
+    @patch('upgrade_mainers.complete_upgrade', return_value=True)
+    @patch('upgrade_mainers.prepare_mainer')
+    @patch('upgrade_mainers.should_skip_upgrade', return_value=(False, None))
+    def test_active_queue_is_deferred(self, mock_skip, mock_prepare, mock_complete, mock_busy, mock_sleep):
+        """Test that the mAIners behind one with an active challenge queue are upgraded first."""
+        mock_prepare.return_value = self.PREPARED
+        busy = {'mainer0-cai': [datetime.now() + timedelta(minutes=5)]}
+        mock_busy.side_effect = lambda network, address: (busy.get(address) or [None]).pop(0)
+
+        result = upgrade_mainers.run_upgrade_pipeline('testing', self.MAINERS, '0xhash', lookahead=1)
+
+        assert result == (4, 0, 0)
+        assert [c.args[1] for c in mock_complete.call_args_list] == [
+            'mainer1-cai', 'mainer2-cai', 'mainer3-cai', 'mainer0-cai']
+        mock_sleep.assert_called_once()
+
+
+class TestResumeFromJournal:
+    """Test that upgrades resume at the step recorded in the journal."""
+
+    @pytest.fixture
+    def journal(self, tmp_path, monkeypatch):
+        journal = upgrade_mainers.UpgradeJournal.open('testing', '0xhash', path=tmp_path / 'journal.jsonl')
+        monkeypatch.setattr(upgrade_mainers, 'upgrade_journal', journal)
+        monkeypatch.setattr(upgrade_mainers, 'log_file_handle', None)
+        yield journal
+        journal.close()
+
+    @patch('upgrade_mainers.should_skip_upgrade')
+    def test_done_mainer_is_skipped_without_calls(self, mock_should_skip, journal):
+        journal.record('abc-cai', 'verified')
+
+        assert upgrade_mainers.check_skip('testing', 'abc-cai', '0xhash') is True
+        mock_should_skip.assert_not_called()
+
+    @patch('upgrade_mainers.complete_upgrade', return_value=True)
+    @patch('upgrade_mainers.get_canister_status')
+    def test_stopped_mainer_is_not_prepared_again(self, mock_status, mock_complete, journal):
+        journal.record('abc-cai', 'stopped', canister_name='mainer_ctrlb_canister_0', pre_upgrade_hash='0xold',
+                       was_stopped=False)
+
+        assert upgrade_mainers.upgrade_mainer('testing', {'address': 'abc-cai'}, '0xhash') is True
+        mock_status.assert_not_called()
+        assert mock_complete.call_args[0][2]['pre_upgrade_hash'] == '0xold'
+
+    @patch('upgrade_mainers.get_canister_wasm_hash', return_value='0xhash')
+    @patch('upgrade_mainers.poll_until')
+    @patch('upgrade_mainers.turn_off_maintenance_flag', return_value=True)
+    @patch('upgrade_mainers.start_timer', return_value=True)
+    @patch('upgrade_mainers.start_canister')
+    @patch('upgrade_mainers.upgrade_canister')
+    @patch('upgrade_mainers.create_snapshot')
+    def test_deployed_mainer_resumes_with_recorded_snapshot(
+        self, mock_snapshot, mock_upgrade, mock_start, mock_start_timer, mock_flag_off, mock_poll, mock_hash, journal
+    ):
+        journal.record('abc-cai', 'snapshot', snapshot_id='0000000000000007')
+        journal.record('abc-cai', 'deployed')
+        mock_start.return_value = True
+        mock_poll.side_effect = [Mock(ready=True, value=True, polls=1, elapsed=0.0),
+                                 Mock(ready=True, value=(True, 'ok'), polls=1, elapsed=0.0)]
+        prepared = {'canister_name': 'mainer_ctrlb_canister_0', 'pre_upgrade_hash': '0xold', 'was_stopped': False}
+
+        result = upgrade_mainers.complete_upgrade('testing', 'abc-cai', prepared, '0xhash')
+
+        assert result is True
+        mock_snapshot.assert_not_called()
+        mock_upgrade.assert_not_called()
+        mock_start.assert_called_once()
+        assert journal.step('abc-cai') == 'verified'
+
+
+class TestPreflight:
+    """Test the concurrent pre-flight pass against the fake IC."""
+
+    @pytest.fixture
+    def fake(self, monkeypatch):
+        import fake_ic
+        fake = fake_ic.FakeIC(fake_ic.FakeConfig(mainers=6, query_latency_ms=0, update_latency_ms=0))
+        fake.install('fake')
+        monkeypatch.setattr(upgrade_mainers, 'preflight_upgrades', set())
+        monkeypatch.setattr(upgrade_mainers, 'log_file_handle', None)
+        yield fake
+        fake.uninstall('fake')
+
+    def test_plan(self, fake):
+        for canister_id in fake.mainer_ids[:2]:
+            fake.install_code(canister_id)
+        mainers = [{'address': canister_id} for canister_id in fake.mainer_ids]
+        mainers.append({'address': 'aaaaa-aaaaa-aaaaa-aaaaa-cai'})
+
+        work_list, skipped = upgrade_mainers.run_preflight('fake', mainers, fake.config.upgraded_module_hash)
+
+        assert [m['address'] for m in work_list] == fake.mainer_ids[2:]
+        assert skipped == 3
+        assert upgrade_mainers.preflight_upgrades == set(fake.mainer_ids[2:])
+
+    def test_busy_queues_go_last(self, fake):
+        now = datetime.now().timestamp()
+        fake.queue_challenge(fake.mainer_ids[0], now - 60)
+        fake.queue_challenge(fake.mainer_ids[1], now - 300)
+        fake.queue_challenge(fake.mainer_ids[2], now - 3600)
+        mainers = [{'address': canister_id} for canister_id in fake.mainer_ids]
+
+        work_list, _ = upgrade_mainers.run_preflight('fake', mainers, fake.config.upgraded_module_hash)
+
+        assert [m['address'] for m in work_list] == fake.mainer_ids[2:] + [fake.mainer_ids[1], fake.mainer_ids[0]]
+
+    @patch('upgrade_mainers.should_skip_upgrade')
+    def test_planned_upgrade_is_not_checked_again(self, mock_should_skip, fake):
+        upgrade_mainers.run_preflight('fake', [{'address': fake.mainer_ids[0]}], fake.config.upgraded_module_hash)
+
+        assert upgrade_mainers.check_skip('fake', fake.mainer_ids[0], fake.config.upgraded_module_hash) is False
+        mock_should_skip.assert_not_called()
@@ -30,12 +30,27 @@ from typing import List, Dict, Optional
 import signal
 from pathlib import Path
 
+try:
+    from .response_cache import cached_call, add_cache_arguments, configure_cache_from_args, cache_stats_summary
+except ImportError:  # run directly or imported by the tests
+    from response_cache import cached_call, add_cache_arguments, configure_cache_from_args, cache_stats_summary
+
+try:
+    from .retry_policy import RETRY_BUDGET, RetryPolicy, canister_keys
+    from .status_stream import StatusStream
+except ImportError:  # run directly or imported by the tests
+    from retry_policy import RETRY_BUDGET, RetryPolicy, canister_keys
+    from status_stream import StatusStream
+
 # Get the directory of this script
 SCRIPT_DIR = Path(__file__).parent.resolve()
 
 # Log file path
 LOG_FILE_PATH = SCRIPT_DIR / "logs-admin-rbac" / "update_admin_rbac_mainers.logs"
 
+# Stream of the status changes, appended as they happen (see status_stream.py)
+STATUS_STREAM_PATH = SCRIPT_DIR / "logs-admin-rbac" / "update_admin_rbac_mainers_status.jsonl"
+
 # Color codes for output
 RED = '\033[0;31m'
 GREEN = '\033[0;32m'
@@ -56,6 +71,9 @@ total_mainers_to_process = None
 # Status tracking for each mAIner
 mainer_status_tracker: Dict[str, Dict] = {}
 
+# Stream of the status changes of this run (None when not run from main)
+status_stream: Optional[StatusStream] = None
+
 def update_mainer_status(address: str, status: str, error_msg: Optional[str] = None):
     """
     Update the status of a mAIner in the global tracker.
@@ -70,6 +88,8 @@ def update_mainer_status(address: str, status: str, error_msg: Optional[str] = N
         'timestamp': datetime.now(),
         'error': error_msg
     }
+    if status_stream is not None:
+        status_stream.emit(address, status, error_msg)
 
 def get_status_summary() -> Dict[str, int]:
     """
@@ -171,7 +191,8 @@ def run_command(
     check: bool = True,
     retry_on_transient_errors: bool = False,
     max_retries: int = 3,
-    retry_delay: float = 2.0
+    retry_delay: float = 2.0,
+    fail_fast: bool = False
 ) -> subprocess.CompletedProcess:
     """Run a command and return the result.
 
@@ -182,53 +203,28 @@ def run_command(
         retry_on_transient_errors: If True, retry on transient errors like timeouts, IC0508, etc.
         max_retries: Maximum number of retry attempts (only used if retry_on_transient_errors=True)
         retry_delay: Base delay between retries in seconds (exponential backoff applied)
+        fail_fast: If True, use the circuit breakers and the retry budget of the run. Only for
+                   read-only calls: role assignments and revocations retry up to max_retries
     """
     # Log the command being executed
     cmd_str = ' '.join(command)
     capture_info = " (capturing output)" if capture_output else " (not capturing output)"
     log_message(f"Executing: {cmd_str}{capture_info}", "INFO")
 
-    def is_transient_error(stderr: str) -> bool:
-        """Check if error message indicates a transient error worth retrying."""
-        if not stderr:
-            return False
-
-        # Non-transient errors that should NOT be retried
-        non_transient_indicators = [
-            "IC0536",  # Method not found - permanent error
-            "has no update method",
-            "has no query method",
-        ]
-        if any(indicator in stderr for indicator in non_transient_indicators):
-            return False
-
-        # Transient errors that SHOULD be retried
-        transient_indicators = [
-            "Failed query call",
-            "CanisterError",
-            "IC0508",  # Canister stopped
-            "IC0503",  # Canister trapped
-            "timeout",
-            "Timeout",
-            "timed out",
-            "Operation timed out",
-            "tcp connect error",
-            "connection refused",
-            "Connection refused",
-            "temporarily unavailable",
-            "error sending request",
-            "client error (Connect)"
-        ]
-        return any(indicator in stderr for indicator in transient_indicators)
-
+    policy = RetryPolicy(max_retries=max_retries, base_delay=retry_delay,
+                         breakers=fail_fast, budget=RETRY_BUDGET if fail_fast else None)
+    keys = canister_keys(command) if retry_on_transient_errors else ()
     attempt = 0
     while True:
         try:
+            policy.check(keys)
             if capture_output:
                 result = subprocess.run(command, capture_output=True, text=True, check=check)
+                policy.record_success(keys)
                 return result
             else:
                 result = subprocess.run(command, check=check)
+                policy.record_success(keys)
                 return result
         except subprocess.CalledProcessError as e:
             attempt += 1
@@ -241,16 +237,12 @@ def run_command(
                 error_text += " " + e.stdout
             error_text += " " + str(e)
 
-            # Check if we should retry
-            should_retry = (
-                retry_on_transient_errors
-                and attempt < max_retries
-                and is_transient_error(error_text)
-            )
+            # Retry transient errors with jittered backoff, unless a circuit breaker is open
+            # or the retry budget of this run is spent
+            delay = policy.retry_delay(attempt, error_text, keys) if retry_on_transient_errors else None
 
-            if should_retry:
-                delay = retry_delay * (2 ** (attempt - 1))  # Exponential backoff
-                log_message(f"Transient error detected (attempt {attempt}/{max_retries}). Retrying in {delay}s...", "WARNING")
+            if delay is not None:
+                log_message(f"Transient error detected (attempt {attempt}/{max_retries}). Retrying in {delay:.1f}s...", "WARNING")
                 if e.stderr:
                     log_message(f"Error was: {e.stderr.strip()}", "WARNING")
                 elif str(e):
@@ -267,15 +259,19 @@ def run_command(
 def get_mainers(network: str) -> List[Dict]:
     """Get all mainers from game state canister."""
     log_message(f"Getting all mAIners from game_state_canister on network {network}...")
-    try:
+    def fetch():
         result = run_command([
             "dfx", "canister", "--network", network, "call",
             "game_state_canister", "getMainerAgentCanistersAdmin",
             "--output", "json"
         ], retry_on_transient_errors=True, max_retries=5, retry_delay=3.0)
-        data = json.loads(result.stdout)
+        return json.loads(result.stdout)
+
+    try:
+        data = cached_call(network, "game_state_canister", "getMainerAgentCanistersAdmin", fetch)
         mainers = data.get('Ok', [])
         log_message(f"Found {len(mainers)} total mAIners", "INFO")
+        log_message(cache_stats_summary(), "INFO")
         return mainers
     except Exception as e:
         log_message(f"Failed to get mAIners: {e}", "ERROR")
@@ -297,7 +293,8 @@ def get_admin_roles(network: str, canister_id: str, dry_run: bool = False) -> Op
         return []
 
     try:
-        result = run_command(command, retry_on_transient_errors=True, max_retries=3, retry_delay=2.0)
+        result = run_command(command, retry_on_transient_errors=True, max_retries=3, retry_delay=2.0,
+                             fail_fast=True)
         data = json.loads(result.stdout)
 
         if 'Ok' in data:
@@ -543,14 +540,16 @@ def main():
         action="store_true",
         help="Run in dry-run mode without making actual changes"
     )
+    add_cache_arguments(parser)
 
     args = parser.parse_args()
+    configure_cache_from_args(args)
 
     # The note (only used for assign)
     note = "Grant AdminQuery access for funnai-django"
 
     # Open log file
-    global log_file_handle
+    global log_file_handle, status_stream
     try:
         # Ensure the logs directory exists
         LOG_FILE_PATH.parent.mkdir(parents=True, exist_ok=True)
@@ -560,9 +559,12 @@ def main():
         log_file_handle = None
 
     try:
+        status_stream = StatusStream.open(STATUS_STREAM_PATH, script="update_admin_rbac_mainers", network=args.network,
+                                          principal=args.principal, action=args.action, dry_run=args.dry_run)
         log_message(f"{'='*60}", "INFO")
         log_message(f"Admin RBAC Update Script for mAIners", "INFO")
         log_message(f"Log file: {LOG_FILE_PATH}", "INFO")
+        log_message(f"Status stream: {STATUS_STREAM_PATH}", "INFO")
         log_message(f"Network: {args.network}", "INFO")
         log_message(f"Principal: {args.principal}", "INFO")
         log_message(f"Action: {args.action}", "INFO")
@@ -638,6 +640,9 @@ def main():
         if summary.get('failed', 0) > 0:
             sys.exit(1)
     finally:
+        if status_stream is not None:
+            status_stream.close()
+            status_stream = None
         # Always close log file
         if log_file_handle:
             log_file_handle.close()
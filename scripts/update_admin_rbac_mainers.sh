@@ -5,6 +5,7 @@ NETWORK_TYPE=""
 PRINCIPAL=""
 ACTION="assign"
 DRY_RUN=""
+CACHE_FLAGS=""
 
 # Parse command line arguments
 while [ $# -gt 0 ]; do
@@ -38,15 +39,25 @@ while [ $# -gt 0 ]; do
             DRY_RUN="--dry-run"
             shift
             ;;
+        --no-cache)
+            CACHE_FLAGS="$CACHE_FLAGS --no-cache"
+            shift
+            ;;
+        --refresh)
+            CACHE_FLAGS="$CACHE_FLAGS --refresh"
+            shift
+            ;;
         *)
             echo "Unknown argument: $1"
-            echo "Usage: $0 --network [local|ic|testing|development|demo|prd] --principal PRINCIPAL [--action assign|revoke] [--dry-run]"
+            echo "Usage: $0 --network [local|ic|testing|development|demo|prd] --principal PRINCIPAL [--action assign|revoke] [--dry-run] [--no-cache] [--refresh]"
             echo ""
             echo "Options:"
             echo "  --network NETWORK       Required. Network to update admin RBAC on"
             echo "  --principal PRINCIPAL   Required. Principal ID to assign/revoke AdminQuery role"
             echo "  --action ACTION         Optional. Action to perform: 'assign' or 'revoke' (default: assign)"
             echo "  --dry-run               Optional. Run in dry-run mode without making changes"
+            echo "  --no-cache              Optional. Do not use the cached mAIner list"
+            echo "  --refresh               Optional. Fetch a fresh mAIner list and update the cache"
             exit 1
             ;;
     esac
@@ -73,6 +84,10 @@ if [ ! -z "$DRY_RUN" ]; then
     PYTHON_CMD="$PYTHON_CMD $DRY_RUN"
 fi
 
+if [ ! -z "$CACHE_FLAGS" ]; then
+    PYTHON_CMD="$PYTHON_CMD $CACHE_FLAGS"
+fi
+
 echo "Executing: $PYTHON_CMD"
 echo ""
 
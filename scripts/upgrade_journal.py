@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Append-only write-ahead journal of the steps of mAIner upgrades, to resume after a crash or Ctrl+C.
+
+upgrade_mainers.py appends one JSON line per state transition of a mAIner (maintenance flag on,
+timer stopped, canister stopped, snapshot created, deployed, started, verified) as soon as the
+step is done, and fsyncs it. Each run starts with a "run" line holding the network, target hash
+and whether it resumes the previous run.
+
+With --resume, the runs since the last fresh run for the same network and target hash are
+replayed: verified and skipped mAIners are skipped without any canister call, and half-done
+mAIners continue at the step after the last one recorded, with the recorded snapshot ID.
+
+Usage:
+    from .upgrade_journal import UpgradeJournal, SNAPSHOT
+
+    journal = UpgradeJournal.open(network, target_hash, resume=True)
+    journal.record(address, SNAPSHOT, snapshot_id=snapshot_id)
+    if journal.reached(address, SNAPSHOT):
+        snapshot_id = journal.data(address)["snapshot_id"]
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+# Steps of an upgrade, in order
+FLAG_ON = "flag_on"
+TIMER_STOPPED = "timer_stopped"
+STOPPED = "stopped"
+SNAPSHOT = "snapshot"
+DEPLOYED = "deployed"
+STARTED = "started"
+VERIFIED = "verified"
+STEPS = [FLAG_ON, TIMER_STOPPED, STOPPED, SNAPSHOT, DEPLOYED, STARTED, VERIFIED]
+
+# Outcomes that are not steps: the mAIner needed no upgrade, or the last step failed
+SKIPPED = "skipped"
+FAILED = "failed"
+
+# The mAIner was put back into service without the upgrade: a resumed run starts it over
+RELEASED = "released"
+
+
+def journal_path(network: str) -> Path:
+    return SCRIPT_DIR / f"upgrade_mainers_journal-{network}.jsonl"
+
+
+def read_records(path: Path) -> List[Dict]:
+    """All complete records of a journal file (a line torn by a crash is ignored)."""
+    records = []
+    if not path.exists():
+        return records
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+def replay(records: List[Dict], network: str, target_hash: Optional[str]) -> Dict[str, Dict]:
+    """State per mAIner after the runs that a resumed run continues.
+
+    Those are the runs for the same network and target hash, going back to the last run
+    that did not resume. Returns {address: {"step": last step or outcome, **recorded data}}.
+    """
+    runs: List[List[Dict]] = []
+    for record in records:
+        if record.get("step") == "run":
+            runs.append([record])
+        elif runs:
+            runs[-1].append(record)
+
+    chain: List[List[Dict]] = []
+    for run in reversed(runs):
+        header = run[0]
+        if header.get("network") != network or header.get("target_hash") != target_hash:
+            break
+        chain.insert(0, run)
+        if not header.get("resume"):
+            break
+
+    state: Dict[str, Dict] = {}
+    for run in chain:
+        for record in run[1:]:
+            address = record.get("address")
+            if not address:
+                continue
+            entry = state.setdefault(address, {})
+            data = {key: value for key, value in record.items() if key not in ("ts", "address")}
+            if record["step"] == FAILED:
+                # a failure does not undo the steps done before it
+                entry["failed"] = data.get("reason")
+                continue
+            entry.update(data)
+            entry.pop("failed", None)
+    return state
+
+
+class UpgradeJournal:
+    """The journal of one run of upgrade_mainers.py."""
+
+    def __init__(self, path: Path, network: str, target_hash: Optional[str], state: Optional[Dict[str, Dict]] = None):
+        self.path = path
+        self.network = network
+        self.target_hash = target_hash
+        self.state: Dict[str, Dict] = state or {}
+        self._lock = threading.Lock()
+        self._file = None
+
+    @classmethod
+    def open(cls, network: str, target_hash: Optional[str], resume: bool = False,
+             path: Optional[Path] = None) -> "UpgradeJournal":
+        """Start a run in the journal; with resume, load the state of the runs it continues."""
+        path = path or journal_path(network)
+        state = replay(read_records(path), network, target_hash) if resume else {}
+        journal = cls(path, network, target_hash, state)
+        journal._file = open(path, "a")
+        journal._append({"step": "run", "network": network, "target_hash": target_hash, "resume": resume})
+        return journal
+
+    @classmethod
+    def reopen(cls, network: str, path: Optional[Path] = None) -> Optional["UpgradeJournal"]:
+        """Append to the last run of the journal for the network, without starting a new run.
+
+        Used to record steps done outside of upgrade_mainers.py (rollbacks). None if there is no run.
+        """
+        path = path or journal_path(network)
+        records = read_records(path)
+        headers = [record for record in records if record.get("step") == "run" and record.get("network") == network]
+        if not headers:
+            return None
+        target_hash = headers[-1].get("target_hash")
+        journal = cls(path, network, target_hash, replay(records, network, target_hash))
+        journal._file = open(path, "a")
+        return journal
+
+    def _append(self, record: Dict):
+        record = {"ts": datetime.now().isoformat(), **record}
+        with self._lock:
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def record(self, address: str, step: str, **data):
+        """Record that a step of a mAIner is done (or the SKIPPED / FAILED outcome), with its data."""
+        self._append({"address": address, "step": step, **data})
+        with self._lock:
+            entry = self.state.setdefault(address, {})
+            if step == FAILED:
+                entry["failed"] = data.get("reason")
+            else:
+                entry.update(step=step, **data)
+                entry.pop("failed", None)
+
+    def step(self, address: str) -> Optional[str]:
+        with self._lock:
+            return self.state.get(address, {}).get("step")
+
+    def data(self, address: str) -> Dict:
+        with self._lock:
+            return dict(self.state.get(address, {}))
+
+    def reached(self, address: str, step: str) -> bool:
+        """True if the mAIner has done `step` (or a later one) in the runs this run continues."""
+        last = self.step(address)
+        return last in STEPS and STEPS.index(last) >= STEPS.index(step)
+
+    def is_done(self, address: str) -> bool:
+        """True if the mAIner was verified or skipped, and did not fail after that: nothing left to do.
+
+        A mAIner found unhealthy after it was verified (by the health gate of its wave or the soak of
+        a canary wave) has a FAILED record after VERIFIED: it is checked again on --resume.
+        """
+        with self._lock:
+            entry = self.state.get(address, {})
+            return entry.get("step") in (VERIFIED, SKIPPED) and "failed" not in entry
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
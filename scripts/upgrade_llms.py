@@ -6,48 +6,117 @@ import sys
 import argparse
 import os
 import json
+import threading
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import dotenv_values
 
 from scripts.cleanup_llm_promptcache import cleanup_llm_promptcache
 
 from .monitor_common import get_canisters, run_this_cmd
+from .canister_index import canister_index
+from .llm_drain import wait_for_drain
+from .readiness import STAGES
 
 # Get the directory of this script
 SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
 FUNNAI_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "../"))
-    
+
+# One `dfx deploy` or `dfx sns prepare-canisters` at a time per dfx project folder: LLMs of the same
+# type are built and deployed from the same folder, and dfx writes its .dfx state there
+_project_locks = defaultdict(threading.Lock)
+_project_locks_lock = threading.Lock()
+
+
+def dfx_project_lock(llm_cwd):
+    """The lock of the dfx project folder of an LLM type."""
+    with _project_locks_lock:
+        return _project_locks[os.path.realpath(llm_cwd)]
+
+
+def llm_pool(canister_name, challenger_canister_id, judge_canister_id, share_service_canister_id):
+    """The controller canister, type and dfx folder of an LLM, from its name. None if the type is unknown."""
+    if "CHALLENGER" in canister_name.upper():
+        return challenger_canister_id, "challenger", os.path.join(SCRIPT_DIR, "../PoAIW/llms/Challenger")
+    if "JUDGE" in canister_name.upper():
+        return judge_canister_id, "judge", os.path.join(SCRIPT_DIR, "../PoAIW/llms/Judge")
+    if "SHARE_SERVICE" in canister_name.upper():
+        return share_service_canister_id, "share_service", os.path.join(SCRIPT_DIR, "../PoAIW/llms/mAIner")
+    return None
+
+
+def wait_until_drained(network, canister_name, canister_id):
+    """Wait until the protocol finished its use of an LLM that was removed from its controller."""
+    print(f"- Waiting until LLM {canister_name} ({canister_id}) has no more work in flight "
+          f"(at most {STAGES['llm_drain'].deadline:.0f} seconds)...")
+    drain = wait_for_drain(network, canister_id)
+    if drain.ready:
+        print(f"---> {canister_name} is idle after {drain.elapsed:.0f} seconds.")
+    else:
+        print(f"---> {canister_name} not seen idle after {drain.elapsed:.0f} seconds; continuing, as after the fixed delay.")
+
+
+def registered_llms(network, ctrlb_canister_id):
+    """The LLMs registered in a controller canister (get_llm_canisters)."""
+    result = subprocess.check_output(
+        ["dfx", "canister", "call", ctrlb_canister_id, "get_llm_canisters", "--output", "json", "--network", network],
+        stderr=subprocess.DEVNULL,
+        text=True
+    )
+    return json.loads(result).get('Ok', {}).get('llmCanisterIds', [])
+
+
+def create_llm_snapshot(network, canister_id, llm_cwd, confirm=False):
+    """Create a snapshot of a stopped LLM. Returns its snapshot ID, None if skipped or the ID is not in the output."""
+    cmd = ["dfx", "canister", "--network", network, "snapshot", "create", canister_id]
+    print(f"  {' '.join(cmd)} \n  -> from directory: {llm_cwd}")
+    if confirm:
+        answer = input(f"  Do you want to run this command? (y/n/quit): ").strip().lower()
+        if answer in ['q', 'quit']:
+            print("Upgrade cancelled.")
+            sys.exit(0)
+        if answer not in ['y', 'yes']:
+            print("  Command skipped.")
+            return None
+    result = subprocess.run(cmd, check=True, text=True, cwd=llm_cwd, capture_output=True)
+    # dfx prints "Created a new snapshot of canister xxx. Snapshot ID: yyy" to stderr
+    for line in (result.stderr + result.stdout).splitlines():
+        if "Snapshot ID:" in line:
+            snapshot_id = line.split("Snapshot ID:")[1].strip()
+            print(f"  Snapshot ID: {snapshot_id}")
+            return snapshot_id
+    print(f"WARNING: Snapshot created, but no snapshot ID in the output of dfx: {result.stderr.strip()}")
+    return None
+
+
+def recover_llm(network, canister_name, canister_id, llm_cwd, snapshot_id=None):
+    """Put an LLM whose upgrade failed after it was stopped back into service: restore the snapshot taken
+    before its deploy (if given), and start it. Returns False if the LLM could not be recovered."""
+    try:
+        if snapshot_id:
+            print(f"- Restoring LLM {canister_name} ({canister_id}) from snapshot {snapshot_id}")
+            run_this_cmd(["dfx", "canister", "--network", network, "stop", canister_id], llm_cwd, confirm=False)
+            run_this_cmd(["dfx", "canister", "--network", network, "snapshot", "load", canister_id, snapshot_id],
+                         llm_cwd, confirm=False)
+        print(f"- Starting LLM {canister_name} ({canister_id}) again")
+        run_this_cmd(["dfx", "canister", "--network", network, "start", canister_id], llm_cwd, confirm=False)
+        return True
+    except subprocess.CalledProcessError:
+        print(f"ERROR: Unable to recover LLM {canister_name} ({canister_id}); check it manually")
+        return False
+
 
 def upgrade_llm(challenger_canister_id, judge_canister_id, share_service_canister_id, canister_name, canister_id, network):
     """Upgrade LLM"""
     try:    
-        ctrlb_canister_id = None
-        llm_type = None
-        llm_cwd = None
-        if "CHALLENGER" in canister_name.upper():
-            ctrlb_canister_id = challenger_canister_id
-            llm_type = "challenger"
-            llm_cwd = os.path.join(SCRIPT_DIR, "../PoAIW/llms/Challenger")
-        elif "JUDGE" in canister_name.upper():
-            ctrlb_canister_id = judge_canister_id
-            llm_type = "judge"
-            llm_cwd = os.path.join(SCRIPT_DIR, "../PoAIW/llms/Judge")
-        elif "SHARE_SERVICE" in canister_name.upper():
-            ctrlb_canister_id = share_service_canister_id
-            llm_type = "share_service"
-            llm_cwd = os.path.join(SCRIPT_DIR, "../PoAIW/llms/mAIner")
-        else:
+        pool = llm_pool(canister_name, challenger_canister_id, judge_canister_id, share_service_canister_id)
+        if pool is None:
             print(f"Unknown llm type for canister {canister_name}. Skipping cleanup.")
             return
+        ctrlb_canister_id, llm_type, llm_cwd = pool
 
         # get canister name from canister_ids.json, for dfx deploy command
-        llm_name_dfx_json = None
-        with open(os.path.join(llm_cwd, "canister_ids.json")) as f:
-            canister_ids = json.load(f)
-            for key, networks in canister_ids.items():
-                if networks.get(network) == canister_id:
-                    llm_name_dfx_json = key
-                    break
+        llm_name_dfx_json = canister_index(os.path.join(llm_cwd, "canister_ids.json")).name(network, canister_id)
         if not llm_name_dfx_json:
             print(f"ERROR: Canister name for {llm_type} not found in canister_ids.json for network {network}.")
             return
@@ -62,45 +131,63 @@ def upgrade_llm(challenger_canister_id, judge_canister_id, share_service_caniste
         cmd = ["dfx", "canister", "--network", network, "call", ctrlb_canister_id, "remove_llm_canister", f"(record {{canister_id = \"{canister_id}\"}})"]
         run_this_cmd(cmd, llm_cwd, confirm=False)
     
-        DELAY = 180
         print(" ")
-        print(f"- Waiting for {DELAY} seconds to allow protocol to finish possible use of the LLM canister...")
-        confirm = input(f"Skip the delay? (y/n): ").strip().lower()
-        if confirm not in ['y', 'yes']:
-            print("---> Starting delay.")
-            time.sleep(DELAY)
-        else:
-            confirm = input(f"Are you sure to skip the delay? (y/n): ").strip().lower()
-            if confirm not in ['y', 'yes']:
-                print("---> Starting delay.")
-                time.sleep(DELAY)
+        wait_until_drained(network, canister_name, canister_id)
+
+        upgrade_llm_canister(network, ctrlb_canister_id, llm_type, llm_cwd, canister_name, canister_id, llm_name_dfx_json)
+
+        print(" ")
+        print(f"- Adding LLM to controller canister {canister_name} ({ctrlb_canister_id})")
+        cmd = ["dfx", "canister", "--network", network, "call", ctrlb_canister_id, "add_llm_canister", f"(record {{canister_id = \"{canister_id}\"}})"]
+        run_this_cmd(cmd, llm_cwd, confirm=True)
         
         print(" ")
-        print(f"- Stopping LLM {canister_name} ({canister_id})")
-        cmd = ["dfx", "canister", "--network", network, "stop", canister_id]
+        print(f"- Verifying LLMs registered in controller canister {canister_name} ({ctrlb_canister_id})")
+        cmd = ["dfx", "canister", "--network", network, "call", ctrlb_canister_id, "get_llm_canisters", "--output", "json"]
         run_this_cmd(cmd, llm_cwd, confirm=False)
         
         print(" ")
-        print(f"- Creating snapshot for LLM {canister_name} ({canister_id})")
-        cmd = ["dfx", "canister", "--network", network, "snapshot", "create", canister_id]
-        run_this_cmd(cmd, llm_cwd, confirm=True)
         
+    except subprocess.CalledProcessError:
+        print(f"ERROR: Unable to upgrade LLM for canister {canister_id} on network {network}")
+
+def upgrade_llm_canister(network, ctrlb_canister_id, llm_type, llm_cwd, canister_name, canister_id, llm_name_dfx_json,
+                         interactive=True):
+    """Upgrade an LLM that is not registered in its controller: stop, snapshot, deploy, start, health check,
+    configure and test it. Raises subprocess.CalledProcessError when a step fails.
+
+    When the deploy, start or health check fails, the LLM is restored from its snapshot (or, when
+    the deploy did not happen, started again) before the error is raised."""
+    print(" ")
+    print(f"- Stopping LLM {canister_name} ({canister_id})")
+    cmd = ["dfx", "canister", "--network", network, "stop", canister_id]
+    run_this_cmd(cmd, llm_cwd, confirm=False)
+    
+    deployed = False
+    snapshot_id = None
+    try:
+        print(" ")
+        print(f"- Creating snapshot for LLM {canister_name} ({canister_id})")
+        snapshot_id = create_llm_snapshot(network, canister_id, llm_cwd, confirm=interactive)
+
         print(" ")
         print(f"- Upgrading LLM {canister_name} ({canister_id})")
         cmd = ["dfx", "deploy", "--network", network, llm_name_dfx_json, "--mode", "upgrade"]
-        run_this_cmd(cmd, llm_cwd, confirm=False)
-        
+        with dfx_project_lock(llm_cwd):
+            run_this_cmd(cmd, llm_cwd, confirm=False)
+        deployed = True
+
         print(" ")
         print(f"- Starting LLM {canister_name} ({canister_id})")
         cmd = ["dfx", "canister", "--network", network, "start", canister_id]
         run_this_cmd(cmd, llm_cwd, confirm=False)
-        
+
         # We can now skip this. Cleaning is done constantly while in production.
         # print(" ")
         # print(f"- Cleaning prompt caches in LLM {canister_name} ({canister_id})")
         # cmd = ["scripts/cleanup_llm_promptcache.sh", "--network", network, "--canister-id", canister_id]
         # run_this_cmd(cmd, FUNNAI_DIR, confirm=False)
-        
+
         print(" ")
         print(f"- Checking health for LLM {canister_name} ({canister_id})")
         cmd = ["dfx", "canister", "--network", network, "call", canister_id, "health"]
@@ -118,97 +205,200 @@ def upgrade_llm(challenger_canister_id, judge_canister_id, share_service_caniste
                 else:
                     print(f"Health check failed after {max_retries} attempts")
                     raise
+    except subprocess.CalledProcessError:
+        recover_llm(network, canister_name, canister_id, llm_cwd, snapshot_id if deployed else None)
+        raise
 
-        print(" ")
-        print(f"- Loading model for LLM {canister_name} ({canister_id})")
-        cmd = ["dfx", "canister", "--network", network, "call", canister_id, "load_model", '(record { args = vec {"--model"; "models/model.gguf"} })']
-        run_this_cmd(cmd, llm_cwd, confirm=False)
-        
-        print(" ")
-        print(f"- Setting max_tokens for LLM {canister_name} ({canister_id})")
-        cmd = ["dfx", "canister", "--network", network, "call", canister_id, "set_max_tokens", '(record { max_tokens_query = 12 : nat64; max_tokens_update = 12 : nat64 })']
-        run_this_cmd(cmd, llm_cwd, confirm=False)
-        
-        print(" ")
-        print(f"- Pausing logs for LLM {canister_name} ({canister_id})")
-        cmd = ["dfx", "canister", "--network", network, "call", canister_id, "log_pause"]
-        run_this_cmd(cmd, llm_cwd, confirm=False)
-        
-        print(" ")
-        print(f"- Pausing db_chats for LLM {canister_name} ({canister_id})")
-        cmd = ["dfx", "canister", "--network", network, "call", canister_id, "chats_pause"]
-        run_this_cmd(cmd, llm_cwd, confirm=False)
+    print(" ")
+    print(f"- Loading model for LLM {canister_name} ({canister_id})")
+    cmd = ["dfx", "canister", "--network", network, "call", canister_id, "load_model", '(record { args = vec {"--model"; "models/model.gguf"} })']
+    run_this_cmd(cmd, llm_cwd, confirm=False)
+    
+    print(" ")
+    print(f"- Setting max_tokens for LLM {canister_name} ({canister_id})")
+    cmd = ["dfx", "canister", "--network", network, "call", canister_id, "set_max_tokens", '(record { max_tokens_query = 12 : nat64; max_tokens_update = 12 : nat64 })']
+    run_this_cmd(cmd, llm_cwd, confirm=False)
+    
+    print(" ")
+    print(f"- Pausing logs for LLM {canister_name} ({canister_id})")
+    cmd = ["dfx", "canister", "--network", network, "call", canister_id, "log_pause"]
+    run_this_cmd(cmd, llm_cwd, confirm=False)
+    
+    print(" ")
+    print(f"- Pausing db_chats for LLM {canister_name} ({canister_id})")
+    cmd = ["dfx", "canister", "--network", network, "call", canister_id, "chats_pause"]
+    run_this_cmd(cmd, llm_cwd, confirm=False)
 
-        print(" ")
-        print(f"- Assigning admin role to controller canister for LLM {canister_name} ({canister_id})")
-        cmd = ["dfx", "canister", "--network", network, "call", canister_id, "assignAdminRole", f'(record {{ "principal" = "{ctrlb_canister_id}"; role = variant {{ AdminUpdate }}; note = "{llm_type.capitalize()} controller canister" }})']
-        run_this_cmd(cmd, llm_cwd, confirm=False)
+    print(" ")
+    print(f"- Assigning admin role to controller canister for LLM {canister_name} ({canister_id})")
+    cmd = ["dfx", "canister", "--network", network, "call", canister_id, "assignAdminRole", f'(record {{ "principal" = "{ctrlb_canister_id}"; role = variant {{ AdminUpdate }}; note = "{llm_type.capitalize()} controller canister" }})']
+    run_this_cmd(cmd, llm_cwd, confirm=False)
 
-        print(" ")
-        print(f"- Assigning admin role to funnai-django-aws-dev for LLM {canister_name} ({canister_id})")
-        cmd = ["dfx", "canister", "--network", network, "call", canister_id, "assignAdminRole", '(record { "principal" = "bzqba-mwz5i-rq3oz-iie6i-gf7bi-kqr2x-tjuq4-nblmh-ephou-n27tl-xqe"; role = variant { AdminUpdate }; note = "funnai-django-aws-dev" })']
-        run_this_cmd(cmd, llm_cwd, confirm=False)
+    print(" ")
+    print(f"- Assigning admin role to funnai-django-aws-dev for LLM {canister_name} ({canister_id})")
+    cmd = ["dfx", "canister", "--network", network, "call", canister_id, "assignAdminRole", '(record { "principal" = "bzqba-mwz5i-rq3oz-iie6i-gf7bi-kqr2x-tjuq4-nblmh-ephou-n27tl-xqe"; role = variant { AdminUpdate }; note = "funnai-django-aws-dev" })']
+    run_this_cmd(cmd, llm_cwd, confirm=False)
 
-        print(" ")
-        print(f"- Assigning admin role to maintainer for LLM {canister_name} ({canister_id})")
-        cmd = ["dfx", "canister", "--network", network, "call", canister_id, "assignAdminRole", '(record { "principal" = "chfec-vmrjj-vsmhw-uiolc-dpldl-ujifg-k6aph-pwccq-jfwii-nezv4-2ae"; role = variant { AdminUpdate }; note = "maintainer" })']
-        run_this_cmd(cmd, llm_cwd, confirm=False)
+    print(" ")
+    print(f"- Assigning admin role to maintainer for LLM {canister_name} ({canister_id})")
+    cmd = ["dfx", "canister", "--network", network, "call", canister_id, "assignAdminRole", '(record { "principal" = "chfec-vmrjj-vsmhw-uiolc-dpldl-ujifg-k6aph-pwccq-jfwii-nezv4-2ae"; role = variant { AdminUpdate }; note = "maintainer" })']
+    run_this_cmd(cmd, llm_cwd, confirm=False)
 
-        print(" ")
-        print(f"- Assigning admin role to maintainer for LLM {canister_name} ({canister_id})")
-        cmd = ["dfx", "canister", "--network", network, "call", canister_id, "assignAdminRole", '(record { "principal" = "cda4n-7jjpo-s4eus-yjvy7-o6qjc-vrueo-xd2hh-lh5v2-k7fpf-hwu5o-yqe"; role = variant { AdminUpdate }; note = "maintainer" })']
-        run_this_cmd(cmd, llm_cwd, confirm=False)
+    print(" ")
+    print(f"- Assigning admin role to maintainer for LLM {canister_name} ({canister_id})")
+    cmd = ["dfx", "canister", "--network", network, "call", canister_id, "assignAdminRole", '(record { "principal" = "cda4n-7jjpo-s4eus-yjvy7-o6qjc-vrueo-xd2hh-lh5v2-k7fpf-hwu5o-yqe"; role = variant { AdminUpdate }; note = "maintainer" })']
+    run_this_cmd(cmd, llm_cwd, confirm=False)
 
-        print(" ")
-        print(f"- Removing controller canister as controller for LLM {canister_name} ({canister_id})")
-        cmd = ["dfx", "canister", "update-settings", canister_id, "--remove-controller", ctrlb_canister_id, "--network", network]
-        run_this_cmd(cmd, llm_cwd, confirm=False)
+    print(" ")
+    print(f"- Removing controller canister as controller for LLM {canister_name} ({canister_id})")
+    cmd = ["dfx", "canister", "update-settings", canister_id, "--remove-controller", ctrlb_canister_id, "--network", network]
+    run_this_cmd(cmd, llm_cwd, confirm=False)
 
-        print(" ")
-        print(f"- Adding log viewers for LLM {canister_name} ({canister_id})")
-        cmd = ["dfx", "canister", "update-settings", canister_id,
-               "--add-log-viewer", "bzqba-mwz5i-rq3oz-iie6i-gf7bi-kqr2x-tjuq4-nblmh-ephou-n27tl-xqe",
-               "--add-log-viewer", "chfec-vmrjj-vsmhw-uiolc-dpldl-ujifg-k6aph-pwccq-jfwii-nezv4-2ae",
-               "--add-log-viewer", "cda4n-7jjpo-s4eus-yjvy7-o6qjc-vrueo-xd2hh-lh5v2-k7fpf-hwu5o-yqe",
-               "--network", network]
-        run_this_cmd(cmd, llm_cwd, confirm=False)
+    print(" ")
+    print(f"- Adding log viewers for LLM {canister_name} ({canister_id})")
+    cmd = ["dfx", "canister", "update-settings", canister_id,
+           "--add-log-viewer", "bzqba-mwz5i-rq3oz-iie6i-gf7bi-kqr2x-tjuq4-nblmh-ephou-n27tl-xqe",
+           "--add-log-viewer", "chfec-vmrjj-vsmhw-uiolc-dpldl-ujifg-k6aph-pwccq-jfwii-nezv4-2ae",
+           "--add-log-viewer", "cda4n-7jjpo-s4eus-yjvy7-o6qjc-vrueo-xd2hh-lh5v2-k7fpf-hwu5o-yqe",
+           "--network", network]
+    run_this_cmd(cmd, llm_cwd, confirm=False)
 
-        print(" ")
-        print(f"- Adding NNS Root Canister as controller for LLM {canister_name} ({canister_id})")
-        cmd = ["dfx", "sns", "prepare-canisters", "--network", "ic", "add-nns-root", canister_id]
+    print(" ")
+    print(f"- Adding NNS Root Canister as controller for LLM {canister_name} ({canister_id})")
+    cmd = ["dfx", "sns", "prepare-canisters", "--network", "ic", "add-nns-root", canister_id]
+    with dfx_project_lock(llm_cwd):
         run_this_cmd(cmd, llm_cwd, confirm=False)
 
-        print(" ")
-        print(f"- Testing LLM {canister_name} ({canister_id})")
-        cmd = ["dfx", "canister", "--network", network, "call", canister_id, "new_chat", '(record { args = vec { "--prompt-cache"; "prompt.cache"; "--cache-type-k"; "q8_0"; }})']
-        run_this_cmd(cmd, llm_cwd, confirm=False)
-        
-        print(" ")
-        print(f"- Testing LLM {canister_name} ({canister_id})")
-        cmd = ["dfx", "canister", "--network", network, "call", canister_id, "run_update", '(record { args = vec { "--prompt-cache"; "prompt.cache"; "--prompt-cache-all"; "--cache-type-k"; "q8_0"; "--repeat-penalty"; "1.1"; "--temp"; "0.6"; "-sp"; "-p"; "<|im_start|>system\nYou are a helpful assistant.<|im_end|>\n<|im_start|>user\ngive me a short introduction to LLMs.<|im_end|>\n<|im_start|>assistant\n"; "-n"; "1" }})']
-        run_this_cmd(cmd, llm_cwd, confirm=False)
-        
-        print(" ")
-        print(f"- Testing LLM {canister_name} ({canister_id})")
-        cmd = ["dfx", "canister", "--network", network, "call", canister_id, "remove_prompt_cache", '(record { args = vec { "--prompt-cache"; "prompt.cache" }})']
-        run_this_cmd(cmd, llm_cwd, confirm=False)
-        
-        print(" ")
-        print(f"- Adding LLM to controller canister {canister_name} ({ctrlb_canister_id})")
+    print(" ")
+    print(f"- Testing LLM {canister_name} ({canister_id})")
+    cmd = ["dfx", "canister", "--network", network, "call", canister_id, "new_chat", '(record { args = vec { "--prompt-cache"; "prompt.cache"; "--cache-type-k"; "q8_0"; }})']
+    run_this_cmd(cmd, llm_cwd, confirm=False)
+    
+    print(" ")
+    print(f"- Testing LLM {canister_name} ({canister_id})")
+    cmd = ["dfx", "canister", "--network", network, "call", canister_id, "run_update", '(record { args = vec { "--prompt-cache"; "prompt.cache"; "--prompt-cache-all"; "--cache-type-k"; "q8_0"; "--repeat-penalty"; "1.1"; "--temp"; "0.6"; "-sp"; "-p"; "<|im_start|>system\nYou are a helpful assistant.<|im_end|>\n<|im_start|>user\ngive me a short introduction to LLMs.<|im_end|>\n<|im_start|>assistant\n"; "-n"; "1" }})']
+    run_this_cmd(cmd, llm_cwd, confirm=False)
+    
+    print(" ")
+    print(f"- Testing LLM {canister_name} ({canister_id})")
+    cmd = ["dfx", "canister", "--network", network, "call", canister_id, "remove_prompt_cache", '(record { args = vec { "--prompt-cache"; "prompt.cache" }})']
+    run_this_cmd(cmd, llm_cwd, confirm=False)
+
+class PoolCapacity:
+    """The LLMs registered in one controller, and the ones taken out of it for their upgrade.
+
+    An LLM is only taken out while at least min_online others stay registered. When that is not
+    possible now, take() waits for an upgraded LLM to be registered again; it gives up when no
+    upgrade that could give the capacity back is running (e.g. after failed upgrades).
+    """
+
+    def __init__(self, online, min_online):
+        self.online = set(online)
+        self.min_online = min_online
+        self.in_flight = 0
+        self._changed = threading.Condition()
+
+    def take(self, canister_id):
+        """Take an LLM out of the pool for its upgrade. False if that would leave fewer than min_online."""
+        with self._changed:
+            if canister_id in self.online:
+                while len(self.online) - 1 < self.min_online:
+                    if not self.in_flight:
+                        return False
+                    self._changed.wait()
+                self.online.discard(canister_id)
+            self.in_flight += 1
+            return True
+
+    def give_back(self, canister_id, registered):
+        """The upgrade of an LLM is over; `registered` if it is back in the pool."""
+        with self._changed:
+            self.in_flight -= 1
+            if registered:
+                self.online.add(canister_id)
+            self._changed.notify_all()
+
+
+def upgrade_llm_rolling(network, capacity, ctrlb_canister_id, llm_type, llm_cwd, canister_name, canister_id):
+    """Upgrade one LLM of a pool without prompts, leaving at least capacity.min_online LLMs registered.
+
+    Returns:
+        'upgraded', 'skipped' or 'failed'
+    """
+    llm_name_dfx_json = canister_index(os.path.join(llm_cwd, "canister_ids.json")).name(network, canister_id)
+    if not llm_name_dfx_json:
+        print(f"ERROR: Canister name for {llm_type} not found in canister_ids.json for network {network}.")
+        return "failed"
+    was_registered = canister_id in capacity.online
+    if not capacity.take(canister_id):
+        print(f"SKIPPED: {canister_name} ({canister_id}) - removing it would leave fewer than "
+              f"{capacity.min_online} LLM(s) registered in {llm_type} controller {ctrlb_canister_id}")
+        return "skipped"
+
+    registered = False
+    try:
+        if was_registered:
+            print(f"- Removing LLM {canister_name} ({canister_id}) from controller canister {ctrlb_canister_id}")
+            cmd = ["dfx", "canister", "--network", network, "call", ctrlb_canister_id, "remove_llm_canister", f"(record {{canister_id = \"{canister_id}\"}})"]
+            run_this_cmd(cmd, llm_cwd, confirm=False)
+            wait_until_drained(network, canister_name, canister_id)
+
+        upgrade_llm_canister(network, ctrlb_canister_id, llm_type, llm_cwd, canister_name, canister_id,
+                             llm_name_dfx_json, interactive=False)
+
+        # upgrade_llm_canister only returns once the LLM passed its health check and tests
+        print(f"- Adding LLM {canister_name} ({canister_id}) to controller canister {ctrlb_canister_id}")
         cmd = ["dfx", "canister", "--network", network, "call", ctrlb_canister_id, "add_llm_canister", f"(record {{canister_id = \"{canister_id}\"}})"]
-        run_this_cmd(cmd, llm_cwd, confirm=True)
-        
-        print(" ")
-        print(f"- Verifying LLMs registered in controller canister {canister_name} ({ctrlb_canister_id})")
-        cmd = ["dfx", "canister", "--network", network, "call", ctrlb_canister_id, "get_llm_canisters", "--output", "json"]
         run_this_cmd(cmd, llm_cwd, confirm=False)
-        
-        print(" ")
-        
-    except subprocess.CalledProcessError:
-        print(f"ERROR: Unable to upgrade LLM for canister {canister_id} on network {network}")
+        registered = canister_id in registered_llms(network, ctrlb_canister_id)
+        if not registered:
+            print(f"ERROR: {canister_name} ({canister_id}) is not registered in {ctrlb_canister_id} after add_llm_canister")
+    except (subprocess.CalledProcessError, ValueError) as e:
+        print(f"ERROR: Unable to upgrade LLM {canister_name} ({canister_id}) on network {network}: {e}")
+    finally:
+        capacity.give_back(canister_id, registered)
+    return "upgraded" if registered else "failed"
+
+
+def upgrade_llms_rolling(network, llms, pools, min_online=1, parallel=2):
+    """Upgrade the LLMs of each pool `parallel` at a time, all pools at once, keeping at least
+    min_online LLMs registered in each controller.
+
+    Args:
+        llms: [(canister_name, canister_id)]
+        pools: {canister_id: (ctrlb_canister_id, llm_type, llm_cwd)}
+
+    Returns:
+        {canister_id: 'upgraded' | 'skipped' | 'failed'}
+    """
+    by_controller = defaultdict(list)
+    for canister_name, canister_id in llms:
+        by_controller[pools[canister_id][0]].append((canister_name, canister_id))
+
+    capacities = {}
+    for ctrlb_canister_id, pool_llms in by_controller.items():
+        online = registered_llms(network, ctrlb_canister_id)
+        capacities[ctrlb_canister_id] = PoolCapacity(online, min_online)
+        print(f"Controller {ctrlb_canister_id}: {len(online)} LLM(s) registered, upgrading {len(pool_llms)}, "
+              f"{parallel} at a time, keeping at least {min_online} registered")
+
+    def upgrade(llm):
+        canister_name, canister_id = llm
+        ctrlb_canister_id, llm_type, llm_cwd = pools[canister_id]
+        return upgrade_llm_rolling(network, capacities[ctrlb_canister_id], ctrlb_canister_id, llm_type, llm_cwd,
+                                   canister_name, canister_id)
+
+    def upgrade_pool(pool_llms):
+        with ThreadPoolExecutor(max_workers=max(1, parallel)) as executor:
+            return dict(zip([canister_id for _, canister_id in pool_llms], executor.map(upgrade, pool_llms)))
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, len(by_controller))) as executor:
+        for pool_results in executor.map(upgrade_pool, by_controller.values()):
+            results.update(pool_results)
+    return results
 
-def main(network, canister_id_):
+def main(network, canister_id_, rolling=False, min_online=1, parallel=2):
     (CANISTERS, CANISTER_COLORS, RESET_COLOR) = get_canisters(network, "protocol")
 
     challenger_name = None
@@ -244,6 +434,37 @@ def main(network, canister_id_):
         print(f"No SHARE_SERVICE canister found in canisters-{network}.env")
         return
 
+    if rolling:
+        llms, pools = [], {}
+        for name, id in reversed(list(CANISTERS.items())):
+            if "LLM" not in name.upper() or canister_id_ not in ("all", id):
+                continue
+            pool = llm_pool(name, challenger_canister_id, judge_canister_id, share_service_canister_id)
+            if pool is None:
+                print(f"Unknown llm type for canister {name}. Skipping.")
+                continue
+            llms.append((name, id))
+            pools[id] = pool
+
+        print(" ")
+        print("=" * 100)
+        for name, id in llms:
+            print(f"  {name} ({id})")
+        confirm = input(f"Upgrade these {len(llms)} LLMs on network '{network}', {parallel} per controller at a time, "
+                        f"keeping at least {min_online} registered per controller? (y/n): ").strip().lower()
+        if confirm not in ['y', 'yes']:
+            print("Upgrade cancelled.")
+            return
+
+        results = upgrade_llms_rolling(network, llms, pools, min_online, parallel)
+        print(" ")
+        print("=" * 100)
+        for name, id in llms:
+            print(f"  {results.get(id, 'failed'):<8} {name} ({id})")
+        if any(result != "upgraded" for result in results.values()):
+            sys.exit(1)
+        return
+
     for name, id in reversed(list(CANISTERS.items())):
         if "LLM" not in name.upper():
             continue
@@ -275,5 +496,24 @@ if __name__ == "__main__":
         default="all",
         help="Specify the canister ID to use",
     )
+    parser.add_argument(
+        "--rolling",
+        action="store_true",
+        help="Upgrade several LLMs per controller at once, without prompts per LLM",
+    )
+    parser.add_argument(
+        "--min-online",
+        type=int,
+        default=1,
+        help="With --rolling: LLMs that stay registered in each controller during the upgrades (default: 1)",
+    )
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        default=2,
+        help="With --rolling: LLMs of a controller upgraded at the same time (default: 2)",
+    )
     args = parser.parse_args()
-    main(args.network, args.canister_id)
+    if args.min_online < 0 or args.parallel < 1:
+        parser.error("--min-online must be at least 0 and --parallel at least 1")
+    main(args.network, args.canister_id, args.rolling, args.min_online, args.parallel)
@@ -3,6 +3,7 @@
 # Default network type is local
 NETWORK_TYPE="local"
 CANISTER_ID="all"
+EXTRA_ARGS=()
 
 # Parse command line arguments for network type
 while [ $# -gt 0 ]; do
@@ -22,9 +23,17 @@ while [ $# -gt 0 ]; do
             CANISTER_ID=$1
             shift
             ;;
+        --rolling)
+            EXTRA_ARGS+=("--rolling")
+            shift
+            ;;
+        --min-online|--parallel)
+            EXTRA_ARGS+=("$1" "$2")
+            shift 2
+            ;;
         *)
             echo "Unknown argument: $1"
-            echo "Usage: $0 --network [local|ic|testing|development|demo|prd] --canister-id [CANISTER_ID/all]"
+            echo "Usage: $0 --network [local|ic|testing|development|demo|prd] --canister-id [CANISTER_ID/all] [--rolling [--min-online K] [--parallel N]]"
             exit 1
             ;;
     esac
@@ -33,4 +42,4 @@ done
 echo "Using network type: $NETWORK_TYPE"
 echo "Using canister ID : $CANISTER_ID"
 
-python -m scripts.upgrade_llms --network $NETWORK_TYPE --canister-id $CANISTER_ID
+python -m scripts.upgrade_llms --network $NETWORK_TYPE --canister-id $CANISTER_ID "${EXTRA_ARGS[@]}"
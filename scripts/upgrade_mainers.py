@@ -31,6 +31,23 @@ To run the upgrade in a safe sequence:
     # Upgrade ALL mainers on production network with target hash and without confirmation prompt:
     scripts/upgrade_mainers.sh --network prd --target-hash $TARGET_HASH [--dry-run]
 
+    # Same, building the wasm once and installing it into each mAIner by canister ID:
+    scripts/upgrade_mainers.sh --network prd --target-hash $TARGET_HASH --install-by-hash [--wasm path/to/mainer.wasm] [--dry-run]
+
+    # Continue a run that crashed or was interrupted (same network and target hash), from its journal:
+    scripts/upgrade_mainers.sh --network prd --target-hash $TARGET_HASH --resume
+
+    # Same, preparing (maintenance flag, timer, queue drain, stop) the next 3 mAIners while one is deployed:
+    scripts/upgrade_mainers.sh --network prd --target-hash $TARGET_HASH --lookahead 3 [--dry-run]
+
+    # Same, 10 mAIners at a time, in waves of 50 that only advance when the previous wave is healthy,
+    # aborting when more than 2% of the upgrades fail:
+    scripts/upgrade_mainers.sh --network prd --target-hash $TARGET_HASH --parallel 10 --wave-size 50 --max-failure-rate 0.02 [--dry-run]
+
+    # Canary rollout: 5 mAIners first, watched for 10 minutes, then waves of 10, 20, 40, 50, 50, ...
+    # mAIners that fail after their deploy are restored from their snapshots and the rollout halts:
+    scripts/upgrade_mainers.sh --network prd --target-hash $TARGET_HASH --parallel 10 --wave-size 50 --canary 5 --soak 600 [--dry-run]
+
 
 To run unit tests:
     # from the root of the repository
@@ -43,21 +60,75 @@ import time
 import argparse
 import sys
 import json
+import hashlib
+import heapq
+import math
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, List, Dict, Optional, Tuple
 import signal
+from contextlib import nullcontext
 from pathlib import Path
 from enum import Enum
 
+try:
+    from .response_cache import cached_call, add_cache_arguments, configure_cache_from_args, cache_stats_summary
+except ImportError:  # run directly or imported by the tests
+    from response_cache import cached_call, add_cache_arguments, configure_cache_from_args, cache_stats_summary
+
+try:
+    from .canister_status import (parse_status_output, parse_info_output, remember_status_record,
+                                  cached_status_record, STATUS_MAX_AGE)
+except ImportError:  # run directly or imported by the tests
+    from canister_status import (parse_status_output, parse_info_output, remember_status_record,
+                                 cached_status_record, STATUS_MAX_AGE)
+
+try:
+    from .retry_policy import RETRY_BUDGET, RetryPolicy, canister_keys, retry_stats_summary
+    from .readiness import poll_until, readiness_summary
+    from .upgrade_journal import (UpgradeJournal, FLAG_ON, TIMER_STOPPED, STOPPED, SNAPSHOT, DEPLOYED, STARTED,
+                                  VERIFIED, SKIPPED, FAILED, RELEASED)
+    from .status_stream import StatusStream
+    from .stage_timings import StageTimings, histogram_lines
+    from .canister_index import canister_index as load_canister_index
+    from .fleet_executor import (run_fleet, canister_method, canister_status_record, canister_health, BOUNDARY_NODES,
+                                 DEFAULT_CONCURRENCY)
+except ImportError:  # run directly or imported by the tests
+    from retry_policy import RETRY_BUDGET, RetryPolicy, canister_keys, retry_stats_summary
+    from readiness import poll_until, readiness_summary
+    from upgrade_journal import (UpgradeJournal, FLAG_ON, TIMER_STOPPED, STOPPED, SNAPSHOT, DEPLOYED, STARTED,
+                                 VERIFIED, SKIPPED, FAILED, RELEASED)
+    from status_stream import StatusStream
+    from stage_timings import StageTimings, histogram_lines
+    from canister_index import canister_index as load_canister_index
+    from fleet_executor import (run_fleet, canister_method, canister_status_record, canister_health, BOUNDARY_NODES,
+                                DEFAULT_CONCURRENCY)
+
 # Get the directory of this script
 SCRIPT_DIR = Path(__file__).parent.resolve()
 POAIW_MAINER_DIR = (SCRIPT_DIR / "../PoAIW/src/mAIner").resolve()
 POAIW_DFX_JSON_PATH = (POAIW_MAINER_DIR / "dfx.json").resolve()
 POAIW_CANISTER_IDS_PATH = (POAIW_MAINER_DIR / "canister_ids.json").resolve()
 
+# dfx.json entry that is built once for all mAIners with --install-by-hash
+MAINER_BUILD_CANISTER = "mainer_ctrlb_canister"
+
 # Log file path
 LOG_FILE_PATH = SCRIPT_DIR / "upgrade_mainers.logs"
 
+# Stream of the status changes, appended as they happen (see status_stream.py)
+STATUS_STREAM_PATH = SCRIPT_DIR / "upgrade_mainers_status.jsonl"
+
+# Time per upgrade stage of the last run (see stage_timings.py)
+TIMINGS_REPORT_PATH = SCRIPT_DIR / "upgrade_mainers_timings.json"
+
+# Status report of the last run
+STATUS_JSON_PATH = SCRIPT_DIR / "upgrade_mainers_status.json"
+STATUS_MD_PATH = SCRIPT_DIR / "upgrade_mainers_status.md"
+
 # Color codes for output
 RED = '\033[0;31m'
 GREEN = '\033[0;32m'
@@ -75,6 +146,14 @@ log_file_handle = None
 current_mainer_index = None
 total_mainers_to_process = None
 
+# Per-thread progress for parallel upgrades (--parallel), and a lock so log lines do not interleave
+_progress = threading.local()
+_log_lock = threading.Lock()
+
+# One `dfx deploy` at a time in POAIW_MAINER_DIR: dfx builds every mAIner there and writes its .dfx state
+# to the same folder (--install-by-hash builds once and needs no lock)
+_deploy_lock = threading.Lock()
+
 # Status tracking for each mAIner
 class MainerStatus(Enum):
     """Status flags for mAIner upgrade process."""
@@ -93,11 +172,55 @@ class MainerStatus(Enum):
     FAILED_START_TIMER = "failed_start_timer"    # Failed to start timer
     FAILED_MAINTENANCE = "failed_maintenance"    # Failed to turn off maintenance flag
     FAILED_OTHER = "failed_other"                # Failed for other reason
+    ROLLED_BACK = "rolled_back"                  # Failed after its deploy, restored from its snapshot (--canary)
 
 # Global dictionary to track status of each mAIner
 # Key: canister address, Value: dict with status, timestamp, and optional error message
 mainer_status_tracker: Dict[str, Dict] = {}
 
+# Wasm installed by canister ID into every mAIner with --install-by-hash (None: dfx deploy per mAIner)
+mainer_wasm_path: Optional[Path] = None
+
+# Write-ahead journal of the upgrade steps (None in dry runs)
+upgrade_journal: Optional[UpgradeJournal] = None
+
+# Stream of the status changes of this run (None when not run from main)
+status_stream: Optional[StatusStream] = None
+
+# Time spent per upgrade stage in this run, and its ETA (None when not run from main)
+stage_timings: Optional[StageTimings] = None
+
+# Snapshot taken before the deploy, per mAIner whose code was replaced in this run (for --canary rollbacks)
+upgrade_snapshots: Dict[str, str] = {}
+
+# Seconds between the health checks of the soak window of a canary wave
+SOAK_CHECK_INTERVAL = 60
+
+# mAIners the pre-flight pass found to need the upgrade: not checked again by should_skip_upgrade
+preflight_upgrades: set = set()
+
+# Cycles balance below which the pre-flight pass warns about a mAIner
+LOW_CYCLES_WARNING = 1_000_000_000_000
+
+# A challenge queue with an entry younger than this is still active: the mAIner is upgraded later
+QUEUE_QUIET_SECONDS = 600
+
+# Times a mAIner is put back in line because its challenge queue is active, before the upgrade waits for it
+MAX_QUEUE_DEFERRALS = 3
+
+def journal_step(address: str, step: str, **data):
+    """Record a step of a mAIner's upgrade in the journal."""
+    if upgrade_journal is not None:
+        upgrade_journal.record(address, step, **data)
+
+def stage_span(address: str, stage: str):
+    """Time a stage of a mAIner's upgrade."""
+    return stage_timings.span(address, stage) if stage_timings is not None else nullcontext()
+
+def journal_reached(address: str, step: str) -> bool:
+    """True if the journal shows the mAIner already did this step (in a run that this run resumes)."""
+    return upgrade_journal is not None and upgrade_journal.reached(address, step)
+
 def update_mainer_status(address: str, status: MainerStatus, error_msg: Optional[str] = None):
     """
     Update the status of a mAIner in the global tracker.
@@ -112,6 +235,21 @@ def update_mainer_status(address: str, status: MainerStatus, error_msg: Optional
         'timestamp': datetime.now(),
         'error': error_msg
     }
+    if status_stream is not None:
+        status_stream.emit(address, status.value, error_msg)
+    if stage_timings is not None and status not in (MainerStatus.PENDING, MainerStatus.IN_PROGRESS,
+                                                    MainerStatus.SKIPPED_FILTER):
+        stage_timings.finished(address)
+        if status == MainerStatus.SUCCESS or status.value.startswith("failed"):
+            log_message(f"Progress: {stage_timings.progress()}", "INFO")
+
+    # Final outcomes also go to the journal
+    if status == MainerStatus.SUCCESS:
+        journal_step(address, VERIFIED)
+    elif status in (MainerStatus.SKIPPED_ALREADY_UPGRADED, MainerStatus.SKIPPED_DOES_NOT_EXIST):
+        journal_step(address, SKIPPED, reason=status.value)
+    elif status.value.startswith("failed"):
+        journal_step(address, FAILED, reason=error_msg or status.value)
 
 def get_status_summary() -> Dict[str, int]:
     """
@@ -126,13 +264,14 @@ def get_status_summary() -> Dict[str, int]:
         summary[status] = summary.get(status, 0) + 1
     return summary
 
-def write_status_to_json(filepath: str = "scripts/upgrade_mainers_status.json"):
+def write_status_to_json(filepath: Optional[str] = None):
     """
     Write the status tracker to a JSON file.
 
     Args:
-        filepath: Path to the JSON file (default: scripts/upgrade_mainers_status.json)
+        filepath: Path to the JSON file (default: STATUS_JSON_PATH, scripts/upgrade_mainers_status.json)
     """
+    filepath = filepath or STATUS_JSON_PATH
     if not mainer_status_tracker:
         log_message("No status data to write to JSON", "WARNING")
         return
@@ -153,13 +292,14 @@ def write_status_to_json(filepath: str = "scripts/upgrade_mainers_status.json"):
     except Exception as e:
         log_message(f"Failed to write JSON status file: {e}", "ERROR")
 
-def write_status_to_markdown(filepath: str = "scripts/upgrade_mainers_status.md"):
+def write_status_to_markdown(filepath: Optional[str] = None):
     """
     Write the status tracker to a Markdown file with a properly formatted table.
 
     Args:
-        filepath: Path to the Markdown file (default: scripts/upgrade_mainers_status.md)
+        filepath: Path to the Markdown file (default: STATUS_MD_PATH, scripts/upgrade_mainers_status.md)
     """
+    filepath = filepath or STATUS_MD_PATH
     if not mainer_status_tracker:
         log_message("No status data to write to Markdown", "WARNING")
         return
@@ -253,6 +393,7 @@ def print_status_report(processed_count: int = 0):
     # Count key categories (only for processed mAIners, not filtered ones)
     success_count = summary.get('success', 0)
     failed_count = sum(count for status, count in summary.items() if status.startswith('failed_'))
+    rolled_back_count = summary.get('rolled_back', 0)
 
     # For skipped, only count the ones that were actually checked (not pre-filtered)
     skipped_already_upgraded = summary.get('skipped_upgraded', 0)
@@ -261,7 +402,7 @@ def print_status_report(processed_count: int = 0):
     skipped_processed = skipped_already_upgraded + skipped_user + skipped_does_not_exist
 
     # Total that were actually looked at
-    total_processed = success_count + failed_count + skipped_processed
+    total_processed = success_count + failed_count + rolled_back_count + skipped_processed
 
     # Print concise summary
     log_message(f"{'='*60}", "INFO")
@@ -272,6 +413,8 @@ def print_status_report(processed_count: int = 0):
     log_message(f"  ⊘ Skipped by user: {skipped_user}", "INFO" if skipped_user == 0 else "WARNING")
     log_message(f"  ⊘ Does not exist: {skipped_does_not_exist}", "WARNING" if skipped_does_not_exist > 0 else "INFO")
     log_message(f"  ✗ Failed: {failed_count}", "ERROR" if failed_count > 0 else "INFO")
+    if rolled_back_count > 0:
+        log_message(f"  ↺ Rolled back: {rolled_back_count}", "WARNING")
 
     # Show canisters that don't exist
     if skipped_does_not_exist > 0:
@@ -288,17 +431,45 @@ def print_status_report(processed_count: int = 0):
                 error_msg = f" - {data['error']}" if data.get('error') else ""
                 log_message(f"  {address}: {data['status'].value}{error_msg}", "ERROR")
 
+    # Show rolled back mAIners
+    if rolled_back_count > 0:
+        log_message("\nRolled back mAIners:", "WARNING")
+        for address, data in mainer_status_tracker.items():
+            if data['status'] == MainerStatus.ROLLED_BACK:
+                log_message(f"  {address} - {data['error']}", "WARNING")
+
+    log_message(retry_stats_summary(), "INFO")
+    log_message(readiness_summary(), "INFO")
     log_message(f"\nDetailed status saved to:", "INFO")
     log_message(f"  - scripts/upgrade_mainers_status.json", "INFO")
     log_message(f"  - scripts/upgrade_mainers_status.md", "INFO")
+    log_message(f"  - scripts/upgrade_mainers_status.jsonl (stream of the status changes)", "INFO")
+    log_message(f"  - scripts/upgrade_mainers_timings.json (time per upgrade stage)", "INFO")
     log_message(f"  - scripts/upgrade_mainers.logs", "INFO")
     log_message(f"{'='*60}", "INFO")
 
+def write_timings_report(timings: StageTimings, path: Optional[Path] = None):
+    """Log the histogram of the time per upgrade stage and write it as JSON."""
+    path = path or TIMINGS_REPORT_PATH
+    report = timings.report()
+    for line in histogram_lines(report):
+        log_message(line, "INFO")
+    if not report:
+        return
+    try:
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        log_message(f"Stage timings saved to {path} (python -m scripts.stage_timings rebuilds them from the stream)", "INFO")
+    except OSError as e:
+        log_message(f"Could not write {path}: {e}", "WARNING")
+
 def signal_handler(sig, frame):
     """Handle Ctrl+C interruption gracefully."""
     global interrupted, log_file_handle
     interrupted = True
     print(f"\n{RED}Upgrade process interrupted! Current canister may need manual inspection.{NC}")
+    if upgrade_journal is not None:
+        print(f"{YELLOW}Run again with --resume to continue where it stopped (journal: {upgrade_journal.path}){NC}")
 
     # Close log file before exiting
     if log_file_handle:
@@ -324,18 +495,22 @@ def log_message(message: str, level: str = "INFO"):
 
     # Add progress indicator if we're in a mainer processing loop
     progress = ""
-    if current_mainer_index is not None and total_mainers_to_process is not None:
-        progress = f" ({current_mainer_index + 1}/{total_mainers_to_process})"
-
-    # Print to console with color
-    console_message = f"{color}[{timestamp}]{progress} {level}: {message}{NC}"
-    print(console_message)
-
-    # Write to log file without color codes
-    if log_file_handle:
-        file_message = f"[{timestamp}]{progress} {level}: {message}\n"
-        log_file_handle.write(file_message)
-        log_file_handle.flush()  # Ensure it's written immediately
+    mainer_index = getattr(_progress, "index", None)
+    if mainer_index is None:
+        mainer_index = current_mainer_index
+    if mainer_index is not None and total_mainers_to_process is not None:
+        progress = f" ({mainer_index + 1}/{total_mainers_to_process})"
+
+    with _log_lock:
+        # Print to console with color
+        console_message = f"{color}[{timestamp}]{progress} {level}: {message}{NC}"
+        print(console_message)
+
+        # Write to log file without color codes
+        if log_file_handle:
+            file_message = f"[{timestamp}]{progress} {level}: {message}\n"
+            log_file_handle.write(file_message)
+            log_file_handle.flush()  # Ensure it's written immediately
 
 def run_command(
     command: List[str],
@@ -345,7 +520,8 @@ def run_command(
     retry_on_transient_errors: bool = False,
     max_retries: int = 3,
     retry_delay: float = 2.0,
-    log_stdout: bool = False
+    log_stdout: bool = False,
+    fail_fast: bool = False
 ) -> subprocess.CompletedProcess:
     """Run a command and return the result.
 
@@ -358,6 +534,8 @@ def run_command(
         max_retries: Maximum number of retry attempts (only used if retry_on_transient_errors=True)
         retry_delay: Base delay between retries in seconds (exponential backoff applied)
         log_stdout: If True, log stdout output line by line (only when capture_output=True)
+        fail_fast: If True, use the circuit breakers and the retry budget of the run. Only for
+                   read-only scans: upgrade and rollback steps retry up to max_retries regardless
     """
     # Log the command being executed with details
     cmd_str = ' '.join(command)
@@ -365,42 +543,13 @@ def run_command(
     capture_info = " (capturing output)" if capture_output else " (not capturing output)"
     log_message(f"Executing: {cmd_str}{cwd_info}{capture_info}", "INFO")
 
-    def is_transient_error(stderr: str) -> bool:
-        """Check if error message indicates a transient error worth retrying."""
-        if not stderr:
-            return False
-
-        # Non-transient errors that should NOT be retried
-        non_transient_indicators = [
-            "IC0536",  # Method not found - permanent error
-            "has no update method",
-            "has no query method",
-        ]
-        if any(indicator in stderr for indicator in non_transient_indicators):
-            return False
-
-        # Transient errors that SHOULD be retried
-        transient_indicators = [
-            "Failed query call",
-            "CanisterError",
-            "IC0508",  # Canister stopped
-            "IC0503",  # Canister trapped
-            "timeout",
-            "Timeout",
-            "timed out",  # Operation timed out
-            "Operation timed out",
-            "tcp connect error",
-            "connection refused",
-            "Connection refused",
-            "temporarily unavailable",
-            "error sending request",  # Network request errors
-            "client error (Connect)"  # Connection errors
-        ]
-        return any(indicator in stderr for indicator in transient_indicators)
-
+    policy = RetryPolicy(max_retries=max_retries, base_delay=retry_delay,
+                         breakers=fail_fast, budget=RETRY_BUDGET if fail_fast else None)
+    keys = canister_keys(command) if retry_on_transient_errors else ()
     attempt = 0
     while True:
         try:
+            policy.check(keys)
             if capture_output:
                 result = subprocess.run(command, capture_output=True, text=True, check=check, cwd=cwd)
                 # Log stdout if requested (useful for dfx deploy output)
@@ -408,9 +557,11 @@ def run_command(
                     for line in result.stdout.strip().split('\n'):
                         if line.strip():
                             log_message(line, "INFO")
+                policy.record_success(keys)
                 return result
             else:
                 result = subprocess.run(command, check=check, cwd=cwd)
+                policy.record_success(keys)
                 return result
         except subprocess.CalledProcessError as e:
             attempt += 1
@@ -423,16 +574,12 @@ def run_command(
                 error_text += " " + e.stdout
             error_text += " " + str(e)
 
-            # Check if we should retry
-            should_retry = (
-                retry_on_transient_errors
-                and attempt < max_retries
-                and is_transient_error(error_text)
-            )
+            # Retry transient errors with jittered backoff, unless a circuit breaker is open
+            # or the retry budget of this run is spent
+            delay = policy.retry_delay(attempt, error_text, keys) if retry_on_transient_errors else None
 
-            if should_retry:
-                delay = retry_delay * (2 ** (attempt - 1))  # Exponential backoff
-                log_message(f"Transient error detected (attempt {attempt}/{max_retries}). Retrying in {delay}s...", "WARNING")
+            if delay is not None:
+                log_message(f"Transient error detected (attempt {attempt}/{max_retries}). Retrying in {delay:.1f}s...", "WARNING")
                 if e.stderr:
                     log_message(f"Error was: {e.stderr.strip()}", "WARNING")
                 elif str(e):
@@ -449,15 +596,19 @@ def run_command(
 def get_mainers(network: str) -> List[Dict]:
     """Get all mainers from game state canister."""
     log_message(f"Getting all mAIners from game_state_canister on network {network}...")
-    try:
+    def fetch():
         result = run_command([
             "dfx", "canister", "--network", network, "call",
             "game_state_canister", "getMainerAgentCanistersAdmin",
             "--output", "json"
         ])
-        data = json.loads(result.stdout)
+        return json.loads(result.stdout)
+
+    try:
+        data = cached_call(network, "game_state_canister", "getMainerAgentCanistersAdmin", fetch)
         mainers = data.get('Ok', [])
         log_message(f"Found {len(mainers)} total mAIners (Unfiltered, still includes empty address + ShareService)", "INFO")
+        log_message(cache_stats_summary(), "INFO")
         return mainers
     except Exception as e:
         log_message(f"Failed to get mAIners: {e}", "ERROR")
@@ -466,21 +617,21 @@ def get_mainers(network: str) -> List[Dict]:
 def get_cycles_balance(network: str, canister_id: str) -> Optional[int]:
     """Get the cycles balance of a canister.
 
+    Reuses the status record of a `get_canister_status` call made just before.
+
     Returns:
         Cycles balance as integer, or None if unable to retrieve.
     """
+    record = cached_status_record(network, canister_id)
+    if record is not None and record.balance is not None:
+        return record.balance
     try:
         result = run_command([
             "dfx", "canister", "--network", network, "status", canister_id
         ], retry_on_transient_errors=True, max_retries=3, retry_delay=5.0)
-        for line in result.stdout.split('\n'):
-            if 'Balance:' in line:
-                # Parse line like "Balance: 3_000_000_000_000 Cycles"
-                balance_str = line.split(':')[1].strip().split()[0]
-                # Remove underscores and convert to int
-                balance = int(balance_str.replace('_', ''))
-                return balance
-        return None
+        record = parse_status_output(canister_id, result.stdout)
+        remember_status_record(network, record)
+        return record.balance
     except Exception as e:
         log_message(f"Failed to get cycles balance for {canister_id}: {e}", "WARNING")
         return None
@@ -512,10 +663,10 @@ def get_canister_status(network: str, canister_id: str) -> Optional[str]:
             result = run_command([
                 "dfx", "canister", "--network", network, "status", canister_id
             ], retry_on_transient_errors=True, max_retries=5, retry_delay=10.0)
-            for line in result.stdout.split('\n'):
-                if line.startswith('Status:'):
-                    return line.split(':')[1].strip()
-            return None
+            # Keep the whole record: balance and module hash are read from it right after
+            record = parse_status_output(canister_id, result.stdout)
+            remember_status_record(network, record)
+            return record.status
         except subprocess.CalledProcessError as e:
             error_text = ""
             if hasattr(e, 'stderr') and e.stderr:
@@ -561,20 +712,26 @@ class CanisterDoesNotExistError(Exception):
     """Exception raised when a canister does not exist."""
     pass
 
-def get_canister_wasm_hash(network: str, canister_id: str) -> Optional[str]:
+def get_canister_wasm_hash(network: str, canister_id: str, max_age: float = STATUS_MAX_AGE,
+                           fail_fast: bool = False) -> Optional[str]:
     """Get the wasm hash of a canister with retry on transient network errors.
 
+    Reuses a status record fetched in the last max_age seconds (pass 0 after an upgrade).
+    fail_fast: use the circuit breakers and the retry budget (for scans, see run_command).
+
     Raises:
         CanisterDoesNotExistError: If the canister does not exist
     """
+    record = cached_status_record(network, canister_id, max_age)
+    if record is not None:
+        return record.module_hash
     try:
         result = run_command([
             "dfx", "canister", "--network", network, "info", canister_id
-        ], retry_on_transient_errors=True, max_retries=5, retry_delay=10.0)
-        for line in result.stdout.split('\n'):
-            if 'Module hash:' in line:
-                return line.split(':')[1].strip()
-        return None
+        ], retry_on_transient_errors=True, max_retries=5, retry_delay=10.0, fail_fast=fail_fast)
+        record = parse_info_output(canister_id, result.stdout)
+        remember_status_record(network, record)
+        return record.module_hash
     except subprocess.CalledProcessError as e:
         # Check if the error is because canister does not exist
         error_text = ""
@@ -642,6 +799,28 @@ def start_timer(network: str, canister_id: str, dry_run: bool = False) -> bool:
         log_message(f"Failed to start timer for {canister_id}: {e}", "ERROR")
         return False
 
+def last_queue_entry(queue: List[Dict]) -> Optional[datetime]:
+    """Time of the most recent entry of a challenge queue (as returned by getChallengeQueueAdmin), None if none."""
+    # Find the entry with the most recent (highest) challengeQueuedTimestamp
+    # The queue can contain up to 5 items and they may not be in timestamp order
+    most_recent_timestamp = 0
+    for entry in queue:
+        timestamp_str = str(entry.get('challengeQueuedTimestamp', '0'))
+        # Remove underscores from timestamp string if present
+        timestamp_ns = int(timestamp_str.replace('_', ''))
+        most_recent_timestamp = max(most_recent_timestamp, timestamp_ns)
+
+    if most_recent_timestamp == 0:
+        return None
+    return datetime.fromtimestamp(most_recent_timestamp / 1_000_000_000)
+
+def queue_quiet_at(last_entry_time: Optional[datetime]) -> Optional[datetime]:
+    """When a challenge queue whose last entry is from last_entry_time becomes quiet, None if it already is."""
+    if last_entry_time is None:
+        return None
+    quiet_at = last_entry_time + timedelta(seconds=QUEUE_QUIET_SECONDS)
+    return quiet_at if quiet_at > datetime.now() else None
+
 def check_queue(network: str, canister_id: str) -> Tuple[bool, Optional[datetime]]:
     """Check the queue for a canister and return status and last entry time."""
     log_message(f"Checking challenge queue for {canister_id}...")
@@ -657,26 +836,11 @@ def check_queue(network: str, canister_id: str) -> Tuple[bool, Optional[datetime
             log_message("Challenge queue is empty", "SUCCESS")
             return False, None
 
-        # Find the entry with the most recent (highest) challengeQueuedTimestamp
-        # The queue can contain up to 5 items and they may not be in timestamp order
-        most_recent_timestamp = 0
-        most_recent_entry = None
-
-        for entry in queue:
-            timestamp_str = entry.get('challengeQueuedTimestamp', '0')
-            # Remove underscores from timestamp string if present
-            timestamp_str = timestamp_str.replace('_', '')
-            timestamp_ns = int(timestamp_str)
-
-            if timestamp_ns > most_recent_timestamp:
-                most_recent_timestamp = timestamp_ns
-                most_recent_entry = entry
-
-        if most_recent_timestamp == 0:
+        timestamp = last_queue_entry(queue)
+        if timestamp is None:
             log_message("Could not find valid timestamp in queue", "ERROR")
             return False, None
 
-        timestamp = datetime.fromtimestamp(most_recent_timestamp / 1_000_000_000)
         age = datetime.now() - timestamp
         log_message(f"Most recent queue entry age: {age.total_seconds() / 60:.1f} minutes")
 
@@ -790,39 +954,33 @@ def create_snapshot(network: str, canister_id: str, dry_run: bool = False) -> Op
         log_message(f"Failed to create snapshot for {canister_id}: {e}", "ERROR")
         return None
 
-def upgrade_canister(network: str, canister_name: str, dry_run: bool = False, deploy_with_yes: bool = False) -> bool:
-    """Upgrade a canister with retry on transient network errors.
-
-    Handles out-of-cycles errors by automatically topping up the canister with cycles.
-    """
-    def is_out_of_cycles_error(error_text: str) -> bool:
-        """Check if error indicates canister is out of cycles during installation."""
-        return "is out of cycles" in error_text and "IC0207" in error_text
-
-    log_message(f"Upgrading {canister_name}...")
-
+def load_snapshot(network: str, canister_id: str, snapshot_id: str, dry_run: bool = False) -> bool:
+    """Load a snapshot into a stopped canister with retry on transient network errors."""
+    log_message(f"Loading snapshot {snapshot_id} into {canister_id}...")
     command = [
-        "dfx", "deploy", "--network", network, canister_name, "--mode", "upgrade", "--wasm-memory-persistence", "keep"
+        "dfx", "canister", "--network", network, "snapshot", "load", canister_id, snapshot_id
     ]
-    if deploy_with_yes:
-        command.append("--yes")
-
     if dry_run:
-        log_message(f"DRY RUN: Would execute (in {POAIW_MAINER_DIR}): {' '.join(command)}", "INFO")
+        log_message(f"DRY RUN: Would execute: {' '.join(command)}", "INFO")
         return True
 
-    # Get canister ID from canister_ids.json
     try:
-        with open(POAIW_CANISTER_IDS_PATH, 'r') as f:
-            canister_ids = json.load(f)
-        canister_id = canister_ids.get(canister_name, {}).get(network)
-        if not canister_id:
-            log_message(f"Could not find canister ID for {canister_name} on network {network}", "ERROR")
-            return False
+        run_command(command, retry_on_transient_errors=True, max_retries=5, retry_delay=10.0)
+        log_message(f"Snapshot {snapshot_id} loaded into {canister_id}", "SUCCESS")
+        return True
     except Exception as e:
-        log_message(f"Failed to read canister_ids.json: {e}", "ERROR")
+        log_message(f"Failed to load snapshot {snapshot_id} into {canister_id}: {e}", "ERROR")
         return False
 
+def install_with_cycles_top_up(network: str, command: List[str], canister_id: str, label: str) -> bool:
+    """Run an upgrade command with retry on transient network errors.
+
+    Handles out-of-cycles errors by automatically topping up the canister with cycles.
+    """
+    def is_out_of_cycles_error(error_text: str) -> bool:
+        """Check if error indicates canister is out of cycles during installation."""
+        return "is out of cycles" in error_text and "IC0207" in error_text
+
     max_attempts = 2  # Initial attempt + 1 retry after topping up
 
     for attempt in range(1, max_attempts + 1):
@@ -839,7 +997,7 @@ def upgrade_canister(network: str, canister_name: str, dry_run: bool = False, de
                 retry_delay=10.0,
                 log_stdout=True  # Show deployment progress
             )
-            log_message(f"Canister {canister_name} upgraded", "SUCCESS")
+            log_message(f"Canister {label} upgraded", "SUCCESS")
             return True
         except subprocess.CalledProcessError as e:
             error_text = ""
@@ -872,16 +1030,106 @@ def upgrade_canister(network: str, canister_name: str, dry_run: bool = False, de
                     return False
             else:
                 # Not an out-of-cycles error, or we've exhausted retries
-                log_message(f"Failed to upgrade {canister_name}: {e}", "ERROR")
+                log_message(f"Failed to upgrade {label}: {e}", "ERROR")
                 return False
         except Exception as e:
-            log_message(f"Failed to upgrade {canister_name}: {e}", "ERROR")
+            log_message(f"Failed to upgrade {label}: {e}", "ERROR")
             return False
 
     # If we get here, all attempts failed
-    log_message(f"Failed to upgrade {canister_name} after {max_attempts} attempts", "ERROR")
+    log_message(f"Failed to upgrade {label} after {max_attempts} attempts", "ERROR")
     return False
 
+def upgrade_canister(network: str, canister_name: str, dry_run: bool = False, deploy_with_yes: bool = False) -> bool:
+    """Upgrade a canister with `dfx deploy`, which builds its wasm first.
+
+    Handles out-of-cycles errors by automatically topping up the canister with cycles.
+    """
+    log_message(f"Upgrading {canister_name}...")
+
+    command = [
+        "dfx", "deploy", "--network", network, canister_name, "--mode", "upgrade", "--wasm-memory-persistence", "keep"
+    ]
+    if deploy_with_yes:
+        command.append("--yes")
+
+    if dry_run:
+        log_message(f"DRY RUN: Would execute (in {POAIW_MAINER_DIR}): {' '.join(command)}", "INFO")
+        return True
+
+    # Get canister ID from canister_ids.json
+    try:
+        canister_id = load_canister_index(POAIW_CANISTER_IDS_PATH).address(canister_name, network)
+        if not canister_id:
+            log_message(f"Could not find canister ID for {canister_name} on network {network}", "ERROR")
+            return False
+    except Exception as e:
+        log_message(f"Failed to read canister_ids.json: {e}", "ERROR")
+        return False
+
+    with _deploy_lock:
+        return install_with_cycles_top_up(network, command, canister_id, canister_name)
+
+def wasm_module_hash(wasm_path: Path) -> str:
+    """The module hash the IC reports for a canister running this wasm: "0x" + sha256 of the file."""
+    return "0x" + hashlib.sha256(Path(wasm_path).read_bytes()).hexdigest()
+
+def build_mainer_wasm(dry_run: bool = False) -> Optional[Path]:
+    """Build the mAIner wasm once, as the MAINER_BUILD_CANISTER entry of dfx.json (added if missing).
+
+    Returns:
+        Path of the built wasm, or None if the build failed
+    """
+    wasm_path = POAIW_MAINER_DIR / ".dfx" / "local" / "canisters" / MAINER_BUILD_CANISTER / f"{MAINER_BUILD_CANISTER}.wasm"
+    command = ["dfx", "build", "--check", MAINER_BUILD_CANISTER]
+    if dry_run:
+        log_message(f"DRY RUN: Would execute (in {POAIW_MAINER_DIR}): {' '.join(command)}", "INFO")
+        return wasm_path
+
+    try:
+        with open(POAIW_DFX_JSON_PATH, 'r') as f:
+            dfx_config = json.load(f)
+        if MAINER_BUILD_CANISTER not in dfx_config['canisters']:
+            dfx_config['canisters'][MAINER_BUILD_CANISTER] = {
+                "main": "src/Main.mo",
+                "type": "motoko",
+                "args": "--enhanced-orthogonal-persistence"
+            }
+            with open(POAIW_DFX_JSON_PATH, 'w') as f:
+                json.dump(dfx_config, f, indent=2)
+
+        log_message(f"Building the mAIner wasm ({MAINER_BUILD_CANISTER})...", "INFO")
+        run_command(command, capture_output=True, cwd=str(POAIW_MAINER_DIR), log_stdout=True)
+    except Exception as e:
+        log_message(f"Failed to build the mAIner wasm: {e}", "ERROR")
+        return None
+
+    if not wasm_path.exists():
+        log_message(f"Build succeeded but {wasm_path} was not found", "ERROR")
+        return None
+    return wasm_path
+
+def install_mainer_wasm(network: str, canister_id: str, wasm_path: Path, dry_run: bool = False,
+                        deploy_with_yes: bool = False) -> bool:
+    """Upgrade a canister by ID with an already built wasm, without a dfx.json entry or a build.
+
+    Handles out-of-cycles errors by automatically topping up the canister with cycles.
+    """
+    log_message(f"Installing {wasm_path.name} into {canister_id}...")
+
+    command = [
+        "dfx", "canister", "install", "--network", network, canister_id, "--mode", "upgrade",
+        "--wasm", str(wasm_path), "--wasm-memory-persistence", "keep"
+    ]
+    if deploy_with_yes:
+        command.append("--yes")
+
+    if dry_run:
+        log_message(f"DRY RUN: Would execute (in {POAIW_MAINER_DIR}): {' '.join(command)}", "INFO")
+        return True
+
+    return install_with_cycles_top_up(network, command, canister_id, canister_id)
+
 def check_health(network: str, canister_id: str, dry_run: bool = False) -> tuple[bool, str]:
     """Check the health of a canister.
 
@@ -982,25 +1230,17 @@ def turn_on_maintenance_flag(network: str, canister_id: str, dry_run: bool = Fal
             ]
             toggle_result = run_command(toggle_command)
 
-            # Step 3: Verify flag is now true (with retries)
-            max_retries = 5
-            retry_delay = 3.0
-
-            for attempt in range(1, max_retries + 1):
-                # Give canister a moment for the flag change to propagate
-                time.sleep(retry_delay)
-
-                new_flag_value = get_maintenance_flag(network, canister_id)
-
-                if new_flag_value is True:
-                    log_message(f"Maintenance flag turned ON for {canister_id}", "SUCCESS")
-                    return True
-                elif attempt < max_retries:
-                    log_message(f"Flag still OFF (attempt {attempt}/{max_retries}). Waiting {retry_delay}s before next check...", "WARNING")
-                else:
-                    log_message(f"Failed to turn on maintenance flag for {canister_id}: flag is still {new_flag_value}", "ERROR")
-                    return False
-
+            # Step 3: Verify flag is now true (polling until the flag change has propagated)
+            poll = poll_until(
+                "maintenance_flag_on", lambda: get_maintenance_flag(network, canister_id),
+                is_ready=lambda flag: flag is True,
+                on_wait=lambda attempt, delay, flag: log_message(
+                    f"Flag still OFF (attempt {attempt}). Waiting {delay:.1f}s before next check...", "WARNING")
+            )
+            if poll.ready:
+                log_message(f"Maintenance flag turned ON for {canister_id} ({poll.elapsed:.1f}s)", "SUCCESS")
+                return True
+            log_message(f"Failed to turn on maintenance flag for {canister_id}: flag is still {poll.value}", "ERROR")
             return False
         else:
             log_message(f"Unexpected maintenance flag value: {flag_value}", "ERROR")
@@ -1025,24 +1265,17 @@ def turn_off_maintenance_flag(network: str, canister_id: str, dry_run: bool = Fa
     try:
         # Step 1: Check current maintenance flag status with retries
         # After upgrade, canister may need time to initialize
-        max_initial_retries = 5
-        initial_retry_delay = 3.0
-        flag_value = None
-
-        for initial_attempt in range(1, max_initial_retries + 1):
-            flag_value = get_maintenance_flag(network, canister_id)
-
-            # If we got a valid response (True or False), proceed
-            if flag_value is not None:
-                break
-
-            # If None (method not found or error), retry with delay
-            if initial_attempt < max_initial_retries:
-                log_message(f"Could not get maintenance flag (attempt {initial_attempt}/{max_initial_retries}). Canister may be initializing. Waiting {initial_retry_delay}s...", "WARNING")
-                time.sleep(initial_retry_delay)
-            else:
-                log_message(f"Could not get maintenance flag after {max_initial_retries} attempts. Canister may not have this method (old version) - assuming success", "WARNING")
-                return True
+        # If None (method not found or error), poll again
+        poll = poll_until(
+            "flag_endpoint", lambda: get_maintenance_flag(network, canister_id),
+            is_ready=lambda flag: flag is not None,
+            on_wait=lambda attempt, delay, flag: log_message(
+                f"Could not get maintenance flag (attempt {attempt}). Canister may be initializing. Waiting {delay:.1f}s...", "WARNING")
+        )
+        if not poll.ready:
+            log_message(f"Could not get maintenance flag after {poll.polls} attempts. Canister may not have this method (old version) - assuming success", "WARNING")
+            return True
+        flag_value = poll.value
 
         # Check if flag is already false
         if flag_value is False:
@@ -1058,25 +1291,17 @@ def turn_off_maintenance_flag(network: str, canister_id: str, dry_run: bool = Fa
             ]
             toggle_result = run_command(toggle_command)
 
-            # Step 3: Verify flag is now false (with retries)
-            max_retries = 5
-            retry_delay = 3.0
-
-            for attempt in range(1, max_retries + 1):
-                # Give canister a moment for the flag change to propagate
-                time.sleep(retry_delay)
-
-                new_flag_value = get_maintenance_flag(network, canister_id)
-
-                if new_flag_value is False:
-                    log_message(f"Maintenance flag turned OFF for {canister_id}", "SUCCESS")
-                    return True
-                elif attempt < max_retries:
-                    log_message(f"Flag still ON (attempt {attempt}/{max_retries}). Waiting {retry_delay}s before next check...", "WARNING")
-                else:
-                    log_message(f"Failed to turn off maintenance flag for {canister_id}: flag is still {new_flag_value}", "ERROR")
-                    return False
-
+            # Step 3: Verify flag is now false (polling until the flag change has propagated)
+            poll = poll_until(
+                "maintenance_flag_off", lambda: get_maintenance_flag(network, canister_id),
+                is_ready=lambda flag: flag is False,
+                on_wait=lambda attempt, delay, flag: log_message(
+                    f"Flag still ON (attempt {attempt}). Waiting {delay:.1f}s before next check...", "WARNING")
+            )
+            if poll.ready:
+                log_message(f"Maintenance flag turned OFF for {canister_id} ({poll.elapsed:.1f}s)", "SUCCESS")
+                return True
+            log_message(f"Failed to turn off maintenance flag for {canister_id}: flag is still {poll.value}", "ERROR")
             return False
         else:
             log_message(f"Unexpected maintenance flag value: {flag_value}", "ERROR")
@@ -1110,16 +1335,9 @@ def prepare_for_deployment(network: str, dry_run: bool = False) -> bool:
         return False
 
 def get_canister_name_from_address(address: str, network: str) -> Optional[str]:
-    """Find the canister name from its address by looking in canister_ids.json."""
+    """Find the canister name from its address in the index of canister_ids.json."""
     try:
-        with open(POAIW_CANISTER_IDS_PATH, 'r') as f:
-            canister_ids = json.load(f)
-
-        for canister_name, networks in canister_ids.items():
-            if isinstance(networks, dict) and networks.get(network) == address:
-                return canister_name
-
-        return None
+        return load_canister_index(POAIW_CANISTER_IDS_PATH).name(network, address)
     except Exception as e:
         log_message(f"Failed to find canister name for {address}: {e}", "ERROR")
         return None
@@ -1144,7 +1362,7 @@ def should_skip_upgrade(network: str, address: str, target_hash: Optional[str],
     """
     # Get current hash
     try:
-        current_hash = get_canister_wasm_hash(network, address)
+        current_hash = get_canister_wasm_hash(network, address, fail_fast=True)
     except CanisterDoesNotExistError:
         log_message(f"Canister {address} does not exist - skipping", "WARNING")
         return True, "does_not_exist"
@@ -1177,9 +1395,119 @@ def should_skip_upgrade(network: str, address: str, target_hash: Optional[str],
         log_message(f"Hash matches but health check failed - will upgrade anyway", "WARNING")
         return False, None
 
-def upgrade_mainer(network: str, mainer: Dict, target_hash: Optional[str],
-                  dry_run: bool = False, canister_index: int = 0, deploy_with_yes: bool = False) -> bool:
-    """Upgrade a single mAIner through all steps."""
+def check_skip(network: str, address: str, target_hash: Optional[str], dry_run: bool = False) -> bool:
+    """Whether a mAIner needs no upgrade, and if so set its status.
+
+    mAIners that the journal shows as done are skipped, and half-done ones resumed, without any call.
+    Others are checked with should_skip_upgrade.
+    """
+    if upgrade_journal is not None:
+        if upgrade_journal.is_done(address):
+            reason = upgrade_journal.data(address).get("reason")
+            status = (MainerStatus.SKIPPED_DOES_NOT_EXIST if reason == MainerStatus.SKIPPED_DOES_NOT_EXIST.value
+                      else MainerStatus.SKIPPED_ALREADY_UPGRADED)
+            update_mainer_status(address, status, "Done in a previous run (journal)")
+            return True
+        if upgrade_journal.reached(address, FLAG_ON):
+            return False
+    if address in preflight_upgrades:
+        return False
+
+    should_skip, skip_reason = should_skip_upgrade(network, address, target_hash, dry_run)
+    if should_skip:
+        if skip_reason == "does_not_exist":
+            update_mainer_status(address, MainerStatus.SKIPPED_DOES_NOT_EXIST, "Canister does not exist")
+        else:
+            update_mainer_status(address, MainerStatus.SKIPPED_ALREADY_UPGRADED, "Already at target hash and healthy")
+    return should_skip
+
+def run_preflight(network: str, mainers: List[Dict], target_hash: Optional[str],
+                  concurrency: int = DEFAULT_CONCURRENCY) -> Tuple[List[Dict], int]:
+    """Decide for all mAIners at once which ones need the upgrade, before touching any of them.
+
+    Fetches the status record (module hash, status, cycles) and, where the hash already matches
+    the target, the health of all mAIners concurrently, with the same rules as should_skip_upgrade.
+    mAIners done or half-done according to the journal are not checked. Unreachable mAIners stay
+    in the work list, to be checked again one by one.
+
+    The challenge queue of the mAIners to upgrade is fetched too: mAIners with recent queue
+    activity are moved to the end of the work list, in the order their queues become quiet.
+
+    Returns:
+        Tuple of (mAIners to process, number skipped)
+    """
+    status_task = canister_status_record(network)
+    health_task = canister_health(network)
+    queue_task = canister_method(network, "getChallengeQueueAdmin")
+
+    async def preflight_task(address: str):
+        record = await status_task(address)
+        healthy = None
+        if target_hash and record.module_hash == target_hash:
+            healthy = await health_task(address)
+        quiet_at = None
+        if not healthy and record.status != "Stopped":
+            try:
+                quiet_at = queue_quiet_at(last_queue_entry((await queue_task(address)).get('Ok', [])))
+            except Exception:
+                pass  # checked again before the upgrade
+        return record, healthy, quiet_at
+
+    addresses = [mainer.get('address', '') for mainer in mainers]
+    if upgrade_journal is not None:
+        addresses = [address for address in addresses
+                     if not upgrade_journal.is_done(address) and not upgrade_journal.reached(address, FLAG_ON)]
+
+    log_message(f"=== PRE-FLIGHT: checking {len(addresses)} mAIner(s), {concurrency} at a time ===", "INFO")
+    results = run_fleet(addresses, {"check": preflight_task}, concurrency=concurrency, network=network,
+                        timeout=60, rate_limit_target=BOUNDARY_NODES)
+
+    skip = set()
+    busy_queues: Dict[str, datetime] = {}
+    unreachable = 0
+    stopped = 0
+    low_cycles = 0
+    for address in addresses:
+        result = results[address]["check"]
+        if not result.ok:
+            if "does not exist" in result.error:
+                update_mainer_status(address, MainerStatus.SKIPPED_DOES_NOT_EXIST, "Canister does not exist")
+                skip.add(address)
+            else:
+                unreachable += 1
+                log_message(f"Pre-flight: {address} unreachable: {result.error}", "WARNING")
+            continue
+        record, healthy, quiet_at = result.value
+        if healthy:
+            update_mainer_status(address, MainerStatus.SKIPPED_ALREADY_UPGRADED, "Already at target hash and healthy")
+            skip.add(address)
+            continue
+        preflight_upgrades.add(address)
+        if record.status == "Stopped":
+            stopped += 1
+        if record.balance is not None and record.balance < LOW_CYCLES_WARNING:
+            low_cycles += 1
+            log_message(f"Pre-flight: {address} has {format_cycles(record.balance)} cycles", "WARNING")
+        if quiet_at is not None:
+            busy_queues[address] = quiet_at
+
+    work_list = [mainer for mainer in mainers
+                 if mainer.get('address', '') not in skip and mainer.get('address', '') not in busy_queues]
+    work_list += sorted((mainer for mainer in mainers if mainer.get('address', '') in busy_queues),
+                        key=lambda mainer: busy_queues[mainer['address']])
+    if busy_queues:
+        log_message(f"Pre-flight: {len(busy_queues)} mAIner(s) with recent challenge queue activity moved to the end", "INFO")
+    log_message(f"Pre-flight plan: {len(preflight_upgrades)} to upgrade ({stopped} stopped, {low_cycles} low on cycles), "
+                f"{len(skip)} to skip, {unreachable} unreachable (checked again one by one), "
+                f"{len(mainers) - len(addresses)} from the journal", "INFO")
+    return work_list, len(skip)
+
+def prepare_mainer(network: str, mainer: Dict, dry_run: bool = False, canister_index: int = 0) -> Optional[Dict]:
+    """Steps 2a-2e of an upgrade: look up the mAIner, turn on maintenance, stop its timer, drain its queue and stop it.
+
+    Returns:
+        Dict with canister_name, pre_upgrade_hash and was_stopped (already stopped before), or None on failure
+    """
     address = mainer.get('address', '')
 
     log_message(f"{'='*60}", "INFO")
@@ -1188,29 +1516,42 @@ def upgrade_mainer(network: str, mainer: Dict, target_hash: Optional[str],
     # Mark as in progress
     update_mainer_status(address, MainerStatus.IN_PROGRESS)
 
-    # Find the actual canister name from canister_ids.json
-    canister_name = get_canister_name_from_address(address, network)
+    # Already stopped by a previous run: continue with its recorded state
+    if journal_reached(address, STOPPED):
+        data = upgrade_journal.data(address)
+        log_message(f"Resuming after step '{data['step']}' of a previous run (journal)", "INFO")
+        return {
+            "canister_name": data.get("canister_name"),
+            "pre_upgrade_hash": data.get("pre_upgrade_hash"),
+            "was_stopped": data.get("was_stopped", False),
+        }
 
-    if not canister_name:
-        log_message(f"Cannot find canister name for {address} in canister_ids.json", "ERROR")
-        log_message("Make sure to run get_mainers.sh first to update the configuration files", "WARNING")
-        update_mainer_status(address, MainerStatus.FAILED_OTHER, "Canister name not found in canister_ids.json")
-        return False
+    # Find the actual canister name from canister_ids.json (not needed to install a prebuilt wasm by canister ID)
+    canister_name = None
+    if mainer_wasm_path is None:
+        canister_name = get_canister_name_from_address(address, network)
 
-    log_message(f"canister_ids.json key: {canister_name}", "INFO")
+        if not canister_name:
+            log_message(f"Cannot find canister name for {address} in canister_ids.json", "ERROR")
+            log_message("Make sure to run get_mainers.sh first to update the configuration files", "WARNING")
+            update_mainer_status(address, MainerStatus.FAILED_OTHER, "Canister name not found in canister_ids.json")
+            return None
+
+        log_message(f"canister_ids.json key: {canister_name}", "INFO")
+
+    # Check canister status before proceeding
+    with stage_span(address, "status"):
+        initial_status = get_canister_status(network, address)
+    log_message(f"Canister initial status: {initial_status}", "INFO")
 
-    # Get pre-upgrade hash for verification later
+    # Get pre-upgrade hash for verification later (from the status record fetched above)
     pre_upgrade_hash = None
     if not dry_run:
         pre_upgrade_hash = get_canister_wasm_hash(network, address)
         if pre_upgrade_hash:
             log_message(f"Pre-upgrade hash: {pre_upgrade_hash}", "INFO")
 
-    # Check canister status before proceeding
-    initial_status = get_canister_status(network, address)
-    log_message(f"Canister initial status: {initial_status}", "INFO")
-
-    # Check cycles balance before upgrade
+    # Check cycles balance before upgrade (from the same status record)
     cycles_balance = get_cycles_balance(network, address)
     if cycles_balance is not None:
         log_message(f"Canister cycles balance: {format_cycles(cycles_balance)}", "INFO")
@@ -1221,155 +1562,188 @@ def upgrade_mainer(network: str, mainer: Dict, target_hash: Optional[str],
         log_message("Canister is already stopped, skipping steps 2b-2e", "INFO")
     else:
         # Step 2b: Set maintenance flag
-        if not turn_on_maintenance_flag(network, address, dry_run):
-            log_message("Failed to turn on maintenance flag", "ERROR")
-            update_mainer_status(address, MainerStatus.FAILED_MAINTENANCE, "Could not turn on maintenance flag")
-            return False
+        if not journal_reached(address, FLAG_ON):
+            with stage_span(address, "maintenance_on"):
+                flag_on = turn_on_maintenance_flag(network, address, dry_run)
+            if not flag_on:
+                log_message("Failed to turn on maintenance flag", "ERROR")
+                update_mainer_status(address, MainerStatus.FAILED_MAINTENANCE, "Could not turn on maintenance flag")
+                return None
+            journal_step(address, FLAG_ON)
 
         # Step 2c: Stop timer
-        if not stop_timer(network, address, dry_run):
-            log_message("Failed to stop timer", "ERROR")
-            update_mainer_status(address, MainerStatus.FAILED_STOP_TIMER, "Could not stop timer")
-            return False
+        if not journal_reached(address, TIMER_STOPPED):
+            with stage_span(address, "stop_timer"):
+                timer_stopped = stop_timer(network, address, dry_run)
+            if not timer_stopped:
+                log_message("Failed to stop timer", "ERROR")
+                update_mainer_status(address, MainerStatus.FAILED_STOP_TIMER, "Could not stop timer")
+                return None
+            journal_step(address, TIMER_STOPPED)
 
         # Step 2d: Check queue
-        has_entries, last_entry_time = check_queue(network, address)
-        if has_entries and last_entry_time:
-            age_minutes = (datetime.now() - last_entry_time).total_seconds() / 60
-            if age_minutes < 10:
-                wait_time = 10 - age_minutes
-                log_message(f"Challenge queue has recent entries. Waiting {wait_time:.1f} minutes...", "WARNING")
-                if not dry_run:
-                    time.sleep(wait_time * 60)
-                    # Re-check after waiting
-                    has_entries, last_entry_time = check_queue(network, address)
-
-            # Clear old entries if still present
-            if has_entries:
-                clear_queue(network, address, dry_run)
+        with stage_span(address, "queue_drain"):
+            has_entries, last_entry_time = check_queue(network, address)
+            if has_entries and last_entry_time:
+                age_minutes = (datetime.now() - last_entry_time).total_seconds() / 60
+                if age_minutes < QUEUE_QUIET_SECONDS / 60:
+                    wait_time = QUEUE_QUIET_SECONDS / 60 - age_minutes
+                    log_message(f"Challenge queue has recent entries. Waiting {wait_time:.1f} minutes...", "WARNING")
+                    if not dry_run:
+                        time.sleep(wait_time * 60)
+                        # Re-check after waiting
+                        has_entries, last_entry_time = check_queue(network, address)
+
+                # Clear old entries if still present
+                if has_entries:
+                    clear_queue(network, address, dry_run)
 
         # Step 2e: Stop canister
-        if not stop_canister(network, address, dry_run):
+        with stage_span(address, "stop"):
+            stopped = stop_canister(network, address, dry_run)
+        if not stopped:
             log_message("Failed to stop canister", "ERROR")
             update_mainer_status(address, MainerStatus.FAILED_OTHER, "Could not stop canister")
-            return False
+            return None
 
-    # Step 2f: Create snapshot
-    snapshot_id = create_snapshot(network, address, dry_run)
-    if not snapshot_id:
-        log_message("Failed to create snapshot", "ERROR")
-        # Start canister and timer before failing
-        start_canister(network, address, dry_run)
-        start_timer(network, address, dry_run)
-        update_mainer_status(address, MainerStatus.FAILED_SNAPSHOT, "Could not create snapshot")
-        return False
+    prepared = {
+        "canister_name": canister_name,
+        "pre_upgrade_hash": pre_upgrade_hash,
+        "was_stopped": initial_status == "Stopped",
+    }
+    journal_step(address, STOPPED, **prepared)
+    return prepared
+
+def complete_upgrade(network: str, address: str, prepared: Dict, target_hash: Optional[str],
+                     dry_run: bool = False, canister_index: int = 0, deploy_with_yes: bool = False) -> bool:
+    """Steps 2f-2l of an upgrade, for a mAIner stopped by prepare_mainer: snapshot, deploy, restart and verify."""
+    canister_name = prepared["canister_name"]
+    pre_upgrade_hash = prepared["pre_upgrade_hash"]
+
+    # Step 2f: Create snapshot (or take the one a previous run created)
+    if journal_reached(address, SNAPSHOT):
+        snapshot_id = upgrade_journal.data(address).get("snapshot_id")
+        log_message(f"Snapshot ID from a previous run (journal): {snapshot_id}", "INFO")
+    else:
+        with stage_span(address, "snapshot"):
+            snapshot_id = create_snapshot(network, address, dry_run)
+        if not snapshot_id:
+            log_message("Failed to create snapshot", "ERROR")
+            # Start canister and timer before failing
+            start_canister(network, address, dry_run)
+            start_timer(network, address, dry_run)
+            journal_step(address, RELEASED)
+            update_mainer_status(address, MainerStatus.FAILED_SNAPSHOT, "Could not create snapshot")
+            return False
+        journal_step(address, SNAPSHOT, snapshot_id=snapshot_id)
 
     # Step 2g: Deploy upgrade
-    if not upgrade_canister(network, canister_name, dry_run, deploy_with_yes):
-        log_message(f"Failed to upgrade canister. Snapshot ID for rollback: {snapshot_id}", "ERROR")
-        # Don't auto-rollback, let admin decide
-        update_mainer_status(address, MainerStatus.FAILED_UPGRADE, f"Upgrade failed. Snapshot: {snapshot_id}")
-        return False
+    if not journal_reached(address, DEPLOYED):
+        with stage_span(address, "deploy"):
+            if mainer_wasm_path is not None:
+                deployed = install_mainer_wasm(network, address, mainer_wasm_path, dry_run, deploy_with_yes)
+            else:
+                deployed = upgrade_canister(network, canister_name, dry_run, deploy_with_yes)
+        if not deployed:
+            log_message(f"Failed to upgrade canister. Snapshot ID for rollback: {snapshot_id}", "ERROR")
+            # Don't auto-rollback, let admin decide
+            update_mainer_status(address, MainerStatus.FAILED_UPGRADE, f"Upgrade failed. Snapshot: {snapshot_id}")
+            return False
+        journal_step(address, DEPLOYED)
+    upgrade_snapshots[address] = snapshot_id
 
     # Step 2h: Start canister
-    if not start_canister(network, address, dry_run):
-        log_message(f"Failed to start canister. Snapshot ID for rollback: {snapshot_id}", "ERROR")
-        update_mainer_status(address, MainerStatus.FAILED_START, f"Could not start canister. Snapshot: {snapshot_id}")
-        return False
+    if not journal_reached(address, STARTED):
+        with stage_span(address, "start"):
+            started = start_canister(network, address, dry_run)
+        if not started:
+            log_message(f"Failed to start canister. Snapshot ID for rollback: {snapshot_id}", "ERROR")
+            update_mainer_status(address, MainerStatus.FAILED_START, f"Could not start canister. Snapshot: {snapshot_id}")
+            return False
+        journal_step(address, STARTED)
 
     # Step 2i: Check maintenance flag (endpoint must now be available and return true)
-    # Retry logic: canister may need time to fully initialize after upgrade
+    # Polling: canister may need time to fully initialize after upgrade
     # If flag is False, call endpoint to turn it on
     if not dry_run:
-        max_retries = 10
-        retry_delay = 15.0
-        flag_value = None
-
-        for attempt in range(1, max_retries + 1):
-            time.sleep(retry_delay)
-            flag_value = get_maintenance_flag(network, address, dry_run)
-
-            if flag_value is True:
-                log_message(f"Maintenance flag check passed (attempt {attempt}/{max_retries})", "SUCCESS")
-                break
-            elif flag_value is False:
-                log_message(f"Maintenance flag is False (attempt {attempt}/{max_retries}), calling endpoint to turn it on...", "WARNING")
+        def maintenance_flag_on() -> Optional[bool]:
+            flag = get_maintenance_flag(network, address, dry_run)
+            if flag is False:
+                log_message(f"Maintenance flag is False, calling endpoint to turn it on...", "WARNING")
                 if turn_on_maintenance_flag(network, address, dry_run):
                     log_message(f"Successfully turned on maintenance flag", "SUCCESS")
-                    break
-                elif attempt < max_retries:
-                    log_message(f"Failed to turn on maintenance flag, will retry. Waiting {retry_delay}s...", "WARNING")
-                else:
-                    log_message(f"Failed to turn on maintenance flag after {max_retries} attempts. Snapshot ID for rollback: {snapshot_id}", "ERROR")
-                    update_mainer_status(address, MainerStatus.FAILED_MAINTENANCE, f"Could not turn on maintenance flag. Snapshot: {snapshot_id}")
-                    return False
-            elif attempt < max_retries:
-                log_message(f"Maintenance flag not yet True (got: {flag_value}), attempt {attempt}/{max_retries}. Waiting {retry_delay}s...", "WARNING")
-            else:
-                log_message(f"Maintenance flag check failed after {max_retries} attempts. Expected True, got: {flag_value}. Snapshot ID for rollback: {snapshot_id}", "ERROR")
-                update_mainer_status(address, MainerStatus.FAILED_MAINTENANCE, f"Maintenance flag was {flag_value}, expected True. Snapshot: {snapshot_id}")
-                return False
+                    return True
+            return flag
+
+        with stage_span(address, "post_upgrade_flag"):
+            poll = poll_until(
+                "post_upgrade_flag", maintenance_flag_on,
+                is_ready=lambda flag: flag is True,
+                on_wait=lambda attempt, delay, flag: log_message(
+                    f"Maintenance flag not yet True (got: {flag}), attempt {attempt}. Waiting {delay:.1f}s...", "WARNING")
+            )
+        flag_value = poll.value
+        if poll.ready:
+            log_message(f"Maintenance flag check passed (attempt {poll.polls}, {poll.elapsed:.1f}s)", "SUCCESS")
+        elif flag_value is False:
+            log_message(f"Failed to turn on maintenance flag after {poll.polls} attempts. Snapshot ID for rollback: {snapshot_id}", "ERROR")
+            update_mainer_status(address, MainerStatus.FAILED_MAINTENANCE, f"Could not turn on maintenance flag. Snapshot: {snapshot_id}")
+            return False
+        else:
+            log_message(f"Maintenance flag check failed after {poll.polls} attempts. Expected True, got: {flag_value}. Snapshot ID for rollback: {snapshot_id}", "ERROR")
+            update_mainer_status(address, MainerStatus.FAILED_MAINTENANCE, f"Maintenance flag was {flag_value}, expected True. Snapshot: {snapshot_id}")
+            return False
     else:
         flag_value = get_maintenance_flag(network, address, dry_run)
 
     # Step 2j: Start timer
-    if not start_timer(network, address, dry_run):
+    with stage_span(address, "start_timer"):
+        timer_started = start_timer(network, address, dry_run)
+    if not timer_started:
         if not dry_run:
             log_message(f"Failed to start timer. Canister upgraded but timer not running!", "ERROR")
             update_mainer_status(address, MainerStatus.FAILED_START_TIMER, f"Could not start timer. Snapshot: {snapshot_id}")
             return False
 
     # Step 2k: Turn off maintenance flag
-    if not turn_off_maintenance_flag(network, address, dry_run):
+    with stage_span(address, "maintenance_off"):
+        flag_off = turn_off_maintenance_flag(network, address, dry_run)
+    if not flag_off:
         if not dry_run:
             log_message(f"Failed to turn off maintenance flag. Canister upgraded but maintenance flag may still be ON!", "ERROR")
             update_mainer_status(address, MainerStatus.FAILED_MAINTENANCE, f"Could not turn off maintenance flag. Snapshot: {snapshot_id}")
             return False
 
     # Step 2i: Check health (must now return 200 OK)
-    # Give canister time for maintenance flag to fully propagate
-    if not dry_run:
-        log_message(f"Waiting 10 seconds for maintenance flag to propagate before health check...", "INFO")
-        time.sleep(10)
-
-    # Retry health check if it fails due to maintenance flag not yet propagated
-    max_health_retries = 3
-    health_retry_delay = 30.0
-    health_ok = False
-
-    for health_attempt in range(1, max_health_retries + 1):
+    # Poll while it fails because the maintenance flag has not propagated yet
+    if dry_run:
         health_ok, health_output = check_health(network, address, dry_run)
-
-        if health_ok:
-            break
-
-        # Check if failure is due to maintenance flag still being on
-        if 'mAIner is under maintenance' in health_output:
-            if health_attempt < max_health_retries:
-                log_message(f"Health check failed due to maintenance flag (attempt {health_attempt}/{max_health_retries}). Waiting {health_retry_delay}s before retry...", "WARNING")
-                if not dry_run:
-                    time.sleep(health_retry_delay)
-            else:
-                log_message(f"Health check still failing after {max_health_retries} attempts. Snapshot ID for rollback: {snapshot_id}", "ERROR")
+    else:
+        with stage_span(address, "health"):
+            poll = poll_until(
+                "health", lambda: check_health(network, address, dry_run),
+                is_ready=lambda result: result[0],
+                give_up=lambda result: 'mAIner is under maintenance' not in result[1],
+                on_wait=lambda attempt, delay, result: log_message(
+                    f"Health check failed due to maintenance flag (attempt {attempt}). Waiting {delay:.1f}s before retry...", "WARNING")
+            )
+        health_ok, health_output = poll.value
+        if not health_ok:
+            if 'mAIner is under maintenance' in health_output:
+                log_message(f"Health check still failing after {poll.polls} attempts. Snapshot ID for rollback: {snapshot_id}", "ERROR")
                 update_mainer_status(address, MainerStatus.FAILED_HEALTH, f"Health check failed (maintenance flag). Snapshot: {snapshot_id}")
-                return False
-        else:
-            # Different error - don't retry
-            if not dry_run:
+            else:
+                # Different error - not retried
                 log_message(f"Health check failed with unexpected error. Snapshot ID for rollback: {snapshot_id}", "ERROR")
                 update_mainer_status(address, MainerStatus.FAILED_HEALTH, f"Health check failed. Snapshot: {snapshot_id}")
-                return False
-
-    if not health_ok:
-        if not dry_run:
-            log_message(f"Health check failed. Snapshot ID for rollback: {snapshot_id}", "ERROR")
-            update_mainer_status(address, MainerStatus.FAILED_HEALTH, f"Health check failed. Snapshot: {snapshot_id}")
             return False
+        log_message(f"Health check passed after {poll.elapsed:.1f}s", "SUCCESS")
 
     # Step 2l: Verify the hash after upgrade
     if not dry_run:
         log_message(f"Verifying module hash after upgrade...", "INFO")
-        post_upgrade_hash = get_canister_wasm_hash(network, address)
+        with stage_span(address, "verify_hash"):
+            post_upgrade_hash = get_canister_wasm_hash(network, address, max_age=0)
 
         if not post_upgrade_hash:
             log_message(f"Could not retrieve post-upgrade hash. Snapshot ID for rollback: {snapshot_id}", "ERROR")
@@ -1399,6 +1773,433 @@ def upgrade_mainer(network: str, mainer: Dict, target_hash: Optional[str],
     update_mainer_status(address, MainerStatus.SUCCESS)
     return True
 
+def upgrade_mainer(network: str, mainer: Dict, target_hash: Optional[str],
+                  dry_run: bool = False, canister_index: int = 0, deploy_with_yes: bool = False) -> bool:
+    """Upgrade a single mAIner through all steps."""
+    prepared = prepare_mainer(network, mainer, dry_run, canister_index)
+    if prepared is None:
+        return False
+    return complete_upgrade(network, mainer.get('address', ''), prepared, target_hash, dry_run,
+                            canister_index, deploy_with_yes)
+
+class UpgradeQueue:
+    """The mAIners left to upgrade one after the other, in order.
+
+    A mAIner whose challenge queue is active can be deferred: it comes back once its queue is
+    quiet, as soon as no other mAIner is waiting. The run only waits for a queue to become quiet
+    when every mAIner left is deferred.
+    """
+
+    def __init__(self, mainers: List[Dict]):
+        self._ready = deque(enumerate(mainers))
+        self._deferred: List[Tuple[datetime, int, Dict]] = []
+        self._deferrals: Dict[int, int] = {}
+
+    def can_defer(self, index: int) -> bool:
+        """False once a mAIner was deferred MAX_QUEUE_DEFERRALS times."""
+        return self._deferrals.get(index, 0) < MAX_QUEUE_DEFERRALS
+
+    def defer(self, index: int, mainer: Dict, quiet_at: datetime) -> bool:
+        """Put a mAIner back in line until quiet_at. False if it was deferred MAX_QUEUE_DEFERRALS times already."""
+        if not self.can_defer(index):
+            return False
+        self._deferrals[index] = self._deferrals.get(index, 0) + 1
+        heapq.heappush(self._deferred, (quiet_at, index, mainer))
+        return True
+
+    def upcoming(self, count: int) -> List[int]:
+        """The indexes of the next `count` mAIners in line, not counting the deferred ones."""
+        return [index for index, _ in islice(self._ready, count)]
+
+    def __iter__(self):
+        while self._ready or self._deferred:
+            if self._deferred and (not self._ready or self._deferred[0][0] <= datetime.now()):
+                quiet_at, index, mainer = heapq.heappop(self._deferred)
+                wait = (quiet_at - datetime.now()).total_seconds()
+                if wait > 0:
+                    log_message(f"Only mAIners with an active challenge queue are left. "
+                                f"Waiting {wait / 60:.1f} minutes for mAIner {index}...", "WARNING")
+                    time.sleep(wait)
+                yield index, mainer
+            else:
+                yield self._ready.popleft()
+
+def queue_busy_until(network: str, canister_id: str) -> Optional[datetime]:
+    """When the challenge queue of a mAIner becomes quiet, None if it already is."""
+    has_entries, last_entry_time = check_queue(network, canister_id)
+    return queue_quiet_at(last_entry_time) if has_entries else None
+
+def queue_deferral(network: str, address: str, dry_run: bool = False) -> Optional[datetime]:
+    """When to come back to a mAIner whose challenge queue is active, None to upgrade it now.
+
+    Only checked before its maintenance flag is on: from then on, prepare_mainer waits for the queue.
+    """
+    if dry_run or journal_reached(address, FLAG_ON):
+        return None
+    return queue_busy_until(network, address)
+
+def release_prepared_mainer(network: str, address: str, prepared: Dict, dry_run: bool = False):
+    """Undo prepare_mainer for a mAIner that will not be upgraded after all (the run stopped before it)."""
+    if not prepared["was_stopped"]:
+        log_message(f"Releasing prepared mAIner {address} without upgrading it", "WARNING")
+        start_canister(network, address, dry_run)
+        start_timer(network, address, dry_run)
+        turn_off_maintenance_flag(network, address, dry_run)
+    journal_step(address, RELEASED)
+    update_mainer_status(address, MainerStatus.PENDING, "Prepared for the upgrade, but the run stopped before it")
+
+def run_upgrade_pipeline(network: str, mainers: List[Dict], target_hash: Optional[str], dry_run: bool = False,
+                         lookahead: int = 1, deploy_with_yes: bool = False) -> Tuple[int, int, int]:
+    """Upgrade mAIners one after the other, while the next `lookahead` mAIners are prepared in the background.
+
+    The prepare stage (skip check, maintenance flag on, timer off, queue drain, stop: steps 2a-2e)
+    is mostly waiting, so it overlaps with the snapshot, deploy and verification (steps 2f-2l) of
+    the mAIner before it, which stay strictly one at a time. Like the sequential mode, the run stops
+    at the first failure; mAIners that were prepared but not upgraded are started again.
+
+    A mAIner with an active challenge queue is deferred through UpgradeQueue before it is prepared,
+    so the mAIners behind it are prepared and upgraded meanwhile, instead of waiting for its queue.
+
+    Returns:
+        Tuple of (successful, failed, skipped) counts
+    """
+    successful = failed = skipped = 0
+    stop = threading.Event()
+    futures = {}
+    upgrade_queue = UpgradeQueue(mainers)
+
+    def prepare_stage(index: int, may_defer: bool) -> Tuple[str, Optional[Dict]]:
+        mainer = mainers[index]
+        address = mainer.get('address', '')
+        if stop.is_set() or interrupted:
+            return "not_started", None
+        _progress.index = index
+        try:
+            if check_skip(network, address, target_hash, dry_run):
+                return "skipped", None
+            quiet_at = queue_deferral(network, address, dry_run) if may_defer else None
+            if quiet_at is not None:
+                return "deferred", quiet_at
+            prepared = prepare_mainer(network, mainer, dry_run, index)
+            return ("prepared", prepared) if prepared is not None else ("failed", None)
+        except Exception as e:
+            log_message(f"Unexpected error preparing mAIner {index}: {e}", "ERROR")
+            update_mainer_status(address, MainerStatus.FAILED_OTHER, f"Unexpected error: {str(e)}")
+            return "failed", None
+        finally:
+            _progress.index = None
+
+    pool = ThreadPoolExecutor(max_workers=lookahead + 1, thread_name_prefix="prepare")
+    try:
+        for index, mainer in upgrade_queue:
+            if interrupted:
+                log_message("Process interrupted by user", "WARNING")
+                break
+            for ahead in [index] + upgrade_queue.upcoming(lookahead):
+                if ahead not in futures:
+                    futures[ahead] = pool.submit(prepare_stage, ahead, upgrade_queue.can_defer(ahead))
+
+            outcome, prepared = futures.pop(index).result()
+            if outcome == "deferred":
+                upgrade_queue.defer(index, mainer, prepared)
+                log_message(f"mAIner {index} has an active challenge queue (quiet at {prepared.strftime('%H:%M:%S')}), "
+                            f"deferred", "INFO")
+                continue
+            if outcome == "skipped":
+                skipped += 1
+                continue
+            if outcome != "prepared":
+                if outcome == "failed":
+                    failed += 1
+                    log_message(f"Failed to upgrade mAIner {index}. Stopping process.", "ERROR")
+                break
+
+            _progress.index = index
+            address = mainer.get('address', '')
+            try:
+                upgraded = complete_upgrade(network, address, prepared, target_hash, dry_run, index, deploy_with_yes)
+            except Exception as e:
+                log_message(f"Unexpected error upgrading mAIner {index}: {e}", "ERROR")
+                update_mainer_status(address, MainerStatus.FAILED_OTHER, f"Unexpected error: {str(e)}")
+                upgraded = False
+            finally:
+                _progress.index = None
+
+            if upgraded:
+                successful += 1
+            else:
+                failed += 1
+                log_message(f"Failed to upgrade mAIner {index}. Stopping process.", "ERROR")
+                break
+    finally:
+        # The look-ahead mAIners were prepared for nothing: put them back into service
+        stop.set()
+        for index, future in sorted(futures.items()):
+            if future.cancel():
+                continue
+            outcome, prepared = future.result()
+            if outcome == "prepared":
+                release_prepared_mainer(network, mainers[index].get('address', ''), prepared, dry_run)
+        pool.shutdown()
+
+    return successful, failed, skipped
+
+def process_mainer(network: str, mainer: Dict, target_hash: Optional[str], dry_run: bool = False,
+                   canister_index: int = 0, deploy_with_yes: bool = False,
+                   defer: Optional[Callable[[datetime], bool]] = None) -> str:
+    """Check whether a mAIner needs the upgrade and upgrade it. Used by the parallel waves.
+
+    defer(quiet_at) is called when the challenge queue of the mAIner is active: True to put the
+    mAIner off until then, False to upgrade it now (prepare_mainer waits for its queue).
+
+    Returns:
+        'success', 'skipped', 'deferred' or 'failed'
+    """
+    address = mainer.get('address', '')
+    _progress.index = canister_index
+    try:
+        if check_skip(network, address, target_hash, dry_run):
+            return "skipped"
+
+        if defer is not None:
+            quiet_at = queue_deferral(network, address, dry_run)
+            if quiet_at is not None and defer(quiet_at):
+                log_message(f"mAIner {canister_index} has an active challenge queue "
+                            f"(quiet at {quiet_at.strftime('%H:%M:%S')}), deferred to the next wave", "INFO")
+                return "deferred"
+
+        if upgrade_mainer(network, mainer, target_hash, dry_run, canister_index, deploy_with_yes):
+            return "success"
+        return "failed"
+    except Exception as e:
+        log_message(f"Unexpected error upgrading mAIner {canister_index}: {e}", "ERROR")
+        update_mainer_status(address, MainerStatus.FAILED_OTHER, f"Unexpected error: {str(e)}")
+        return "failed"
+    finally:
+        _progress.index = None
+
+def wave_health_gate(network: str, addresses: List[str], dry_run: bool = False, parallel: int = 1) -> List[str]:
+    """Check the health of the mAIners upgraded in a wave again, once the whole wave is done.
+
+    Returns:
+        The addresses that are not healthy (marked FAILED_HEALTH)
+    """
+    if not addresses:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, parallel)) as pool:
+        health = list(pool.map(lambda address: check_health(network, address, dry_run)[0], addresses))
+
+    unhealthy = [address for address, ok in zip(addresses, health) if not ok]
+    for address in unhealthy:
+        update_mainer_status(address, MainerStatus.FAILED_HEALTH, "Health check failed after its wave completed")
+    return unhealthy
+
+def soak_wave(network: str, addresses: List[str], soak: float, dry_run: bool = False, parallel: int = 1) -> List[str]:
+    """Keep checking the health of the mAIners of a wave for `soak` seconds, before the rollout ramps up.
+
+    Returns:
+        The addresses that became unhealthy (marked FAILED_HEALTH), at the first check that finds any
+    """
+    if not addresses or soak <= 0:
+        return []
+    checks = max(1, math.ceil(soak / SOAK_CHECK_INTERVAL))
+    log_message(f"Soaking {len(addresses)} mAIner(s) for {soak:.0f}s ({checks} health check(s))...", "INFO")
+    for _ in range(checks):
+        if interrupted:
+            break
+        time.sleep(soak / checks)
+        unhealthy = wave_health_gate(network, addresses, dry_run, parallel)
+        if unhealthy:
+            return unhealthy
+    return []
+
+def restore_snapshot(network: str, canister_id: str, snapshot_id: str, dry_run: bool = False) -> bool:
+    """Roll a mAIner back to the snapshot taken before its upgrade and put it back into service."""
+    log_message(f"Rolling back {canister_id} to snapshot {snapshot_id}...", "WARNING")
+    if not stop_canister(network, canister_id, dry_run):
+        return False
+    if not load_snapshot(network, canister_id, snapshot_id, dry_run):
+        # Leave it stopped: it runs the code that failed
+        log_message(f"Canister {canister_id} is left stopped for manual inspection", "ERROR")
+        return False
+    if not start_canister(network, canister_id, dry_run):
+        return False
+    # The snapshot was taken with the timer stopped and the maintenance flag on
+    if not start_timer(network, canister_id, dry_run) and not dry_run:
+        return False
+    if not turn_off_maintenance_flag(network, canister_id, dry_run) and not dry_run:
+        return False
+    journal_step(canister_id, RELEASED)
+    log_message(f"Rolled back {canister_id} to snapshot {snapshot_id}", "SUCCESS")
+    return True
+
+def rollback_mainers(network: str, addresses: List[str], dry_run: bool = False, parallel: int = 1) -> List[str]:
+    """Restore failed mAIners from the snapshots taken before their deploy, `parallel` at a time.
+
+    mAIners without a snapshot in this run were not deployed, and have nothing to roll back.
+
+    Returns:
+        The addresses that were rolled back (marked ROLLED_BACK)
+    """
+    to_restore = [address for address in addresses if address in upgrade_snapshots]
+    if not to_restore:
+        return []
+    log_message(f"Rolling back {len(to_restore)} mAIner(s) from their snapshots: {', '.join(to_restore)}", "WARNING")
+
+    def rollback(address: str) -> bool:
+        snapshot_id = upgrade_snapshots[address]
+        reason = (mainer_status_tracker.get(address) or {}).get('error') or "failed after its deploy"
+        try:
+            restored = restore_snapshot(network, address, snapshot_id, dry_run)
+        except Exception as e:
+            log_message(f"Unexpected error rolling back {address}: {e}", "ERROR")
+            restored = False
+        if restored:
+            update_mainer_status(address, MainerStatus.ROLLED_BACK, f"Rolled back to snapshot {snapshot_id} after: {reason}")
+        else:
+            update_mainer_status(address, MainerStatus.FAILED_OTHER, f"Rollback to snapshot {snapshot_id} failed after: {reason}")
+        return restored
+
+    with ThreadPoolExecutor(max_workers=max(1, parallel), thread_name_prefix="rollback") as pool:
+        restored = list(pool.map(rollback, to_restore))
+    return [address for address, ok in zip(to_restore, restored) if ok]
+
+def plan_waves(mainers: List[Dict], wave_size: Optional[int], canary: int = 0, ramp: float = 2.0) -> List[List[Dict]]:
+    """Split the mAIners into waves: all of wave_size, or with a canary a first wave of `canary`
+    mAIners, each next wave `ramp` times bigger, up to wave_size (no limit if None)."""
+    if not canary:
+        return [mainers[i:i + wave_size] for i in range(0, len(mainers), wave_size)]
+    waves = []
+    start = 0
+    size = canary
+    while start < len(mainers):
+        count = min(size, wave_size) if wave_size else size
+        waves.append(mainers[start:start + count])
+        start += count
+        size = math.ceil(size * ramp)
+    return waves
+
+def run_upgrade_waves(network: str, mainers: List[Dict], target_hash: Optional[str], dry_run: bool = False,
+                      parallel: int = 1, wave_size: Optional[int] = None, max_failure_rate: float = 0.0,
+                      deploy_with_yes: bool = False, canary: int = 0, soak: float = 0.0,
+                      ramp: float = 2.0) -> Tuple[int, int, int]:
+    """Upgrade mAIners `parallel` at a time, in waves of `wave_size`.
+
+    Every mAIner goes through the same steps as in the sequential mode (process_mainer).
+    A wave only starts when all mAIners of the previous wave are done and healthy.
+    The run is aborted, without starting new upgrades, as soon as more than
+    max_failure_rate of the upgrades failed (counted over at least one wave, so with
+    the default of 0 the first failure aborts, like in the sequential mode).
+    Upgrades that are already running when the run is aborted are finished.
+
+    With a canary, the first wave has `canary` mAIners and each next wave is `ramp` times
+    bigger (up to wave_size). Before the next wave starts, the health of the wave is watched
+    for `soak` seconds. A mAIner that fails after its deploy (start, maintenance flag, health
+    or hash verification, also during the soak) halts the rollout, and the failed mAIners
+    are restored from their snapshots in parallel.
+
+    A mAIner with an active challenge queue is deferred to the next wave (at most
+    MAX_QUEUE_DEFERRALS times), so its wave does not wait for its queue. A wave of deferred
+    mAIners only starts once the first of their queues is quiet.
+
+    Returns:
+        Tuple of (successful, failed, skipped) counts
+    """
+    base_size = wave_size or parallel
+    waves = plan_waves(list(enumerate(mainers)), wave_size if canary else base_size, canary, ramp)
+    counts = {"success": 0, "failed": 0, "skipped": 0}
+    counts_lock = threading.Lock()
+    abort = threading.Event()
+    deferrals: Dict[int, int] = {}
+    deferred_until: Dict[int, datetime] = {}
+
+    def too_many_failures() -> bool:
+        attempted = counts["success"] + counts["failed"]
+        return counts["failed"] > max_failure_rate * max(attempted, base_size)
+
+    def run(index: int, mainer: Dict) -> str:
+        if abort.is_set() or interrupted:
+            return "not_started"
+
+        def defer(quiet_at: datetime) -> bool:
+            with counts_lock:
+                if deferrals.get(index, 0) >= MAX_QUEUE_DEFERRALS:
+                    return False
+                deferrals[index] = deferrals.get(index, 0) + 1
+                deferred_until[index] = quiet_at
+                return True
+
+        outcome = process_mainer(network, mainer, target_hash, dry_run, index, deploy_with_yes, defer)
+        if outcome == "deferred":
+            return outcome
+        with counts_lock:
+            counts[outcome] += 1
+            if outcome == "failed" and canary and mainer.get('address', '') in upgrade_snapshots:
+                if not abort.is_set():
+                    abort.set()
+                    log_message(f"mAIner {index} failed after its deploy - no new upgrades will be started", "ERROR")
+            elif outcome == "failed" and too_many_failures() and not abort.is_set():
+                abort.set()
+                log_message(f"Failure rate above {max_failure_rate:.0%} ({counts['failed']} failed) - "
+                            f"no new upgrades will be started", "ERROR")
+        return outcome
+
+    def roll_back(addresses: List[str]):
+        rolled_back = rollback_mainers(network, addresses, dry_run, parallel)
+        log_message(f"Rollout halted: {len(rolled_back)}/{len(addresses)} failed mAIner(s) rolled back", "ERROR")
+
+    for wave_number, wave in enumerate(waves, 1):
+        if abort.is_set() or interrupted:
+            break
+        if all(index in deferred_until for index, _ in wave):
+            wait = (min(deferred_until[index] for index, _ in wave) - datetime.now()).total_seconds()
+            if wait > 0:
+                log_message(f"Only mAIners with an active challenge queue are left. "
+                            f"Waiting {wait / 60:.1f} minutes...", "WARNING")
+                time.sleep(wait)
+        log_message(f"{'='*60}", "INFO")
+        kind = "CANARY " if canary and wave_number == 1 else ""
+        log_message(f"=== {kind}WAVE {wave_number}/{len(waves)}: {len(wave)} mAIner(s), {parallel} at a time ===", "INFO")
+
+        with ThreadPoolExecutor(max_workers=max(1, parallel), thread_name_prefix="upgrade") as pool:
+            outcomes = list(pool.map(lambda item: run(*item), wave))
+
+        deferred = [item for item, outcome in zip(wave, outcomes) if outcome == "deferred"]
+        if deferred:
+            if wave_number < len(waves):
+                waves[wave_number].extend(deferred)
+            else:
+                waves.append(deferred)
+
+        addresses = [mainer.get('address', '') for _, mainer in wave]
+        if canary:
+            failed_after_deploy = [address for address, outcome in zip(addresses, outcomes)
+                                   if outcome == "failed" and address in upgrade_snapshots]
+            if failed_after_deploy:
+                roll_back(failed_after_deploy)
+                break
+
+        if abort.is_set() or interrupted:
+            break
+
+        upgraded = [address for address, outcome in zip(addresses, outcomes) if outcome == "success"]
+        unhealthy = wave_health_gate(network, upgraded, dry_run, parallel)
+        if not unhealthy and canary and wave_number < len(waves):
+            unhealthy = soak_wave(network, upgraded, soak, dry_run, parallel)
+        if unhealthy:
+            counts["success"] -= len(unhealthy)
+            counts["failed"] += len(unhealthy)
+            log_message(f"Wave {wave_number} health gate failed for {len(unhealthy)} mAIner(s): "
+                        f"{', '.join(unhealthy)}. Not starting the next wave.", "ERROR")
+            if canary:
+                roll_back(unhealthy)
+            break
+        log_message(f"Wave {wave_number}/{len(waves)} done and healthy "
+                    f"(total: {counts['success']} upgraded, {counts['skipped']} skipped, {counts['failed']} failed)",
+                    "SUCCESS")
+
+    return counts["success"], counts["failed"], counts["skipped"]
+
 def main():
     parser = argparse.ArgumentParser(
         description="Upgrade mAIner canisters with safety checks and rollback capability"
@@ -1451,8 +2252,84 @@ def main():
         action="store_true",
         help="Use 'dfx deploy --yes' to skip confirmation prompts"
     )
+    parser.add_argument(
+        "--install-by-hash",
+        action="store_true",
+        help="Build the mAIner wasm once, check it against --target-hash and install it into each mAIner by canister ID"
+    )
+    parser.add_argument(
+        "--wasm",
+        help="With --install-by-hash: install this prebuilt wasm instead of building it"
+    )
+    parser.add_argument(
+        "--no-preflight",
+        action="store_true",
+        help="Do not check all mAIners concurrently up front; decide whether to skip each one right before its upgrade"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run from its journal: skip mAIners it finished, resume half-done ones at their last step"
+    )
+    parser.add_argument(
+        "--lookahead",
+        type=int,
+        default=0,
+        help="Prepare (maintenance on, timer off, queue drain, stop) the next N mAIners while the current one is upgraded (default: 0)"
+    )
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        default=1,
+        help="Number of mAIners to upgrade at the same time (default: 1, one after the other)"
+    )
+    parser.add_argument(
+        "--wave-size",
+        type=int,
+        help="Upgrade in waves of this many mAIners; a wave only starts when the previous one is healthy (default: --parallel)"
+    )
+    parser.add_argument(
+        "--max-failure-rate",
+        type=float,
+        default=0.0,
+        help="With --parallel/--wave-size: abort when more than this fraction of the upgrades fail (default: 0, the first failure)"
+    )
+    parser.add_argument(
+        "--canary",
+        type=int,
+        default=0,
+        help="Upgrade this many mAIners first, then ramp up the wave size; mAIners failing after their deploy are "
+             "rolled back from their snapshots and the rollout halts (default: 0, no canary)"
+    )
+    parser.add_argument(
+        "--soak",
+        type=float,
+        default=300.0,
+        help="With --canary: seconds to keep checking the health of a wave before the next one starts (default: 300)"
+    )
+    parser.add_argument(
+        "--ramp",
+        type=float,
+        default=2.0,
+        help="With --canary: factor by which each wave is bigger than the previous one, up to --wave-size (default: 2)"
+    )
+    add_cache_arguments(parser)
 
     args = parser.parse_args()
+    wave_mode = args.parallel > 1 or args.wave_size is not None or args.canary > 0
+    if args.parallel < 1 or (args.wave_size is not None and args.wave_size < 1):
+        parser.error("--parallel and --wave-size must be at least 1")
+    if args.canary < 0 or args.soak < 0 or args.ramp < 1:
+        parser.error("--canary and --soak must be at least 0, --ramp at least 1")
+    if wave_mode and args.ask_before_upgrade:
+        parser.error("--ask-before-upgrade cannot be combined with --parallel, --wave-size or --canary")
+    if args.wasm and not args.install_by_hash:
+        parser.error("--wasm requires --install-by-hash")
+    if args.lookahead < 0:
+        parser.error("--lookahead must be at least 0")
+    if args.lookahead and (wave_mode or args.ask_before_upgrade):
+        parser.error("--lookahead cannot be combined with --parallel, --wave-size, --canary or --ask-before-upgrade")
+    configure_cache_from_args(args)
 
     # Open log file
     global log_file_handle
@@ -1473,6 +2350,19 @@ def main():
         log_message(f"User: {args.user or 'All'}", "INFO")
         log_message(f"Dry Run: {args.dry_run}", "INFO")
         log_message(f"Ask Before Upgrade: {args.ask_before_upgrade}", "INFO")
+        if wave_mode:
+            log_message(f"Parallel: {args.parallel}, wave size: {args.wave_size or args.parallel}, "
+                        f"max failure rate: {args.max_failure_rate:.0%}", "INFO")
+        if args.canary:
+            log_message(f"Canary: {args.canary} mAIner(s), soak {args.soak:.0f}s, ramp x{args.ramp:g}, "
+                        f"automatic rollback from snapshots", "INFO")
+        if args.lookahead:
+            log_message(f"Look-ahead: preparing the next {args.lookahead} mAIner(s) during each upgrade", "INFO")
+        if args.install_by_hash:
+            log_message(f"Install by hash: {args.wasm or 'build the mAIner wasm once'}", "INFO")
+        elif args.parallel > 1:
+            log_message("Without --install-by-hash the `dfx deploy`s run one at a time; "
+                        "only the other upgrade steps run in parallel", "WARNING")
         log_message(f"{'='*60}", "INFO")
 
         if args.dry_run:
@@ -1485,8 +2375,46 @@ def main():
                 log_message("Upgrade cancelled", "INFO")
                 sys.exit(0)
 
-        # Step 1: Prepare for deployment
-        if not args.skip_preparation:
+        # Build the wasm once and check its hash, instead of a dfx deploy (and build) per mAIner
+        global mainer_wasm_path, upgrade_journal, status_stream, stage_timings
+        if args.install_by_hash:
+            log_message("=== PREPARING THE mAIner WASM ===", "INFO")
+            wasm_path = Path(args.wasm).resolve() if args.wasm else build_mainer_wasm(args.dry_run)
+            if wasm_path is None or (not args.dry_run and not wasm_path.exists()):
+                log_message(f"No mAIner wasm to install ({wasm_path})", "ERROR")
+                sys.exit(1)
+            if not args.dry_run:
+                wasm_hash = wasm_module_hash(wasm_path)
+                log_message(f"Wasm {wasm_path}: module hash {wasm_hash}", "INFO")
+                if args.target_hash and wasm_hash != args.target_hash:
+                    log_message(f"Wasm hash {wasm_hash} does not match the target hash {args.target_hash}", "ERROR")
+                    sys.exit(1)
+                # mAIners already running this wasm are skipped, and each upgrade is verified against it
+                args.target_hash = wasm_hash
+            mainer_wasm_path = wasm_path
+
+        # Journal of the upgrade steps, to resume after a crash or Ctrl+C
+        if args.dry_run:
+            if args.resume:
+                log_message("Dry run: not reading or writing the upgrade journal", "WARNING")
+        else:
+            upgrade_journal = UpgradeJournal.open(args.network, args.target_hash, resume=args.resume)
+            log_message(f"Upgrade journal: {upgrade_journal.path}", "INFO")
+            if args.resume:
+                done = sum(1 for address in upgrade_journal.state if upgrade_journal.is_done(address))
+                half_done = sum(1 for address in upgrade_journal.state if upgrade_journal.reached(address, FLAG_ON)
+                                and not upgrade_journal.is_done(address))
+                log_message(f"Resuming: {done} mAIner(s) done and {half_done} half-done in the journal", "INFO")
+
+        status_stream = StatusStream.open(STATUS_STREAM_PATH, script="upgrade_mainers", network=args.network,
+                                          target_hash=args.target_hash, dry_run=args.dry_run)
+        log_message(f"Status stream: {STATUS_STREAM_PATH} (python -m scripts.status_stream follow ...)", "INFO")
+        stage_timings = StageTimings(sink=status_stream.span)
+
+        # Step 1: Prepare for deployment (dfx.json and canister_ids.json are not used when installing by hash)
+        if args.install_by_hash:
+            log_message("Installing by canister ID: skipping preparation step", "INFO")
+        elif not args.skip_preparation:
             if not prepare_for_deployment(args.network, args.dry_run):
                 log_message("Failed to prepare for deployment", "ERROR")
                 sys.exit(1)
@@ -1495,14 +2423,15 @@ def main():
 
         # Get all mAIners
         mainers = get_mainers(args.network)
+        index = load_canister_index(POAIW_CANISTER_IDS_PATH)
+        index.register_mainers(mainers)
 
         # Filter mAIners based on arguments
         share_agent_mainers = []
         for mainer in mainers:
             address = mainer.get('address', '')
-            canister_type_dict = mainer.get('canisterType', {}).get("MainerAgent", {})
-            canister_type = list(canister_type_dict.keys())[0] if canister_type_dict else ''
-            owned_by = mainer.get('ownedBy', '')
+            canister_type = index.canister_type(address) if address else ''
+            owned_by = index.owner(address) if address else ''
 
             # Skip if not ShareAgent type
             if canister_type != "ShareAgent" or address == "":
@@ -1552,70 +2481,99 @@ def main():
         global current_mainer_index, total_mainers_to_process
         total_mainers_to_process = max_upgrades
 
-        # Process mAIners
-        for i, mainer in enumerate(share_agent_mainers[:max_upgrades]):
-            current_mainer_index = i
+        # Pre-flight: find the mAIners that actually need the upgrade, all at once
+        work_list = share_agent_mainers[:max_upgrades]
+        preflight_skipped = 0
+        if not args.no_preflight and len(work_list) > 1:
+            work_list, preflight_skipped = run_preflight(args.network, work_list, args.target_hash)
+            total_mainers_to_process = len(work_list)
+        stage_timings.start_run(len(work_list))
+
+        # Process mAIners in parallel waves
+        if wave_mode:
+            successful, failed, skipped = run_upgrade_waves(
+                args.network, work_list, args.target_hash, args.dry_run,
+                args.parallel, args.wave_size, args.max_failure_rate, args.deploy_with_yes,
+                args.canary, args.soak, args.ramp
+            )
 
-            if interrupted:
-                log_message("Process interrupted by user", "WARNING")
-                break
+        # Process mAIners one after the other, preparing the next ones in the background
+        elif args.lookahead:
+            successful, failed, skipped = run_upgrade_pipeline(
+                args.network, work_list, args.target_hash, args.dry_run,
+                args.lookahead, args.deploy_with_yes
+            )
 
-            try:
-                # Check if upgrade should be skipped
-                address = mainer.get('address', '')
+        # Process mAIners one after the other, deferring those with an active challenge queue
+        else:
+            upgrade_queue = UpgradeQueue(work_list)
+            for i, mainer in upgrade_queue:
+                current_mainer_index = i
 
-                should_skip, skip_reason = should_skip_upgrade(args.network, address, args.target_hash, args.dry_run)
-                if should_skip:
-                    if skip_reason == "does_not_exist":
-                        update_mainer_status(address, MainerStatus.SKIPPED_DOES_NOT_EXIST, "Canister does not exist")
-                    else:
-                        update_mainer_status(address, MainerStatus.SKIPPED_ALREADY_UPGRADED, "Already at target hash and healthy")
-                    skipped += 1
-                    continue
+                if interrupted:
+                    log_message("Process interrupted by user", "WARNING")
+                    break
 
-                # Ask for confirmation if --ask-before-upgrade is set
-                if args.ask_before_upgrade:
-                    log_message(f"About to upgrade mAIner {i}: {address}", "WARNING")
-                    response = input(f"Continue with upgrade? (y/n/exit) [y]: ").strip().lower()
-                    if not response:
-                        response = 'y'  # Default to yes
-
-                    # Normalize responses
-                    if response in ['yes', 'y']:
-                        response = 'y'
-                    elif response in ['no', 'n']:
-                        response = 'n'
-                    elif response in ['exit', 'e']:
-                        response = 'exit'
-
-                    if response == 'exit':
-                        log_message(f"Exiting upgrade process by user request", "INFO")
-                        update_mainer_status(address, MainerStatus.SKIPPED_USER_REQUEST, "User chose to exit")
-                        break
-                    elif response == 'n':
-                        log_message(f"Skipping mAIner {i} by user request", "INFO")
-                        update_mainer_status(address, MainerStatus.SKIPPED_USER_REQUEST, "User chose to skip")
+                try:
+                    # Check if upgrade should be skipped
+                    address = mainer.get('address', '')
+
+                    if check_skip(args.network, address, args.target_hash, args.dry_run):
                         skipped += 1
                         continue
-                    elif response != 'y':
-                        log_message(f"Invalid response. Skipping mAIner {i}", "WARNING")
-                        update_mainer_status(address, MainerStatus.SKIPPED_USER_REQUEST, "Invalid response")
-                        skipped += 1
+
+                    # Upgrade mAIners with a quiet challenge queue first, instead of waiting for this one
+                    quiet_at = queue_deferral(args.network, address, args.dry_run) if upgrade_queue.can_defer(i) else None
+                    if quiet_at is not None and upgrade_queue.defer(i, mainer, quiet_at):
+                        log_message(f"mAIner {i} has an active challenge queue (quiet at {quiet_at.strftime('%H:%M:%S')}), "
+                                    f"deferred", "INFO")
                         continue
 
-                # Proceed with upgrade
-                if upgrade_mainer(args.network, mainer, args.target_hash, args.dry_run, i, args.deploy_with_yes):
-                    successful += 1
-                else:
+                    # Ask for confirmation if --ask-before-upgrade is set
+                    if args.ask_before_upgrade:
+                        log_message(f"About to upgrade mAIner {i}: {address}", "WARNING")
+                        response = input(f"Continue with upgrade? (y/n/exit) [y]: ").strip().lower()
+                        if not response:
+                            response = 'y'  # Default to yes
+
+                        # Normalize responses
+                        if response in ['yes', 'y']:
+                            response = 'y'
+                        elif response in ['no', 'n']:
+                            response = 'n'
+                        elif response in ['exit', 'e']:
+                            response = 'exit'
+
+                        if response == 'exit':
+                            log_message(f"Exiting upgrade process by user request", "INFO")
+                            update_mainer_status(address, MainerStatus.SKIPPED_USER_REQUEST, "User chose to exit")
+                            break
+                        elif response == 'n':
+                            log_message(f"Skipping mAIner {i} by user request", "INFO")
+                            update_mainer_status(address, MainerStatus.SKIPPED_USER_REQUEST, "User chose to skip")
+                            skipped += 1
+                            continue
+                        elif response != 'y':
+                            log_message(f"Invalid response. Skipping mAIner {i}", "WARNING")
+                            update_mainer_status(address, MainerStatus.SKIPPED_USER_REQUEST, "Invalid response")
+                            skipped += 1
+                            continue
+
+                    # Proceed with upgrade
+                    if upgrade_mainer(args.network, mainer, args.target_hash, args.dry_run, i, args.deploy_with_yes):
+                        successful += 1
+                    else:
+                        failed += 1
+                        log_message(f"Failed to upgrade mAIner {i}. Stopping process.", "ERROR")
+                        break
+                except Exception as e:
                     failed += 1
-                    log_message(f"Failed to upgrade mAIner {i}. Stopping process.", "ERROR")
+                    address = mainer.get('address', '')
+                    log_message(f"Unexpected error upgrading mAIner {i}: {e}", "ERROR")
+                    update_mainer_status(address, MainerStatus.FAILED_OTHER, f"Unexpected error: {str(e)}")
                     break
-            except Exception as e:
-                failed += 1
-                address = mainer.get('address', '')
-                log_message(f"Unexpected error upgrading mAIner {i}: {e}", "ERROR")
-                update_mainer_status(address, MainerStatus.FAILED_OTHER, f"Unexpected error: {str(e)}")
-                break
+
+        skipped += preflight_skipped
 
         # Reset progress tracking
         current_mainer_index = None
@@ -1627,10 +2585,18 @@ def main():
 
         # Print concise status report (pass max_upgrades to show only what was processed)
         print_status_report(processed_count=max_upgrades)
+        write_timings_report(stage_timings)
 
         if failed > 0:
             sys.exit(1)
     finally:
+        if upgrade_journal is not None:
+            upgrade_journal.close()
+            upgrade_journal = None
+        if status_stream is not None:
+            status_stream.close()
+            status_stream = None
+        stage_timings = None
         # Always close log file
         if log_file_handle:
             log_file_handle.close()
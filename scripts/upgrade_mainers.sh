@@ -11,6 +11,8 @@ SKIP_PREPARATION=""
 ASK_BEFORE_UPGRADE=""
 REVERSE=""
 DEPLOY_WITH_YES=""
+NO_CACHE=""
+REFRESH=""
 
 # Parse command line arguments
 while [ $# -gt 0 ]; do
@@ -65,9 +67,17 @@ while [ $# -gt 0 ]; do
             DEPLOY_WITH_YES="--deploy-with-yes"
             shift
             ;;
+        --no-cache)
+            NO_CACHE="--no-cache"
+            shift
+            ;;
+        --refresh)
+            REFRESH="--refresh"
+            shift
+            ;;
         *)
             echo "Unknown argument: $1"
-            echo "Usage: $0 --network [local|ic|testing|development|demo|prd] [--target-hash HASH] [--num NUM] [--mainer CANISTER_ID] [--user PRINCIPAL] [--dry-run] [--skip-preparation] [--ask-before-upgrade] [--reverse] [--deploy-with-yes]"
+            echo "Usage: $0 --network [local|ic|testing|development|demo|prd] [--target-hash HASH] [--num NUM] [--mainer CANISTER_ID] [--user PRINCIPAL] [--dry-run] [--skip-preparation] [--ask-before-upgrade] [--reverse] [--deploy-with-yes] [--no-cache] [--refresh]"
             echo ""
             echo "Options:"
             echo "  --network NETWORK       Required. Network to upgrade mainers on"
@@ -80,6 +90,8 @@ while [ $# -gt 0 ]; do
             echo "  --ask-before-upgrade    Optional. Ask for confirmation before upgrading each canister"
             echo "  --reverse               Optional. Process mainers in reverse order"
             echo "  --deploy-with-yes       Optional. Use 'dfx deploy --yes' to skip confirmation prompts"
+            echo "  --no-cache              Optional. Do not use the cached mAIner list"
+            echo "  --refresh               Optional. Fetch a fresh mAIner list and update the cache"
             exit 1
             ;;
     esac
@@ -131,6 +143,14 @@ if [ ! -z "$DEPLOY_WITH_YES" ]; then
     PYTHON_CMD="$PYTHON_CMD $DEPLOY_WITH_YES"
 fi
 
+if [ ! -z "$NO_CACHE" ]; then
+    PYTHON_CMD="$PYTHON_CMD $NO_CACHE"
+fi
+
+if [ ! -z "$REFRESH" ]; then
+    PYTHON_CMD="$PYTHON_CMD $REFRESH"
+fi
+
 echo "Executing: $PYTHON_CMD"
 echo ""
 